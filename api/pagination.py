@@ -0,0 +1,49 @@
+"""API pagination — page numbers by default, keyset cursors on request."""
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from config.pagination import CURSOR_PARAM, InvalidCursor, cursor_requested, keyset_page
+
+
+class CursorOrPageNumberPagination(PageNumberPagination):
+    """``?page=N`` as before; ``?pagination=cursor`` pages on ``(created_at, id)``.
+
+    Cursor responses carry ``next``/``previous`` links and ``results`` but no
+    ``count``, so no page costs a ``COUNT(*)`` or an ``OFFSET``.
+    """
+
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if not cursor_requested(request.query_params):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        try:
+            self.keyset = keyset_page(
+                queryset, request.query_params.get(CURSOR_PARAM), self.get_page_size(request)
+            )
+        except InvalidCursor:
+            raise NotFound("Invalid cursor.") from None
+        return list(self.keyset)
+
+    def get_paginated_response(self, data):
+        if self.keyset is None:
+            return super().get_paginated_response(data)
+        return Response(
+            {
+                "next": self._cursor_link(self.keyset.next_cursor),
+                "previous": self._cursor_link(self.keyset.previous_cursor),
+                "results": data,
+            }
+        )
+
+    def _cursor_link(self, cursor: str | None) -> str | None:
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, CURSOR_PARAM, cursor)
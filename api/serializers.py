@@ -1,10 +1,19 @@
 """DRF serializers for the public / authenticated REST API."""
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
-from orders.models import Order, Subscription, VPSInstance
+from orders.billing_context import get_billing_context
+from orders.models import (
+    Order,
+    Subscription,
+    VPSInstance,
+    VPSInstanceStatus,
+    VPSOperation,
+    VPSPowerAction,
+)
 from services.models import PlanFeature, ServicePlan
 from tickets.models import Ticket, TicketMessage
 
@@ -105,6 +114,35 @@ class TicketSerializer(serializers.ModelSerializer):
         ]
 
 
+class TicketListSerializer(serializers.ModelSerializer):
+    """Ticket list row — thread summary instead of message bodies.
+
+    Expects a queryset from ``Ticket.objects.with_message_summary()``.
+    """
+
+    message_count = serializers.IntegerField(read_only=True)
+    last_message_at = serializers.DateTimeField(read_only=True, allow_null=True)
+    last_message_is_staff = serializers.BooleanField(read_only=True, allow_null=True)
+    is_open = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Ticket
+        fields = [
+            "id",
+            "reference_short",
+            "subject",
+            "status",
+            "priority",
+            "is_open",
+            "message_count",
+            "last_message_at",
+            "last_message_is_staff",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
 class TicketCreateSerializer(serializers.Serializer):
     """Payload for opening a new support ticket."""
 
@@ -161,7 +199,63 @@ class VPSInstanceSerializer(serializers.ModelSerializer):
 class VPSActionSerializer(serializers.Serializer):
     """Payload for VPS power actions."""
 
-    action = serializers.ChoiceField(choices=["start", "stop", "restart"])
+    action = serializers.ChoiceField(choices=VPSPowerAction.choices)
+
+
+class VPSBulkActionSerializer(serializers.Serializer):
+    """Payload for a power action on many instances: ``ids`` or a ``status`` filter."""
+
+    action = serializers.ChoiceField(choices=VPSPowerAction.choices)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False
+    )
+    status = serializers.ChoiceField(choices=VPSInstanceStatus.choices, required=False)
+
+    def validate_ids(self, value):
+        ids = list(dict.fromkeys(value))
+        limit = settings.POWER_BULK_ACTION_LIMIT
+        if len(ids) > limit:
+            raise serializers.ValidationError(f"At most {limit} instances per request.")
+        return ids
+
+    def validate(self, attrs):
+        if ("ids" in attrs) == ("status" in attrs):
+            raise serializers.ValidationError("Provide either ids or status.")
+        return attrs
+
+
+class VPSBulkActionResultSerializer(serializers.Serializer):
+    """One instance's outcome in a bulk power action."""
+
+    id = serializers.IntegerField()
+    queued = serializers.SerializerMethodField()
+    operation = serializers.IntegerField(source="operation.pk", default=None)
+    error = serializers.CharField()
+
+    def get_queued(self, result) -> bool:
+        return result.operation is not None
+
+
+class VPSOperationSerializer(serializers.ModelSerializer):
+    """A queued VPS power action and the status of its instance."""
+
+    instance_status = serializers.CharField(source="instance.status", read_only=True)
+    error = serializers.CharField(source="error_message", read_only=True)
+
+    class Meta:
+        model = VPSOperation
+        fields = [
+            "id",
+            "instance",
+            "action",
+            "status",
+            "error",
+            "instance_status",
+            "created_at",
+            "started_at",
+            "completed_at",
+        ]
+        read_only_fields = fields
 
 
 # ---------------------------------------------------------------------------
@@ -205,10 +299,14 @@ class MeSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(SubscriptionSerializer(allow_null=True))
     def get_subscription(self, user):
-        customer = getattr(user, "stripe_customer", None)
-        if customer is None:
-            return None
-        sub = customer.get_active_subscription()
+        request = self.context.get("request")
+        if request is not None and request.user.pk == user.pk:
+            sub = get_billing_context(request).subscription
+        else:
+            customer = getattr(user, "stripe_customer", None)
+            if customer is None:
+                return None
+            sub = customer.get_active_subscription()
         if sub is None:
             return None
         return SubscriptionSerializer(sub).data
@@ -0,0 +1,20 @@
+"""DRF throttles that keep their counters in the shared ``throttle`` cache alias."""
+
+from django.core.cache import caches
+from rest_framework import throttling
+
+
+class ThrottleCacheMixin:
+    """Point SimpleRateThrottle at ``caches["throttle"]`` instead of the default cache."""
+
+    @property
+    def cache(self):
+        return caches["throttle"]
+
+
+class AnonRateThrottle(ThrottleCacheMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(ThrottleCacheMixin, throttling.UserRateThrottle):
+    pass
@@ -5,6 +5,8 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from .views import (
+    DatabaseStatsView,
+    FleetStatsView,
     HealthView,
     JWTAuthThrottle,
     MeView,
@@ -13,9 +15,12 @@ from .views import (
     TicketDetailView,
     TicketListCreateView,
     TicketReplyView,
+    VPSBulkActionView,
     VPSInstanceActionView,
     VPSInstanceDetailView,
     VPSInstanceListView,
+    VPSOperationDetailView,
+    VPSOperationListView,
 )
 
 app_name = "api"
@@ -23,6 +28,8 @@ app_name = "api"
 urlpatterns = [
     # Liveness / readiness probe
     path("health/", HealthView.as_view(), name="health"),
+    path("health/db/", DatabaseStatsView.as_view(), name="health-db"),
+    path("health/fleet/", FleetStatsView.as_view(), name="health-fleet"),
     # API docs
     path("v1/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("v1/docs/", SpectacularSwaggerView.as_view(url_name="api:schema"), name="docs"),
@@ -47,4 +54,11 @@ urlpatterns = [
     path("v1/vps/", VPSInstanceListView.as_view(), name="v1-vps-list"),
     path("v1/vps/<int:pk>/", VPSInstanceDetailView.as_view(), name="v1-vps-detail"),
     path("v1/vps/<int:pk>/action/", VPSInstanceActionView.as_view(), name="v1-vps-action"),
+    path("v1/vps/bulk-action/", VPSBulkActionView.as_view(), name="v1-vps-bulk-action"),
+    path("v1/vps/operations/", VPSOperationListView.as_view(), name="v1-vps-operation-list"),
+    path(
+        "v1/vps/operations/<int:pk>/",
+        VPSOperationDetailView.as_view(),
+        name="v1-vps-operation",
+    ),
 ]
@@ -1,28 +1,58 @@
 """REST API views — versioned under /api/v1/."""
 
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
 from django.db import transaction
-from drf_spectacular.utils import OpenApiResponse, extend_schema, inline_serializer
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    OpenApiResponse,
+    extend_schema,
+    inline_serializer,
+)
 from rest_framework import generics, serializers, status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework.throttling import UserRateThrottle
 from rest_framework.views import APIView
 
-from orders.models import Order, VPSInstance
+from config.db import pool_stats
+from orders.models import Order, VPSInstance, VPSOperation
+from orders.power import (
+    RETRY_AFTER,
+    PowerActionConflict,
+    PowerActionError,
+    request_bulk_power_action,
+    request_power_action,
+    wait_for_operation,
+)
+from orders.reconcile import last_metrics
+from services.catalog import catalog_version
 from services.models import ServicePlan
 from tickets.models import Ticket, TicketMessage, TicketPriority, TicketStatus
 
+from .pagination import CursorOrPageNumberPagination
 from .serializers import (
     MeSerializer,
     OrderSerializer,
     ServicePlanSerializer,
     TicketCreateSerializer,
+    TicketListSerializer,
     TicketMessageSerializer,
     TicketReplySerializer,
     TicketSerializer,
     VPSActionSerializer,
+    VPSBulkActionResultSerializer,
+    VPSBulkActionSerializer,
     VPSInstanceSerializer,
+    VPSOperationSerializer,
 )
+from .throttling import UserRateThrottle
 
 
 class TicketCreateThrottle(UserRateThrottle):
@@ -57,6 +87,64 @@ class HealthView(APIView):
         return Response({"status": "ok"})
 
 
+class DatabaseStatsView(APIView):
+    """Staff-only connection/pool metrics for this process (see config/db.py)."""
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        operation_id="health_db_stats",
+        responses={
+            200: inline_serializer(
+                name="DatabaseStatsResponse",
+                fields={
+                    "alias": serializers.CharField(),
+                    "vendor": serializers.CharField(),
+                    "process_type": serializers.CharField(),
+                    "pooled": serializers.BooleanField(),
+                    "conn_max_age": serializers.IntegerField(allow_null=True),
+                    "conn_health_checks": serializers.BooleanField(),
+                    "pool": serializers.DictField(allow_null=True),
+                },
+            )
+        },
+    )
+    def get(self, request):
+        return Response(pool_stats())
+
+
+class FleetStatsView(APIView):
+    """Staff-only metrics of the last fleet status reconcile (see orders/reconcile.py)."""
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        operation_id="health_fleet_stats",
+        responses={
+            200: inline_serializer(
+                name="FleetStatsResponse",
+                fields={
+                    "checked": serializers.IntegerField(),
+                    "changed": serializers.IntegerField(),
+                    "missing": serializers.IntegerField(),
+                    "unmapped": serializers.IntegerField(),
+                    "unmanaged": serializers.IntegerField(),
+                    "transitions": serializers.DictField(child=serializers.IntegerField()),
+                    "skipped_providers": serializers.ListField(child=serializers.CharField()),
+                    "duration": serializers.FloatField(),
+                    "finished_at": serializers.DateTimeField(),
+                },
+            ),
+            204: OpenApiResponse(description="No reconcile has run yet."),
+        },
+    )
+    def get(self, request):
+        metrics = last_metrics()
+        if metrics is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(metrics)
+
+
 # ---------------------------------------------------------------------------
 # Plans (public)
 # ---------------------------------------------------------------------------
@@ -72,20 +160,59 @@ class PlanListView(generics.ListAPIView):
     def get_queryset(self):
         return ServicePlan.objects.filter(is_active=True).prefetch_related("features")
 
+    def list(self, request, *args, **kwargs):
+        """Serve the rendered JSON page from cache, keyed on the catalog version.
+
+        The body is rendered once per catalog version and page; repeat polls cost a
+        cache read, and clients sending a matching If-None-Match get a bodiless 304.
+        The browsable API renderer bypasses the cache.
+        """
+        if type(request.accepted_renderer) is not JSONRenderer:
+            return super().list(request, *args, **kwargs)
+
+        page = request.query_params.get(self.paginator.page_query_param, "1")
+        # The host is part of the key because pagination links are absolute URLs.
+        key = f"api:plans:{catalog_version()}:{request.get_host()}:{page}"
+        entry = caches["fragments"].get(key)
+        if entry is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = JSONRenderer().render(response.data)
+            entry = {
+                "body": body,
+                "etag": f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"',
+            }
+            caches["fragments"].set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+
+        response = HttpResponse(entry["body"], content_type="application/json")
+        response["ETag"] = entry["etag"]
+        patch_vary_headers(response, ("Accept",))
+        patch_cache_control(response, public=True, max_age=settings.PLANS_API_MAX_AGE)
+        return get_conditional_response(request, etag=entry["etag"], response=response)
+
 
 # ---------------------------------------------------------------------------
 # Tickets (authenticated)
 # ---------------------------------------------------------------------------
 
 
+# Each message serializes its sender's email — join it instead of one query per message.
+_MESSAGES_WITH_SENDER = Prefetch(
+    "messages", queryset=TicketMessage.objects.select_related("sender")
+)
+
+
 class TicketListCreateView(generics.ListCreateAPIView):
     """
-    GET  /api/v1/tickets/ — list the authenticated user's tickets (paginated, newest first).
+    GET  /api/v1/tickets/ — list the authenticated user's tickets (paginated, newest first);
+                           each row carries a thread summary, not the messages.
     POST /api/v1/tickets/ — open a new support ticket.
     """
 
     permission_classes = [IsAuthenticated]
-    serializer_class = TicketSerializer
+    serializer_class = TicketListSerializer
+    pagination_class = CursorOrPageNumberPagination
 
     def get_throttles(self):
         if self.request.method == "POST":
@@ -93,16 +220,16 @@ class TicketListCreateView(generics.ListCreateAPIView):
         return super().get_throttles()
 
     def get_queryset(self):
-        return self.request.user.tickets.prefetch_related("messages").all()
+        return self.request.user.tickets.with_message_summary()
 
     def get_serializer_class(self):
         if self.request.method == "POST":
             return TicketCreateSerializer
-        return TicketSerializer
+        return TicketListSerializer
 
     @extend_schema(
         operation_id="v1_tickets_list",
-        responses=TicketSerializer(many=True),
+        responses=TicketListSerializer(many=True),
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -151,7 +278,9 @@ class TicketDetailView(APIView):
 
     def _get_ticket(self, request, pk):
         try:
-            return Ticket.objects.prefetch_related("messages").get(pk=pk, user=request.user)
+            return Ticket.objects.prefetch_related(_MESSAGES_WITH_SENDER).get(
+                pk=pk, user=request.user
+            )
         except Ticket.DoesNotExist:
             return None
 
@@ -270,6 +399,7 @@ class OrderListView(generics.ListAPIView):
 
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
+    pagination_class = CursorOrPageNumberPagination
 
     def get_queryset(self):
         return Order.objects.filter(customer__user=self.request.user).select_related("service_plan")
@@ -285,6 +415,7 @@ class VPSInstanceListView(generics.ListAPIView):
 
     permission_classes = [IsAuthenticated]
     serializer_class = VPSInstanceSerializer
+    pagination_class = CursorOrPageNumberPagination
 
     def get_queryset(self):
         return VPSInstance.objects.filter(customer__user=self.request.user)
@@ -308,7 +439,12 @@ class VPSInstanceDetailView(APIView):
 
 
 class VPSInstanceActionView(APIView):
-    """POST /api/v1/vps/{pk}/action/ — execute power action on a VPS instance."""
+    """POST /api/v1/vps/{pk}/action/ — queue a power action on a VPS instance.
+
+    Returns 202 with the queued operation; poll ``Location`` (optionally with
+    ``?wait=<seconds>``), pausing for ``Retry-After`` between requests, until
+    its status is ``succeeded`` or ``failed``.
+    """
 
     permission_classes = [IsAuthenticated]
 
@@ -316,14 +452,17 @@ class VPSInstanceActionView(APIView):
         operation_id="v1_vps_action",
         request=VPSActionSerializer,
         responses={
-            200: VPSInstanceSerializer,
+            202: VPSOperationSerializer,
             400: OpenApiResponse(description="Invalid action for current state"),
             404: OpenApiResponse(description="Not found"),
+            409: OpenApiResponse(description="Another action is in progress"),
         },
     )
     def post(self, request, pk):
         try:
-            instance = VPSInstance.objects.get(pk=pk, customer__user=request.user)
+            instance = VPSInstance.objects.select_related("customer").get(
+                pk=pk, customer__user=request.user
+            )
         except VPSInstance.DoesNotExist:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -331,40 +470,168 @@ class VPSInstanceActionView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        action = serializer.validated_data["action"]
+        try:
+            operation = request_power_action(
+                instance, serializer.validated_data["action"], request.user
+            )
+        except PowerActionConflict as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except PowerActionError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        location = reverse("api:v1-vps-operation", kwargs={"pk": operation.pk})
+        return Response(
+            VPSOperationSerializer(operation).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": location, "Retry-After": str(RETRY_AFTER)},
+        )
 
-        # Validate action is appropriate for current status
-        from orders.models import VPSInstanceStatus
 
-        status_action_map = {
-            "start": {VPSInstanceStatus.STOPPED},
-            "stop": {VPSInstanceStatus.RUNNING},
-            "restart": {VPSInstanceStatus.RUNNING},
-        }
-        if instance.status not in status_action_map[action]:
-            return Response(
-                {"detail": f"Cannot {action} a {instance.get_status_display().lower()} instance."},
-                status=status.HTTP_400_BAD_REQUEST,
+class VPSBulkActionView(APIView):
+    """POST /api/v1/vps/bulk-action/ — queue a power action on many instances.
+
+    Takes ``ids`` or a ``status`` filter (at most POWER_BULK_ACTION_LIMIT
+    instances).  Ownership is checked in one query, and the accepted
+    instances are queued in batches that the worker runs concurrently.
+    Returns one result per instance.  The response is 202 if anything was
+    queued, 200 if nothing was.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        operation_id="v1_vps_bulk_action",
+        request=VPSBulkActionSerializer,
+        responses={
+            202: inline_serializer(
+                name="VPSBulkActionResponse",
+                fields={
+                    "action": serializers.CharField(),
+                    "queued": serializers.IntegerField(),
+                    "rejected": serializers.IntegerField(),
+                    "results": VPSBulkActionResultSerializer(many=True),
+                },
+            ),
+            400: OpenApiResponse(description="Invalid payload or too many instances"),
+            409: OpenApiResponse(description="A concurrent request claimed some instances"),
+        },
+    )
+    def post(self, request):
+        serializer = VPSBulkActionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        try:
+            results = request_bulk_power_action(
+                request.user,
+                data["action"],
+                ids=data.get("ids"),
+                status=data.get("status"),
+                limit=settings.POWER_BULK_ACTION_LIMIT,
             )
+        except PowerActionConflict as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except PowerActionError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queued = sum(result.operation is not None for result in results)
+        return Response(
+            {
+                "action": data["action"],
+                "queued": queued,
+                "rejected": len(results) - queued,
+                "results": VPSBulkActionResultSerializer(results, many=True).data,
+            },
+            status=status.HTTP_202_ACCEPTED if queued else status.HTTP_200_OK,
+        )
 
-        from orders.provisioning import get_provider
 
-        provider = get_provider()
-        action_method = getattr(provider, action)
-        success = action_method(instance)
+class VPSOperationDetailView(APIView):
+    """GET /api/v1/vps/operations/{pk}/ — status of a queued power action.
 
-        if not success:
+    ``?wait=<seconds>`` long-polls: the response is held until the operation
+    finishes or the wait (capped at POWER_ACTION_MAX_WAIT, a few seconds)
+    runs out.  An unfinished operation comes back with ``Retry-After``.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        operation_id="v1_vps_operation",
+        parameters=[
+            OpenApiParameter(
+                "wait",
+                float,
+                description="Seconds to wait for the operation to finish (long-poll).",
+            )
+        ],
+        responses={
+            200: VPSOperationSerializer,
+            400: OpenApiResponse(description="Invalid wait"),
+            404: OpenApiResponse(description="Not found"),
+        },
+    )
+    def get(self, request, pk):
+        try:
+            operation = VPSOperation.objects.select_related("instance").get(
+                pk=pk, instance__customer__user=request.user
+            )
+        except VPSOperation.DoesNotExist:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            wait = float(request.query_params.get("wait", 0))
+        except ValueError:
             return Response(
-                {"detail": f"VPS {action} failed."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                {"wait": ["Must be a number of seconds."]}, status=status.HTTP_400_BAD_REQUEST
             )
+        wait = max(0.0, min(wait, settings.POWER_ACTION_MAX_WAIT))
+        operation = wait_for_operation(operation, wait)
+        response = Response(VPSOperationSerializer(operation).data)
+        if not operation.done:
+            response["Retry-After"] = str(RETRY_AFTER)
+        return response
 
-        status_result = {
-            "start": VPSInstanceStatus.RUNNING,
-            "stop": VPSInstanceStatus.STOPPED,
-            "restart": VPSInstanceStatus.RUNNING,
-        }
-        instance.status = status_result[action]
-        instance.save(update_fields=["status", "updated_at"])
 
-        return Response(VPSInstanceSerializer(instance).data)
+class VPSOperationListView(APIView):
+    """GET /api/v1/vps/operations/?ids=1,2,3 — status of many power actions at once.
+
+    Lets a client track a bulk action with one request per poll rather than
+    one per instance.  Unknown or foreign ids are left out of the response.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        operation_id="v1_vps_operation_list",
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                str,
+                required=True,
+                description="Comma-separated operation ids (at most POWER_BULK_ACTION_LIMIT).",
+            )
+        ],
+        responses={
+            200: VPSOperationSerializer(many=True),
+            400: OpenApiResponse(description="Missing or invalid ids"),
+        },
+    )
+    def get(self, request):
+        try:
+            ids = {int(pk) for pk in request.query_params.get("ids", "").split(",") if pk}
+        except ValueError:
+            ids = set()
+        if not ids or len(ids) > settings.POWER_BULK_ACTION_LIMIT:
+            limit = settings.POWER_BULK_ACTION_LIMIT
+            return Response(
+                {"ids": [f"Give 1 to {limit} comma-separated operation ids."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        operations = (
+            VPSOperation.objects.filter(pk__in=ids, instance__customer__user=request.user)
+            .select_related("instance")
+            .order_by("pk")
+        )
+        return Response(VPSOperationSerializer(operations, many=True).data)
@@ -0,0 +1,46 @@
+"""CACHES profiles shared by the settings modules.
+
+Every process must see the same cache for throttles, the plan-catalog version
+and cached sessions to behave consistently across gunicorn and Celery workers,
+so the default profile is Redis (``REDIS_URL``).  The ``locmem`` profile is a
+per-process stand-in with the same aliases, for tests and Redis-less dev boxes.
+
+Aliases:
+  - ``default``   — general purpose (catalog version, Stripe object snapshots)
+  - ``throttle``  — DRF rate-limit counters (api/throttling.py)
+  - ``sessions``  — session store when SESSION_ENGINE is cache-backed
+  - ``fragments`` — rendered pages and serialized API payloads
+"""
+
+from __future__ import annotations
+
+CACHE_ALIASES = {
+    # alias: (key prefix, default timeout in seconds)
+    "default": ("ez", 300),
+    "throttle": ("ez:throttle", 3600),
+    "sessions": ("ez:session", 86400),
+    "fragments": ("ez:fragment", 3600),
+}
+
+
+def build_caches(backend: str, redis_url: str = "") -> dict:
+    """Return a CACHES dict for *backend* (``redis`` or ``locmem``)."""
+    if backend not in ("redis", "locmem"):
+        raise ValueError(f"Unknown CACHE_BACKEND {backend!r}; expected 'redis' or 'locmem'")
+
+    caches = {}
+    for alias, (prefix, timeout) in CACHE_ALIASES.items():
+        if backend == "redis":
+            caches[alias] = {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": redis_url,
+                "KEY_PREFIX": prefix,
+                "TIMEOUT": timeout,
+            }
+        else:
+            caches[alias] = {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": f"ez-{alias}",
+                "TIMEOUT": timeout,
+            }
+    return caches
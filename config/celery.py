@@ -68,3 +68,9 @@ def on_worker_ready(**kwargs):
 @worker_shutdown.connect
 def on_worker_shutdown(**kwargs):
     _log.info("Celery worker shutting down")
+    try:
+        from config.db import pool_stats
+
+        _log.info("DB connection stats at shutdown: %s", pool_stats())
+    except Exception:  # noqa: BLE001
+        _log.exception("Could not collect DB connection stats")
@@ -0,0 +1,88 @@
+"""Database connection settings per process type, plus pool metrics.
+
+Two connection modes are available for PostgreSQL:
+
+  - persistent (default) — each thread keeps its connection for
+    ``DB_CONN_MAX_AGE`` seconds, and ``CONN_HEALTH_CHECKS`` discards dead ones
+    before reuse.
+  - pooled (``DB_POOL=True``) — psycopg 3's built-in pool (Django ≥ 5.1), one
+    pool per process, sized by ``PROCESS_TYPE``.  Requires ``psycopg[pool]``
+    instead of psycopg2.
+
+``PROCESS_TYPE`` is set per process in the Procfile / Makefile.  Sizes assume
+the process layouts there: gthread web workers run two request threads each,
+Celery prefork children run one task at a time, and the power worker runs
+16 tasks on threads, each of which may hold a connection.
+"""
+
+from __future__ import annotations
+
+from importlib.util import find_spec
+
+PROCESS_TYPES = ("web", "worker", "provisioning", "power", "periodic")
+
+# process type: (min_size, max_size) — per process, not per host
+POOL_SIZES = {
+    "web": (2, 4),
+    "worker": (1, 2),
+    "provisioning": (1, 4),
+    "power": (2, 16),  # make worker-power: --pool=threads --concurrency=16
+    "periodic": (1, 1),
+}
+
+
+def database_options(
+    engine: str,
+    pooled: bool,
+    process_type: str,
+    pool_timeout: int = 10,
+    min_size: int | None = None,
+    max_size: int | None = None,
+) -> dict:
+    """Return ``DATABASES["default"]["OPTIONS"]`` for the given mode.
+
+    Raises:
+        ValueError: If *process_type* is unknown, or pooling is requested
+            without psycopg 3 and ``psycopg_pool`` installed.
+    """
+    if not pooled or "postgresql" not in engine:
+        return {}
+    if process_type not in POOL_SIZES:
+        raise ValueError(f"Unknown PROCESS_TYPE {process_type!r}; expected one of {PROCESS_TYPES}")
+    if find_spec("psycopg") is None or find_spec("psycopg_pool") is None:
+        raise ValueError(
+            "DB_POOL=True needs psycopg 3 with its pool; install 'psycopg[binary,pool]' "
+            "(see requirements/prod.txt)"
+        )
+
+    default_min, default_max = POOL_SIZES[process_type]
+    return {
+        "pool": {
+            "min_size": min_size or default_min,
+            "max_size": max_size or default_max,
+            "timeout": pool_timeout,
+            "name": f"ez-{process_type}",
+        }
+    }
+
+
+def pool_stats(alias: str = "default") -> dict:
+    """Connection stats for *alias*, including psycopg pool counters when pooled."""
+    from django.conf import settings
+    from django.db import connections
+
+    conn = connections[alias]
+    stats = {
+        "alias": alias,
+        "vendor": conn.vendor,
+        "process_type": settings.PROCESS_TYPE,
+        "pooled": bool(conn.settings_dict.get("OPTIONS", {}).get("pool")),
+        "conn_max_age": conn.settings_dict.get("CONN_MAX_AGE"),
+        "conn_health_checks": conn.settings_dict.get("CONN_HEALTH_CHECKS"),
+        "pool": None,
+    }
+    pool = getattr(conn, "pool", None) if stats["pooled"] else None
+    if pool is not None:
+        # psycopg_pool counters: pool_min/max/size, pool_available, requests_waiting, …
+        stats["pool"] = pool.get_stats()
+    return stats
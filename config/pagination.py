@@ -0,0 +1,154 @@
+"""Keyset ("cursor") pagination on ``(created_at, id)``, newest first.
+
+Page-number pagination runs a ``COUNT(*)`` for every page and an ``OFFSET``
+that grows with the page number, so deep pages of a large account get slower
+and slower.  Keyset pagination remembers the last row shown instead and asks
+for the rows after it:
+
+    WHERE created_at <= %s AND NOT (created_at = %s AND id >= %s)
+    ORDER BY created_at DESC, id DESC
+    LIMIT page_size + 1
+
+An index leading with ``created_at`` (or ``<owner>, created_at``) serves that
+in constant time at any depth.  ``id`` breaks ties between rows created in
+the same instant, so rows are never skipped or repeated, and rows created
+while a client is paging do not shift the pages it has yet to fetch.
+
+The mode is opt-in per request: ``?pagination=cursor`` starts at the newest
+row, and the ``cursor`` tokens on each page move forward and back.  Requests
+without either keep page numbers.  The HTML list views use ``paginate()``;
+the API uses ``api.pagination.CursorOrPageNumberPagination``.
+"""
+
+from __future__ import annotations
+
+import base64
+import datetime
+from dataclasses import dataclass
+
+from django.core.paginator import Paginator
+from django.http import Http404
+
+CURSOR_PARAM = "cursor"
+MODE_PARAM = "pagination"
+
+
+class InvalidCursor(ValueError):
+    """A cursor token that was not produced by ``Cursor.encode()``."""
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position of a row in ``(created_at, id)`` order.
+
+    ``before`` selects the page of newer rows ending just above this row
+    (the "previous" link); otherwise the page of older rows after it.
+    """
+
+    created_at: datetime.datetime
+    pk: int
+    before: bool = False
+
+    def encode(self) -> str:
+        raw = f"{'b' if self.before else 'a'}|{self.created_at.isoformat()}|{self.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> Cursor:
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+            direction, created_at, pk = raw.split("|")
+            if direction not in ("a", "b"):
+                raise ValueError(direction)
+            return cls(datetime.datetime.fromisoformat(created_at), int(pk), direction == "b")
+        except ValueError as exc:
+            raise InvalidCursor(token) from exc
+
+    @classmethod
+    def of(cls, row, before: bool = False) -> Cursor:
+        return cls(row.created_at, row.pk, before)
+
+
+class KeysetPage:
+    """One keyset page — enough of ``django.core.paginator.Page`` for the list templates."""
+
+    is_cursor = True
+
+    def __init__(self, object_list: list, next_cursor: str | None, previous_cursor: str | None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+def cursor_requested(params) -> bool:
+    """True when the query parameters opt in to cursor pagination."""
+    return CURSOR_PARAM in params or params.get(MODE_PARAM) == "cursor"
+
+
+def keyset_page(queryset, cursor: str | None, page_size: int) -> KeysetPage:
+    """Return the page of *queryset* at *cursor* (the newest rows when empty).
+
+    Any ordering on *queryset* is replaced.  Raises ``InvalidCursor`` for a
+    malformed token.
+    """
+    position = Cursor.decode(cursor) if cursor else None
+
+    if position is None:
+        rows = list(queryset.order_by("-created_at", "-pk")[: page_size + 1])
+        has_next, has_previous = len(rows) > page_size, False
+        rows = rows[:page_size]
+    elif not position.before:
+        older = queryset.filter(created_at__lte=position.created_at).exclude(
+            created_at=position.created_at, pk__gte=position.pk
+        )
+        rows = list(older.order_by("-created_at", "-pk")[: page_size + 1])
+        has_next, has_previous = len(rows) > page_size, True
+        rows = rows[:page_size]
+    else:
+        newer = queryset.filter(created_at__gte=position.created_at).exclude(
+            created_at=position.created_at, pk__lte=position.pk
+        )
+        rows = list(newer.order_by("created_at", "pk")[: page_size + 1])
+        has_next, has_previous = True, len(rows) > page_size
+        rows = rows[:page_size][::-1]
+
+    if not rows:
+        return KeysetPage([], None, None)
+    return KeysetPage(
+        rows,
+        next_cursor=Cursor.of(rows[-1]).encode() if has_next else None,
+        previous_cursor=Cursor.of(rows[0], before=True).encode() if has_previous else None,
+    )
+
+
+def paginate(request, queryset, per_page: int, ordering: tuple[str, ...] = ("-created_at",)):
+    """Page *queryset* for an HTML list view.
+
+    Returns a ``KeysetPage`` when the request opts in to cursor pagination,
+    otherwise a page-number ``Page`` of *queryset* ordered by *ordering*.
+    """
+    if cursor_requested(request.GET):
+        try:
+            return keyset_page(queryset, request.GET.get(CURSOR_PARAM), per_page)
+        except InvalidCursor:
+            raise Http404("Invalid cursor.") from None
+    paginator = Paginator(queryset.order_by(*ordering), per_page)
+    return paginator.get_page(request.GET.get("page"))
@@ -8,6 +8,9 @@ from pathlib import Path
 
 from decouple import Csv, config
 
+from config.cache import build_caches
+from config.db import database_options
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 # ---------------------------------------------------------------------------
@@ -92,6 +95,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "orders.billing_context.context_processor",
             ],
         },
     },
@@ -101,16 +105,33 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 # ---------------------------------------------------------------------------
 # Database  (default: SQLite for quick bootstrap; swap via env in prod)
-# ---------------------------------------------------------------------------
+# Connection modes and per-process pool sizes are documented in config/db.py.
+# ---------------------------------------------------------------------------
+DB_ENGINE = config("DB_ENGINE", default="django.db.backends.sqlite3")
+# web | worker | provisioning | power | periodic
+PROCESS_TYPE = config("PROCESS_TYPE", default="web")
+DB_POOL = config("DB_POOL", default=False, cast=bool)  # psycopg 3 pool (PostgreSQL only)
+_db_options = database_options(
+    DB_ENGINE,
+    DB_POOL,
+    PROCESS_TYPE,
+    pool_timeout=config("DB_POOL_TIMEOUT", default=10, cast=int),
+    min_size=config("DB_POOL_MIN_SIZE", default=0, cast=int),
+    max_size=config("DB_POOL_MAX_SIZE", default=0, cast=int),
+)
+
 DATABASES = {
     "default": {
-        "ENGINE": config("DB_ENGINE", default="django.db.backends.sqlite3"),
+        "ENGINE": DB_ENGINE,
         "NAME": config("DB_NAME", default=str(BASE_DIR / "db.sqlite3")),
         "USER": config("DB_USER", default=""),
         "PASSWORD": config("DB_PASSWORD", default=""),
         "HOST": config("DB_HOST", default=""),
         "PORT": config("DB_PORT", default=""),
-        "OPTIONS": {},
+        # A pool owns connection lifetime, so Django must close (return) after use.
+        "CONN_MAX_AGE": 0 if _db_options else config("DB_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": _db_options,
     }
 }
 
@@ -191,8 +212,8 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "api.throttling.AnonRateThrottle",
+        "api.throttling.UserRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/hour",
@@ -227,6 +248,39 @@ STRIPE_PUBLIC_KEY = config("STRIPE_PUBLIC_KEY", default="")
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY", default="")
 STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET", default="")
 
+# Webhook ingestion mode (see orders/ingest.py):
+#   "direct" — one PaymentEvent insert + one Celery task per webhook POST
+#   "memory" — process-local buffer, bulk-inserted per batch (DEBUG only; not durable)
+#   "redis"  — shared Redis stream, bulk-inserted per batch and drained by beat
+STRIPE_WEBHOOK_INGEST_MODE = config("STRIPE_WEBHOOK_INGEST_MODE", default="direct")
+STRIPE_WEBHOOK_BATCH_SIZE = config("STRIPE_WEBHOOK_BATCH_SIZE", default=100, cast=int)
+STRIPE_WEBHOOK_FLUSH_INTERVAL = config("STRIPE_WEBHOOK_FLUSH_INTERVAL", default=2, cast=int)
+
+# Per-customer ordered processing (see orders/sharding.py).  0 = disabled; N > 0
+# routes event tasks to queues stripe-events-0 … stripe-events-<N-1>, each of
+# which must be consumed by exactly one --concurrency=1 worker.
+STRIPE_EVENT_SHARDS = config("STRIPE_EVENT_SHARDS", default=0, cast=int)
+
+# Seconds a Stripe object snapshot from a webhook stays in the read-through
+# cache in front of stripe.Subscription.retrieve (see orders/stripe_cache.py).
+STRIPE_OBJECT_CACHE_TTL = config("STRIPE_OBJECT_CACHE_TTL", default=900, cast=int)
+
+# Seconds a user's customer + active subscription stay cached between requests
+# (see orders/billing_context.py); 0 loads them once per request only.
+BILLING_CONTEXT_CACHE_TTL = config("BILLING_CONTEXT_CACHE_TTL", default=60, cast=int)
+
+# Weekly pruning of processed PaymentEvent rows (see orders/pruning.py).  Set
+# PAYMENT_EVENT_ARCHIVE_DIR to keep a gzip JSONL copy of every deleted batch.
+PAYMENT_EVENT_RETENTION_DAYS = config("PAYMENT_EVENT_RETENTION_DAYS", default=90, cast=int)
+PAYMENT_EVENT_PRUNE_BATCH_SIZE = config("PAYMENT_EVENT_PRUNE_BATCH_SIZE", default=1000, cast=int)
+PAYMENT_EVENT_PRUNE_SLEEP = config("PAYMENT_EVENT_PRUNE_SLEEP", default=0.2, cast=float)
+PAYMENT_EVENT_ARCHIVE_DIR = config("PAYMENT_EVENT_ARCHIVE_DIR", default="")
+
+# Monthly partitions for PaymentEvent / NotificationLog on PostgreSQL (see
+# orders/partitions.py).  Expired partitions are dropped whole.
+AUDIT_PARTITION_MONTHS_AHEAD = config("AUDIT_PARTITION_MONTHS_AHEAD", default=3, cast=int)
+NOTIFICATION_LOG_RETENTION_DAYS = config("NOTIFICATION_LOG_RETENTION_DAYS", default=365, cast=int)
+
 # ---------------------------------------------------------------------------
 # Email  (dev uses console backend; override in dev.py / prod.py)
 # ---------------------------------------------------------------------------
@@ -237,8 +291,9 @@ SERVER_EMAIL = DEFAULT_FROM_EMAIL
 # ---------------------------------------------------------------------------
 # Celery
 # ---------------------------------------------------------------------------
-CELERY_BROKER_URL = config("REDIS_URL", default="redis://localhost:6379/0")
-CELERY_RESULT_BACKEND = config("REDIS_URL", default="redis://localhost:6379/0")
+REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
@@ -258,15 +313,89 @@ CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 # Task routing — dedicated queue for long-running provisioning jobs
 CELERY_TASK_ROUTES = {
     "orders.tasks.provision_vps_task": {"queue": "provisioning"},
+    "orders.tasks.provision_batch_task": {"queue": "provisioning"},
+    "orders.periodic.poll_provisioning_operations": {"queue": "provisioning"},
+    "orders.periodic.provision_stranded_jobs": {"queue": "provisioning"},
+    "orders.periodic.reconcile_fleet_status": {"queue": "periodic"},
+    "orders.periodic.expire_stale_power_operations": {"queue": "periodic"},
+    "orders.tasks.vps_power_action_task": {"queue": "power"},
+    "orders.tasks.vps_bulk_power_action_task": {"queue": "power"},
     "orders.periodic.check_expiring_subscriptions": {"queue": "periodic"},
     "orders.periodic.cleanup_stale_provisioning_jobs": {"queue": "periodic"},
     "orders.periodic.cleanup_old_payment_events": {"queue": "periodic"},
+    "orders.periodic.maintain_partitions": {"queue": "periodic"},
+    "orders.periodic.flush_webhook_buffer": {"queue": "default"},
+    "orders.periodic.drain_payment_events": {"queue": "default"},
 }
 CELERY_TASK_DEFAULT_QUEUE = "default"
 
 # Broker connection retry on startup (silences Celery ≥5.3 deprecation warning)
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# ---------------------------------------------------------------------------
+# VPS provisioning (see orders/provisioning.py)
+# ---------------------------------------------------------------------------
+# In-flight provider operations polled per poll_provisioning_operations run,
+# and how many of those polls run at once.
+PROVISIONING_POLL_BATCH_SIZE = config("PROVISIONING_POLL_BATCH_SIZE", default=500, cast=int)
+PROVISIONING_POLL_CONCURRENCY = config("PROVISIONING_POLL_CONCURRENCY", default=32, cast=int)
+# Queued jobs claimed per provision_batch_task, and the seconds a checkout
+# waits for others to join its batch (see orders/batch.py).
+PROVISIONING_BATCH_SIZE = config("PROVISIONING_BATCH_SIZE", default=200, cast=int)
+PROVISIONING_BATCH_DELAY = config("PROVISIONING_BATCH_DELAY", default=2, cast=int)
+# Instances diffed per query by reconcile_fleet_status (see orders/reconcile.py).
+FLEET_RECONCILE_CHUNK_SIZE = config("FLEET_RECONCILE_CHUNK_SIZE", default=2000, cast=int)
+# Power actions (see orders/power.py): seconds before an unfinished operation
+# is failed, the longest ?wait= a client may long-poll an operation for (kept
+# short — a waiting request holds one of the web process's gthread threads),
+# and the most instances one /api/v1/vps/bulk-action/ request may act on.
+POWER_ACTION_TIMEOUT = config("POWER_ACTION_TIMEOUT", default=600, cast=int)
+POWER_ACTION_MAX_WAIT = config("POWER_ACTION_MAX_WAIT", default=3, cast=int)
+POWER_BULK_ACTION_LIMIT = config("POWER_BULK_ACTION_LIMIT", default=500, cast=int)
+
+# Provider for new ProvisioningJobs: demo | proxmox
+VPS_PROVIDER = config("VPS_PROVIDER", default="demo")
+
+# Proxmox VE API (see orders/proxmox.py).  Set PROXMOX_TOKEN_ID/SECRET for API
+# token auth, or PROXMOX_USERNAME/PASSWORD for a reused auth ticket.
+# PROXMOX_TEMPLATES maps PLAN_SPECS os_template names to template VMIDs.
+# PROXMOX_TASK_TIMEOUT bounds the wait for a start/stop/reboot task (keep it
+# under the power task's soft time limit); PROXMOX_GUEST_AGENT_TIMEOUT is the
+# uptime after which a new VM is reported ready without an agent-reported IP.
+PROXMOX_URL = config("PROXMOX_URL", default="")
+PROXMOX_NODE = config("PROXMOX_NODE", default="pve")
+PROXMOX_TOKEN_ID = config("PROXMOX_TOKEN_ID", default="")
+PROXMOX_TOKEN_SECRET = config("PROXMOX_TOKEN_SECRET", default="")
+PROXMOX_USERNAME = config("PROXMOX_USERNAME", default="")
+PROXMOX_PASSWORD = config("PROXMOX_PASSWORD", default="")
+PROXMOX_VERIFY_TLS = config("PROXMOX_VERIFY_TLS", default=True, cast=bool)
+PROXMOX_HTTP2 = config("PROXMOX_HTTP2", default=False, cast=bool)  # needs httpx[http2]
+PROXMOX_TIMEOUT = config("PROXMOX_TIMEOUT", default=10.0, cast=float)
+PROXMOX_MAX_RETRIES = config("PROXMOX_MAX_RETRIES", default=3, cast=int)
+PROXMOX_RETRY_BACKOFF = config("PROXMOX_RETRY_BACKOFF", default=0.25, cast=float)
+PROXMOX_MAX_CONNECTIONS = config("PROXMOX_MAX_CONNECTIONS", default=20, cast=int)
+PROXMOX_TEMPLATES = config(
+    "PROXMOX_TEMPLATES",
+    default="ubuntu-22.04=9000",
+    cast=Csv(cast=lambda pair: pair.split("="), post_process=lambda pairs: dict(pairs)),
+)
+PROXMOX_VMID_BASE = config("PROXMOX_VMID_BASE", default=10000, cast=int)
+PROXMOX_TASK_TIMEOUT = config("PROXMOX_TASK_TIMEOUT", default=60, cast=int)
+PROXMOX_GUEST_AGENT_TIMEOUT = config("PROXMOX_GUEST_AGENT_TIMEOUT", default=300, cast=int)
+
+# ---------------------------------------------------------------------------
+# Cache — shared Redis by default; CACHE_BACKEND=locmem for a per-process
+# stand-in (tests, Redis-less dev).  Aliases are documented in config/cache.py.
+# ---------------------------------------------------------------------------
+CACHE_BACKEND = config("CACHE_BACKEND", default="redis")
+CACHES = build_caches(CACHE_BACKEND, REDIS_URL)
+
+# Anonymous landing/pricing/plan pages (see services/pagecache.py).  Keys include
+# the plan-catalog version, so this only bounds memory use.
+PAGE_CACHE_TIMEOUT = config("PAGE_CACHE_TIMEOUT", default=3600, cast=int)
+# Cache-Control max-age for /api/v1/plans/; clients revalidate with If-None-Match.
+PLANS_API_MAX_AGE = config("PLANS_API_MAX_AGE", default=60, cast=int)
+
 # ---------------------------------------------------------------------------
 # Sentry (optional; only activates when DSN is set)
 # ---------------------------------------------------------------------------
@@ -21,6 +21,9 @@ INSTALLED_APPS += ["debug_toolbar"]  # noqa: F405
 MIDDLEWARE = ["debug_toolbar.middleware.DebugToolbarMiddleware"] + MIDDLEWARE  # noqa: F405
 INTERNAL_IPS = ["127.0.0.1"]
 
+# Per-process cache unless CACHE_BACKEND=redis is set (e.g. to share with Celery)
+CACHES = build_caches(config("CACHE_BACKEND", default="locmem"), REDIS_URL)  # noqa: F405
+
 # Console email backend — no SMTP needed in dev
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
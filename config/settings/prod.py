@@ -49,10 +49,16 @@ CORS_ALLOWED_ORIGINS = config("CORS_ALLOWED_ORIGINS", default="", cast=Csv())  #
 # Use rediss:// (TLS) when your provider supports it, e.g.:
 #   REDIS_URL=rediss://:password@your-redis-host:6380/0
 # ---------------------------------------------------------------------------
-_redis_url = config("REDIS_URL", default="redis://localhost:6379/0")  # noqa: F405
+REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")  # noqa: F405
 
-CELERY_BROKER_URL = _redis_url
-CELERY_RESULT_BACKEND = _redis_url
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
+CACHES = build_caches(CACHE_BACKEND, REDIS_URL)  # noqa: F405
+
+# Sessions live in the shared cache: no session-table read/write per request.
+# The Redis instance must not evict keys (maxmemory-policy noeviction or volatile-*).
+SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+SESSION_CACHE_ALIAS = "sessions"
 
 # Must be >= the longest task time_limit (provision_vps_task = 300 s)
 CELERY_BROKER_TRANSPORT_OPTIONS = {
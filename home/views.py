@@ -2,12 +2,14 @@ from django.http import HttpResponse
 from django.shortcuts import render
 from django.views.decorators.cache import cache_control
 
-from services.models import ServicePlan
+from services.catalog import active_plans
+from services.pagecache import cache_anonymous_page
 
 
+@cache_anonymous_page
 def index(request):
     """Public landing page — passes active service plans for the pricing teaser."""
-    plans = ServicePlan.objects.filter(is_active=True).prefetch_related("features")[:3]
+    plans = active_plans()[:3]
     return render(request, "home/landing.html", {"plans": plans})
 
 
@@ -30,6 +30,7 @@ def notify_user(
     body: str,
     html_body: str = "",
     channels: list[str] | None = None,
+    kind: str = "",
 ) -> dict[str, bool]:
     """
     Send a notification to a user across one or more channels.
@@ -41,6 +42,7 @@ def notify_user(
         html_body: Optional HTML body (used by email channel)
         channels: Channel names to use. If None, uses all configured channels
                   the user has contact info for.
+        kind: NotificationKind recorded on the NotificationLog rows (default "general").
 
     Returns:
         Dict mapping channel name → success bool.
@@ -72,6 +74,7 @@ def notify_user(
                 subject=subject,
                 recipient=recipient,
                 success=ok,
+                kind=kind,
             )
         except Exception as exc:
             log.exception("Channel '%s' failed for user %s", name, user.pk)
@@ -83,6 +86,7 @@ def notify_user(
                 recipient=recipient,
                 success=False,
                 error=str(exc),
+                kind=kind,
             )
 
     return results
@@ -149,15 +153,22 @@ def _get_recipient(user, channel_name: str) -> str:
 
 
 def _log_notification(
-    user, channel: str, subject: str, recipient: str, success: bool, error: str = ""
+    user,
+    channel: str,
+    subject: str,
+    recipient: str,
+    success: bool,
+    error: str = "",
+    kind: str = "",
 ) -> None:
     """Write a NotificationLog entry (fire-and-forget; never raise)."""
     try:
-        from .models import NotificationLog
+        from .models import NotificationKind, NotificationLog
 
         NotificationLog.objects.create(
             user=user,
             channel=channel,
+            kind=kind or NotificationKind.GENERAL,
             subject=subject[:255],
             recipient=recipient[:255],
             success=success,
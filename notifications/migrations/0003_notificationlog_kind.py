@@ -0,0 +1,42 @@
+# Generated by Django 5.2.11 on 2026-10-16 19:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def tag_expiry_notices(apps, schema_editor):
+    """Mark pre-existing expiry notices so the first run after deploy dedups against them."""
+    NotificationLog = apps.get_model("notifications", "NotificationLog")
+    NotificationLog.objects.filter(subject="Your subscription is expiring soon").update(
+        kind="subscription_expiring"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0002_alter_notificationlog_channel"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationlog",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("general", "General"),
+                    ("subscription_expiring", "Subscription expiring"),
+                ],
+                default="general",
+                max_length=40,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificationlog",
+            index=models.Index(
+                fields=["user", "kind", "created_at"], name="notif_user_kind_created_idx"
+            ),
+        ),
+        migrations.RunPython(tag_expiry_notices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-16 19:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0003_notificationlog_kind"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notificationlog",
+            index=models.Index(fields=["user", "created_at"], name="notif_user_created_idx"),
+        ),
+    ]
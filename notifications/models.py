@@ -10,6 +10,13 @@ class NotificationChannel(models.TextChoices):
     SIGNAL = "signal", "Signal"
 
 
+class NotificationKind(models.TextChoices):
+    """What a notification is about — used to deduplicate recurring notices."""
+
+    GENERAL = "general", "General"
+    SUBSCRIPTION_EXPIRING = "subscription_expiring", "Subscription expiring"
+
+
 class NotificationPreference(models.Model):
     """Per-user channel preferences and contact identifiers for Telegram/Signal."""
 
@@ -75,6 +82,11 @@ class NotificationLog(models.Model):
         blank=True,
     )
     channel = models.CharField(max_length=20, choices=NotificationChannel.choices)
+    kind = models.CharField(
+        max_length=40,
+        choices=NotificationKind.choices,
+        default=NotificationKind.GENERAL,
+    )
     subject = models.CharField(max_length=255)
     recipient = models.CharField(max_length=255)
     success = models.BooleanField(default=False)
@@ -85,6 +97,12 @@ class NotificationLog(models.Model):
         verbose_name = "Notification Log"
         verbose_name_plural = "Notification Logs"
         ordering = ["-created_at"]
+        indexes = [
+            # "Was this user sent a <kind> notice recently?" — periodic dedup lookups
+            models.Index(fields=["user", "kind", "created_at"], name="notif_user_kind_created_idx"),
+            # A user's notification history, newest first
+            models.Index(fields=["user", "created_at"], name="notif_user_created_idx"),
+        ]
 
     def __str__(self) -> str:
         status = "✓" if self.success else "✗"
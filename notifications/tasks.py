@@ -24,6 +24,7 @@ def send_notification_task(
     body: str,
     html_body: str = "",
     channels: list[str] | None = None,
+    kind: str = "",
 ) -> dict[str, bool]:
     """Send a multi-channel notification to a user."""
     from notifications.dispatch import notify_user
@@ -40,9 +41,50 @@ def send_notification_task(
         body=body,
         html_body=html_body,
         channels=channels,
+        kind=kind,
     )
 
 
+@shared_task(
+    soft_time_limit=300,
+    time_limit=360,
+)
+def send_notification_batch_task(notifications: list[dict]) -> int:
+    """Send many user notifications from one task message.
+
+    Each item holds ``send_notification_task`` keyword arguments (``user_id``,
+    ``subject``, ``body`` and optionally ``html_body``, ``channels``, ``kind``).
+    Users are loaded in one query.  A failing item is logged and skipped rather
+    than retried with the whole batch, which would re-send the ones that worked.
+
+    Returns the number of notifications attempted.
+    """
+    from notifications.dispatch import notify_user
+
+    users = User.objects.select_related("notification_prefs").in_bulk(
+        {item["user_id"] for item in notifications}
+    )
+    attempted = 0
+    for item in notifications:
+        user = users.get(item["user_id"])
+        if user is None:
+            log.warning("User %s not found for batched notification", item["user_id"])
+            continue
+        try:
+            notify_user(
+                user=user,
+                subject=item["subject"],
+                body=item["body"],
+                html_body=item.get("html_body", ""),
+                channels=item.get("channels"),
+                kind=item.get("kind", ""),
+            )
+            attempted += 1
+        except Exception:  # noqa: BLE001
+            log.exception("Batched notification failed for user %s", item["user_id"])
+    return attempted
+
+
 @shared_task(
     autoretry_for=(Exception,),
     retry_backoff=True,
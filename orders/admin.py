@@ -2,7 +2,15 @@
 
 from django.contrib import admin
 
-from .models import Customer, Order, PaymentEvent, ProvisioningJob, Subscription, VPSInstance
+from .models import (
+    Customer,
+    Order,
+    PaymentEvent,
+    ProvisioningJob,
+    Subscription,
+    VPSInstance,
+    VPSOperation,
+)
 
 
 class SubscriptionInline(admin.TabularInline):
@@ -104,3 +112,12 @@ class VPSInstanceAdmin(admin.ModelAdmin):
     list_filter = ("status", "created_at")
     search_fields = ("hostname", "ip_address", "customer__user__email", "proxmox_vmid")
     readonly_fields = ("created_at", "updated_at", "credentials_ref")
+
+
+@admin.register(VPSOperation)
+class VPSOperationAdmin(admin.ModelAdmin):
+    list_display = ("id", "instance", "action", "status", "requested_by", "created_at")
+    list_filter = ("action", "status", "created_at")
+    search_fields = ("instance__hostname", "requested_by__email")
+    raw_id_fields = ("instance", "requested_by")
+    readonly_fields = ("created_at", "updated_at", "started_at", "completed_at")
@@ -0,0 +1,218 @@
+"""Batch provisioning — submit every queued ProvisioningJob in one pass.
+
+A promo can queue dozens of jobs within seconds.  With one
+``provision_vps_task`` per job the backlog drained one provider call at a
+time per provisioning worker, re-resolving the same plan specs for each.
+``provision_batch()`` instead:
+
+  1. claims up to PROVISIONING_BATCH_SIZE QUEUED jobs in one UPDATE
+     (SKIP LOCKED where the database supports it, so concurrent batches
+     never share a job);
+  2. groups them by provider and OS template, and submits each provider's
+     jobs through its own thread pool of ``provider.max_concurrency`` —
+     providers run side by side, jobs sharing a template back to back;
+  3. writes the outcome back in bulk: one ``bulk_create`` for the new
+     VPSInstances, one ``bulk_update`` for the READY jobs and one for jobs
+     whose provider returned a ``ProvisionOperation`` (left for
+     ``poll_provisioning_operations``).  Failed submissions are failed
+     one by one through ``fail_provisioning``, and if the bulk insert hits
+     a constraint the READY jobs are recorded one by one instead.
+
+Only the provider calls run on the pools; every query runs on the calling
+thread.  ``schedule_batch()`` is what ``_queue_provisioning`` calls: it
+enqueues a single ``provision_batch_task`` PROVISIONING_BATCH_DELAY seconds
+out, so a burst of checkouts is collected into one batch.  A batch that comes
+back full schedules the next one itself, and the ``provision_stranded_jobs``
+beat task picks up anything a lost batch task left QUEUED.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import ProvisioningJob, ProvisioningStatus, VPSInstance
+from .provisioning import PLAN_SPECS, ProvisionOperation, get_provider
+
+log = logging.getLogger(__name__)
+
+SCHEDULED_KEY = "provisioning:batch:scheduled"
+READY_FIELDS = ["status", "external_id", "completed_at", "updated_at"]
+
+
+@dataclass
+class BatchResult:
+    claimed: int = 0
+    ready: int = 0
+    submitted: int = 0
+    failed: int = 0
+
+
+def claim_queued_jobs(limit: int, job_ids=None, queued_before=None) -> list[ProvisioningJob]:
+    """Move up to *limit* QUEUED jobs (oldest first) to PROVISIONING and return them.
+
+    *queued_before* restricts the claim to jobs created before that time.
+    """
+    now = timezone.now()
+    queued = ProvisioningJob.objects.filter(status=ProvisioningStatus.QUEUED)
+    if job_ids is not None:
+        queued = queued.filter(pk__in=job_ids)
+    if queued_before is not None:
+        queued = queued.filter(created_at__lt=queued_before)
+    if connection.features.has_select_for_update_skip_locked:
+        queued = queued.select_for_update(skip_locked=True)
+    with transaction.atomic():
+        pks = list(queued.order_by("pk").values_list("pk", flat=True)[:limit])
+        ProvisioningJob.objects.filter(pk__in=pks).update(
+            status=ProvisioningStatus.PROVISIONING, started_at=now, updated_at=now
+        )
+    return list(
+        ProvisioningJob.objects.filter(pk__in=pks)
+        .select_related("order__customer__user", "order__subscription")
+        .order_by("pk")
+    )
+
+
+def _template(job) -> str:
+    tier_key = job.payload.get("tier_key", "")
+    return PLAN_SPECS.get(tier_key, PLAN_SPECS["starter"])["os_template"]
+
+
+def _submit(jobs: list[ProvisioningJob]) -> list[tuple[ProvisioningJob, object]]:
+    """Call ``provision()`` for every job; pair each with its result or exception."""
+    groups = defaultdict(list)
+    for job in jobs:
+        groups[job.provider, _template(job)].append(job)
+
+    pools, futures = {}, []
+    try:
+        for (name, _), group in sorted(groups.items()):
+            try:
+                provider = get_provider(name)
+            except ValueError as exc:
+                futures += [(job, exc) for job in group]
+                continue
+            if name not in pools:
+                pools[name] = ThreadPoolExecutor(
+                    max_workers=provider.max_concurrency, thread_name_prefix=f"provision-{name}"
+                )
+            futures += [(job, pools[name].submit(provider.provision, job)) for job in group]
+
+        outcomes = []
+        for job, future in futures:
+            if isinstance(future, Exception):
+                outcomes.append((job, future))
+                continue
+            try:
+                outcomes.append((job, future.result()))
+            except Exception as exc:  # noqa: BLE001
+                outcomes.append((job, exc))
+        return outcomes
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+
+def provision_batch(limit: int | None = None, job_ids=None, queued_before=None) -> BatchResult:
+    """Claim, submit and record a batch of queued ProvisioningJobs.
+
+    Without *job_ids*, a batch that claims its full *limit* schedules another
+    one, so a burst larger than PROVISIONING_BATCH_SIZE drains completely.
+    """
+    from users.summary import refresh
+
+    from .tasks import _queue_vps_ready_notification, build_vps_instance, fail_provisioning
+
+    limit = limit or settings.PROVISIONING_BATCH_SIZE
+    jobs = claim_queued_jobs(limit, job_ids, queued_before)
+    result = BatchResult(claimed=len(jobs))
+    if not jobs:
+        return result
+
+    ready, submitted = [], []
+    outcomes = _submit(jobs)
+    now = timezone.now()
+    for job, outcome in outcomes:
+        if isinstance(outcome, Exception):
+            log.error("ProvisioningJob %s failed: %s", job.pk, outcome)
+            fail_provisioning(job, str(outcome))
+            result.failed += 1
+        elif isinstance(outcome, ProvisionOperation):
+            job.payload = {**job.payload, "operation": outcome.to_payload()}
+            job.updated_at = now
+            submitted.append(job)
+        else:
+            job.status = ProvisioningStatus.READY
+            job.external_id = outcome.get("external_id", "")
+            job.completed_at = job.updated_at = now
+            ready.append((job, outcome))
+
+    ProvisioningJob.objects.bulk_update(submitted, ["payload", "updated_at"], batch_size=500)
+    instances = [build_vps_instance(job, outcome) for job, outcome in ready]
+    try:
+        with transaction.atomic():
+            VPSInstance.objects.bulk_create(instances, batch_size=500)
+            ProvisioningJob.objects.bulk_update(
+                [job for job, _ in ready], READY_FIELDS, batch_size=500
+            )
+    except IntegrityError:
+        # One bad row (say, a reused VMID) must not sink the whole batch.
+        log.exception("provision_batch bulk write failed; recording jobs one by one")
+        instances = []
+        for job, outcome in ready:
+            instance = build_vps_instance(job, outcome)
+            try:
+                with transaction.atomic():
+                    instance.save()
+                    job.save(update_fields=READY_FIELDS)
+            except IntegrityError as exc:
+                fail_provisioning(job, str(exc))
+                result.failed += 1
+            else:
+                instances.append(instance)
+
+    # bulk_create bypasses the dashboard summary signals
+    for user_id in {instance.customer.user_id for instance in instances}:
+        refresh(user_id, "vps")
+    for instance in instances:
+        _queue_vps_ready_notification(instance.customer.user_id, instance.hostname)
+
+    result.ready, result.submitted = len(instances), len(submitted)
+    if job_ids is None and result.claimed == limit:
+        # More may be waiting, and checkouts only schedule while none is pending.
+        schedule_batch()
+    log.info(
+        "provision_batch complete: %d claimed, %d ready, %d submitted, %d failed",
+        result.claimed,
+        result.ready,
+        result.submitted,
+        result.failed,
+    )
+    return result
+
+
+def schedule_batch() -> bool:
+    """Enqueue one ``provision_batch_task`` unless one is already waiting.
+
+    Returns False when the task could not be enqueued, so the caller can fall
+    back to provisioning inline.
+    """
+    from .tasks import provision_batch_task
+
+    delay = settings.PROVISIONING_BATCH_DELAY
+    if not cache.add(SCHEDULED_KEY, 1, timeout=delay + 60):
+        return True
+    try:
+        provision_batch_task.apply_async(countdown=delay, ignore_result=True)
+    except Exception:  # noqa: BLE001
+        cache.delete(SCHEDULED_KEY)
+        log.exception("Provisioning batch enqueue failed")
+        return False
+    return True
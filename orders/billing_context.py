@@ -0,0 +1,97 @@
+"""Request-scoped billing context — the user's Stripe customer and active subscription.
+
+``billing``, ``order_history``, ``vps_list``, ``billing_portal`` and the
+``/api/v1/me/`` serializer all need the customer row, and several also need
+the active subscription.  Each used to resolve ``request.user.stripe_customer``
+and run ``get_active_subscription()`` on its own.  ``get_billing_context()``
+loads both once and memoizes them on the request; templates reach the same
+object as ``{{ billing }}`` through ``context_processor``.
+
+Loading is one query for a subscriber (the subscription with its customer
+joined) and two otherwise.  The loaded pair is also kept in the default cache
+for BILLING_CONTEXT_CACHE_TTL seconds (0 disables) so a burst of page views
+does not repeat it.  ``invalidate()`` drops that entry; ``_upsert_subscription``
+(every Stripe subscription webhook) and customer creation at checkout call it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+from .models import ACTIVE_SUBSCRIPTION_STATUSES, Customer, Subscription
+
+CACHE_KEY = "billing:context:{user_id}"
+REQUEST_ATTR = "_billing_context"
+
+
+@dataclass(frozen=True)
+class BillingContext:
+    customer: Customer | None = None
+    subscription: Subscription | None = None
+
+    @property
+    def has_customer(self) -> bool:
+        return self.customer is not None
+
+
+def cache_key(user_id: int) -> str:
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def load(user_id: int) -> BillingContext:
+    """Query *user_id*'s customer and active subscription."""
+    subscription = (
+        Subscription.objects.filter(
+            customer__user_id=user_id, status__in=ACTIVE_SUBSCRIPTION_STATUSES
+        )
+        .select_related("customer")
+        .first()
+    )
+    if subscription is not None:
+        customer = subscription.customer
+    else:
+        customer = Customer.objects.filter(user_id=user_id).first()
+    if customer is not None:
+        customer._active_subscription = subscription
+    return BillingContext(customer, subscription)
+
+
+def get_billing_context(request) -> BillingContext:
+    """The billing context for ``request.user``, loaded at most once per request."""
+    request = getattr(request, "_request", request)  # DRF wraps the HttpRequest
+    context = getattr(request, REQUEST_ATTR, None)
+    if context is not None:
+        return context
+
+    user = request.user
+    if not user.is_authenticated:
+        context = BillingContext()
+    else:
+        ttl = settings.BILLING_CONTEXT_CACHE_TTL
+        key = cache_key(user.pk)
+        context = cache.get(key) if ttl else None
+        if context is None:
+            context = load(user.pk)
+            if ttl:
+                cache.set(key, context, ttl)
+        elif context.customer is not None:
+            context.customer._active_subscription = context.subscription
+    setattr(request, REQUEST_ATTR, context)
+    return context
+
+
+def invalidate(user_id: int) -> None:
+    """Drop *user_id*'s cached billing context, now and again after commit."""
+    key = cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def context_processor(request) -> dict:
+    """Expose the billing context to templates as ``billing`` (loaded on first use)."""
+    return {"billing": SimpleLazyObject(lambda: get_billing_context(request))}
@@ -0,0 +1,278 @@
+"""Buffered Stripe webhook ingestion.
+
+In ``direct`` mode (the default) ``stripe_webhook`` writes one PaymentEvent per
+request and enqueues one Celery task per event.  Under Stripe retry storms that
+is two round-trips per POST, so two buffered modes are available instead:
+
+  - ``memory`` — process-local buffer, flushed inline once it holds
+    STRIPE_WEBHOOK_BATCH_SIZE events or its oldest event is older than
+    STRIPE_WEBHOOK_FLUSH_INTERVAL seconds.  Events acknowledged to Stripe are
+    lost if the process exits before the next flush, so the mode is refused
+    unless DEBUG is on and the webhook falls back to ``direct``.
+  - ``redis``  — durable Redis stream shared by every web worker.  Flushed inline
+    when a batch is full and drained by the ``flush_webhook_buffer`` beat task.
+
+A flush turns a whole batch into one ``bulk_create(ignore_conflicts=True)`` and
+one ``process_stripe_events`` task (one per customer shard when
+STRIPE_EVENT_SHARDS is set — see orders/sharding.py).  The unique ``stripe_event_id`` column stays
+the idempotency guarantee — duplicate deliveries are dropped by the insert.
+
+Every path stores the Stripe event's ``created`` time as ``stripe_created_at``
+(see ``event_created_at``), so all deliveries of one event carry the same
+timestamp — required once PaymentEvent is partitioned by it (orders/partitions.py).
+The webhook rejects events without one: substituting the arrival time would
+give each redelivery a different key and let a duplicate past the unique
+constraint.  ``received_at`` stays the arrival time.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import EventStatus, PaymentEvent
+from .sharding import event_customer_id, group_by_queue
+from .webhooks import HANDLED_EVENTS
+
+log = logging.getLogger(__name__)
+
+INGEST_MODES = ("direct", "memory", "redis")
+
+STREAM_KEY = "stripe:webhooks"
+STREAM_GROUP = "flushers"
+# Entries claimed by a flusher that died mid-batch are re-claimed after this long.
+STREAM_CLAIM_IDLE_MS = 60_000
+
+
+def event_created_at(event) -> datetime.datetime:
+    """The event's Stripe ``created`` time.
+
+    Raises:
+        ValueError: If the event has no valid ``created`` timestamp.
+    """
+    try:
+        created = int(event["created"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError(f"Stripe event {event.get('id')!r} has no created time") from exc
+    return datetime.datetime.fromtimestamp(created, tz=datetime.UTC)
+
+
+class MemoryBuffer:
+    """Thread-safe, process-local FIFO of verified events."""
+
+    def __init__(self) -> None:
+        self._events: deque[tuple[float, dict]] = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def append(self, event: dict) -> None:
+        with self._lock:
+            self._events.append((time.monotonic(), event))
+
+    def oldest_age(self) -> float:
+        with self._lock:
+            if not self._events:
+                return 0.0
+            return time.monotonic() - self._events[0][0]
+
+    def take(self, count: int) -> list[tuple[str | None, dict]]:
+        with self._lock:
+            n = min(count, len(self._events))
+            return [(None, self._events.popleft()[1]) for _ in range(n)]
+
+    def ack(self, tokens: list) -> None:
+        """Events are removed on take(); nothing to acknowledge."""
+
+    def release(self, entries: list[tuple[str | None, dict]]) -> None:
+        """Put entries back at the head of the queue after a failed flush."""
+        now = time.monotonic()
+        with self._lock:
+            self._events.extendleft((now, event) for _, event in reversed(entries))
+
+
+class RedisStreamBuffer:
+    """Redis stream consumed through a consumer group so flushers never overlap."""
+
+    def __init__(self, url: str) -> None:
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._group_ready = False
+
+    def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        import redis
+
+        try:
+            self._client.xgroup_create(STREAM_KEY, STREAM_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._group_ready = True
+
+    def __len__(self) -> int:
+        return int(self._client.xlen(STREAM_KEY))
+
+    def append(self, event: dict) -> None:
+        self._client.xadd(STREAM_KEY, {"event": json.dumps(event, default=str)})
+
+    def oldest_age(self) -> float:
+        """Age is irrelevant here — the beat task drains the stream on a fixed interval."""
+        return 0.0
+
+    def take(self, count: int) -> list[tuple[bytes, dict]]:
+        self._ensure_group()
+        # Re-claim entries left pending by a crashed flusher before reading new ones.
+        _, entries, *_ = self._client.xautoclaim(
+            STREAM_KEY, STREAM_GROUP, self._consumer, STREAM_CLAIM_IDLE_MS, count=count
+        )
+        if not entries:
+            response = self._client.xreadgroup(
+                STREAM_GROUP, self._consumer, {STREAM_KEY: ">"}, count=count
+            )
+            entries = response[0][1] if response else []
+        return [(entry_id, json.loads(fields[b"event"])) for entry_id, fields in entries]
+
+    def ack(self, tokens: list) -> None:
+        if not tokens:
+            return
+        pipe = self._client.pipeline()
+        pipe.xack(STREAM_KEY, STREAM_GROUP, *tokens)
+        pipe.xdel(STREAM_KEY, *tokens)
+        pipe.execute()
+
+    def release(self, entries: list) -> None:
+        """Un-acked entries stay pending and are re-claimed by the next flush."""
+
+
+_buffers: dict[str, MemoryBuffer | RedisStreamBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(mode: str | None = None) -> MemoryBuffer | RedisStreamBuffer:
+    """Return the process-wide buffer for *mode* (defaults to the configured mode).
+
+    Raises:
+        ValueError: If the mode has no buffer (``direct``), is unknown, or is
+            ``memory`` while DEBUG is off.
+    """
+    mode = mode or settings.STRIPE_WEBHOOK_INGEST_MODE
+    if mode == "memory" and not settings.DEBUG:
+        raise ValueError("The memory webhook buffer is not durable; it requires DEBUG=True")
+    with _buffers_lock:
+        if mode not in _buffers:
+            if mode == "memory":
+                _buffers[mode] = MemoryBuffer()
+            elif mode == "redis":
+                _buffers[mode] = RedisStreamBuffer(settings.REDIS_URL)
+            else:
+                raise ValueError(f"No webhook buffer for ingest mode {mode!r}")
+        return _buffers[mode]
+
+
+def ingest_event(event: dict) -> None:
+    """Append a verified event to the buffer, flushing inline when a batch is due."""
+    buffer = get_buffer()
+    buffer.append(_to_plain_dict(event))
+    if (
+        len(buffer) >= settings.STRIPE_WEBHOOK_BATCH_SIZE
+        or buffer.oldest_age() >= settings.STRIPE_WEBHOOK_FLUSH_INTERVAL
+    ):
+        flush_buffer(buffer)
+
+
+def flush_buffer(buffer=None, batch_size: int | None = None) -> int:
+    """Persist one batch of buffered events and enqueue a single batch task.
+
+    Returns the number of buffer entries consumed (including duplicates).
+    """
+    buffer = buffer or get_buffer()
+    batch_size = batch_size or settings.STRIPE_WEBHOOK_BATCH_SIZE
+
+    entries = buffer.take(batch_size)
+    if not entries:
+        return 0
+
+    rows: dict[str, PaymentEvent] = {}
+    for _, event in entries:
+        event_id = event.get("id")
+        if not event_id or event_id in rows:
+            continue
+        try:
+            created_at = event_created_at(event)
+        except ValueError:
+            # The webhook rejects these; only entries buffered before it did get here.
+            log.warning("Dropping buffered event %s without a created time", event_id)
+            continue
+        rows[event_id] = PaymentEvent(
+            stripe_event_id=event_id,
+            event_type=event.get("type", ""),
+            stripe_created_at=created_at,
+            payload=event,
+        )
+
+    try:
+        with transaction.atomic():
+            PaymentEvent.objects.bulk_create(list(rows.values()), ignore_conflicts=True)
+    except Exception:
+        buffer.release(entries)
+        raise
+
+    # bulk_create(ignore_conflicts=True) does not return PKs, so resolve them in one
+    # query.  Events still RECEIVED from an earlier delivery are included again;
+    # the processing task's status guard makes that a no-op.
+    pending = list(
+        PaymentEvent.objects.filter(
+            stripe_event_id__in=list(rows),
+            status=EventStatus.RECEIVED,
+            event_type__in=HANDLED_EVENTS,
+        )
+        .order_by("received_at", "pk")
+        .values_list("pk", "stripe_event_id")
+    )
+    buffer.ack([token for token, _ in entries if token is not None])
+
+    batches = group_by_queue(
+        (pk, event_customer_id(rows[event_id].payload)) for pk, event_id in pending
+    )
+    for queue, ids in batches.items():
+        _enqueue_batch(ids, queue=queue)
+
+    log.info(
+        "Flushed %d webhook event(s): %d new row(s) pending processing",
+        len(entries),
+        len(pending),
+    )
+    return len(entries)
+
+
+def _enqueue_batch(payment_event_ids: list[int], queue: str | None = None) -> None:
+    from .tasks import process_stripe_events
+
+    routing = {"queue": queue} if queue else {}
+    try:
+        process_stripe_events.apply_async(args=[payment_event_ids], ignore_result=True, **routing)
+    except Exception:  # noqa: BLE001
+        log.exception(
+            "Celery enqueue failed for %d buffered events; processing synchronously",
+            len(payment_event_ids),
+        )
+        process_stripe_events.run(payment_event_ids)
+
+
+def _to_plain_dict(event) -> dict:
+    """Convert a stripe.Event (nested StripeObjects) into JSON-safe plain dicts."""
+    return json.loads(json.dumps(event, default=str))
@@ -0,0 +1,81 @@
+"""
+Management command: manage_partitions
+
+Usage:
+    python manage.py manage_partitions                 # create upcoming, drop expired partitions
+    python manage.py manage_partitions --dry-run       # show what would change
+    python manage.py manage_partitions --convert       # one-off: partition the audit tables
+
+PostgreSQL only; see orders/partitions.py.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders import partitions
+
+
+class Command(BaseCommand):
+    help = "Maintain monthly partitions for PaymentEvent and NotificationLog (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Rebuild unpartitioned audit tables as partitioned tables (locks them)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report partitions that would be created or dropped without changing anything",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=settings.AUDIT_PARTITION_MONTHS_AHEAD,
+            help="Months of partitions to keep created ahead of now",
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.is_postgresql():
+            raise CommandError("Table partitioning requires PostgreSQL.")
+
+        now = timezone.now()
+        months_ahead = options["months_ahead"]
+
+        if options["convert"]:
+            for spec in partitions.PARTITIONED_TABLES:
+                if partitions.is_partitioned(spec.table):
+                    self.stdout.write(f"  · {spec.table} is already partitioned")
+                    continue
+                if options["dry_run"]:
+                    self.stdout.write(f"  · {spec.table} would be converted")
+                    continue
+                try:
+                    copied = partitions.convert_to_partitioned(spec, now, months_ahead)
+                except RuntimeError as exc:
+                    raise CommandError(str(exc)) from exc
+                self.stdout.write(
+                    self.style.SUCCESS(f"  ✓ {spec.table} converted ({copied} rows copied)")
+                )
+
+        summary = partitions.maintain_partitions(
+            now=now, months_ahead=months_ahead, dry_run=options["dry_run"]
+        )
+        if not summary:
+            self.stdout.write(
+                self.style.WARNING("No partitioned tables; run with --convert first.")
+            )
+            return
+
+        prefix = "would be " if options["dry_run"] else ""
+        for table, changes in summary.items():
+            created = ", ".join(changes["created"]) or "none"
+            dropped = ", ".join(changes["dropped"]) or "none"
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"  ✓ {table}: {prefix}created {created}; {prefix}dropped {dropped}; "
+                    f"{prefix}pruned {changes['pruned']} row(s) from the default partition"
+                )
+            )
@@ -2,6 +2,7 @@
 
 import json
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
 
@@ -61,6 +62,70 @@ class Command(BaseCommand):
         )
         self.stdout.write(self.style.SUCCESS("  ✓ cleanup-stale-provisioning-jobs (every 30 min)"))
 
+        # ── Schedule: every 10 seconds (in-flight provider operations) ─
+        every_10_sec, _ = IntervalSchedule.objects.get_or_create(
+            every=10,
+            period=IntervalSchedule.SECONDS,
+        )
+
+        PeriodicTask.objects.update_or_create(
+            name="poll-provisioning-operations",
+            defaults={
+                "task": "orders.periodic.poll_provisioning_operations",
+                "interval": every_10_sec,
+                "crontab": None,
+                "enabled": True,
+                "description": "Poll submitted provider operations and finish their jobs.",
+                "kwargs": json.dumps({}),
+            },
+        )
+        self.stdout.write(self.style.SUCCESS("  ✓ poll-provisioning-operations (every 10 s)"))
+
+        # ── Schedule: every 5 minutes (fleet status reconcile) ────────
+        every_5_min, _ = IntervalSchedule.objects.get_or_create(
+            every=5,
+            period=IntervalSchedule.MINUTES,
+        )
+
+        PeriodicTask.objects.update_or_create(
+            name="provision-stranded-jobs",
+            defaults={
+                "task": "orders.periodic.provision_stranded_jobs",
+                "interval": every_5_min,
+                "crontab": None,
+                "enabled": True,
+                "description": "Provision queued jobs a lost batch task left behind.",
+                "kwargs": json.dumps({}),
+            },
+        )
+        self.stdout.write(self.style.SUCCESS("  ✓ provision-stranded-jobs (every 5 min)"))
+
+        PeriodicTask.objects.update_or_create(
+            name="reconcile-fleet-status",
+            defaults={
+                "task": "orders.periodic.reconcile_fleet_status",
+                "interval": every_5_min,
+                "crontab": None,
+                "enabled": True,
+                "description": "Sync VPS instance status from each provider's fleet listing.",
+                "kwargs": json.dumps({}),
+            },
+        )
+        self.stdout.write(self.style.SUCCESS("  ✓ reconcile-fleet-status (every 5 min)"))
+
+        PeriodicTask.objects.update_or_create(
+            name="expire-stale-power-operations",
+            defaults={
+                "task": "orders.periodic.expire_stale_power_operations",
+                "interval": every_5_min,
+                "crontab": None,
+                "enabled": True,
+                "description": "Fail VPS power actions a lost worker left unfinished.",
+                "kwargs": json.dumps({}),
+            },
+        )
+        self.stdout.write(self.style.SUCCESS("  ✓ expire-stale-power-operations (every 5 min)"))
+
         # ── Schedule: weekly on Sunday at 03:00 UTC ───────────────────
         weekly_sun_0300, _ = CrontabSchedule.objects.get_or_create(
             minute="0",
@@ -78,10 +143,75 @@ class Command(BaseCommand):
                 "crontab": weekly_sun_0300,
                 "interval": None,
                 "enabled": True,
-                "description": "Delete processed/skipped payment events older than 90 days.",
+                "description": "Prune processed/skipped payment events past retention, in batches.",
                 "kwargs": json.dumps({}),
             },
         )
         self.stdout.write(self.style.SUCCESS("  ✓ cleanup-old-payment-events (Sunday 03:00 UTC)"))
 
+        # ── Schedule: daily at 02:30 UTC (audit table partitions) ─────
+        daily_0230, _ = CrontabSchedule.objects.get_or_create(
+            minute="30",
+            hour="2",
+            day_of_week="*",
+            day_of_month="*",
+            month_of_year="*",
+            defaults={"timezone": "UTC"},
+        )
+
+        postgres = "postgresql" in settings.DATABASES["default"]["ENGINE"]
+        PeriodicTask.objects.update_or_create(
+            name="maintain-partitions",
+            defaults={
+                "task": "orders.periodic.maintain_partitions",
+                "crontab": daily_0230,
+                "interval": None,
+                "enabled": postgres,
+                "description": "Create upcoming and drop expired audit-table partitions.",
+                "kwargs": json.dumps({}),
+            },
+        )
+        state = "daily 02:30 UTC" if postgres else "disabled — database is not PostgreSQL"
+        self.stdout.write(self.style.SUCCESS(f"  ✓ maintain-partitions ({state})"))
+
+        # ── Schedule: every 5 seconds (buffered webhook ingestion) ────
+        every_5_sec, _ = IntervalSchedule.objects.get_or_create(
+            every=5,
+            period=IntervalSchedule.SECONDS,
+        )
+
+        buffered = settings.STRIPE_WEBHOOK_INGEST_MODE == "redis"
+        PeriodicTask.objects.update_or_create(
+            name="flush-webhook-buffer",
+            defaults={
+                "task": "orders.periodic.flush_webhook_buffer",
+                "interval": every_5_sec,
+                "crontab": None,
+                "enabled": buffered,
+                "description": "Bulk-insert buffered Stripe webhook events (redis ingest mode).",
+                "kwargs": json.dumps({}),
+            },
+        )
+        state = "every 5 s" if buffered else "disabled — ingest mode is not redis"
+        self.stdout.write(self.style.SUCCESS(f"  ✓ flush-webhook-buffer ({state})"))
+
+        # ── Schedule: every minute (webhook backlog drain) ────────────
+        every_minute, _ = IntervalSchedule.objects.get_or_create(
+            every=1,
+            period=IntervalSchedule.MINUTES,
+        )
+
+        PeriodicTask.objects.update_or_create(
+            name="drain-payment-events",
+            defaults={
+                "task": "orders.periodic.drain_payment_events",
+                "interval": every_minute,
+                "crontab": None,
+                "enabled": True,
+                "description": "Batch-process Stripe events left in 'received' by a lost task.",
+                "kwargs": json.dumps({}),
+            },
+        )
+        self.stdout.write(self.style.SUCCESS("  ✓ drain-payment-events (every minute)"))
+
         self.stdout.write(self.style.SUCCESS("\nAll periodic tasks configured."))
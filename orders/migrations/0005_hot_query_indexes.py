@@ -0,0 +1,46 @@
+# Generated by Django 5.2.11 on 2026-10-16 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_alter_paymentevent_event_type"),
+        ("services", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["customer", "created_at"], name="order_customer_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentevent",
+            index=models.Index(
+                fields=["status", "received_at"], name="payevent_status_received_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentevent",
+            index=models.Index(
+                fields=["status", "processed_at"], name="payevent_status_processed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="provisioningjob",
+            index=models.Index(fields=["status", "started_at"], name="provjob_status_started_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="subscription",
+            index=models.Index(fields=["customer", "status"], name="sub_customer_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="vpsinstance",
+            index=models.Index(
+                fields=["customer", "status", "created_at"], name="vps_cust_status_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-16 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0005_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="vpsinstance",
+            index=models.Index(fields=["customer", "created_at"], name="vps_customer_created_idx"),
+        ),
+    ]
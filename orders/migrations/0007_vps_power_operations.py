@@ -0,0 +1,120 @@
+# Generated by Django 5.2.11 on 2026-10-16 20:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0006_keyset_pagination_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="vpsinstance",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("provisioning", "Provisioning"),
+                    ("running", "Running"),
+                    ("stopped", "Stopped"),
+                    ("suspended", "Suspended"),
+                    ("terminated", "Terminated"),
+                    ("error", "Error"),
+                    ("starting", "Starting"),
+                    ("stopping", "Stopping"),
+                    ("restarting", "Restarting"),
+                ],
+                db_index=True,
+                default="provisioning",
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="VPSOperation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[("start", "Start"), ("stop", "Stop"), ("restart", "Restart")],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("succeeded", "Succeeded"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "previous_status",
+                    models.CharField(
+                        choices=[
+                            ("provisioning", "Provisioning"),
+                            ("running", "Running"),
+                            ("stopped", "Stopped"),
+                            ("suspended", "Suspended"),
+                            ("terminated", "Terminated"),
+                            ("error", "Error"),
+                            ("starting", "Starting"),
+                            ("stopping", "Stopping"),
+                            ("restarting", "Restarting"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("error_message", models.TextField(blank=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "instance",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="operations",
+                        to="orders.vpsinstance",
+                    ),
+                ),
+                (
+                    "requested_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(fields=["status", "created_at"], name="vpsop_status_created_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status__in", ["pending", "running"])),
+                        fields=("instance",),
+                        name="vpsop_one_active_per_instance",
+                    )
+                ],
+            },
+        ),
+    ]
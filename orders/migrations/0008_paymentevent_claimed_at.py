@@ -0,0 +1,20 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0007_vps_power_operations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paymentevent",
+            name="claimed_at",
+            field=models.DateTimeField(
+                blank=True, help_text="When a worker last moved the event to PROCESSING", null=True
+            ),
+        ),
+    ]
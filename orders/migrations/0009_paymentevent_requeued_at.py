@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0008_paymentevent_claimed_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paymentevent",
+            name="requeued_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When drain_payment_events last re-enqueued the event",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:26
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_received_at(apps, schema_editor):
+    """Existing rows have no separate created time; their receipt time is the closest."""
+    PaymentEvent = apps.get_model("orders", "PaymentEvent")
+    PaymentEvent.objects.update(stripe_created_at=F("received_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0009_paymentevent_requeued_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paymentevent",
+            name="stripe_created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                help_text="Stripe's event created time — the same on every delivery; partition key",
+            ),
+        ),
+        migrations.RunPython(copy_received_at, migrations.RunPython.noop),
+    ]
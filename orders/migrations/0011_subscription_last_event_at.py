@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0010_paymentevent_stripe_created_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="last_event_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Stripe created time of the newest webhook event applied to this row",
+                null=True,
+            ),
+        ),
+    ]
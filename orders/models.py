@@ -24,14 +24,15 @@ class Customer(models.Model):
         return f"{self.user.email} → {self.stripe_customer_id}"
 
     def get_active_subscription(self):
-        """Return the first active/trialing/past_due subscription, or None."""
-        return self.subscriptions.filter(
-            status__in=[
-                SubscriptionStatus.ACTIVE,
-                SubscriptionStatus.TRIALING,
-                SubscriptionStatus.PAST_DUE,
-            ]
-        ).first()
+        """Return the first active/trialing/past_due subscription, or None.
+
+        Memoized on the instance; ``orders.billing_context`` pre-fills it.
+        """
+        if not hasattr(self, "_active_subscription"):
+            self._active_subscription = self.subscriptions.filter(
+                status__in=ACTIVE_SUBSCRIPTION_STATUSES
+            ).first()
+        return self._active_subscription
 
 
 class SubscriptionStatus(models.TextChoices):
@@ -45,6 +46,13 @@ class SubscriptionStatus(models.TextChoices):
     PAUSED = "paused", "Paused"
 
 
+ACTIVE_SUBSCRIPTION_STATUSES = (
+    SubscriptionStatus.ACTIVE,
+    SubscriptionStatus.TRIALING,
+    SubscriptionStatus.PAST_DUE,
+)
+
+
 class Subscription(models.Model):
     """Mirrors a Stripe Subscription object; kept in sync via webhook."""
 
@@ -64,6 +72,11 @@ class Subscription(models.Model):
     current_period_start = models.DateTimeField(null=True, blank=True)
     current_period_end = models.DateTimeField(null=True, blank=True)
     cancel_at_period_end = models.BooleanField(default=False)
+    last_event_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Stripe created time of the newest webhook event applied to this row",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -71,6 +84,10 @@ class Subscription(models.Model):
         verbose_name = "Subscription"
         verbose_name_plural = "Subscriptions"
         ordering = ["-created_at"]
+        indexes = [
+            # Customer.get_active_subscription — status IN (...) per customer
+            models.Index(fields=["customer", "status"], name="sub_customer_status_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.stripe_subscription_id} ({self.status})"
@@ -112,6 +129,16 @@ class PaymentEvent(models.Model):
     )
     error_message = models.TextField(blank=True, default="")
     received_at = models.DateTimeField(default=timezone.now)
+    stripe_created_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Stripe's event created time — the same on every delivery; partition key",
+    )
+    claimed_at = models.DateTimeField(
+        null=True, blank=True, help_text="When a worker last moved the event to PROCESSING"
+    )
+    requeued_at = models.DateTimeField(
+        null=True, blank=True, help_text="When drain_payment_events last re-enqueued the event"
+    )
     processed_at = models.DateTimeField(null=True, blank=True)
     payload = models.JSONField(default=dict, help_text="Full event payload for audit trail")
 
@@ -119,6 +146,12 @@ class PaymentEvent(models.Model):
         verbose_name = "Payment Event"
         verbose_name_plural = "Payment Events"
         ordering = ["-received_at"]
+        indexes = [
+            # process_stripe_events / drain_payment_events — oldest RECEIVED first
+            models.Index(fields=["status", "received_at"], name="payevent_status_received_idx"),
+            # cleanup_old_payment_events — finished events past retention
+            models.Index(fields=["status", "processed_at"], name="payevent_status_processed_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.event_type} — {self.stripe_event_id} [{self.status}]"
@@ -145,6 +178,23 @@ class VPSInstanceStatus(models.TextChoices):
     SUSPENDED = "suspended", "Suspended"
     TERMINATED = "terminated", "Terminated"
     ERROR = "error", "Error"
+    # Transitional — a power action is in flight (see orders/power.py)
+    STARTING = "starting", "Starting"
+    STOPPING = "stopping", "Stopping"
+    RESTARTING = "restarting", "Restarting"
+
+
+class VPSPowerAction(models.TextChoices):
+    START = "start", "Start"
+    STOP = "stop", "Stop"
+    RESTART = "restart", "Restart"
+
+
+class VPSOperationStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    RUNNING = "running", "Running"
+    SUCCEEDED = "succeeded", "Succeeded"
+    FAILED = "failed", "Failed"
 
 
 class Order(models.Model):
@@ -185,6 +235,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Per-customer order history, newest first (/api/v1/orders/)
+            models.Index(fields=["customer", "created_at"], name="order_customer_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Order #{self.pk} ({self.status})"
@@ -211,6 +265,10 @@ class ProvisioningJob(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # cleanup_stale_provisioning_jobs — PROVISIONING and started before a cutoff
+            models.Index(fields=["status", "started_at"], name="provjob_status_started_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"ProvisioningJob #{self.pk} ({self.status})"
@@ -251,6 +309,62 @@ class VPSInstance(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Dashboard / VPS list — a customer's instances by status, newest first
+            models.Index(
+                fields=["customer", "status", "created_at"], name="vps_cust_status_created_idx"
+            ),
+            # Unfiltered VPS list / keyset pages on (created_at, id)
+            models.Index(fields=["customer", "created_at"], name="vps_customer_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.hostname} ({self.status})"
+
+
+class VPSOperation(models.Model):
+    """One power action on a VPS instance, run off the request path by a worker."""
+
+    instance = models.ForeignKey(VPSInstance, on_delete=models.CASCADE, related_name="operations")
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    action = models.CharField(max_length=20, choices=VPSPowerAction.choices)
+    status = models.CharField(
+        max_length=20,
+        choices=VPSOperationStatus.choices,
+        default=VPSOperationStatus.PENDING,
+    )
+    # Instance status before the action, restored if it fails
+    previous_status = models.CharField(max_length=20, choices=VPSInstanceStatus.choices)
+    error_message = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # expire_stale_power_operations — unfinished and created before a cutoff
+            models.Index(fields=["status", "created_at"], name="vpsop_status_created_idx"),
+        ]
+        constraints = [
+            # At most one action in flight per instance
+            models.UniqueConstraint(
+                fields=["instance"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="vpsop_one_active_per_instance",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"VPSOperation #{self.pk} {self.action} ({self.status})"
+
+    @property
+    def done(self) -> bool:
+        return self.status in (VPSOperationStatus.SUCCEEDED, VPSOperationStatus.FAILED)
@@ -0,0 +1,433 @@
+"""Monthly range partitions for the append-only audit tables (PostgreSQL only).
+
+``PaymentEvent`` (by ``stripe_created_at``) and ``NotificationLog`` (by
+``created_at``) only ever grow.  Once converted, each calendar month lives in
+its own partition named ``<table>_pYYYYMM``, plus a ``<table>_default`` catch-all:
+
+  - range scans on the time column only touch the matching partitions,
+  - retention detaches and drops whole partitions instead of deleting rows
+    (the default partition, which only catches stray rows such as old
+    backfills or skewed clocks, is pruned row by row),
+  - indexes stay month-sized, which keeps bloat and vacuum work down.
+
+Conversion is a one-off, run in a maintenance window with
+``manage.py manage_partitions --convert``.  After that the
+``maintain_partitions`` beat task creates upcoming partitions ahead of time and
+drops expired ones.  SQLite and unconverted tables are left alone, so dev and
+tests keep using plain tables; the PostgreSQL path is covered by the
+``postgres`` CI job.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary key becomes ``(id, <key>)`` and ``PaymentEvent.stripe_event_id`` becomes
+unique together with ``stripe_created_at``.  Webhooks set that column from the
+Stripe event's ``created`` timestamp (orders/ingest.py), which is the same on
+every delivery of an event, so retries still hit the constraint.
+
+These two constraints are the only difference from the schema Django's
+migrations describe.  Conversion therefore refuses to run with unapplied
+migrations, and a later migration that alters either constraint on a converted
+table has to be written by hand.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import re
+from dataclasses import dataclass
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PartitionSpec:
+    model: str  # "app_label.ModelName"
+    column: str  # range partition key
+    retention_setting: str  # settings name holding the retention in days
+    unique_with_key: tuple[str, ...] = ()  # columns unique per key value after conversion
+    # Lookups every row must match before its partition may be dropped.
+    droppable_when: tuple[tuple[str, object], ...] = ()
+
+    @property
+    def model_class(self):
+        return apps.get_model(self.model)
+
+    @property
+    def table(self) -> str:
+        return self.model_class._meta.db_table
+
+
+PARTITIONED_TABLES = (
+    PartitionSpec(
+        model="orders.PaymentEvent",
+        column="stripe_created_at",
+        retention_setting="PAYMENT_EVENT_RETENTION_DAYS",
+        unique_with_key=("stripe_event_id",),
+        # Never drop events that still need processing or investigation.
+        droppable_when=(("status__in", ("processed", "skipped")),),
+    ),
+    PartitionSpec(
+        model="notifications.NotificationLog",
+        column="created_at",
+        retention_setting="NOTIFICATION_LOG_RETENTION_DAYS",
+    ),
+)
+
+
+# ---------------------------------------------------------------------------
+# Month arithmetic and naming
+# ---------------------------------------------------------------------------
+
+
+def month_start(value: datetime.date | datetime.datetime) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def parse_partition_month(table: str, name: str) -> datetime.date | None:
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{4}})(\d{{2}})", name)
+    if not match:
+        return None
+    return datetime.date(int(match[1]), int(match[2]), 1)
+
+
+def months_between(first: datetime.date, last: datetime.date) -> list[datetime.date]:
+    """Every month start from *first* to *last*, inclusive."""
+    months, month = [], month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def expired_months(
+    months: list[datetime.date], now: datetime.datetime, retention_days: int
+) -> list[datetime.date]:
+    """Months whose partitions hold only rows older than the retention period."""
+    cutoff = (now - datetime.timedelta(days=retention_days)).date()
+    return [m for m in sorted(months) if add_months(m, 1) <= cutoff]
+
+
+# ---------------------------------------------------------------------------
+# Catalog queries
+# ---------------------------------------------------------------------------
+
+
+def is_postgresql() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def is_partitioned(table: str) -> bool:
+    if not is_postgresql():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(table: str) -> dict[datetime.date, str]:
+    """Map month → partition name for the monthly partitions of *table*."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return {m: name for name in names if (m := parse_partition_month(table, name))}
+
+
+# ---------------------------------------------------------------------------
+# DDL — identifiers come from model metadata and are quoted; no user input.
+# ---------------------------------------------------------------------------
+
+
+def default_partition(table: str) -> str:
+    return f"{table}_default"
+
+
+def _create_partition_sql(table: str, month: datetime.date) -> str:
+    qn = connection.ops.quote_name
+    return (
+        f"CREATE TABLE IF NOT EXISTS {qn(partition_name(table, month))} "
+        f"PARTITION OF {qn(table)} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def _create_partition(spec: PartitionSpec, month: datetime.date) -> None:
+    """Create *month*'s partition, first moving its rows out of the default partition.
+
+    PostgreSQL refuses to create a partition whose range the default partition
+    already holds rows for.  In that case the default partition is detached,
+    the new partition created, the rows re-routed through the parent and the
+    default partition re-attached, all in one transaction.
+    """
+    qn = connection.ops.quote_name
+    table, default = spec.table, default_partition(spec.table)
+    bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+    in_month = f"{qn(spec.column)} >= %s AND {qn(spec.column)} < %s"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT 1 FROM {qn(default)} WHERE {in_month} LIMIT 1",  # noqa: S608
+            bounds,
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(_create_partition_sql(table, month))
+            return
+        cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}")
+        cursor.execute(_create_partition_sql(table, month))
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(default)} WHERE {in_month} RETURNING *) "  # noqa: S608
+            f"INSERT INTO {qn(table)} SELECT * FROM moved",
+            bounds,
+        )
+        moved = cursor.rowcount
+        cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT")
+    log.info("Moved %d row(s) from %s into %s", moved, default, partition_name(table, month))
+
+
+def ensure_partitions(
+    spec: PartitionSpec, now: datetime.datetime, months_ahead: int, dry_run: bool = False
+) -> list[str]:
+    """Create the partitions for this month and the next *months_ahead* months."""
+    existing = existing_partitions(spec.table)
+    this_month = month_start(now)
+    missing = [
+        m
+        for m in months_between(this_month, add_months(this_month, months_ahead))
+        if m not in existing
+    ]
+    if not dry_run:
+        for month in missing:
+            _create_partition(spec, month)
+    return [partition_name(spec.table, m) for m in missing]
+
+
+def drop_expired_partitions(
+    spec: PartitionSpec, now: datetime.datetime, dry_run: bool = False
+) -> list[str]:
+    """Detach and drop monthly partitions past the retention period.
+
+    A partition still holding rows that fail ``spec.droppable_when`` is kept and
+    logged, so unprocessed events are never discarded by retention.
+    """
+    retention_days = getattr(settings, spec.retention_setting)
+    existing = existing_partitions(spec.table)
+    model = spec.model_class
+    qn = connection.ops.quote_name
+
+    dropped = []
+    for month in expired_months(list(existing), now, retention_days):
+        name = existing[month]
+        if spec.droppable_when:
+            start, end = (
+                datetime.datetime.combine(m, datetime.time(), tzinfo=datetime.UTC)
+                for m in (month, add_months(month, 1))
+            )
+            in_month = model.objects.filter(
+                **{f"{spec.column}__gte": start, f"{spec.column}__lt": end}
+            )
+            blocking = in_month.exclude(**dict(spec.droppable_when)).count()
+            if blocking:
+                log.warning("Keeping expired partition %s: %d row(s) not finished", name, blocking)
+                continue
+        if not dry_run:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {qn(spec.table)} DETACH PARTITION {qn(name)}")
+                cursor.execute(f"DROP TABLE {qn(name)}")
+        dropped.append(name)
+    return dropped
+
+
+def prune_default_partition(
+    spec: PartitionSpec, now: datetime.datetime, dry_run: bool = False
+) -> int:
+    """Delete rows past the retention period from the default partition.
+
+    Rows outside every monthly range (old backfills, skewed clocks) land in the
+    default partition, which ``drop_expired_partitions`` never drops.  They are
+    deleted one by one instead, subject to ``spec.droppable_when``.  Returns
+    the number of rows deleted (or that would be, with *dry_run*).
+    """
+    retention_days = getattr(settings, spec.retention_setting)
+    cutoff = now - datetime.timedelta(days=retention_days)
+    model = spec.model_class
+    pk = model._meta.pk.column
+    qn = connection.ops.quote_name
+
+    expired = model.objects.filter(
+        **{f"{spec.column}__lt": cutoff}, **dict(spec.droppable_when)
+    ).order_by()
+    sql, params = expired.values(model._meta.pk.name).query.sql_with_params()
+    default = qn(default_partition(spec.table))
+    verb = "SELECT count(*) FROM" if dry_run else "DELETE FROM"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"{verb} {default} WHERE {qn(spec.column)} < %s AND {qn(pk)} IN ({sql})",  # noqa: S608
+            [cutoff, *params],
+        )
+        pruned = cursor.fetchone()[0] if dry_run else cursor.rowcount
+    if pruned:
+        log.info("Pruned %d expired row(s) from %s", pruned, default)
+    return pruned
+
+
+def pending_migrations() -> list[str]:
+    """Unapplied migrations on the default database, as ``app.name`` labels."""
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return [f"{migration.app_label}.{migration.name}" for migration, _ in plan]
+
+
+def _secondary_definitions(table: str) -> tuple[list[str], list[tuple[str, str]]]:
+    """Non-unique index DDL and (name, definition) foreign keys of *table*.
+
+    Read from the catalog so the rebuilt table keeps the exact names Django's
+    migrations created.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = %s::regclass AND NOT indisunique ORDER BY indexrelid",
+            [table],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f' ORDER BY conname",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+    return indexes, foreign_keys
+
+
+def convert_to_partitioned(spec: PartitionSpec, now: datetime.datetime, months_ahead: int) -> int:
+    """Rebuild *spec*'s table as a partitioned table, copying every row.
+
+    Takes an ACCESS EXCLUSIVE lock for the duration of the copy, so run it in a
+    maintenance window.  Returns the number of rows copied.
+
+    Raises:
+        RuntimeError: If migrations are pending — they were written against the
+            unpartitioned schema.
+    """
+    if pending := pending_migrations():
+        raise RuntimeError(f"Apply pending migrations before converting: {', '.join(pending)}")
+
+    model = spec.model_class
+    table = spec.table
+    legacy = f"{table}_unpartitioned"
+    sequence = f"{table}_pk_seq"
+    pk = model._meta.pk.column
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+        # Run deferred FK checks now; pending trigger events block DROP TABLE.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        indexes, foreign_keys = _secondary_definitions(table)
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS "
+            f"INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS) "
+            f"PARTITION BY RANGE ({qn(spec.column)})"
+        )
+        # A plain sequence instead of an identity column, which partitioned
+        # tables only support from PostgreSQL 17.
+        cursor.execute(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.{qn(pk)}")
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ALTER COLUMN {qn(pk)} "
+            f"SET DEFAULT nextval('{sequence}'::regclass)"
+        )
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY ({qn(pk)}, {qn(spec.column)})")
+        for column in spec.unique_with_key:
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ADD CONSTRAINT "
+                f"{qn(f'{table}_{column}_{spec.column}_uniq')} "
+                f"UNIQUE ({qn(column)}, {qn(spec.column)})"
+            )
+
+        cursor.execute(f"SELECT min({qn(spec.column)}) FROM {qn(legacy)}")  # noqa: S608
+        oldest = cursor.fetchone()[0] or now
+        this_month = month_start(now)
+        for month in months_between(
+            min(month_start(oldest), this_month), add_months(this_month, months_ahead)
+        ):
+            cursor.execute(_create_partition_sql(table, month))
+        cursor.execute(
+            f"CREATE TABLE {qn(default_partition(table))} PARTITION OF {qn(table)} DEFAULT"
+        )
+
+        cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")  # noqa: S608
+        copied = cursor.rowcount
+        cursor.execute(
+            f"SELECT setval('{sequence}'::regclass, "  # noqa: S608
+            f"COALESCE(max({qn(pk)}), 0) + 1, false) FROM {qn(table)}"
+        )
+        # Dropping the old table frees its index and constraint names; the
+        # captured definitions name the original table, which is now the new one.
+        cursor.execute(f"DROP TABLE {qn(legacy)}")
+        for statement in indexes:
+            cursor.execute(statement)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+
+    log.info("Converted %s to monthly partitions (%d rows copied)", table, copied)
+    return copied
+
+
+# ---------------------------------------------------------------------------
+# Entry point for the command and the beat task
+# ---------------------------------------------------------------------------
+
+
+def maintain_partitions(
+    now: datetime.datetime | None = None,
+    months_ahead: int | None = None,
+    dry_run: bool = False,
+) -> dict[str, dict[str, list[str]]]:
+    """Create upcoming partitions and drop expired ones for every converted table.
+
+    Returns ``{table: {"created": [...], "dropped": [...], "pruned": n}}``, where
+    *pruned* counts expired rows deleted from the default partition; tables
+    that are not partitioned (or not on PostgreSQL) are omitted.
+    """
+    if not is_postgresql():
+        return {}
+    now = now or timezone.now()
+    months_ahead = settings.AUDIT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+
+    summary = {}
+    for spec in PARTITIONED_TABLES:
+        if not is_partitioned(spec.table):
+            log.debug("%s is not partitioned; skipping", spec.table)
+            continue
+        summary[spec.table] = {
+            "created": ensure_partitions(spec, now, months_ahead, dry_run=dry_run),
+            "dropped": drop_expired_partitions(spec, now, dry_run=dry_run),
+            "pruned": prune_default_partition(spec, now, dry_run=dry_run),
+        }
+    return summary
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import logging
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from celery import shared_task
 
@@ -17,72 +17,82 @@ log = logging.getLogger(__name__)
     soft_time_limit=120,
     time_limit=180,
 )
-def check_expiring_subscriptions() -> int:
+def check_expiring_subscriptions(batch_size: int = 200) -> int:
     """Check for subscriptions expiring within 3 days and notify users.
 
-    Runs daily.  Only notifies once per subscription by checking whether a
-    NotificationLog with a subject containing "subscription expiring" already
-    exists for the user within the last 3 days.
+    Runs daily.  Only notifies once per subscription: users who already have a
+    ``subscription_expiring`` NotificationLog from the last 3 days are removed
+    in the same query (NOT EXISTS over the (user, kind, created_at) index).
+    Notifications are queued as ``send_notification_batch_task`` messages of up
+    to *batch_size* items instead of one task per user.
 
-    Returns the number of notifications sent.
+    Returns the number of notifications queued.
     """
+    from django.db.models import Exists, OuterRef
     from django.utils import timezone
 
-    from notifications.models import NotificationLog
-    from notifications.tasks import send_notification_task
+    from notifications.models import NotificationKind, NotificationLog
     from orders.models import Subscription, SubscriptionStatus
 
     now = timezone.now()
     expiry_window = now + timedelta(days=3)
 
-    expiring_subs = Subscription.objects.filter(
-        status__in=[SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING],
-        current_period_end__lte=expiry_window,
-        current_period_end__gt=now,
-        cancel_at_period_end=True,
-    ).select_related("customer__user")
+    recently_notified = NotificationLog.objects.filter(
+        user=OuterRef("customer__user"),
+        kind=NotificationKind.SUBSCRIPTION_EXPIRING,
+        created_at__gte=now - timedelta(days=3),
+    )
+    expiring_subs = (
+        Subscription.objects.filter(
+            status__in=[SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING],
+            current_period_end__lte=expiry_window,
+            current_period_end__gt=now,
+            cancel_at_period_end=True,
+        )
+        .filter(~Exists(recently_notified))
+        .select_related("customer__user")
+        .order_by("pk")
+    )
 
-    sent = 0
+    notifications = []
     for sub in expiring_subs:
         user = sub.customer.user
-
-        # Skip if we already notified this user about an expiring sub recently
-        already_notified = NotificationLog.objects.filter(
-            user=user,
-            subject__icontains="subscription expiring",
-            created_at__gte=now - timedelta(days=3),
-        ).exists()
-
-        if already_notified:
-            log.debug(
-                "Skipping expiry notification for user %s (sub %s) — already notified",
-                user.pk,
-                sub.pk,
-            )
-            continue
-
         days_left = (sub.current_period_end - now).days
-        subject = "Your subscription is expiring soon"
         body = (
-            f"Hi {user.get_full_name() or user.email},\n\n"
+            f"Hi {user.full_name},\n\n"
             f"Your subscription ({sub.stripe_subscription_id}) is set to expire "
             f"in {days_left} day{'s' if days_left != 1 else ''}. "
             f"If you'd like to continue your service, please renew before "
             f"{sub.current_period_end:%Y-%m-%d %H:%M} UTC.\n\n"
             f"— EZ Solutions"
         )
-
-        send_notification_task.delay(user.pk, subject, body)
-        sent += 1
-        log.info(
-            "Queued expiry notification for user %s (sub %s, expires %s)",
-            user.pk,
-            sub.pk,
-            sub.current_period_end,
+        notifications.append(
+            {
+                "user_id": user.pk,
+                "subject": "Your subscription is expiring soon",
+                "body": body,
+                "kind": NotificationKind.SUBSCRIPTION_EXPIRING,
+            }
         )
 
-    log.info("check_expiring_subscriptions complete: %d notifications queued", sent)
-    return sent
+    for start in range(0, len(notifications), batch_size):
+        _queue_notification_batch(notifications[start : start + batch_size])
+
+    log.info("check_expiring_subscriptions complete: %d notifications queued", len(notifications))
+    return len(notifications)
+
+
+def _queue_notification_batch(notifications: list[dict]) -> None:
+    from notifications.tasks import send_notification_batch_task
+
+    try:
+        send_notification_batch_task.apply_async(args=[notifications], ignore_result=True)
+    except Exception:  # noqa: BLE001
+        log.exception(
+            "Notification batch enqueue failed (%d items); sending synchronously",
+            len(notifications),
+        )
+        send_notification_batch_task.run(notifications)
 
 
 @shared_task(
@@ -95,42 +105,181 @@ def check_expiring_subscriptions() -> int:
 def cleanup_stale_provisioning_jobs() -> int:
     """Mark provisioning jobs stuck in 'provisioning' for >1 hour as failed.
 
-    Notifies admins about each stale job.  Runs every 30 minutes.
+    The stale jobs are claimed and failed in one UPDATE … RETURNING, and admins
+    get a single digest listing them rather than one message per job, so a
+    provider outage does not flood every admin channel.  Runs every 30 minutes.
 
     Returns the number of jobs marked as failed.
     """
     from django.utils import timezone
 
     from notifications.tasks import send_admin_notification_task
-    from orders.models import ProvisioningJob, ProvisioningStatus
 
     now = timezone.now()
-    stale_cutoff = now - timedelta(hours=1)
+    failed = _fail_stale_jobs(now - timedelta(hours=1), now, "Timed out after 1 hour")
+    if failed:
+        send_admin_notification_task.delay(**_stale_jobs_digest(failed))
+        log.warning(
+            "Marked %d stale ProvisioningJob(s) as failed: %s",
+            len(failed),
+            ", ".join(f"#{pk}" for pk, _, _ in failed),
+        )
+
+    log.info("cleanup_stale_provisioning_jobs complete: %d jobs failed", len(failed))
+    return len(failed)
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=60,
+    time_limit=90,
+)
+def poll_provisioning_operations(batch_size: int | None = None) -> int:
+    """Advance ProvisioningJobs whose provider operation is still in flight.
+
+    Every PROVISIONING job holding a ``ProvisionOperation`` handle (see
+    ``provision_vps_task``) is polled — oldest first, up to *batch_size*
+    (PROVISIONING_POLL_BATCH_SIZE) per run — on a thread pool of
+    PROVISIONING_POLL_CONCURRENCY, so one run covers hundreds of provisions in
+    roughly one provider round-trip.  Only the provider calls run on the pool;
+    finished jobs are completed or failed back on this thread.  A poll that
+    raises leaves its job for the next run (and, eventually, for
+    ``cleanup_stale_provisioning_jobs``).  Runs every 10 seconds; a run that
+    finds the previous one still going returns at once, so slow runs never
+    poll the same jobs side by side.
+
+    Returns the number of jobs that finished.
+    """
+    from django.core.cache import cache
+
+    # Expires with the hard time limit, so a killed run cannot hold it.
+    if not cache.add(POLL_LOCK_KEY, 1, timeout=90):
+        log.info("poll_provisioning_operations: previous run still active — skipping")
+        return 0
+    try:
+        return _poll_operations(batch_size)
+    finally:
+        cache.delete(POLL_LOCK_KEY)
+
+
+POLL_LOCK_KEY = "provisioning:poll:running"
 
-    stale_jobs = ProvisioningJob.objects.filter(
-        status=ProvisioningStatus.PROVISIONING,
-        started_at__lt=stale_cutoff,
-    )
 
-    count = 0
-    for job in stale_jobs:
-        job.status = ProvisioningStatus.FAILED
-        job.error_message = "Timed out after 1 hour"
-        job.save(update_fields=["status", "error_message", "updated_at"])
-        count += 1
-
-        send_admin_notification_task.delay(
-            subject=f"Provisioning job #{job.pk} timed out",
-            body=(
-                f"ProvisioningJob #{job.pk} (order #{job.order_id}) has been stuck in "
-                f"'provisioning' since {job.started_at:%Y-%m-%d %H:%M} UTC and was "
-                f"automatically marked as failed."
-            ),
+def _poll_operations(batch_size: int | None) -> int:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.conf import settings
+
+    from orders.models import ProvisioningJob, ProvisioningStatus
+    from orders.provisioning import ProvisionOperation, get_provider
+    from orders.tasks import complete_provisioning, fail_provisioning
+
+    batch_size = batch_size or settings.PROVISIONING_POLL_BATCH_SIZE
+    jobs = list(
+        ProvisioningJob.objects.filter(
+            status=ProvisioningStatus.PROVISIONING, payload__has_key="operation"
         )
-        log.warning("Marked stale ProvisioningJob #%d as failed", job.pk)
+        .select_related("order__customer__user")
+        .order_by("started_at", "pk")[:batch_size]
+    )
+    if not jobs:
+        return 0
+
+    providers = {name: get_provider(name) for name in {job.provider for job in jobs}}
+
+    def _poll(job):
+        operation = ProvisionOperation.from_payload(job.payload["operation"])
+        try:
+            return job, operation, providers[job.provider].poll(operation)
+        except Exception:  # noqa: BLE001
+            log.exception("Polling operation %s of ProvisioningJob %s failed", operation.id, job.pk)
+            return job, operation, None
+
+    with ThreadPoolExecutor(max_workers=settings.PROVISIONING_POLL_CONCURRENCY) as pool:
+        polled = list(pool.map(_poll, jobs))
+
+    finished = 0
+    for job, operation, status in polled:
+        if status is None or not status.done:
+            # Save the steps poll() recorded so the next poll does not repeat them.
+            if operation.to_payload() != job.payload["operation"]:
+                ProvisioningJob.objects.filter(
+                    pk=job.pk, status=ProvisioningStatus.PROVISIONING
+                ).update(payload={**job.payload, "operation": operation.to_payload()})
+            continue
+        if status.result is not None:
+            finished += complete_provisioning(job, status.result)
+        else:
+            fail_provisioning(job, status.error or "Provider operation failed")
+            finished += 1
 
-    log.info("cleanup_stale_provisioning_jobs complete: %d jobs failed", count)
-    return count
+    log.info("poll_provisioning_operations complete: %d polled, %d finished", len(jobs), finished)
+    return finished
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=240,
+    time_limit=300,
+)
+def provision_stranded_jobs(min_age_minutes: int = 5) -> int:
+    """Provision QUEUED jobs that no scheduled batch picked up.
+
+    ``schedule_batch`` suppresses scheduling while a batch task is pending, so
+    a lost or crashed ``provision_batch_task`` leaves its jobs QUEUED until the
+    next checkout.  This claims jobs queued more than *min_age_minutes* ago in
+    one ``provision_batch``; a full batch schedules the rest.  Runs every 5
+    minutes.
+
+    Returns the number of jobs claimed.
+    """
+    from django.utils import timezone
+
+    from orders.batch import provision_batch
+
+    cutoff = timezone.now() - timedelta(minutes=min_age_minutes)
+    claimed = provision_batch(queued_before=cutoff).claimed
+    if claimed:
+        log.warning("provision_stranded_jobs: %d stranded QUEUED job(s) claimed", claimed)
+    return claimed
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=240,
+    time_limit=280,
+)
+def reconcile_fleet_status(chunk_size: int | None = None) -> int:
+    """Sync VPSInstance.status with what each provider reports.
+
+    One ``fleet_status()`` listing per provider, diffed against the database
+    in chunks of *chunk_size* (FLEET_RECONCILE_CHUNK_SIZE) and applied with
+    one conditional UPDATE per status transition — see orders/reconcile.py.
+    Missing, unmapped and unmanaged VMs are logged and recorded in the run's
+    metrics, not changed.  Runs every 5 minutes.
+
+    Returns the number of instances whose status changed.
+    """
+    from orders.reconcile import reconcile_fleet
+
+    result = reconcile_fleet(chunk_size)
+    log.info(
+        "reconcile_fleet_status complete: %d checked, %d changed, %d missing, "
+        "%d unmapped, %d unmanaged in %.1fs",
+        result.checked,
+        result.changed,
+        result.missing,
+        result.unmapped,
+        result.unmanaged,
+        result.duration,
+    )
+    return result.changed
 
 
 @shared_task(
@@ -138,25 +287,362 @@ def cleanup_stale_provisioning_jobs() -> int:
     retry_backoff=True,
     max_retries=3,
     soft_time_limit=60,
-    time_limit=120,
+    time_limit=90,
+)
+def expire_stale_power_operations() -> int:
+    """Fail VPS power operations unfinished after POWER_ACTION_TIMEOUT seconds.
+
+    A worker lost mid-action leaves its operation RUNNING and the instance in
+    a transitional status, which blocks further actions on it.  Expired
+    RUNNING operations whose VM already shows the action's result are
+    finished as succeeded; the rest fail through
+    ``orders.power.finish_operations``, restoring the instance's previous
+    status for the next fleet reconcile to correct.  Runs every 5 minutes.
+
+    Returns the number of operations expired.
+    """
+    from django.conf import settings
+
+    from orders.power import expire_stale_operations
+
+    expired = expire_stale_operations(settings.POWER_ACTION_TIMEOUT)
+    if expired:
+        log.warning("Expired %d stale VPS power operation(s)", expired)
+    log.info("expire_stale_power_operations complete: %d expired", expired)
+    return expired
+
+
+def _fail_stale_jobs(cutoff, now, message: str) -> list[tuple]:
+    """Fail PROVISIONING jobs started before *cutoff*; return (pk, order_id, started_at).
+
+    PostgreSQL and SQLite ≥ 3.35 claim the rows with a single UPDATE … RETURNING,
+    so a job finishing concurrently is either failed and reported or left alone.
+    Other backends lock the rows, read them and update them in one transaction.
+    """
+    import sqlite3
+
+    from django.db import connection, transaction
+    from django.utils.dateparse import parse_datetime
+
+    from orders.models import ProvisioningJob, ProvisioningStatus
+
+    # MariaDB supports INSERT … RETURNING but not UPDATE … RETURNING.
+    returning = connection.vendor == "postgresql" or (
+        connection.vendor == "sqlite" and sqlite3.sqlite_version_info >= (3, 35)
+    )
+    if not returning:
+        with transaction.atomic():
+            stale = ProvisioningJob.objects.select_for_update().filter(
+                status=ProvisioningStatus.PROVISIONING, started_at__lt=cutoff
+            )
+            rows = list(stale.order_by("pk").values_list("pk", "order_id", "started_at"))
+            ProvisioningJob.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(
+                status=ProvisioningStatus.FAILED, error_message=message, updated_at=now
+            )
+        return rows
+
+    # Identifiers come from model metadata; all values are bound parameters.
+    qn = connection.ops.quote_name
+    sql = (
+        f"UPDATE {qn(ProvisioningJob._meta.db_table)} "  # noqa: S608
+        f"SET {qn('status')} = %s, {qn('error_message')} = %s, {qn('updated_at')} = %s "
+        f"WHERE {qn('status')} = %s AND {qn('started_at')} < %s "
+        f"RETURNING {qn('id')}, {qn('order_id')}, {qn('started_at')}"
+    )
+    params = [
+        ProvisioningStatus.FAILED,
+        message,
+        connection.ops.adapt_datetimefield_value(now),
+        ProvisioningStatus.PROVISIONING,
+        connection.ops.adapt_datetimefield_value(cutoff),
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    # SQLite hands timestamps back as text (UTC); PostgreSQL returns datetimes.
+    return sorted(
+        (pk, order_id, parse_datetime(started) if isinstance(started, str) else started)
+        for pk, order_id, started in rows
+    )
+
+
+def _stale_jobs_digest(failed: list[tuple], limit: int = 50) -> dict[str, str]:
+    """Build the admin notification for a batch of timed-out jobs."""
+    lines = [
+        f"  - ProvisioningJob #{pk} (order #{order_id}), provisioning since "
+        f"{started_at:%Y-%m-%d %H:%M} UTC"
+        for pk, order_id, started_at in failed[:limit]
+    ]
+    if len(failed) > limit:
+        lines.append(f"  … and {len(failed) - limit} more")
+    return {
+        "subject": f"{len(failed)} provisioning job(s) timed out",
+        "body": (
+            f"{len(failed)} provisioning job(s) were stuck in 'provisioning' for over "
+            f"an hour and were automatically marked as failed:\n\n" + "\n".join(lines)
+        ),
+    }
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=360,
+    time_limit=420,
+)
+def cleanup_old_payment_events(time_budget: int = 300, cutoff: str | None = None) -> int:
+    """Delete processed/skipped payment events older than the retention period.
+
+    Runs weekly.  Rows are removed in ID-ordered batches of
+    PAYMENT_EVENT_PRUNE_BATCH_SIZE with a pause between batches, and archived
+    to gzip JSONL under PAYMENT_EVENT_ARCHIVE_DIR first when that is set (see
+    orders/pruning.py).  If *time_budget* seconds run out before the scan
+    finishes, the task re-queues itself with the same *cutoff* (ISO 8601) and
+    resumes from the cursor saved for it.
+    Does nothing once the table is partitioned — retention then drops whole
+    partitions (``maintain_partitions``).
+
+    Returns the number of events deleted by this run.
+    """
+    from django.conf import settings
+    from django.utils import timezone
+
+    from orders.models import EventStatus, PaymentEvent
+    from orders.partitions import is_partitioned
+    from orders.pruning import prune_payment_events
+
+    if is_partitioned(PaymentEvent._meta.db_table):
+        log.info("cleanup_old_payment_events: table is partitioned; maintain_partitions prunes it")
+        return 0
+
+    if cutoff is None:
+        until = timezone.now() - timedelta(days=settings.PAYMENT_EVENT_RETENTION_DAYS)
+    else:
+        until = datetime.fromisoformat(cutoff)
+
+    result = prune_payment_events(
+        PaymentEvent.objects.filter(
+            status__in=[EventStatus.PROCESSED, EventStatus.SKIPPED],
+            processed_at__lt=until,
+        ),
+        batch_size=settings.PAYMENT_EVENT_PRUNE_BATCH_SIZE,
+        sleep_seconds=settings.PAYMENT_EVENT_PRUNE_SLEEP,
+        archive_dir=settings.PAYMENT_EVENT_ARCHIVE_DIR,
+        time_budget=time_budget,
+    )
+    if not result.complete:
+        log.info(
+            "cleanup_old_payment_events: time budget used after %d batches; resuming",
+            result.batches,
+        )
+        cleanup_old_payment_events.apply_async(
+            kwargs={"time_budget": time_budget, "cutoff": until.isoformat()},
+            countdown=60,
+            ignore_result=True,
+        )
+
+    log.info(
+        "cleanup_old_payment_events complete: %d events deleted in %d batches (%d archived)",
+        result.deleted,
+        result.batches,
+        result.archived_files,
+    )
+    return result.deleted
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=120,
+    time_limit=180,
+)
+def maintain_partitions() -> int:
+    """Create upcoming monthly partitions and drop expired ones.
+
+    Expired rows in the default partition are deleted as well.
+
+    Runs daily.  A no-op on SQLite and for tables not yet converted with
+    ``manage.py manage_partitions --convert`` (see orders/partitions.py).
+
+    Returns the number of partitions created plus dropped.
+    """
+    from orders.partitions import maintain_partitions as maintain
+
+    summary = maintain()
+    changed = sum(len(c["created"]) + len(c["dropped"]) for c in summary.values())
+    for table, changes in summary.items():
+        if changes["created"] or changes["dropped"] or changes["pruned"]:
+            log.info(
+                "maintain_partitions %s: created %s, dropped %s, pruned %d default row(s)",
+                table,
+                changes["created"],
+                changes["dropped"],
+                changes["pruned"],
+            )
+    return changed
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=30,
+    time_limit=60,
 )
-def cleanup_old_payment_events() -> int:
-    """Delete processed/skipped payment events older than 90 days.
+def flush_webhook_buffer(max_batches: int = 50) -> int:
+    """Drain the buffered Stripe webhook stream into PaymentEvent rows.
 
-    Runs weekly.
+    Runs every few seconds when STRIPE_WEBHOOK_INGEST_MODE is "redis".  Each
+    batch is one bulk insert plus one ``process_stripe_events`` task.
 
-    Returns the number of events deleted.
+    Returns the number of buffered entries consumed.
+    """
+    from django.conf import settings
+
+    from orders.ingest import flush_buffer, get_buffer
+
+    if settings.STRIPE_WEBHOOK_INGEST_MODE == "direct":
+        return 0
+
+    buffer = get_buffer()
+    consumed = 0
+    for _ in range(max_batches):
+        flushed = flush_buffer(buffer)
+        if not flushed:
+            break
+        consumed += flushed
+
+    if consumed:
+        log.info("flush_webhook_buffer complete: %d entries consumed", consumed)
+    return consumed
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=30,
+    time_limit=60,
+)
+def drain_payment_events(max_workers: int = 4, batch_size: int = 100) -> int:
+    """Fan out ``process_stripe_events`` tasks over any RECEIVED backlog.
+
+    Picks up events whose per-event or per-flush task was lost (broker outage,
+    enqueue failure) and lets several workers drain a large backlog in parallel —
+    each batch claims its own rows with SKIP LOCKED.  Only events older than two
+    minutes are considered so freshly received events stay with their own task.
+
+    Events a lost worker left PROCESSING for over STALE_CLAIM_SECONDS are marked
+    FAILED first — their handler may have run partway, so they are not replayed
+    automatically.
+
+    Runs every minute.  Returns the number of batch tasks enqueued.
     """
     from django.utils import timezone
 
     from orders.models import EventStatus, PaymentEvent
+    from orders.sharding import shard_count
+    from orders.tasks import process_stripe_events
+
+    _fail_stale_claims(timezone.now())
+
+    min_age = 120
+    backlog = PaymentEvent.objects.filter(
+        status=EventStatus.RECEIVED,
+        received_at__lte=timezone.now() - timedelta(seconds=min_age),
+    ).count()
+    if not backlog:
+        return 0
+
+    if shard_count():
+        return _drain_sharded(backlog, max_workers * batch_size, batch_size, min_age)
+
+    batches = min(max_workers, -(-backlog // batch_size))
+    for _ in range(batches):
+        process_stripe_events.apply_async(
+            kwargs={"limit": batch_size, "min_age_seconds": min_age},
+            ignore_result=True,
+        )
 
-    cutoff = timezone.now() - timedelta(days=90)
+    log.warning(
+        "drain_payment_events: %d orphaned event(s), %d batch task(s) queued", backlog, batches
+    )
+    return batches
+
+
+# Longer than any processing task's hard time limit.
+STALE_CLAIM_SECONDS = 15 * 60
 
-    deleted_count, _ = PaymentEvent.objects.filter(
-        status__in=[EventStatus.PROCESSED, EventStatus.SKIPPED],
-        processed_at__lt=cutoff,
-    ).delete()
 
-    log.info("cleanup_old_payment_events complete: %d events deleted", deleted_count)
-    return deleted_count
+def _fail_stale_claims(now) -> int:
+    """Fail PaymentEvents a crashed worker left PROCESSING; return how many."""
+    from django.db.models import Q
+
+    from orders.models import EventStatus, PaymentEvent
+
+    cutoff = now - timedelta(seconds=STALE_CLAIM_SECONDS)
+    # Rows claimed before claimed_at existed fall back to their receipt time.
+    expired = Q(claimed_at__lt=cutoff) | Q(claimed_at__isnull=True, received_at__lt=cutoff)
+    stale = PaymentEvent.objects.filter(expired, status=EventStatus.PROCESSING)
+    failed = stale.update(
+        status=EventStatus.FAILED,
+        error_message="Worker lost while processing — check before replaying",
+        processed_at=now,
+    )
+    if failed:
+        log.warning("drain_payment_events: %d stale PROCESSING event(s) marked failed", failed)
+    return failed
+
+
+# A shard queue has this long to reach a re-enqueued event before it is sent again.
+REQUEUE_TIMEOUT_SECONDS = 30 * 60
+
+
+def _drain_sharded(backlog: int, limit: int, batch_size: int, min_age: int) -> int:
+    """Re-enqueue the oldest orphaned events onto their customer shard queues.
+
+    Backlog-mode batches would mix customers across workers, so with sharding
+    enabled the events are resolved here and sent as explicit ID batches.
+    Re-enqueued events are stamped with ``requeued_at`` and skipped until
+    REQUEUE_TIMEOUT_SECONDS pass, so a shard queue that is merely behind does
+    not get another copy of its backlog every minute.
+    """
+    from django.db.models import Q
+    from django.utils import timezone
+
+    from orders.models import EventStatus, PaymentEvent
+    from orders.sharding import group_by_queue
+    from orders.tasks import process_stripe_events
+
+    now = timezone.now()
+    pairs = list(
+        PaymentEvent.objects.filter(
+            status=EventStatus.RECEIVED,
+            received_at__lte=now - timedelta(seconds=min_age),
+        )
+        .filter(
+            Q(requeued_at__isnull=True)
+            | Q(requeued_at__lt=now - timedelta(seconds=REQUEUE_TIMEOUT_SECONDS))
+        )
+        .order_by("received_at", "pk")
+        .values_list("pk", "payload__data__object__customer")[:limit]
+    )
+    if pairs:
+        PaymentEvent.objects.filter(pk__in=[pk for pk, _ in pairs]).update(requeued_at=now)
+    batches = 0
+    for queue, ids in group_by_queue(pairs).items():
+        routing = {"queue": queue} if queue else {}
+        for start in range(0, len(ids), batch_size):
+            process_stripe_events.apply_async(
+                args=[ids[start : start + batch_size]], ignore_result=True, **routing
+            )
+            batches += 1
+
+    log.warning(
+        "drain_payment_events: %d orphaned event(s), %d sharded batch task(s) queued",
+        backlog,
+        batches,
+    )
+    return batches
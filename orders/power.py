@@ -0,0 +1,448 @@
+"""VPS power actions — requested by the web process, run on the ``power`` queue.
+
+start/stop/restart used to call the provider inside the HTTP request, holding
+a web worker for the whole hypervisor round-trip.  Now:
+
+  1. ``request_power_action()`` (web) checks the action against the
+     instance's status, moves the instance to its transitional status
+     (starting / stopping / restarting) with a conditional UPDATE, creates a
+     PENDING ``VPSOperation`` and enqueues ``vps_power_action_task`` once the
+     transaction commits.  No provider call is made.
+  2. ``run_power_action()`` (worker) claims the operation (PENDING →
+     RUNNING), calls the provider and finishes it: SUCCEEDED moves the
+     instance to its resting status, FAILED puts back the status it had.
+  3. Clients poll ``GET /api/v1/vps/operations/<id>/``, or long-poll it with
+     ``?wait=<seconds>``; ``wait_for_operation()`` watches a cache flag set
+     by ``finish_operations()``, so a waiting request never queries the
+     provider and barely touches the database.  The wait is capped at
+     POWER_ACTION_MAX_WAIT, since it holds a web worker thread, and an
+     unfinished operation is returned with ``Retry-After: RETRY_AFTER``.
+
+``request_bulk_power_action()`` does step 1 for up to POWER_BULK_ACTION_LIMIT
+instances in a fixed number of queries and queues them as
+``vps_bulk_power_action_task`` messages of ``bulk_chunk_size()`` operations,
+few enough to finish within the task's soft time limit.
+``run_power_actions()`` then calls the provider for each message's
+operations concurrently.
+
+A partial unique constraint on VPSOperation allows one unfinished operation
+per instance.  ``expire_stale_operations()`` settles operations a lost or
+timed-out worker left behind (see ``expire_stale_power_operations``):
+a RUNNING one whose VM already shows the action's result succeeds, the
+rest fail.  Instances in a transitional status are skipped by
+``orders.reconcile``.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Customer, VPSInstance, VPSInstanceStatus, VPSOperation, VPSOperationStatus
+from .provisioning import get_provider
+
+log = logging.getLogger(__name__)
+
+DONE_KEY = "vps:operation:{pk}:done"
+DONE_TTL = 10 * 60
+WAIT_INTERVAL = 0.25
+RETRY_AFTER = 2  # seconds a client should wait before polling an unfinished operation
+UNFINISHED = (VPSOperationStatus.PENDING, VPSOperationStatus.RUNNING)
+
+
+@dataclass(frozen=True)
+class PowerTransition:
+    allowed_from: frozenset[str]
+    transitional: str
+    result: str
+
+
+TRANSITIONS = {
+    "start": PowerTransition(
+        frozenset({VPSInstanceStatus.STOPPED}),
+        VPSInstanceStatus.STARTING,
+        VPSInstanceStatus.RUNNING,
+    ),
+    "stop": PowerTransition(
+        frozenset({VPSInstanceStatus.RUNNING}),
+        VPSInstanceStatus.STOPPING,
+        VPSInstanceStatus.STOPPED,
+    ),
+    "restart": PowerTransition(
+        frozenset({VPSInstanceStatus.RUNNING}),
+        VPSInstanceStatus.RESTARTING,
+        VPSInstanceStatus.RUNNING,
+    ),
+}
+TRANSITIONAL_STATUSES = frozenset(t.transitional for t in TRANSITIONS.values())
+
+
+class PowerActionError(Exception):
+    """The action is not valid for the instance's current status."""
+
+
+class PowerActionConflict(PowerActionError):
+    """Another power action on the instance is still in flight."""
+
+
+def _rejection(instance: VPSInstance, action: str) -> str:
+    """Why *action* cannot start on *instance* now, or "" if it can."""
+    label = instance.get_status_display().lower()
+    if instance.status in TRANSITIONAL_STATUSES:
+        return f"{instance.hostname} is {label}; wait for that to finish."
+    if instance.status not in TRANSITIONS[action].allowed_from:
+        return f"Cannot {action} a {label} instance."
+    return ""
+
+
+def request_power_action(instance: VPSInstance, action: str, user=None) -> VPSOperation:
+    """Record and enqueue *action* on *instance*; return the PENDING operation.
+
+    Raises PowerActionError for an action the status does not allow and
+    PowerActionConflict while another action is in flight.  *instance* must
+    have ``customer`` loaded.
+    """
+    from users.summary import refresh
+
+    transition = TRANSITIONS[action]
+    if error := _rejection(instance, action):
+        if instance.status in TRANSITIONAL_STATUSES:
+            raise PowerActionConflict(error)
+        raise PowerActionError(error)
+
+    previous = instance.status
+    try:
+        with transaction.atomic():
+            moved = VPSInstance.objects.filter(pk=instance.pk, status=previous).update(
+                status=transition.transitional, updated_at=timezone.now()
+            )
+            if not moved:
+                raise PowerActionConflict(f"{instance.hostname} changed state; reload and retry.")
+            operation = VPSOperation.objects.create(
+                instance=instance, requested_by=user, action=action, previous_status=previous
+            )
+    except IntegrityError as exc:
+        raise PowerActionConflict(
+            f"Another action on {instance.hostname} is already in progress."
+        ) from exc
+
+    instance.status = transition.transitional
+    # QuerySet.update() bypasses the dashboard summary signals
+    refresh(instance.customer.user_id, "vps")
+    transaction.on_commit(lambda: _enqueue([operation]))
+    return operation
+
+
+@dataclass
+class BulkActionResult:
+    """The outcome of one instance in ``request_bulk_power_action()``."""
+
+    id: int
+    operation: VPSOperation | None = None
+    error: str = ""
+
+
+def request_bulk_power_action(
+    user, action: str, *, ids: list[int] | None = None, status: str | None = None, limit: int
+) -> list[BulkActionResult]:
+    """Queue *action* on many of *user*'s instances at once.
+
+    The instances are picked by *ids* or by *status*, and are locked and
+    ownership-checked in one query.  The valid ones move to the transitional
+    status in one UPDATE.  Their operations are created with one
+    ``bulk_create`` and handed to ``vps_bulk_power_action_task`` in chunks
+    of ``bulk_chunk_size()``.
+    Returns one result per requested id, in order (per matching instance
+    for a *status* filter).  Raises PowerActionError when a *status* filter
+    matches more than *limit* instances, and PowerActionConflict if another
+    request raced this one.
+    """
+    from users.summary import refresh
+
+    transition = TRANSITIONS[action]
+    owned = VPSInstance.objects.filter(customer__user=user)
+    owned = owned.filter(pk__in=ids) if ids is not None else owned.filter(status=status)
+    try:
+        with transaction.atomic():
+            instances = list(owned.select_for_update(of=("self",)).order_by("pk")[: limit + 1])
+            if len(instances) > limit:
+                raise PowerActionError(f"More than {limit} instances match; narrow the filter.")
+            found = {instance.pk: instance for instance in instances}
+
+            results, eligible = [], []
+            for pk in ids if ids is not None else found:
+                instance = found.get(pk)
+                if instance is None:
+                    results.append(BulkActionResult(pk, error="Not found."))
+                elif error := _rejection(instance, action):
+                    results.append(BulkActionResult(pk, error=error))
+                else:
+                    results.append(BulkActionResult(pk))
+                    eligible.append(instance)
+            if not eligible:
+                return results
+
+            VPSInstance.objects.filter(pk__in=[i.pk for i in eligible]).update(
+                status=transition.transitional, updated_at=timezone.now()
+            )
+            operations = VPSOperation.objects.bulk_create(
+                VPSOperation(
+                    instance=instance,
+                    requested_by=user,
+                    action=action,
+                    previous_status=instance.status,
+                )
+                for instance in eligible
+            )
+    except IntegrityError as exc:
+        raise PowerActionConflict(
+            "Another action on one of these instances is already in progress."
+        ) from exc
+
+    by_instance = {operation.instance_id: operation for operation in operations}
+    for result in results:
+        result.operation = by_instance.get(result.id)
+    for instance in eligible:
+        instance.status = transition.transitional
+    # QuerySet.update() and bulk_create() bypass the dashboard summary signals
+    refresh(user.pk, "vps")
+    transaction.on_commit(lambda: _enqueue(operations))
+    return results
+
+
+def bulk_chunk_size() -> int:
+    """Operations per ``vps_bulk_power_action_task`` message.
+
+    A Proxmox action is the slowest provider call: its request plus up to
+    PROXMOX_TASK_TIMEOUT seconds waiting for the task, PROXMOX_MAX_CONNECTIONS
+    at a time.  A chunk takes as many of those rounds as fit in the task's
+    soft time limit (at least one).
+    """
+    from .tasks import BULK_POWER_SOFT_TIME_LIMIT
+
+    call = settings.PROXMOX_TASK_TIMEOUT + settings.PROXMOX_TIMEOUT
+    rounds = max(1, int(BULK_POWER_SOFT_TIME_LIMIT // call))
+    return settings.PROXMOX_MAX_CONNECTIONS * rounds
+
+
+def _enqueue(operations: list[VPSOperation]) -> None:
+    from .tasks import vps_bulk_power_action_task, vps_power_action_task
+
+    queued = 0
+    try:
+        if len(operations) == 1:
+            vps_power_action_task.apply_async(args=[operations[0].pk], ignore_result=True)
+            return
+        size = bulk_chunk_size()
+        for queued in range(0, len(operations), size):
+            vps_bulk_power_action_task.apply_async(
+                args=[[operation.pk for operation in operations[queued : queued + size]]],
+                ignore_result=True,
+            )
+    except Exception:  # noqa: BLE001
+        unqueued = operations[queued:]
+        log.exception("Enqueueing %d VPSOperation(s) failed", len(unqueued))
+        error = "The action could not be queued. Please try again."
+        finish_operations([(operation, error) for operation in unqueued])
+
+
+def run_power_actions(operation_ids: list[int]) -> list[VPSOperation]:
+    """Claim the PENDING operations among *operation_ids*, run and finish them.
+
+    Provider calls run on one thread pool per provider, sized by its
+    ``max_concurrency``, so a batch takes about one provider round-trip per
+    ``max_concurrency`` operations.  Every query runs on the calling thread.
+    Returns the operations this call claimed.
+    """
+    now = timezone.now()
+    pending = VPSOperation.objects.filter(pk__in=operation_ids, status=VPSOperationStatus.PENDING)
+    if connection.features.has_select_for_update_skip_locked:
+        pending = pending.select_for_update(skip_locked=True)
+    with transaction.atomic():
+        pks = list(pending.values_list("pk", flat=True))
+        VPSOperation.objects.filter(pk__in=pks).update(
+            status=VPSOperationStatus.RUNNING, started_at=now, updated_at=now
+        )
+    operations = list(
+        VPSOperation.objects.filter(pk__in=pks)
+        .select_related("instance__provisioning_job")
+        .order_by("pk")
+    )
+    if operations:
+        finish_operations(_call_providers(operations))
+    return operations
+
+
+def run_power_action(operation_id: int) -> VPSOperation | None:
+    """``run_power_actions()`` for one operation; None if it was already claimed."""
+    operations = run_power_actions([operation_id])
+    return operations[0] if operations else None
+
+
+def _call(provider, operation: VPSOperation) -> str:
+    try:
+        if getattr(provider, operation.action)(operation.instance):
+            return ""
+        return f"The provider rejected the {operation.action}."
+    except Exception as exc:  # noqa: BLE001
+        log.exception("VPSOperation %s (%s) failed", operation.pk, operation.action)
+        return str(exc) or type(exc).__name__
+
+
+def _call_providers(operations: list[VPSOperation]) -> list[tuple[VPSOperation, str]]:
+    """Run every operation's provider call; pair each with its error ("" on success)."""
+    groups = defaultdict(list)
+    for operation in operations:
+        groups[operation.instance.provisioning_job.provider].append(operation)
+
+    pools, futures = [], []
+    try:
+        for name, group in groups.items():
+            try:
+                provider = get_provider(name)
+            except ValueError as exc:
+                futures += [(operation, str(exc)) for operation in group]
+                continue
+            pool = ThreadPoolExecutor(
+                max_workers=min(provider.max_concurrency, len(group)),
+                thread_name_prefix=f"power-{name}",
+            )
+            pools.append(pool)
+            futures += [(op, pool.submit(_call, provider, op)) for op in group]
+        return [
+            (operation, outcome if isinstance(outcome, str) else outcome.result())
+            for operation, outcome in futures
+        ]
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+
+
+def finish_operation(operation: VPSOperation, error: str = "") -> bool:
+    """Mark *operation* SUCCEEDED (or FAILED with *error*) and settle its instance.
+
+    Returns False if the operation had already finished.
+    """
+    return finish_operations([(operation, error)]) == 1
+
+
+def finish_operations(outcomes: list[tuple[VPSOperation, str]]) -> int:
+    """Finish each (operation, error) pair; an empty error means it succeeded.
+
+    Successes are written with one UPDATE for the operations and one per
+    action for their instances.  Failures restore each instance's previous
+    status one by one.  Operations that already finished, for example
+    expired ones, are skipped.  Returns how many operations were finished.
+    """
+    from users.summary import refresh
+
+    now = timezone.now()
+    with transaction.atomic():
+        live = set(
+            VPSOperation.objects.select_for_update()
+            .filter(pk__in=[op.pk for op, _ in outcomes], status__in=UNFINISHED)
+            .values_list("pk", flat=True)
+        )
+        outcomes = [(op, error) for op, error in outcomes if op.pk in live]
+        succeeded = defaultdict(list)
+        for operation, error in outcomes:
+            transition = TRANSITIONS[operation.action]
+            operation.status = VPSOperationStatus.FAILED if error else VPSOperationStatus.SUCCEEDED
+            operation.error_message = error
+            operation.completed_at = now
+            if not error:
+                succeeded[operation.action].append(operation)
+                continue
+            VPSOperation.objects.filter(pk=operation.pk).update(
+                status=operation.status, error_message=error, completed_at=now, updated_at=now
+            )
+            VPSInstance.objects.filter(
+                pk=operation.instance_id, status=transition.transitional
+            ).update(status=operation.previous_status, updated_at=now)
+
+        for action, operations in succeeded.items():
+            transition = TRANSITIONS[action]
+            VPSOperation.objects.filter(pk__in=[op.pk for op in operations]).update(
+                status=VPSOperationStatus.SUCCEEDED, completed_at=now, updated_at=now
+            )
+            VPSInstance.objects.filter(
+                pk__in=[op.instance_id for op in operations], status=transition.transitional
+            ).update(status=transition.result, updated_at=now)
+
+    customers = {op.instance.customer_id for op, _ in outcomes}
+    for user_id in Customer.objects.filter(pk__in=customers).values_list("user_id", flat=True):
+        refresh(user_id, "vps")
+    cache.set_many({DONE_KEY.format(pk=op.pk): op.status for op, _ in outcomes}, DONE_TTL)
+    return len(outcomes)
+
+
+def wait_for_operation(operation: VPSOperation, timeout: float) -> VPSOperation:
+    """Block up to *timeout* seconds for *operation* to finish; return it fresh."""
+    if operation.done or timeout <= 0:
+        return operation
+    key = DONE_KEY.format(pk=operation.pk)
+    deadline = time.monotonic() + timeout
+    while cache.get(key) is None and time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+    operation.refresh_from_db(
+        fields=["status", "error_message", "started_at", "completed_at", "updated_at"]
+    )
+    operation.instance.refresh_from_db(fields=["status"])
+    return operation
+
+
+def _settled(operations: list[VPSOperation]) -> set[int]:
+    """PKs of the RUNNING *operations* whose VM already shows the action's result.
+
+    Asks each provider once through ``fleet_status()``, or per instance with
+    ``status()`` when it cannot list its fleet.  A provider that errors
+    settles nothing.
+    """
+    groups = defaultdict(list)
+    for operation in operations:
+        if operation.status == VPSOperationStatus.RUNNING:
+            groups[operation.instance.provisioning_job.provider].append(operation)
+
+    settled = set()
+    for name, group in groups.items():
+        try:
+            provider = get_provider(name)
+            fleet = provider.fleet_status()
+            for operation in group:
+                instance = operation.instance
+                actual = (
+                    provider.status(instance) if fleet is None else fleet.get(instance.proxmox_vmid)
+                )
+                if actual == TRANSITIONS[operation.action].result:
+                    settled.add(operation.pk)
+        except Exception:  # noqa: BLE001
+            log.exception("Checking %d stale %s VPSOperation(s) failed", len(group), name)
+    return settled
+
+
+def expire_stale_operations(max_age: int) -> int:
+    """Finish operations left unfinished for more than *max_age* seconds.
+
+    The action may have gone through before its worker was lost or timed
+    out, so a RUNNING operation whose VM shows the expected status succeeds;
+    every other one fails.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    stale = list(
+        VPSOperation.objects.filter(status__in=UNFINISHED, created_at__lt=cutoff).select_related(
+            "instance__provisioning_job"
+        )
+    )
+    settled = _settled(stale)
+    return finish_operations(
+        [(op, "" if op.pk in settled else "Timed out waiting for a worker.") for op in stale]
+    )
@@ -1,11 +1,21 @@
-"""VPS provider abstraction and demo implementation."""
+"""VPS provider abstraction and demo implementation.
+
+Providers whose hypervisor finishes a provision within the API call return
+the result from ``provision()`` directly.  Providers backed by a long-running
+clone/boot return a ``ProvisionOperation`` instead; ``provision_vps_task``
+stores it on the ProvisioningJob and returns, and the
+``poll_provisioning_operations`` beat task polls every in-flight operation
+with ``VPSProvider.poll()`` until it succeeds or fails.
+"""
 
 from __future__ import annotations
 
 import abc
 import logging
 import random
+import time
 import uuid
+from dataclasses import asdict, dataclass, field
 
 log = logging.getLogger(__name__)
 
@@ -27,17 +37,74 @@ PLAN_SPECS: dict[str, dict] = {
 }
 
 
+class OperationState:
+    PENDING = "pending"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class ProvisionOperation:
+    """Handle for a provision the provider accepted but has not finished.
+
+    ``data`` is provider-specific (node, task ID, …) and must be JSON-serialisable:
+    the handle is stored in ``ProvisioningJob.payload["operation"]``.  ``poll()``
+    may record progress in it; the poller saves the handle after each poll.
+    """
+
+    id: str
+    data: dict = field(default_factory=dict)
+
+    def to_payload(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> ProvisionOperation:
+        return cls(id=payload["id"], data=dict(payload.get("data") or {}))
+
+
+@dataclass(frozen=True)
+class OperationStatus:
+    """Result of polling a ``ProvisionOperation``.
+
+    ``result`` is set once ``state`` is SUCCEEDED, in the same shape a
+    synchronous ``provision()`` returns; ``error`` once it is FAILED.
+    """
+
+    state: str
+    result: dict | None = None
+    error: str = ""
+
+    @property
+    def done(self) -> bool:
+        return self.state != OperationState.PENDING
+
+
 class VPSProvider(abc.ABC):
     """Abstract interface for VPS infrastructure providers."""
 
+    #: Provision calls ``orders.batch`` may have in flight at once.
+    max_concurrency = 8
+
     @abc.abstractmethod
-    def provision(self, job) -> dict:
-        """Provision a new VPS.
+    def provision(self, job) -> dict | ProvisionOperation:
+        """Provision a new VPS, or submit the provision and return its handle.
 
         Returns:
-            {"external_id": str, "ip_address": str, "vmid": int}
+            {"external_id": str, "ip_address": str, "vmid": int} when the VPS
+            is ready, otherwise a ``ProvisionOperation`` to pass to ``poll()``.
         """
 
+    def poll(self, operation: ProvisionOperation) -> OperationStatus:
+        """Return the current state of a submitted provision.
+
+        Must be cheap and safe to call from several threads at once.  Steps
+        that must not repeat are recorded in ``operation.data``, which the
+        poller saves.  Only providers that return operations from
+        ``provision()`` implement it.
+        """
+        raise NotImplementedError(f"{type(self).__name__} provisions synchronously")
+
     @abc.abstractmethod
     def start(self, instance) -> bool:
         """Start a stopped VPS instance."""
@@ -58,10 +125,21 @@ class VPSProvider(abc.ABC):
     def status(self, instance) -> str:
         """Return the current status string of the VPS instance."""
 
+    def fleet_status(self) -> dict[int, str] | None:
+        """Return the status of every VM the provider hosts, keyed by VMID.
+
+        Used by ``orders.reconcile``, so it must be one listing call (or one
+        per node) — never a call per VM.  None means the provider cannot
+        list its fleet and its instances are not reconciled.
+        """
+        return None
+
 
 class DemoProvider(VPSProvider):
     """Simulated provider for development / testing — no real infrastructure."""
 
+    max_concurrency = 32
+
     def provision(self, job) -> dict:
         external_id = str(uuid.uuid4())
         ip_address = f"10.0.{random.randint(0, 255)}.{random.randint(1, 254)}"  # noqa: S311
@@ -94,9 +172,198 @@ class DemoProvider(VPSProvider):
     def status(self, instance) -> str:
         return "running"
 
+    def fleet_status(self) -> None:
+        # Nothing is really running, so there is no state to reconcile against.
+        return None
+
+
+# Proxmox VM states → VPSInstanceStatus values
+PROXMOX_STATUSES = {"running": "running", "stopped": "stopped", "paused": "suspended"}
+# Seconds between status checks while waiting for a PVE task
+TASK_POLL_INTERVAL = 1.0
+
+
+class ProxmoxProvider(VPSProvider):
+    """Proxmox VE over its REST API, through the pooled client in orders/proxmox.py.
+
+    ``provision()`` full-clones the plan's OS template (PROXMOX_TEMPLATES) to
+    VMID ``PROXMOX_VMID_BASE + job.pk`` — deterministic, so concurrent clones
+    never race for ``/cluster/nextid`` — and returns the clone task as a
+    ``ProvisionOperation``.  ``poll()`` waits for the clone, applies the plan's
+    cores, memory and disk, boots the VM and reports success once it runs and
+    the guest agent reports an IP (or PROXMOX_GUEST_AGENT_TIMEOUT seconds of
+    uptime pass without one).
+
+    Power actions and ``terminate()`` start PVE tasks; each waits up to
+    PROXMOX_TASK_TIMEOUT seconds for its task to end with exit status "OK" and
+    raises ProxmoxError otherwise.
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from .proxmox import get_client
+
+            self._client = get_client()
+        return self._client
+
+    @property
+    def max_concurrency(self) -> int:
+        from django.conf import settings
+
+        return settings.PROXMOX_MAX_CONNECTIONS
+
+    # -- provisioning ------------------------------------------------------
+
+    def provision(self, job) -> ProvisionOperation:
+        from django.conf import settings
+
+        specs = PLAN_SPECS.get(job.payload.get("tier_key", ""), PLAN_SPECS["starter"])
+        template = settings.PROXMOX_TEMPLATES.get(specs["os_template"])
+        if template is None:
+            raise ValueError(f"No Proxmox template configured for {specs['os_template']!r}")
+        node = settings.PROXMOX_NODE
+        vmid = settings.PROXMOX_VMID_BASE + job.pk
+        upid = self.client.post(
+            f"/nodes/{node}/qemu/{template}/clone",
+            data={"newid": vmid, "name": f"vps-{job.order_id}", "full": 1},
+        )
+        log.info(
+            "ProxmoxProvider: job #%s cloning %s → %s/%s (%s)", job.pk, template, node, vmid, upid
+        )
+        return ProvisionOperation(id=upid, data={"node": node, "vmid": vmid, **specs})
+
+    def poll(self, operation: ProvisionOperation) -> OperationStatus:
+        node, vmid = operation.data["node"], operation.data["vmid"]
+        task = self.client.get(f"/nodes/{node}/tasks/{operation.id}/status")
+        if task["status"] == "running":
+            return OperationStatus(OperationState.PENDING)
+        if task.get("exitstatus") != "OK":
+            return OperationStatus(
+                OperationState.FAILED, error=f"Clone failed: {task.get('exitstatus', 'unknown')}"
+            )
+
+        vm = f"/nodes/{node}/qemu/{vmid}"
+        current = self.client.get(f"{vm}/status/current")
+        if current["status"] == "running":
+            ip_address = self._guest_ip(vm)
+            if ip_address is None:
+                from django.conf import settings
+
+                if current.get("uptime", 0) < settings.PROXMOX_GUEST_AGENT_TIMEOUT:
+                    return OperationStatus(OperationState.PENDING)  # agent still booting
+                log.warning(
+                    "ProxmoxProvider: %s/%s runs but its guest agent reports no IP", node, vmid
+                )
+            result = {"external_id": f"{node}/{vmid}", "vmid": vmid, "ip_address": ip_address}
+            return OperationStatus(OperationState.SUCCEEDED, result=result)
+
+        # Cloned but not booted yet: size it to the plan and start it.  Each
+        # write is sent once; a VM slow to report "running" is only watched.
+        if not operation.data.get("configured"):
+            self.client.put(
+                f"{vm}/config",
+                data={"cores": operation.data["cpu_cores"], "memory": operation.data["ram_mb"]},
+            )
+            self.client.put(
+                f"{vm}/resize", data={"disk": "scsi0", "size": f"{operation.data['disk_gb']}G"}
+            )
+            operation.data["configured"] = True
+        start_task = operation.data.get("start_task")
+        if start_task is None:
+            operation.data["start_task"] = self.client.post(f"{vm}/status/start")
+            return OperationStatus(OperationState.PENDING)
+        task = self.client.get(f"/nodes/{node}/tasks/{start_task}/status")
+        if task["status"] != "running" and task.get("exitstatus") != "OK":
+            return OperationStatus(
+                OperationState.FAILED, error=f"Start failed: {task.get('exitstatus', 'unknown')}"
+            )
+        return OperationStatus(OperationState.PENDING)
+
+    def _guest_ip(self, vm: str) -> str | None:
+        """First non-loopback IPv4 the QEMU guest agent reports, if it is up yet."""
+        from .proxmox import ProxmoxError
+
+        try:
+            interfaces = self.client.get(f"{vm}/agent/network-get-interfaces")["result"]
+        except ProxmoxError:
+            return None
+        for interface in interfaces:
+            for address in interface.get("ip-addresses", []):
+                ip = address.get("ip-address", "")
+                if address.get("ip-address-type") == "ipv4" and not ip.startswith("127."):
+                    return ip
+        return None
+
+    # -- power actions -----------------------------------------------------
+
+    def _vm_path(self, instance) -> str:
+        from django.conf import settings
+
+        node = settings.PROXMOX_NODE
+        external_id = instance.provisioning_job.external_id
+        if "/" in external_id:
+            node = external_id.split("/", 1)[0]
+        return f"/nodes/{node}/qemu/{instance.proxmox_vmid}"
+
+    def _wait_for_task(self, upid: str) -> None:
+        """Block until the PVE task *upid* ends; raise ProxmoxError unless it ended OK."""
+        from django.conf import settings
+
+        from .proxmox import ProxmoxError
+
+        node = upid.split(":")[1]  # UPID:<node>:<pid>:<pstart>:<starttime>:<type>:<id>:<user>:
+        deadline = time.monotonic() + settings.PROXMOX_TASK_TIMEOUT
+        while True:
+            task = self.client.get(f"/nodes/{node}/tasks/{upid}/status")
+            if task["status"] != "running":
+                break
+            if time.monotonic() >= deadline:
+                raise ProxmoxError(
+                    f"Task {upid} still running after {settings.PROXMOX_TASK_TIMEOUT}s"
+                )
+            time.sleep(TASK_POLL_INTERVAL)
+        if task.get("exitstatus") != "OK":
+            raise ProxmoxError(f"Task {upid} failed: {task.get('exitstatus', 'unknown')}")
+
+    def start(self, instance) -> bool:
+        self._wait_for_task(self.client.post(f"{self._vm_path(instance)}/status/start"))
+        return True
+
+    def stop(self, instance) -> bool:
+        self._wait_for_task(self.client.post(f"{self._vm_path(instance)}/status/shutdown"))
+        return True
+
+    def restart(self, instance) -> bool:
+        self._wait_for_task(self.client.post(f"{self._vm_path(instance)}/status/reboot"))
+        return True
+
+    def terminate(self, instance) -> bool:
+        vm = self._vm_path(instance)
+        self._wait_for_task(self.client.post(f"{vm}/status/stop"))
+        self._wait_for_task(self.client.delete(vm, params={"purge": 1}))
+        return True
+
+    def status(self, instance) -> str:
+        state = self.client.get(f"{self._vm_path(instance)}/status/current")["status"]
+        return PROXMOX_STATUSES.get(state, "error")
+
+    def fleet_status(self) -> dict[int, str]:
+        """Every VM on every node, from one ``/cluster/resources`` call."""
+        resources = self.client.get("/cluster/resources", params={"type": "vm"})
+        return {
+            int(vm["vmid"]): PROXMOX_STATUSES.get(vm.get("status", ""), "error")
+            for vm in resources
+            if not vm.get("template")
+        }
+
 
 _PROVIDERS: dict[str, type[VPSProvider]] = {
     "demo": DemoProvider,
+    "proxmox": ProxmoxProvider,
 }
 
 
@@ -104,7 +371,7 @@ def get_provider(name: str = "demo") -> VPSProvider:
     """Factory: return a VPSProvider instance by name.
 
     Args:
-        name: Provider key (currently only "demo" is available).
+        name: Provider key ("demo" or "proxmox").
 
     Raises:
         ValueError: If the provider name is unknown.
@@ -0,0 +1,225 @@
+"""Pooled HTTP client for the Proxmox VE REST API.
+
+Every provider call used to be free to open its own connection, paying TCP
+and TLS setup on each power action and status poll.  ``get_client()``
+returns one ``ProxmoxClient`` per process, shared by every
+``ProxmoxProvider`` and by the provisioning/polling thread pools:
+
+  - one ``httpx.Client`` with keep-alive connections (PROXMOX_MAX_CONNECTIONS),
+    and HTTP/2 when PROXMOX_HTTP2 is set (needs the ``httpx[http2]`` extra);
+  - API-token auth when PROXMOX_TOKEN_ID is set, otherwise a PVE auth ticket
+    from PROXMOX_USERNAME/PASSWORD, reused until it nears its two-hour
+    expiry and renewed once on a 401;
+  - a PROXMOX_TIMEOUT default per call, overridable with ``timeout=``;
+  - up to PROXMOX_MAX_RETRIES retries with exponential backoff and full
+    jitter.  GET and HEAD are retried on transport errors and 5xx responses;
+    every other method (PUT and DELETE included) only when the connection
+    failed before the request was sent, so a clone, resize or destroy is
+    never issued twice.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+
+import httpx
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+TICKET_LIFETIME = 2 * 60 * 60
+TICKET_RENEW_MARGIN = 15 * 60
+RETRY_STATUSES = frozenset({502, 503, 504})
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+
+class ProxmoxError(Exception):
+    """A Proxmox API call failed after any retries."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ProxmoxClient:
+    """Thread-safe client for one Proxmox VE cluster."""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        token_id: str = "",
+        token_secret: str = "",
+        username: str = "",
+        password: str = "",
+        verify: bool = True,
+        http2: bool = False,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.25,
+        max_connections: int = 20,
+    ):
+        self.token_id = token_id
+        self.token_secret = token_secret
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._ticket: tuple[str, str, float] | None = None  # (ticket, csrf, issued_at)
+        self._ticket_lock = threading.Lock()
+        self._http = httpx.Client(
+            base_url=f"{base_url.rstrip('/')}/api2/json",
+            verify=verify,
+            http2=http2,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+        )
+
+    def close(self) -> None:
+        self._http.close()
+
+    # ------------------------------------------------------------------
+    # Auth
+    # ------------------------------------------------------------------
+
+    def _auth_headers(self, method: str) -> dict[str, str]:
+        if self.token_id:
+            return {"Authorization": f"PVEAPIToken={self.token_id}={self.token_secret}"}
+        ticket, csrf = self._get_ticket()
+        headers = {"Cookie": f"PVEAuthCookie={ticket}"}
+        if method != "GET":
+            headers["CSRFPreventionToken"] = csrf
+        return headers
+
+    def _get_ticket(self) -> tuple[str, str]:
+        with self._ticket_lock:
+            now = time.monotonic()
+            if (
+                self._ticket is None
+                or now - self._ticket[2] > TICKET_LIFETIME - TICKET_RENEW_MARGIN
+            ):
+                data = self._send(
+                    "POST",
+                    "/access/ticket",
+                    data={"username": self.username, "password": self.password},
+                    authenticate=False,
+                )
+                self._ticket = (data["ticket"], data["CSRFPreventionToken"], now)
+            return self._ticket[:2]
+
+    def _drop_ticket(self) -> None:
+        with self._ticket_lock:
+            self._ticket = None
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def get(self, path: str, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def request(self, method: str, path: str, *, data=None, params=None, timeout=None):
+        """Send an authenticated request and return the response's ``data`` member."""
+        try:
+            return self._send(method, path, data=data, params=params, timeout=timeout)
+        except ProxmoxError as exc:
+            if exc.status_code != 401 or self.token_id:
+                raise
+        # The ticket expired or was revoked server-side — renew it once.
+        self._drop_ticket()
+        return self._send(method, path, data=data, params=params, timeout=timeout)
+
+    def _send(self, method, path, *, data=None, params=None, timeout=None, authenticate=True):
+        retry_reads = method in READ_METHODS
+        attempt = 0
+        while True:
+            headers = self._auth_headers(method) if authenticate else {}
+            try:
+                response = self._http.request(
+                    method,
+                    path,
+                    data=data,
+                    params=params,
+                    headers=headers,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as exc:
+                error = exc  # never reached the server: safe to retry any method
+            except httpx.TransportError as exc:
+                if not retry_reads or attempt >= self.max_retries:
+                    raise ProxmoxError(f"{method} {path}: {exc}") from exc
+                error = exc
+            else:
+                if response.status_code in RETRY_STATUSES and retry_reads:
+                    error = ProxmoxError(
+                        f"{method} {path}: HTTP {response.status_code}", response.status_code
+                    )
+                elif response.is_error:
+                    raise ProxmoxError(
+                        f"{method} {path}: HTTP {response.status_code} {response.text[:200]}",
+                        response.status_code,
+                    )
+                else:
+                    return response.json().get("data")
+
+            if attempt >= self.max_retries:
+                if isinstance(error, ProxmoxError):
+                    raise error
+                raise ProxmoxError(f"{method} {path}: {error}") from error
+            attempt += 1
+            delay = random.uniform(0, self.retry_backoff * 2**attempt)  # noqa: S311
+            log.warning(
+                "Proxmox %s %s failed (%s); retry %d in %.2fs", method, path, error, attempt, delay
+            )
+            time.sleep(delay)
+
+
+_client: ProxmoxClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ProxmoxClient:
+    """The process-wide client for the PROXMOX_* settings."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not settings.PROXMOX_URL:
+                raise ProxmoxError("PROXMOX_URL is not configured")
+            _client = ProxmoxClient(
+                settings.PROXMOX_URL,
+                token_id=settings.PROXMOX_TOKEN_ID,
+                token_secret=settings.PROXMOX_TOKEN_SECRET,
+                username=settings.PROXMOX_USERNAME,
+                password=settings.PROXMOX_PASSWORD,
+                verify=settings.PROXMOX_VERIFY_TLS,
+                http2=settings.PROXMOX_HTTP2,
+                timeout=settings.PROXMOX_TIMEOUT,
+                max_retries=settings.PROXMOX_MAX_RETRIES,
+                retry_backoff=settings.PROXMOX_RETRY_BACKOFF,
+                max_connections=settings.PROXMOX_MAX_CONNECTIONS,
+            )
+        return _client
+
+
+def reset_client() -> None:
+    """Close and forget the shared client (settings changed, or tests)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
@@ -0,0 +1,142 @@
+"""Chunked pruning of old PaymentEvent rows.
+
+``QuerySet.delete()`` hands the whole match to Django's deletion collector,
+which may load every row (payload JSON included) and deletes them in one long
+transaction.  The pruner instead walks the table in primary-key order:
+
+  1. select the next *batch_size* matching IDs above the last processed ID
+     (keyset pagination — no OFFSET, no payloads read),
+  2. optionally archive those rows to a gzip-compressed JSONL file,
+  3. delete them with ``filter(pk__in=ids).delete()`` — PaymentEvent has no
+     cascades or delete signals, so Django issues one ``DELETE … WHERE id IN (…)``,
+  4. record the last ID in the default cache and sleep before the next batch.
+
+The cursor lets a run that hits its time budget (or is killed) resume where it
+stopped.  It is cleared once the scan reaches the end of the table, so the next
+scheduled run starts from the beginning again.  The cursor is keyed by a hash
+of the queryset's SQL and parameters: an ID saved while pruning with one
+cutoff says nothing about the rows another cutoff matches, so a run with a
+different filter starts from the beginning instead of skipping rows.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import PaymentEvent
+
+log = logging.getLogger(__name__)
+
+CURSOR_CACHE_PREFIX = "prune:payment_events"
+CURSOR_TTL = 60 * 60 * 24 * 14
+
+ARCHIVE_FIELDS = (
+    "id",
+    "stripe_event_id",
+    "event_type",
+    "status",
+    "error_message",
+    "received_at",
+    "stripe_created_at",
+    "processed_at",
+    "payload",
+)
+
+
+def cursor_key(queryset) -> str:
+    """Cache key of the resume cursor for *queryset*'s filter."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.sha256(f"{sql}|{params!r}".encode()).hexdigest()[:16]
+    return f"{CURSOR_CACHE_PREFIX}:{digest}:last_pk"
+
+
+@dataclass
+class PruneResult:
+    deleted: int = 0
+    batches: int = 0
+    archived_files: int = 0
+    complete: bool = False
+
+
+def prune_payment_events(
+    queryset,
+    batch_size: int = 1000,
+    sleep_seconds: float = 0.0,
+    archive_dir: str = "",
+    time_budget: float | None = None,
+) -> PruneResult:
+    """Delete the rows of *queryset* in ID-ordered batches.
+
+    Stops early (``complete=False``) once *time_budget* seconds have elapsed;
+    calling again with the same filter (including the same cutoff) resumes
+    after the last deleted ID.
+    """
+    result = PruneResult()
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    key = cursor_key(queryset)
+    last_pk = cache.get(key, 0)
+
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            cache.delete(key)
+            result.complete = True
+            return result
+
+        if archive_dir:
+            archive_batch(ids, archive_dir)
+            result.archived_files += 1
+
+        deleted, _ = PaymentEvent.objects.filter(pk__in=ids).delete()
+        result.deleted += deleted
+        result.batches += 1
+        last_pk = ids[-1]
+        cache.set(key, last_pk, CURSOR_TTL)
+        log.debug("Pruned %d payment events up to id %d", len(ids), last_pk)
+
+        if len(ids) < batch_size:
+            cache.delete(key)
+            result.complete = True
+            return result
+        if deadline is not None and time.monotonic() >= deadline:
+            return result
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+
+
+def archive_batch(ids: list[int], archive_dir: str) -> Path:
+    """Write the rows in *ids* to ``payment_events-<first>-<last>.jsonl.gz``.
+
+    The file is written under a temporary name, fsynced and renamed, so a
+    batch is only deleted once its archive is complete on disk.
+    """
+    directory = Path(archive_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"payment_events-{ids[0]:012d}-{ids[-1]:012d}.jsonl.gz"
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    rows = PaymentEvent.objects.filter(pk__in=ids).order_by("pk").values(*ARCHIVE_FIELDS)
+    try:
+        with open(tmp_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for row in rows.iterator(chunk_size=500):
+                gz.write(json.dumps(row, cls=DjangoJSONEncoder).encode() + b"\n")
+            gz.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,187 @@
+"""Fleet status reconciliation — keep VPSInstance.status in step with the provider.
+
+Power actions, host failures and out-of-band changes made on the hypervisor
+all move a VM without touching its VPSInstance row, so the status shown to
+customers drifts.  ``reconcile_fleet()`` repairs it in bulk:
+
+  1. one ``provider.fleet_status()`` call per provider lists every VM it
+     hosts (a provider that cannot list its fleet — the demo one — is
+     skipped);
+  2. the provider's RUNNING/STOPPED/SUSPENDED/ERROR instances are read in
+     primary-key chunks of FLEET_RECONCILE_CHUNK_SIZE (five columns, no
+     model instances) and diffed against that listing;
+  3. the changes in each chunk are applied with one UPDATE per
+     (old status → new status) transition.  Each UPDATE is conditional on
+     the old status and on ``updated_at`` predating the listing, so a row a
+     power action settled after the provider was listed keeps its newer
+     status instead of being reverted to the stale one, and instances in
+     PROVISIONING or TERMINATED are never touched.
+
+Anomalies are counted rather than acted on: instances whose VMID the
+provider does not list (``missing``), instances with no VMID at all
+(``unmapped``) and VMs the provider lists that no instance claims
+(``unmanaged`` — leaked VMs, or clones still being provisioned).  The last
+run's ``ReconcileResult`` is kept in the cache under METRICS_KEY and served
+by ``/api/health/fleet/``.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import VPSInstance, VPSInstanceStatus
+from .provisioning import get_provider
+
+log = logging.getLogger(__name__)
+
+METRICS_KEY = "fleet:reconcile:last"
+RECONCILED_STATUSES = (
+    VPSInstanceStatus.RUNNING,
+    VPSInstanceStatus.STOPPED,
+    VPSInstanceStatus.SUSPENDED,
+    VPSInstanceStatus.ERROR,
+)
+SAMPLE_SIZE = 20
+
+
+@dataclass
+class ReconcileResult:
+    checked: int = 0
+    changed: int = 0
+    missing: int = 0
+    unmapped: int = 0
+    unmanaged: int = 0
+    transitions: Counter = field(default_factory=Counter)  # "running->stopped": n
+    skipped_providers: list[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    def as_metrics(self) -> dict:
+        return {
+            **asdict(self),
+            "transitions": dict(self.transitions),
+            "finished_at": timezone.now().isoformat(),
+        }
+
+
+def _chunks(provider_name: str, chunk_size: int):
+    """Yield the provider's reconciled instances in primary-key order, a chunk at a time.
+
+    Each row is (pk, status, vmid, user_id, updated_at).
+    """
+    instances = VPSInstance.objects.filter(
+        provisioning_job__provider=provider_name, status__in=RECONCILED_STATUSES
+    ).order_by("pk")
+    last_pk = 0
+    while True:
+        chunk = list(
+            instances.filter(pk__gt=last_pk).values_list(
+                "pk", "status", "proxmox_vmid", "customer__user_id", "updated_at"
+            )[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+def _reconcile_provider(name, observed, listed_at, chunk_size, result, users) -> None:
+    """Diff *name*'s instances against *observed*, its fleet as listed at *listed_at*."""
+    seen, missing = set(), []
+    now = timezone.now()
+    for chunk in _chunks(name, chunk_size):
+        changes = defaultdict(list)
+        for pk, status, vmid, user_id, updated_at in chunk:
+            if vmid is None:
+                result.unmapped += 1
+                continue
+            seen.add(vmid)
+            if updated_at >= listed_at:
+                continue  # changed since the listing, which may predate the change
+            actual = observed.get(vmid)
+            if actual is None:
+                missing.append(pk)
+            elif actual != status:
+                changes[status, actual].append((pk, user_id))
+        result.checked += len(chunk)
+
+        for (old, new), rows in changes.items():
+            updated = VPSInstance.objects.filter(
+                pk__in=[pk for pk, _ in rows], status=old, updated_at__lt=listed_at
+            ).update(status=new, updated_at=now)
+            result.changed += updated
+            result.transitions[f"{old}->{new}"] += updated
+            users.update(user_id for _, user_id in rows)
+
+    result.missing += len(missing)
+    if missing:
+        log.warning(
+            "Fleet reconcile: %d %s instance(s) not listed by the provider, e.g. %s",
+            len(missing),
+            name,
+            missing[:SAMPLE_SIZE],
+        )
+
+    unseen = observed.keys() - seen
+    if unseen:
+        # Instances in PROVISIONING/TERMINATED still own their VMIDs.
+        unseen -= set(
+            VPSInstance.objects.filter(proxmox_vmid__in=unseen).values_list(
+                "proxmox_vmid", flat=True
+            )
+        )
+    result.unmanaged += len(unseen)
+    if unseen:
+        log.warning(
+            "Fleet reconcile: %d VM(s) on %s with no VPSInstance, e.g. %s",
+            len(unseen),
+            name,
+            sorted(unseen)[:SAMPLE_SIZE],
+        )
+
+
+def reconcile_fleet(chunk_size: int | None = None) -> ReconcileResult:
+    """Sync the status of every provisioned VPSInstance from its provider."""
+    from users.summary import refresh
+
+    chunk_size = chunk_size or settings.FLEET_RECONCILE_CHUNK_SIZE
+    started = time.monotonic()
+    result = ReconcileResult()
+    users: set[int] = set()
+
+    names = (
+        VPSInstance.objects.filter(status__in=RECONCILED_STATUSES)
+        .order_by()
+        .values_list("provisioning_job__provider", flat=True)
+        .distinct()
+    )
+    for name in sorted(names):
+        listed_at = timezone.now()
+        try:
+            observed = get_provider(name).fleet_status()
+        except Exception:  # noqa: BLE001
+            log.exception("Fleet reconcile: listing %s failed", name)
+            observed = None
+        if observed is None:
+            result.skipped_providers.append(name)
+            continue
+        _reconcile_provider(name, observed, listed_at, chunk_size, result, users)
+
+    # QuerySet.update() bypasses the dashboard summary signals
+    for user_id in users:
+        refresh(user_id, "vps")
+
+    result.duration = round(time.monotonic() - started, 3)
+    cache.set(METRICS_KEY, result.as_metrics(), timeout=None)
+    return result
+
+
+def last_metrics() -> dict | None:
+    """Metrics of the most recent ``reconcile_fleet()`` run, if any."""
+    return cache.get(METRICS_KEY)
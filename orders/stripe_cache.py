@@ -0,0 +1,72 @@
+"""Read-through cache for Stripe API objects, fed from webhook payloads.
+
+Every webhook carries a full snapshot of the object it concerns, so a
+``customer.subscription.created`` delivered a moment before
+``checkout.session.completed`` already holds what ``_handle_checkout_completed``
+would otherwise fetch with a blocking ``stripe.Subscription.retrieve``.
+
+Entries are keyed by object type and ID and stamped with the event's
+``created`` time.  An older snapshot never overwrites a newer one, because
+Stripe does not guarantee delivery order.  TTL is STRIPE_OBJECT_CACHE_TTL seconds.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
+
+CACHED_OBJECT_TYPES = frozenset({"subscription"})
+
+
+def _key(object_type: str, object_id: str) -> str:
+    return f"stripe:obj:{object_type}:{object_id}"
+
+
+def remember(obj, created: int | None = None) -> bool:
+    """Cache a Stripe object snapshot unless a newer one is already cached.
+
+    Returns True if the snapshot was stored.
+    """
+    object_type = obj.get("object", "")
+    object_id = obj.get("id", "")
+    if object_type not in CACHED_OBJECT_TYPES or not object_id:
+        return False
+
+    created = int(created if created is not None else time.time())
+    key = _key(object_type, object_id)
+    current = cache.get(key)
+    if current and current["created"] > created:
+        return False
+
+    snapshot = json.loads(json.dumps(obj, default=str))
+    cache.set(key, {"created": created, "object": snapshot}, settings.STRIPE_OBJECT_CACHE_TTL)
+    return True
+
+
+def remember_event(event) -> bool:
+    """Cache the object embedded in a webhook event, stamped with ``event.created``."""
+    obj = event.get("data", {}).get("object") or {}
+    return remember(obj, event.get("created"))
+
+
+def get_cached(object_type: str, object_id: str) -> dict | None:
+    entry = cache.get(_key(object_type, object_id))
+    return entry["object"] if entry else None
+
+
+def retrieve_subscription(subscription_id: str):
+    """Return a subscription from the cache, falling back to the Stripe API on a miss."""
+    cached = get_cached("subscription", subscription_id)
+    if cached is not None:
+        return cached
+
+    subscription = stripe.Subscription.retrieve(subscription_id)
+    remember(subscription)
+    return subscription
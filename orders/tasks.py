@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import logging
+from collections import Counter
+from datetime import timedelta
 
 from celery import shared_task
 from django.contrib.auth import get_user_model
@@ -31,19 +33,20 @@ def process_stripe_event(payment_event_id: int) -> None:
         log.warning("PaymentEvent %s disappeared before processing", payment_event_id)
         return
 
-    # Guard: skip if already processed/failed (prevents double-processing on retry)
-    if payment_event.status in (EventStatus.PROCESSED, EventStatus.SKIPPED):
-        log.info("PaymentEvent %s already %s — skipping", payment_event_id, payment_event.status)
-        return
-
     if payment_event.event_type not in HANDLED_EVENTS:
-        payment_event.status = EventStatus.SKIPPED
-        payment_event.processed_at = timezone.now()
-        payment_event.save(update_fields=["status", "processed_at"])
+        PaymentEvent.objects.filter(
+            pk=payment_event_id, status__in=[EventStatus.RECEIVED, EventStatus.FAILED]
+        ).update(status=EventStatus.SKIPPED, processed_at=timezone.now())
         return
 
-    payment_event.status = EventStatus.PROCESSING
-    payment_event.save(update_fields=["status"])
+    # Claim with a conditional UPDATE: a drain or flush batch may be claiming the
+    # same row, and the handlers are not idempotent.
+    claimed = PaymentEvent.objects.filter(
+        pk=payment_event_id, status__in=[EventStatus.RECEIVED, EventStatus.FAILED]
+    ).update(status=EventStatus.PROCESSING, claimed_at=timezone.now())
+    if not claimed:
+        log.info("PaymentEvent %s already claimed or finished — skipping", payment_event_id)
+        return
 
     try:
         handle_event(payment_event.payload)
@@ -59,6 +62,99 @@ def process_stripe_event(payment_event_id: int) -> None:
         raise
 
 
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=240,
+    time_limit=300,
+)
+def process_stripe_events(
+    payment_event_ids: list[int] | None = None,
+    limit: int = 100,
+    min_age_seconds: int = 0,
+) -> int:
+    """Claim and process up to *limit* PaymentEvents in one invocation.
+
+    With ``payment_event_ids`` (one buffered-ingest flush) only those events are
+    claimed; without, the oldest RECEIVED events received at least
+    *min_age_seconds* ago are claimed so several workers can drain a backlog in
+    parallel.  Claiming uses ``SELECT ... FOR UPDATE SKIP
+    LOCKED`` plus one bulk UPDATE, so concurrent batches never pick the same row.
+
+    Events are dispatched one at a time in Stripe ``created`` order
+    (``stripe_created_at``, then pk), so a shard applies each customer's events
+    in the order Stripe produced them.  Every claimed event is attempted; if
+    any fail the task raises.  An ID batch re-claims its FAILED events on autoretry; a
+    backlog-mode retry only claims RECEIVED rows, so its failures stay FAILED
+    for inspection.  Rows left PROCESSING by a lost worker are failed by
+    ``drain_payment_events``.
+
+    Returns the number of events processed successfully.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import EventStatus
+
+    claimable = [EventStatus.RECEIVED]
+    if payment_event_ids is not None:
+        if not payment_event_ids:
+            return 0
+        claimable.append(EventStatus.FAILED)
+        limit = max(limit, len(payment_event_ids))
+
+    with transaction.atomic():
+        qs = PaymentEvent.objects.select_for_update(skip_locked=True).filter(status__in=claimable)
+        if payment_event_ids is not None:
+            qs = qs.filter(pk__in=payment_event_ids)
+        if min_age_seconds:
+            qs = qs.filter(received_at__lte=timezone.now() - timedelta(seconds=min_age_seconds))
+        events = list(qs.order_by("received_at", "pk")[:limit])
+
+        handled = [e for e in events if e.event_type in HANDLED_EVENTS]
+        skipped_ids = [e.pk for e in events if e.event_type not in HANDLED_EVENTS]
+        if handled:
+            PaymentEvent.objects.filter(pk__in=[e.pk for e in handled]).update(
+                status=EventStatus.PROCESSING, claimed_at=timezone.now()
+            )
+        if skipped_ids:
+            PaymentEvent.objects.filter(pk__in=skipped_ids).update(
+                status=EventStatus.SKIPPED, processed_at=timezone.now()
+            )
+
+    processed_ids: list[int] = []
+    failed: list[PaymentEvent] = []
+    for event in sorted(handled, key=lambda e: (e.stripe_created_at, e.pk)):
+        try:
+            handle_event(event.payload)
+        except Exception as exc:  # noqa: BLE001
+            log.exception("Batch webhook handler failed for event %s", event.stripe_event_id)
+            event.status = EventStatus.FAILED
+            event.error_message = str(exc)[:2000]
+            event.processed_at = timezone.now()
+            failed.append(event)
+        else:
+            processed_ids.append(event.pk)
+
+    if processed_ids:
+        PaymentEvent.objects.filter(pk__in=processed_ids).update(
+            status=EventStatus.PROCESSED, processed_at=timezone.now()
+        )
+    if failed:
+        PaymentEvent.objects.bulk_update(failed, ["status", "error_message", "processed_at"])
+        raise RuntimeError(f"{len(failed)} of {len(handled)} events failed")
+
+    log.info(
+        "process_stripe_events: %d processed, %d skipped (%s)",
+        len(processed_ids),
+        len(skipped_ids),
+        ", ".join(f"{t}={n}" for t, n in Counter(e.event_type for e in handled).items())
+        or "no handled events",
+    )
+    return len(processed_ids)
+
+
 @shared_task(
     autoretry_for=(Exception,),
     retry_backoff=True,
@@ -180,79 +276,194 @@ def send_payment_failed_email_task(user_id: int, amount: str, currency: str) ->
     time_limit=300,
 )
 def provision_vps_task(provisioning_job_id: int) -> None:
-    """Process a queued ProvisioningJob: call provider and create VPSInstance."""
+    """Process a queued ProvisioningJob: submit it to the provider.
+
+    A provider that finishes within the call gets its VPSInstance created
+    here.  One that returns a ``ProvisionOperation`` has the handle stored on
+    the job, which stays PROVISIONING until ``poll_provisioning_operations``
+    sees the operation finish — the worker slot is released immediately.
+    """
     from django.utils import timezone
 
-    from .models import (
-        ProvisioningJob,
-        ProvisioningStatus,
-        VPSInstance,
-        VPSInstanceStatus,
-    )
-    from .provisioning import PLAN_SPECS, get_provider
+    from .models import ProvisioningJob, ProvisioningStatus
+    from .provisioning import ProvisionOperation, get_provider
 
     try:
-        job = ProvisioningJob.objects.select_related(
-            "order__customer__user",
-            "order__service_plan",
-        ).get(pk=provisioning_job_id)
+        job = ProvisioningJob.objects.select_related("order__customer__user").get(
+            pk=provisioning_job_id
+        )
     except ProvisioningJob.DoesNotExist:
         log.warning("ProvisioningJob %s not found", provisioning_job_id)
         return
 
-    # Guard: don't re-process finished jobs
+    # Guard: don't re-process finished or already submitted jobs
     if job.status in (ProvisioningStatus.READY, ProvisioningStatus.FAILED):
         log.info("ProvisioningJob %s already %s — skipping", provisioning_job_id, job.status)
         return
+    if "operation" in job.payload:
+        log.info("ProvisioningJob %s already submitted — skipping", provisioning_job_id)
+        return
 
     # Mark as provisioning
     job.status = ProvisioningStatus.PROVISIONING
     job.started_at = timezone.now()
     job.save(update_fields=["status", "started_at"])
 
+    try:
+        result = get_provider(job.provider).provision(job)
+    except Exception as exc:
+        fail_provisioning(job, str(exc))
+        log.exception("ProvisioningJob %s failed", provisioning_job_id)
+        raise
+
+    if isinstance(result, ProvisionOperation):
+        job.payload = {**job.payload, "operation": result.to_payload()}
+        job.save(update_fields=["payload", "updated_at"])
+        log.info("ProvisioningJob %s submitted as operation %s", provisioning_job_id, result.id)
+        return
+
+    complete_provisioning(job, result)
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=240,
+    time_limit=300,
+)
+def provision_batch_task(job_ids: list[int] | None = None) -> int:
+    """Submit every queued ProvisioningJob (or just *job_ids*) as one batch.
+
+    Scheduled by ``orders.batch.schedule_batch``.  Returns the number of
+    jobs claimed.
+    """
+    from django.core.cache import cache
+
+    from .batch import SCHEDULED_KEY, provision_batch
+
+    if job_ids is None:
+        # Let the next checkout schedule a fresh batch; anything it queues
+        # before the claim below is picked up by this one.
+        cache.delete(SCHEDULED_KEY)
+    return provision_batch(job_ids=job_ids).claimed
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=90,
+    time_limit=120,
+)
+def vps_power_action_task(operation_id: int) -> str | None:
+    """Run a queued VPS power action (see ``orders.power``).
+
+    The operation is claimed before the provider is called, so a retry or a
+    duplicate delivery never repeats the action.  Returns the operation's
+    final status, or None if it had already been claimed.
+    """
+    from .power import run_power_action
+
+    operation = run_power_action(operation_id)
+    return operation.status if operation else None
+
+
+# orders.power.bulk_chunk_size() sizes each batch to finish within this.
+BULK_POWER_SOFT_TIME_LIMIT = 240
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    soft_time_limit=BULK_POWER_SOFT_TIME_LIMIT,
+    time_limit=BULK_POWER_SOFT_TIME_LIMIT + 60,
+)
+def vps_bulk_power_action_task(operation_ids: list[int]) -> int:
+    """Run a batch of queued VPS power actions concurrently (see ``orders.power``).
+
+    Queued by ``request_bulk_power_action``, at most ``bulk_chunk_size()``
+    operations per message.  Returns the number of operations this run
+    claimed.
+    """
+    from .power import run_power_actions
+
+    return len(run_power_actions(operation_ids))
+
+
+def build_vps_instance(job, result: dict):
+    """An unsaved VPSInstance for *job* from a provider's provision *result*."""
+    from services.catalog import get_plan_by_id
+
+    from .models import VPSInstance, VPSInstanceStatus
+    from .provisioning import PLAN_SPECS
+
     order = job.order
-    plan = order.service_plan
+    plan = get_plan_by_id(order.service_plan_id)
     tier_key = plan.tier_key if plan else ""
     specs = PLAN_SPECS.get(tier_key, PLAN_SPECS["starter"])
-    hostname = f"vps-{order.pk}-{plan.slug}.ez-solutions.dev"
+    return VPSInstance(
+        provisioning_job=job,
+        customer=order.customer,
+        subscription=order.subscription,
+        hostname=f"vps-{order.pk}-{plan.slug}.ez-solutions.dev",
+        ip_address=result.get("ip_address") or None,
+        proxmox_vmid=result.get("vmid"),
+        os_template=specs["os_template"],
+        cpu_cores=specs["cpu_cores"],
+        ram_mb=specs["ram_mb"],
+        disk_gb=specs["disk_gb"],
+        status=VPSInstanceStatus.RUNNING,
+    )
 
-    try:
-        provider = get_provider(job.provider)
-        result = provider.provision(job)
-
-        # Create VPSInstance
-        VPSInstance.objects.create(
-            provisioning_job=job,
-            customer=order.customer,
-            subscription=order.subscription,
-            hostname=hostname,
-            ip_address=result.get("ip_address", ""),
-            proxmox_vmid=result.get("vmid"),
-            os_template=specs["os_template"],
-            cpu_cores=specs["cpu_cores"],
-            ram_mb=specs["ram_mb"],
-            disk_gb=specs["disk_gb"],
-            status=VPSInstanceStatus.RUNNING,
+
+def complete_provisioning(job, result: dict) -> bool:
+    """Create the VPSInstance for a provisioned *job* and mark the job READY.
+
+    The job is claimed with a conditional UPDATE first, so two pollers seeing
+    the same finished operation create one instance.  Returns False when the
+    job was no longer PROVISIONING.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import ProvisioningJob, ProvisioningStatus
+
+    instance = build_vps_instance(job, result)
+    job.external_id = result.get("external_id", "")
+    job.status = ProvisioningStatus.READY
+    job.completed_at = timezone.now()
+    with transaction.atomic():
+        claimed = ProvisioningJob.objects.filter(
+            pk=job.pk, status=ProvisioningStatus.PROVISIONING
+        ).update(
+            status=job.status,
+            external_id=job.external_id,
+            completed_at=job.completed_at,
+            updated_at=job.completed_at,
         )
+        if not claimed:
+            return False
+        instance.save()
 
-        # Mark job complete
-        job.external_id = result.get("external_id", "")
-        job.status = ProvisioningStatus.READY
-        job.completed_at = timezone.now()
-        job.save(update_fields=["status", "external_id", "completed_at"])
+    # Notify user
+    _queue_vps_ready_notification(job.order.customer.user.pk, instance.hostname)
+    log.info("ProvisioningJob %s completed — %s", job.pk, instance.hostname)
+    return True
 
-        # Notify user
-        _queue_vps_ready_notification(order.customer.user.pk, hostname)
-        log.info("ProvisioningJob %s completed — %s", provisioning_job_id, hostname)
 
-    except Exception as exc:
-        job.status = ProvisioningStatus.FAILED
-        job.error_message = str(exc)[:2000]
-        job.completed_at = timezone.now()
-        job.save(update_fields=["status", "error_message", "completed_at"])
-        log.exception("ProvisioningJob %s failed", provisioning_job_id)
-        _queue_vps_failed_notification(provisioning_job_id, str(exc)[:500])
-        raise
+def fail_provisioning(job, error: str) -> None:
+    """Mark *job* FAILED with *error* and alert the admins."""
+    from django.utils import timezone
+
+    from .models import ProvisioningStatus
+
+    job.status = ProvisioningStatus.FAILED
+    job.error_message = error[:2000]
+    job.completed_at = timezone.now()
+    job.save(update_fields=["status", "error_message", "completed_at", "updated_at"])
+    _queue_vps_failed_notification(job.pk, error[:500])
 
 
 def _queue_vps_ready_notification(user_id: int, hostname: str) -> None:
@@ -4,25 +4,29 @@ import stripe
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.db import IntegrityError, transaction
-from django.http import HttpResponse, HttpResponseBadRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
-from services.models import ServicePlan
+from config.pagination import paginate
+from services.catalog import get_plan_by_slug
 
+from .billing_context import get_billing_context
+from .billing_context import invalidate as invalidate_billing_context
+from .ingest import event_created_at, ingest_event
 from .models import (
     Customer,
     Order,
     PaymentEvent,
-    SubscriptionStatus,
     VPSInstance,
     VPSInstanceStatus,
 )
-from .provisioning import get_provider
+from .power import TRANSITIONS, PowerActionError, request_power_action
+from .sharding import route_for_event
+from .stripe_cache import remember_event
 from .tasks import process_stripe_event
 from .webhooks import HANDLED_EVENTS, handle_event
 
@@ -37,19 +41,6 @@ log = logging.getLogger(__name__)
 @login_required
 def billing(request):
     """Show the user's current subscription status."""
-    subscription = None
-    try:
-        customer = request.user.stripe_customer
-        subscription = customer.subscriptions.filter(
-            status__in=[
-                SubscriptionStatus.ACTIVE,
-                SubscriptionStatus.TRIALING,
-                SubscriptionStatus.PAST_DUE,
-            ]
-        ).first()
-    except Customer.DoesNotExist:
-        pass
-
     if request.GET.get("checkout") == "success":
         messages.success(
             request,
@@ -57,6 +48,7 @@ def billing(request):
         )
         return redirect("orders:billing")
 
+    subscription = get_billing_context(request).subscription
     return render(request, "orders/billing.html", {"subscription": subscription})
 
 
@@ -64,14 +56,11 @@ def billing(request):
 def order_history(request):
     """Show the user's order history, paginated."""
     orders = Order.objects.none()
-    try:
-        customer = request.user.stripe_customer
-        orders = customer.orders.select_related("service_plan").order_by("-created_at")
-    except Customer.DoesNotExist:
-        pass
+    customer = get_billing_context(request).customer
+    if customer is not None:
+        orders = customer.orders.select_related("service_plan")
 
-    paginator = Paginator(orders, 15)
-    page = paginator.get_page(request.GET.get("page"))
+    page = paginate(request, orders, 15)
 
     return render(request, "orders/order_history.html", {"orders": page})
 
@@ -80,7 +69,9 @@ def order_history(request):
 @require_POST
 def create_checkout_session(request, plan_slug):
     """Start a Stripe Checkout session for the given plan."""
-    plan = get_object_or_404(ServicePlan, slug=plan_slug, is_active=True)
+    plan = get_plan_by_slug(plan_slug)
+    if plan is None or not plan.is_active:
+        raise Http404("No active plan matches the given slug.")
 
     if not plan.stripe_price_id_monthly:
         messages.error(request, "This plan is not yet available for purchase. Please contact us.")
@@ -96,6 +87,7 @@ def create_checkout_session(request, plan_slug):
                 user=request.user,
                 stripe_customer_id=stripe_id,
             )
+        invalidate_billing_context(request.user.pk)
 
     success_url = request.build_absolute_uri(reverse("orders:billing")) + "?checkout=success"
     cancel_url = request.build_absolute_uri(reverse("services:pricing"))
@@ -123,9 +115,8 @@ def create_checkout_session(request, plan_slug):
 @require_POST
 def billing_portal(request):
     """Open the Stripe Customer Portal so users can manage their subscription."""
-    try:
-        customer = request.user.stripe_customer
-    except Customer.DoesNotExist:
+    customer = get_billing_context(request).customer
+    if customer is None:
         messages.info(request, "You don't have an active subscription yet.")
         return redirect("services:pricing")
 
@@ -163,6 +154,22 @@ def stripe_webhook(request):
         return HttpResponseBadRequest("Invalid payload")
     except stripe.error.SignatureVerificationError:
         return HttpResponseBadRequest("Invalid signature")
+    try:
+        created_at = event_created_at(event)
+    except ValueError:
+        return HttpResponseBadRequest("Event has no created time")
+
+    try:
+        remember_event(event)
+    except Exception:  # noqa: BLE001
+        log.exception("Stripe object cache update failed for %s", event["id"])
+
+    if settings.STRIPE_WEBHOOK_INGEST_MODE != "direct":
+        try:
+            ingest_event(event)
+            return HttpResponse("ok", status=200)
+        except Exception:  # noqa: BLE001
+            log.exception("Buffered ingest failed for %s; storing directly", event["id"])
 
     created = False
     try:
@@ -170,6 +177,7 @@ def stripe_webhook(request):
             stripe_event_id=event["id"],
             defaults={
                 "event_type": event["type"],
+                "stripe_created_at": created_at,
                 "payload": dict(event),
             },
         )
@@ -178,7 +186,11 @@ def stripe_webhook(request):
 
     if created and payment_event.event_type in HANDLED_EVENTS:
         try:
-            process_stripe_event.apply_async(args=[payment_event.pk], ignore_result=True)
+            process_stripe_event.apply_async(
+                args=[payment_event.pk],
+                ignore_result=True,
+                **route_for_event(payment_event.payload),
+            )
         except Exception:  # noqa: BLE001
             log.exception(
                 "Celery enqueue failed for %s; processing synchronously",
@@ -198,20 +210,15 @@ def stripe_webhook(request):
 def vps_list(request):
     """List the authenticated user's VPS instances with optional status filter."""
     instances = VPSInstance.objects.none()
-    try:
-        customer = request.user.stripe_customer
-        instances = customer.vps_instances.select_related("provisioning_job").order_by(
-            "-created_at"
-        )
-    except Customer.DoesNotExist:
-        pass
+    customer = get_billing_context(request).customer
+    if customer is not None:
+        instances = customer.vps_instances.select_related("provisioning_job")
 
     status_filter = request.GET.get("status", "")
     if status_filter and status_filter in VPSInstanceStatus.values:
         instances = instances.filter(status=status_filter)
 
-    paginator = Paginator(instances, 10)
-    page = paginator.get_page(request.GET.get("page"))
+    page = paginate(request, instances, 10)
 
     return render(
         request,
@@ -238,7 +245,11 @@ def vps_detail(request, pk):
 @login_required
 @require_POST
 def vps_action(request, pk):
-    """Execute a power action (start/stop/restart) on a VPS instance."""
+    """Queue a power action (start/stop/restart) on a VPS instance.
+
+    The provider call runs on the ``power`` queue (see orders/power.py); the
+    instance shows a transitional status until it finishes.
+    """
     instance = get_object_or_404(
         VPSInstance.objects.select_related("customer"),
         pk=pk,
@@ -246,39 +257,20 @@ def vps_action(request, pk):
     )
 
     action = request.POST.get("action", "")
-    allowed_actions = {"start", "stop", "restart"}
-    if action not in allowed_actions:
+    if action not in TRANSITIONS:
         messages.error(request, f"Invalid action: {action}")
         return redirect("orders:vps_detail", pk=instance.pk)
 
-    # Validate action is appropriate for current status
-    status_action_map = {
-        "start": {VPSInstanceStatus.STOPPED},
-        "stop": {VPSInstanceStatus.RUNNING},
-        "restart": {VPSInstanceStatus.RUNNING},
-    }
-    if instance.status not in status_action_map[action]:
-        messages.error(
+    try:
+        request_power_action(instance, action, request.user)
+    except PowerActionError as exc:
+        messages.error(request, str(exc))
+    else:
+        messages.info(
             request,
-            f"Cannot {action} a {instance.get_status_display().lower()} instance.",
+            f"VPS {instance.hostname} is {instance.get_status_display().lower()}. "
+            "This page updates when it is done.",
         )
-        return redirect("orders:vps_detail", pk=instance.pk)
-
-    provider = get_provider()
-    action_method = getattr(provider, action)
-    success = action_method(instance)
-
-    if success:
-        status_result = {
-            "start": VPSInstanceStatus.RUNNING,
-            "stop": VPSInstanceStatus.STOPPED,
-            "restart": VPSInstanceStatus.RUNNING,
-        }
-        instance.status = status_result[action]
-        instance.save(update_fields=["status", "updated_at"])
-        messages.success(request, f"VPS {instance.hostname} {action} succeeded.")
-    else:
-        messages.error(request, f"VPS {action} failed. Please try again or contact support.")
 
     return redirect("orders:vps_detail", pk=instance.pk)
 
@@ -4,12 +4,14 @@ import datetime
 import logging
 from decimal import Decimal
 
-import stripe
+from django.db import transaction
 
-from services.models import ServicePlan
+from services.catalog import get_plan_by_price_id, get_plan_by_slug
 from users.models import SubscriptionTier
 
+from .billing_context import invalidate as invalidate_billing_context
 from .models import Customer, Order, OrderStatus, ProvisioningJob, Subscription
+from .stripe_cache import retrieve_subscription
 
 log = logging.getLogger(__name__)
 
@@ -22,18 +24,25 @@ HANDLED_EVENTS = {
 
 
 def handle_event(event: dict) -> None:
+    """Apply one Stripe event.
+
+    Events may arrive out of order (Stripe retries, shard backlogs), so a
+    subscription write carries the event's ``created`` time and is skipped if
+    the row already reflects a newer event.
+    """
     event_type = event.get("type", "")
     data = event.get("data", {}).get("object", {})
+    event_at = _ts(event.get("created"))
 
     if event_type == "checkout.session.completed":
-        _handle_checkout_completed(data)
+        _handle_checkout_completed(data, event_at)
     elif event_type.startswith("customer.subscription."):
-        _handle_subscription_change(data)
+        _handle_subscription_change(data, event_at)
     elif event_type == "invoice.payment_failed":
         _handle_payment_failed(data)
 
 
-def _handle_checkout_completed(session: dict) -> None:
+def _handle_checkout_completed(session: dict, event_at=None) -> None:
     stripe_customer_id = session.get("customer")
     stripe_sub_id = session.get("subscription")
     if not stripe_customer_id or not stripe_sub_id:
@@ -45,8 +54,8 @@ def _handle_checkout_completed(session: dict) -> None:
         log.warning("Checkout completed for unknown customer %s", stripe_customer_id)
         return
 
-    stripe_sub = stripe.Subscription.retrieve(stripe_sub_id)
-    sub = _upsert_subscription(customer, stripe_sub)
+    stripe_sub = retrieve_subscription(stripe_sub_id)
+    sub, _ = _upsert_subscription(customer, stripe_sub, event_at)
 
     plan_slug = session.get("metadata", {}).get("plan_slug", "")
     plan = _get_plan(plan_slug)
@@ -76,7 +85,7 @@ def _handle_checkout_completed(session: dict) -> None:
     _queue_checkout_success_email(customer.user.pk, plan_name)
 
 
-def _handle_subscription_change(subscription: dict) -> None:
+def _handle_subscription_change(subscription: dict, event_at=None) -> None:
     stripe_customer_id = subscription.get("customer")
     try:
         customer = Customer.objects.get(stripe_customer_id=stripe_customer_id)
@@ -87,7 +96,9 @@ def _handle_subscription_change(subscription: dict) -> None:
         stripe_subscription_id=subscription.get("id", ""),
     ).first()
     previous_status = existing.status if existing else ""
-    sub = _upsert_subscription(customer, subscription)
+    sub, applied = _upsert_subscription(customer, subscription, event_at)
+    if not applied:
+        return
 
     new_status = subscription.get("status", "")
     if new_status in ("active", "trialing"):
@@ -99,39 +110,58 @@ def _handle_subscription_change(subscription: dict) -> None:
             _queue_subscription_canceled_email(customer.user.pk)
 
 
-def _upsert_subscription(customer: Customer, stripe_sub: dict) -> Subscription:
-    def _ts(val):
-        if val:
-            return datetime.datetime.fromtimestamp(val, tz=datetime.UTC)
-        return None
+def _ts(val):
+    if val:
+        return datetime.datetime.fromtimestamp(val, tz=datetime.UTC)
+    return None
+
+
+def _upsert_subscription(
+    customer: Customer, stripe_sub: dict, event_at=None
+) -> tuple[Subscription, bool]:
+    """Write *stripe_sub* to its Subscription row; return (row, whether it was written).
 
+    The write is skipped when the row was last written from an event created
+    after *event_at*, so a late retry cannot overwrite newer state.
+    """
     price_id = ""
     items = stripe_sub.get("items", {}).get("data", [])
     if items:
         price_id = items[0].get("price", {}).get("id", "")
 
-    sub, _ = Subscription.objects.update_or_create(
-        stripe_subscription_id=stripe_sub["id"],
-        defaults={
-            "customer": customer,
-            "stripe_price_id": price_id,
-            "status": stripe_sub.get("status", "incomplete"),
-            "current_period_start": _ts(stripe_sub.get("current_period_start")),
-            "current_period_end": _ts(stripe_sub.get("current_period_end")),
-            "cancel_at_period_end": stripe_sub.get("cancel_at_period_end", False),
-        },
-    )
-    return sub
+    with transaction.atomic():
+        current = (
+            Subscription.objects.select_for_update()
+            .filter(stripe_subscription_id=stripe_sub["id"])
+            .first()
+        )
+        if current and event_at and current.last_event_at and current.last_event_at > event_at:
+            log.info(
+                "Skipping stale update of %s from an event created %s (row has %s)",
+                stripe_sub["id"],
+                event_at.isoformat(),
+                current.last_event_at.isoformat(),
+            )
+            return current, False
+        sub, _ = Subscription.objects.update_or_create(
+            stripe_subscription_id=stripe_sub["id"],
+            defaults={
+                "customer": customer,
+                "stripe_price_id": price_id,
+                "status": stripe_sub.get("status", "incomplete"),
+                "current_period_start": _ts(stripe_sub.get("current_period_start")),
+                "current_period_end": _ts(stripe_sub.get("current_period_end")),
+                "cancel_at_period_end": stripe_sub.get("cancel_at_period_end", False),
+                "last_event_at": event_at or (current and current.last_event_at),
+            },
+        )
+    invalidate_billing_context(customer.user_id)
+    return sub, True
 
 
 def _get_plan(plan_slug: str):
     """Fetch ServicePlan by slug, returning None if not found."""
-    if not plan_slug:
-        return None
-    try:
-        return ServicePlan.objects.get(slug=plan_slug)
-    except ServicePlan.DoesNotExist:
-        return None
+    return get_plan_by_slug(plan_slug)
 
 
 def _update_user_tier(user, plan) -> None:
@@ -152,29 +182,26 @@ def _sync_tier_from_price(user, stripe_price_id: str) -> None:
     """Look up a ServicePlan by its Stripe price ID and update the user tier."""
     if not stripe_price_id:
         return
-    plan = (
-        ServicePlan.objects.filter(stripe_price_id_monthly=stripe_price_id).first()
-        or ServicePlan.objects.filter(stripe_price_id_annual=stripe_price_id).first()
-    )
-    _update_user_tier(user, plan)
+    _update_user_tier(user, get_plan_by_price_id(stripe_price_id))
 
 
 def _queue_provisioning(order: Order) -> None:
-    """Create a ProvisioningJob and dispatch the async task."""
+    """Create a ProvisioningJob and schedule the batch that will submit it."""
+    from django.conf import settings
+
+    from .batch import schedule_batch
     from .tasks import provision_vps_task
 
     job = ProvisioningJob.objects.create(
         order=order,
-        provider="demo",
+        provider=settings.VPS_PROVIDER,
         payload={
             "plan_slug": order.service_plan.slug,
             "tier_key": order.service_plan.tier_key,
         },
     )
-    try:
-        provision_vps_task.apply_async(args=[job.pk], ignore_result=True)
-    except Exception:  # noqa: BLE001
-        log.exception("Provisioning task enqueue failed for job %s; running synchronously", job.pk)
+    if not schedule_batch():
+        log.warning("Provisioning job %s could not be batched; running synchronously", job.pk)
         provision_vps_task.run(job.pk)
 
 
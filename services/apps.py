@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ServicesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "services"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        signals.connect_signals()
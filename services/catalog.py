@@ -0,0 +1,111 @@
+"""Process-local, versioned index of the service-plan catalog.
+
+The catalog is a handful of rows that change a few times a year but are read on
+every webhook, checkout and provisioning job.  Each process keeps every
+ServicePlan (with its features prefetched) in dictionaries keyed by ID, slug and
+Stripe price ID, so lookups are dictionary hits rather than queries.
+
+Staleness is controlled by a catalog version held in the shared Django cache.
+``post_save`` / ``post_delete`` on ServicePlan and PlanFeature bump it (see
+services/signals.py), and every process rebuilds its index the next time it
+sees a version it did not build from.  Code that changes plans without
+signals (``QuerySet.update()``, raw SQL) must call ``bump_catalog_version()``.
+
+Returned instances are shared between callers — treat them as read-only.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from django.core.cache import cache
+
+VERSION_CACHE_KEY = "services:catalog:version"
+
+_lock = threading.Lock()
+_index: dict = {"version": None}
+
+
+def catalog_version() -> int:
+    """Return the current catalog version (a millisecond timestamp)."""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_catalog_version() -> int:
+    """Invalidate every process's index (and anything keyed on the version)."""
+    version = max(int(time.time() * 1000), (cache.get(VERSION_CACHE_KEY) or 0) + 1)
+    cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    clear_local_index()
+    return version
+
+
+def clear_local_index() -> None:
+    global _index
+    _index = {"version": None}
+
+
+def _build(version: int) -> dict:
+    from .models import ServicePlan
+
+    plans = list(ServicePlan.objects.prefetch_related("features"))
+    index = {
+        "version": version,
+        "plans": plans,
+        "by_id": {},
+        "by_slug": {},
+        "by_monthly_price": {},
+        "by_annual_price": {},
+    }
+    # Plans arrive in Meta.ordering; setdefault keeps the first match per price ID,
+    # as the previous filter().first() lookups did.
+    for plan in plans:
+        index["by_id"][plan.pk] = plan
+        index["by_slug"][plan.slug] = plan
+        if plan.stripe_price_id_monthly:
+            index["by_monthly_price"].setdefault(plan.stripe_price_id_monthly, plan)
+        if plan.stripe_price_id_annual:
+            index["by_annual_price"].setdefault(plan.stripe_price_id_annual, plan)
+    return index
+
+
+def _current() -> dict:
+    global _index
+    version = catalog_version()
+    index = _index
+    if index["version"] == version:
+        return index
+    with _lock:
+        # The index is swapped, never mutated, so lock-free readers see a whole one.
+        if _index["version"] != version:
+            _index = _build(version)
+        return _index
+
+
+def get_plan_by_id(plan_id):
+    return _current()["by_id"].get(plan_id)
+
+
+def get_plan_by_slug(slug: str):
+    if not slug:
+        return None
+    return _current()["by_slug"].get(slug)
+
+
+def get_plan_by_price_id(stripe_price_id: str):
+    """Resolve a monthly or annual Stripe price ID to its plan (monthly wins)."""
+    if not stripe_price_id:
+        return None
+    index = _current()
+    return index["by_monthly_price"].get(stripe_price_id) or index["by_annual_price"].get(
+        stripe_price_id
+    )
+
+
+def active_plans() -> list:
+    """Active plans in catalog order, features prefetched."""
+    return [plan for plan in _current()["plans"] if plan.is_active]
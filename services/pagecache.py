@@ -0,0 +1,89 @@
+"""Full-page cache for the public catalog pages (landing, pricing, plan detail).
+
+Rendered responses are stored in the ``fragments`` cache alias for anonymous
+GET/HEAD requests under a key built
+from the catalog version (services/catalog.py), the active language and the
+request path.  A plan or feature change bumps the version, so stale pages are
+never served; they simply stop being read and expire.
+
+Responses carry an ETag (body digest) and Last-Modified (catalog version), so
+browsers and CDNs can revalidate with a 304.
+
+The CSP nonce is the only per-request value in these templates.  It is swapped
+for a placeholder before storing and replaced with the current request's nonce
+on every hit, so the body always matches the CSP header.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.translation import get_language
+
+from .catalog import catalog_version
+
+NONCE_PLACEHOLDER = "__CSP_NONCE__"
+
+
+def _cacheable(request) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Flash messages are rendered into the page and must not be shared.
+    return not len(get_messages(request))
+
+
+def _nonce(request) -> str:
+    # csp_nonce is lazy and falsy until first evaluated, so test for None explicitly.
+    nonce = getattr(request, "csp_nonce", None)
+    return str(nonce) if nonce is not None else ""
+
+
+def cache_anonymous_page(view_func):
+    """Serve *view_func* from the page cache for anonymous visitors."""
+
+    @functools.wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view_func(request, *args, **kwargs)
+
+        version = catalog_version()
+        key = f"pagecache:{version}:{get_language()}:{request.path}"
+        entry = caches["fragments"].get(key)
+        if entry is None:
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            body = response.content.decode(response.charset)
+            nonce = _nonce(request)
+            if nonce:
+                body = body.replace(nonce, NONCE_PLACEHOLDER)
+            entry = {
+                "body": body,
+                "content_type": response["Content-Type"],
+                "etag": f'"{hashlib.md5(body.encode(), usedforsecurity=False).hexdigest()}"',
+            }
+            caches["fragments"].set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+
+        response = HttpResponse(
+            entry["body"].replace(NONCE_PLACEHOLDER, _nonce(request)),
+            content_type=entry["content_type"],
+        )
+        last_modified = version // 1000
+        response["ETag"] = entry["etag"]
+        response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ("Cookie", "Accept-Language"))
+        patch_cache_control(response, max_age=0, must_revalidate=True)
+        return get_conditional_response(
+            request, etag=entry["etag"], last_modified=last_modified, response=response
+        )
+
+    return _wrapped
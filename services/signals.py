@@ -0,0 +1,27 @@
+"""Signal handlers keeping the plan catalog index fresh."""
+
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+def connect_signals():
+    """Connect catalog invalidation signals. Called from ServicesConfig.ready()."""
+    from .models import PlanFeature, ServicePlan
+
+    for model in (ServicePlan, PlanFeature):
+        post_save.connect(on_catalog_changed, sender=model)
+        post_delete.connect(on_catalog_changed, sender=model)
+
+
+def on_catalog_changed(sender, **kwargs):
+    """Bump the catalog version now and again once the change is committed.
+
+    The second bump drops any index another process rebuilt from the
+    pre-commit rows in between.
+    """
+    from .catalog import bump_catalog_version
+
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
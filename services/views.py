@@ -1,17 +1,22 @@
 """Services catalog views."""
 
-from django.shortcuts import get_object_or_404, render
+from django.http import Http404
+from django.shortcuts import render
 
-from .models import ServicePlan
+from .catalog import active_plans, get_plan_by_slug
+from .pagecache import cache_anonymous_page
 
 
+@cache_anonymous_page
 def pricing(request):
     """Public pricing/plans page."""
-    plans = ServicePlan.objects.filter(is_active=True).prefetch_related("features")
-    return render(request, "services/pricing.html", {"plans": plans})
+    return render(request, "services/pricing.html", {"plans": active_plans()})
 
 
+@cache_anonymous_page
 def plan_detail(request, slug):
     """Detail page for a single plan (used for SEO landing pages)."""
-    plan = get_object_or_404(ServicePlan, slug=slug, is_active=True)
+    plan = get_plan_by_slug(slug)
+    if plan is None or not plan.is_active:
+        raise Http404("No active plan matches the given slug.")
     return render(request, "services/plan_detail.html", {"plan": plan})
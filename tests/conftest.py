@@ -4,6 +4,11 @@ Global pytest configuration and shared fixtures.
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import override_settings
+
+from config.cache import build_caches
+from services.catalog import clear_local_index
 
 User = get_user_model()
 
@@ -12,6 +17,25 @@ TEST_USER_PASSWORD = "StrongPass123!"
 TEST_ADMIN_PASSWORD = "AdminPass123!"
 
 
+@pytest.fixture(scope="session", autouse=True)
+def _locmem_caches():
+    """Run the suite against per-process caches even if .env selects Redis."""
+    with override_settings(CACHES=build_caches("locmem")):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    """Keep cached state (Stripe snapshots, plan index, throttles) from leaking between tests."""
+    for cache in caches.all():
+        cache.clear()
+    clear_local_index()
+    yield
+    for cache in caches.all():
+        cache.clear()
+    clear_local_index()
+
+
 @pytest.fixture
 def user(db):
     """A basic active user."""
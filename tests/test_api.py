@@ -6,6 +6,7 @@ import pytest
 from rest_framework.test import APIClient
 
 from orders.models import Customer, Subscription, SubscriptionStatus
+from orders.reconcile import reconcile_fleet
 from services.models import ServicePlan
 from tickets.models import Ticket, TicketMessage, TicketPriority, TicketStatus
 
@@ -134,6 +135,30 @@ class TestHealth:
         resp = api_client.get(HEALTH_URL)
         assert resp.status_code == 200
 
+    def test_db_stats_require_staff(self, auth_client):
+        assert auth_client.get("/api/health/db/").status_code == 403
+
+    def test_db_stats_report_connection_mode(self, api_client, superuser):
+        api_client.force_authenticate(superuser)
+        resp = api_client.get("/api/health/db/")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["process_type"] == "web"
+        assert data["pooled"] is False
+        assert data["conn_health_checks"] is True
+        assert data["pool"] is None
+
+    def test_fleet_stats_require_staff(self, auth_client):
+        assert auth_client.get("/api/health/fleet/").status_code == 403
+
+    def test_fleet_stats_report_the_last_reconcile(self, api_client, superuser):
+        api_client.force_authenticate(superuser)
+        assert api_client.get("/api/health/fleet/").status_code == 204
+        reconcile_fleet()
+        resp = api_client.get("/api/health/fleet/")
+        assert resp.status_code == 200
+        assert resp.json()["checked"] == 0
+
 
 @pytest.mark.django_db
 class TestApiDocsAndJwt:
@@ -209,6 +234,32 @@ class TestPlanList:
         resp = api_client.get(PLANS_URL)
         assert resp.status_code == 200
 
+    def test_repeat_request_is_served_from_cache(self, api_client, plan, django_assert_num_queries):
+        first = api_client.get(PLANS_URL)
+        with django_assert_num_queries(0):
+            second = api_client.get(PLANS_URL)
+        assert second.content == first.content
+        assert second["ETag"] == first["ETag"]
+        assert "max-age" in second["Cache-Control"]
+
+    def test_if_none_match_returns_304(self, api_client, plan):
+        etag = api_client.get(PLANS_URL)["ETag"]
+        resp = api_client.get(PLANS_URL, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+        assert resp.content == b""
+
+    def test_plan_change_changes_etag(self, api_client, plan):
+        etag = api_client.get(PLANS_URL)["ETag"]
+        plan.tagline = "Now with more RAM"
+        plan.save()
+        resp = api_client.get(PLANS_URL, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+        assert resp.json()["results"][0]["tagline"] == "Now with more RAM"
+
+    def test_pages_are_cached_separately(self, api_client, plan):
+        assert api_client.get(PLANS_URL).status_code == 200
+        assert api_client.get(f"{PLANS_URL}?page=2").status_code == 404
+
 
 # ---------------------------------------------------------------------------
 # Tickets — list & create
@@ -228,6 +279,30 @@ class TestTicketList:
         assert len(results) == 1
         assert results[0]["subject"] == "API test ticket"
 
+    def test_rows_carry_thread_summary_not_messages(self, auth_client, ticket, user):
+        TicketMessage.objects.create(ticket=ticket, sender=user, body="Reply", is_staff_reply=True)
+        row = auth_client.get(TICKETS_URL).json()["results"][0]
+        assert "messages" not in row
+        assert row["message_count"] == 2
+        assert row["last_message_is_staff"] is True
+        assert row["last_message_at"] is not None
+
+    def test_page_is_one_query_regardless_of_threads(
+        self, auth_client, user, django_assert_num_queries
+    ):
+        tickets = Ticket.objects.bulk_create(
+            Ticket(user=user, subject=f"Ticket {n}") for n in range(5)
+        )
+        TicketMessage.objects.bulk_create(
+            TicketMessage(ticket=t, sender=user, body=f"Message {m}")
+            for t in tickets
+            for m in range(3)
+        )
+        # One COUNT for the paginator, one SELECT for the page.
+        with django_assert_num_queries(2):
+            resp = auth_client.get(TICKETS_URL)
+        assert [r["message_count"] for r in resp.json()["results"]] == [3] * 5
+
     def test_does_not_return_other_users_tickets(self, db, auth_client, user):
         from django.contrib.auth import get_user_model
 
@@ -0,0 +1,142 @@
+"""
+Billing context tests — the request-scoped customer + active subscription,
+its short-lived cross-request cache, and invalidation from webhook upserts.
+"""
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.billing_context import cache_key, get_billing_context
+from orders.models import Customer, Subscription, SubscriptionStatus
+from orders.webhooks import handle_event
+
+
+@pytest.fixture
+def customer(db, user):
+    return Customer.objects.create(user=user, stripe_customer_id="cus_context")
+
+
+@pytest.fixture
+def subscription(customer):
+    return Subscription.objects.create(
+        customer=customer, stripe_subscription_id="sub_context", status=SubscriptionStatus.ACTIVE
+    )
+
+
+def _request(user):
+    request = RequestFactory().get("/")
+    request.user = user
+    return request
+
+
+def _billing_queries(ctx):
+    tables = (Customer._meta.db_table, Subscription._meta.db_table)
+    return [q["sql"] for q in ctx.captured_queries if any(t in q["sql"] for t in tables)]
+
+
+# ---------------------------------------------------------------------------
+# 1. Loading and memoization
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestGetBillingContext:
+    def test_subscriber_loads_in_one_query(self, user, subscription):
+        request = _request(user)
+        with CaptureQueriesContext(connection) as ctx:
+            context = get_billing_context(request)
+            context.customer.get_active_subscription()
+            get_billing_context(request)
+        assert len(ctx) == 1
+        assert context.subscription == subscription
+        assert context.customer.stripe_customer_id == "cus_context"
+
+    def test_customer_without_subscription(self, user, customer):
+        Subscription.objects.create(
+            customer=customer, stripe_subscription_id="sub_old", status=SubscriptionStatus.CANCELED
+        )
+        context = get_billing_context(_request(user))
+        assert context.customer == customer
+        assert context.subscription is None
+
+    def test_user_without_customer(self, user):
+        context = get_billing_context(_request(user))
+        assert not context.has_customer
+        assert context.subscription is None
+
+    def test_anonymous_user_runs_no_queries(self, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            assert get_billing_context(_request(AnonymousUser())).customer is None
+
+    def test_later_requests_are_served_from_the_cache(self, user, subscription):
+        get_billing_context(_request(user))
+        with CaptureQueriesContext(connection) as ctx:
+            context = get_billing_context(_request(user))
+            assert context.customer.get_active_subscription() == subscription
+        assert len(ctx) == 0
+
+    def test_zero_ttl_disables_the_cache(self, settings, user, subscription):
+        settings.BILLING_CONTEXT_CACHE_TTL = 0
+        get_billing_context(_request(user))
+        assert cache.get(cache_key(user.pk)) is None
+
+
+# ---------------------------------------------------------------------------
+# 2. Invalidation
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestInvalidation:
+    def test_subscription_webhook_invalidates(self, user, subscription):
+        assert get_billing_context(_request(user)).subscription == subscription
+        handle_event(
+            {
+                "type": "customer.subscription.updated",
+                "data": {
+                    "object": {
+                        "id": "sub_context",
+                        "customer": "cus_context",
+                        "status": "canceled",
+                    }
+                },
+            }
+        )
+        assert cache.get(cache_key(user.pk)) is None
+        assert get_billing_context(_request(user)).subscription is None
+
+
+# ---------------------------------------------------------------------------
+# 3. Views, serializers and templates
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestConsumers:
+    @pytest.mark.parametrize("name", ["orders:billing", "orders:order_history", "orders:vps_list"])
+    def test_views_resolve_billing_once(self, client_logged_in, subscription, name):
+        with CaptureQueriesContext(connection) as ctx:
+            assert client_logged_in.get(reverse(name)).status_code == 200
+        lookups = [q for q in _billing_queries(ctx) if "stripe_customer_id" in q]
+        assert len(lookups) == 1
+
+    def test_me_endpoint_uses_the_context(self, user, subscription):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        body = client.get("/api/v1/me/").json()
+        assert body["subscription"]["status"] == "active"
+        with CaptureQueriesContext(connection) as ctx:
+            client.get("/api/v1/me/")
+        assert _billing_queries(ctx) == []
+
+    def test_template_context_is_lazy(self, client_logged_in, subscription):
+        resp = client_logged_in.get(reverse("tickets:list"))
+        assert resp.status_code == 200
+        assert cache.get(cache_key(subscription.customer.user_id)) is None
+        assert resp.context["billing"].subscription == subscription
@@ -0,0 +1,558 @@
+"""
+Billing pipeline tests — buffered webhook ingestion, batch event processing,
+per-customer shard routing and the Stripe object cache.
+"""
+
+import datetime
+import json
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.ingest import MemoryBuffer, flush_buffer, get_buffer, ingest_event
+from orders.models import EventStatus, PaymentEvent
+from orders.periodic import drain_payment_events
+from orders.sharding import (
+    group_by_queue,
+    queue_for_customer,
+    route_for_event,
+    shard_for_customer,
+    shard_queue,
+)
+from orders.stripe_cache import get_cached, remember_event, retrieve_subscription
+from orders.tasks import process_stripe_event, process_stripe_events
+
+WEBHOOK_URL = reverse("orders:stripe_webhook")
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _event(event_id, event_type="customer.subscription.updated", customer="cus_pipe_1"):
+    return {
+        "id": event_id,
+        "type": event_type,
+        "created": 1_700_000_000,
+        "data": {"object": {"id": f"sub_{event_id}", "customer": customer}},
+    }
+
+
+def _post(client, event):
+    return client.post(
+        WEBHOOK_URL,
+        data=json.dumps(event),
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE="t=1,v1=testsig",
+    )
+
+
+@pytest.fixture
+def memory_ingest(settings):
+    """Switch to the in-memory ingest mode with a fresh buffer."""
+    settings.DEBUG = True
+    settings.STRIPE_WEBHOOK_INGEST_MODE = "memory"
+    settings.STRIPE_WEBHOOK_BATCH_SIZE = 3
+    settings.STRIPE_WEBHOOK_FLUSH_INTERVAL = 3600
+    with patch.dict("orders.ingest._buffers", {"memory": MemoryBuffer()}):
+        yield get_buffer()
+
+
+# ---------------------------------------------------------------------------
+# 1. orders/ingest.py — buffered ingestion
+# ---------------------------------------------------------------------------
+
+
+class TestMemoryBuffer:
+    def test_take_is_fifo(self):
+        buffer = MemoryBuffer()
+        for i in range(3):
+            buffer.append({"id": f"evt_{i}"})
+        taken = buffer.take(2)
+        assert [event["id"] for _, event in taken] == ["evt_0", "evt_1"]
+        assert len(buffer) == 1
+
+    def test_release_puts_entries_back_in_order(self):
+        buffer = MemoryBuffer()
+        for i in range(3):
+            buffer.append({"id": f"evt_{i}"})
+        taken = buffer.take(2)
+        buffer.release(taken)
+        assert [event["id"] for _, event in buffer.take(3)] == ["evt_0", "evt_1", "evt_2"]
+
+
+@pytest.mark.django_db
+class TestBufferedIngest:
+    @patch("orders.ingest._enqueue_batch")
+    def test_events_are_buffered_until_batch_is_full(self, mock_enqueue, memory_ingest):
+        ingest_event(_event("evt_b1"))
+        ingest_event(_event("evt_b2"))
+        assert PaymentEvent.objects.count() == 0
+        assert len(memory_ingest) == 2
+
+        ingest_event(_event("evt_b3"))
+        assert PaymentEvent.objects.count() == 3
+        assert len(memory_ingest) == 0
+        mock_enqueue.assert_called_once()
+        assert len(mock_enqueue.call_args.args[0]) == 3
+
+    @patch("orders.ingest._enqueue_batch")
+    def test_flush_drops_duplicate_deliveries(self, mock_enqueue, memory_ingest):
+        PaymentEvent.objects.create(
+            stripe_event_id="evt_dup",
+            event_type="customer.subscription.updated",
+            status=EventStatus.PROCESSED,
+        )
+        memory_ingest.append(_event("evt_dup"))
+        memory_ingest.append(_event("evt_new"))
+        memory_ingest.append(_event("evt_new"))
+
+        assert flush_buffer(memory_ingest) == 3
+        assert PaymentEvent.objects.filter(stripe_event_id="evt_dup").count() == 1
+        assert PaymentEvent.objects.filter(stripe_event_id="evt_new").count() == 1
+        new_pk = PaymentEvent.objects.get(stripe_event_id="evt_new").pk
+        mock_enqueue.assert_called_once_with([new_pk], queue=None)
+
+    @patch("orders.ingest._enqueue_batch")
+    def test_unhandled_events_are_stored_but_not_enqueued(self, mock_enqueue, memory_ingest):
+        memory_ingest.append(_event("evt_misc", event_type="some.unknown.event"))
+        flush_buffer(memory_ingest)
+        assert PaymentEvent.objects.filter(stripe_event_id="evt_misc").exists()
+        mock_enqueue.assert_not_called()
+
+    @patch("orders.ingest._enqueue_batch")
+    def test_received_at_stays_arrival_time(self, mock_enqueue, memory_ingest):
+        created = datetime.datetime(2026, 1, 2, tzinfo=datetime.UTC)
+        before = timezone.now()
+        memory_ingest.append({**_event("evt_late_retry"), "created": int(created.timestamp())})
+        flush_buffer(memory_ingest)
+        event = PaymentEvent.objects.get(stripe_event_id="evt_late_retry")
+        assert event.stripe_created_at == created
+        assert event.received_at >= before
+
+    def test_flush_of_empty_buffer_is_noop(self, memory_ingest):
+        assert flush_buffer(memory_ingest) == 0
+
+    @patch("orders.views.process_stripe_event.apply_async")
+    @patch("orders.views.stripe.Webhook.construct_event")
+    def test_webhook_view_buffers_instead_of_inserting(
+        self, mock_construct, mock_apply_async, client, memory_ingest
+    ):
+        event = _event("evt_view_1")
+        mock_construct.return_value = event
+
+        resp = _post(client, event)
+        assert resp.status_code == 200
+        assert len(memory_ingest) == 1
+        assert not PaymentEvent.objects.exists()
+        mock_apply_async.assert_not_called()
+
+    @patch("orders.views.ingest_event", side_effect=ConnectionError("redis down"))
+    @patch("orders.views.process_stripe_event.apply_async")
+    @patch("orders.views.stripe.Webhook.construct_event")
+    def test_webhook_view_falls_back_to_direct_insert(
+        self, mock_construct, mock_apply_async, mock_ingest, client, settings
+    ):
+        settings.STRIPE_WEBHOOK_INGEST_MODE = "redis"
+        event = _event("evt_view_2")
+        mock_construct.return_value = event
+
+        resp = _post(client, event)
+        assert resp.status_code == 200
+        assert PaymentEvent.objects.filter(stripe_event_id="evt_view_2").exists()
+        mock_apply_async.assert_called_once()
+
+    @patch("orders.views.process_stripe_event.apply_async")
+    @patch("orders.views.stripe.Webhook.construct_event")
+    def test_memory_mode_is_refused_without_debug(
+        self, mock_construct, mock_apply_async, client, memory_ingest, settings
+    ):
+        settings.DEBUG = False
+        event = _event("evt_view_3")
+        mock_construct.return_value = event
+
+        with pytest.raises(ValueError):
+            get_buffer()
+        resp = _post(client, event)
+        assert resp.status_code == 200
+        assert len(memory_ingest) == 0
+        assert PaymentEvent.objects.filter(stripe_event_id="evt_view_3").exists()
+
+
+# ---------------------------------------------------------------------------
+# 2. orders/tasks.py — process_stripe_events batch claiming
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestProcessStripeEventsBatch:
+    @patch("orders.tasks.handle_event")
+    def test_processes_every_event(self, mock_handle):
+        events = [
+            PaymentEvent.objects.create(
+                stripe_event_id=f"evt_batch_{i}",
+                event_type="customer.subscription.updated",
+                payload=_event(f"evt_batch_{i}"),
+            )
+            for i in range(3)
+        ]
+        assert process_stripe_events.run([e.pk for e in events]) == 3
+        assert mock_handle.call_count == 3
+        assert set(PaymentEvent.objects.values_list("status", flat=True)) == {EventStatus.PROCESSED}
+
+    @patch("orders.tasks.handle_event")
+    def test_one_failure_does_not_block_the_rest(self, mock_handle):
+        mock_handle.side_effect = [RuntimeError("boom"), None]
+        first = PaymentEvent.objects.create(
+            stripe_event_id="evt_fail_1",
+            event_type="customer.subscription.updated",
+            payload=_event("evt_fail_1"),
+        )
+        second = PaymentEvent.objects.create(
+            stripe_event_id="evt_fail_2",
+            event_type="customer.subscription.updated",
+            payload=_event("evt_fail_2"),
+        )
+
+        with pytest.raises(RuntimeError):
+            process_stripe_events.run([first.pk, second.pk])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert first.status == EventStatus.FAILED
+        assert second.status == EventStatus.PROCESSED
+
+    @patch("orders.tasks.handle_event")
+    def test_only_claimable_events_are_processed(self, mock_handle):
+        done = PaymentEvent.objects.create(
+            stripe_event_id="evt_done",
+            event_type="customer.subscription.updated",
+            status=EventStatus.PROCESSED,
+        )
+        in_flight = PaymentEvent.objects.create(
+            stripe_event_id="evt_in_flight",
+            event_type="customer.subscription.updated",
+            status=EventStatus.PROCESSING,
+        )
+        assert process_stripe_events.run([done.pk, in_flight.pk]) == 0
+        mock_handle.assert_not_called()
+
+    @patch("orders.tasks.handle_event")
+    def test_unhandled_types_are_bulk_skipped(self, mock_handle):
+        event = PaymentEvent.objects.create(
+            stripe_event_id="evt_skip", event_type="payment_intent.created"
+        )
+        process_stripe_events.run([event.pk])
+        event.refresh_from_db()
+        assert event.status == EventStatus.SKIPPED
+        assert event.processed_at is not None
+        mock_handle.assert_not_called()
+
+    @patch("orders.tasks.handle_event")
+    def test_dispatches_in_stripe_created_order(self, mock_handle):
+        base = timezone.now()
+        order = [
+            ("evt_o1", "invoice.payment_failed", 3),
+            ("evt_o2", "customer.subscription.updated", 1),
+            ("evt_o3", "checkout.session.completed", 0),
+            ("evt_o4", "customer.subscription.updated", 1),
+        ]
+        ids = [
+            PaymentEvent.objects.create(
+                stripe_event_id=eid,
+                event_type=etype,
+                payload={"id": eid, "type": etype},
+                stripe_created_at=base + datetime.timedelta(seconds=offset),
+            ).pk
+            for eid, etype, offset in order
+        ]
+        process_stripe_events.run(ids)
+        dispatched = [c.args[0]["id"] for c in mock_handle.call_args_list]
+        assert dispatched == ["evt_o3", "evt_o2", "evt_o4", "evt_o1"]
+
+    @patch("orders.tasks.handle_event")
+    def test_backlog_mode_claims_oldest_received_up_to_limit(self, mock_handle):
+        for i in range(5):
+            PaymentEvent.objects.create(
+                stripe_event_id=f"evt_backlog_{i}",
+                event_type="customer.subscription.updated",
+                payload=_event(f"evt_backlog_{i}"),
+            )
+        assert process_stripe_events.run(limit=3) == 3
+        assert PaymentEvent.objects.filter(status=EventStatus.RECEIVED).count() == 2
+        assert not PaymentEvent.objects.filter(
+            stripe_event_id__in=["evt_backlog_0", "evt_backlog_1", "evt_backlog_2"],
+            status=EventStatus.RECEIVED,
+        ).exists()
+
+    @patch("orders.tasks.handle_event")
+    def test_query_count_is_constant_per_batch(self, mock_handle, django_assert_max_num_queries):
+        ids = [
+            PaymentEvent.objects.create(
+                stripe_event_id=f"evt_q_{i}",
+                event_type="customer.subscription.updated",
+                payload=_event(f"evt_q_{i}"),
+            ).pk
+            for i in range(25)
+        ]
+        # claim SELECT + PROCESSING UPDATE + PROCESSED UPDATE, plus savepoint overhead
+        with django_assert_max_num_queries(5):
+            process_stripe_events.run(ids)
+
+
+@pytest.mark.django_db
+class TestDrainPaymentEvents:
+    @patch("orders.tasks.process_stripe_events.apply_async")
+    def test_fans_out_batches_for_orphaned_backlog(self, mock_apply_async):
+        stale = timezone.now() - datetime.timedelta(minutes=10)
+        for i in range(250):
+            PaymentEvent.objects.create(
+                stripe_event_id=f"evt_orphan_{i}",
+                event_type="customer.subscription.updated",
+                received_at=stale,
+            )
+        assert drain_payment_events.run(max_workers=4, batch_size=100) == 3
+        assert mock_apply_async.call_count == 3
+
+    @patch("orders.tasks.process_stripe_events.apply_async")
+    def test_ignores_fresh_events(self, mock_apply_async):
+        PaymentEvent.objects.create(
+            stripe_event_id="evt_fresh", event_type="customer.subscription.updated"
+        )
+        assert drain_payment_events.run() == 0
+        mock_apply_async.assert_not_called()
+
+    @patch("orders.tasks.process_stripe_events.apply_async")
+    def test_fails_events_left_processing_by_a_lost_worker(self, mock_apply_async):
+        now = timezone.now()
+        stale = PaymentEvent.objects.create(
+            stripe_event_id="evt_stale_claim",
+            event_type="customer.subscription.updated",
+            status=EventStatus.PROCESSING,
+            claimed_at=now - datetime.timedelta(hours=1),
+        )
+        live = PaymentEvent.objects.create(
+            stripe_event_id="evt_live_claim",
+            event_type="customer.subscription.updated",
+            status=EventStatus.PROCESSING,
+            claimed_at=now,
+        )
+        drain_payment_events.run()
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        assert stale.status == EventStatus.FAILED
+        assert live.status == EventStatus.PROCESSING
+
+
+@pytest.mark.django_db
+class TestProcessStripeEventClaim:
+    @patch("orders.tasks.handle_event")
+    def test_event_claimed_by_a_batch_is_not_handled_again(self, mock_handle):
+        event = PaymentEvent.objects.create(
+            stripe_event_id="evt_claimed",
+            event_type="customer.subscription.updated",
+            status=EventStatus.PROCESSING,
+            payload=_event("evt_claimed"),
+        )
+        process_stripe_event.run(event.pk)
+        mock_handle.assert_not_called()
+        event.refresh_from_db()
+        assert event.status == EventStatus.PROCESSING
+
+    @patch("orders.tasks.handle_event")
+    def test_claim_stamps_claimed_at(self, mock_handle):
+        event = PaymentEvent.objects.create(
+            stripe_event_id="evt_stamp",
+            event_type="customer.subscription.updated",
+            payload=_event("evt_stamp"),
+        )
+        process_stripe_event.run(event.pk)
+        event.refresh_from_db()
+        assert event.status == EventStatus.PROCESSED
+        assert event.claimed_at is not None
+
+
+# ---------------------------------------------------------------------------
+# 3. orders/sharding.py — per-customer queue routing
+# ---------------------------------------------------------------------------
+
+
+class TestSharding:
+    def test_disabled_by_default(self, settings):
+        settings.STRIPE_EVENT_SHARDS = 0
+        assert shard_for_customer("cus_a") is None
+        assert route_for_event(_event("evt_s0")) == {}
+
+    def test_customer_always_maps_to_same_shard(self, settings):
+        settings.STRIPE_EVENT_SHARDS = 8
+        shard = shard_for_customer("cus_stable")
+        assert 0 <= shard < 8
+        assert all(shard_for_customer("cus_stable") == shard for _ in range(5))
+        assert route_for_event(_event("evt_s1", customer="cus_stable")) == {
+            "queue": shard_queue(shard)
+        }
+
+    def test_customers_spread_across_shards(self, settings):
+        settings.STRIPE_EVENT_SHARDS = 4
+        shards = {shard_for_customer(f"cus_{i}") for i in range(100)}
+        assert shards == {0, 1, 2, 3}
+
+    def test_event_without_customer_uses_default_route(self, settings):
+        settings.STRIPE_EVENT_SHARDS = 4
+        event = {"id": "evt_s2", "type": "invoice.payment_failed", "data": {"object": {}}}
+        assert route_for_event(event) == {}
+
+    def test_group_by_queue_preserves_order(self, settings):
+        settings.STRIPE_EVENT_SHARDS = 4
+        pairs = [(1, "cus_x"), (2, "cus_y"), (3, "cus_x"), (4, None)]
+        grouped = group_by_queue(pairs)
+        assert queue_for_customer("cus_x") != queue_for_customer("cus_y")
+        assert grouped[queue_for_customer("cus_x")] == [1, 3]
+        assert grouped[queue_for_customer("cus_y")] == [2]
+        assert grouped[None] == [4]
+
+
+@pytest.mark.django_db
+class TestShardedDispatch:
+    @patch("orders.ingest._enqueue_batch")
+    def test_flush_enqueues_one_batch_per_shard(self, mock_enqueue, memory_ingest, settings):
+        settings.STRIPE_EVENT_SHARDS = 4
+        memory_ingest.append(_event("evt_sh1", customer="cus_one"))
+        memory_ingest.append(_event("evt_sh2", customer="cus_two"))
+        memory_ingest.append(_event("evt_sh3", customer="cus_one"))
+        flush_buffer(memory_ingest)
+
+        calls = {c.kwargs["queue"]: c.args[0] for c in mock_enqueue.call_args_list}
+        pks = dict(PaymentEvent.objects.values_list("stripe_event_id", "pk"))
+        assert calls == {
+            queue_for_customer("cus_one"): [pks["evt_sh1"], pks["evt_sh3"]],
+            queue_for_customer("cus_two"): [pks["evt_sh2"]],
+        }
+
+    @patch("orders.views.process_stripe_event.apply_async")
+    @patch("orders.views.stripe.Webhook.construct_event")
+    def test_direct_webhook_routes_to_customer_shard(
+        self, mock_construct, mock_apply_async, client, settings
+    ):
+        settings.STRIPE_EVENT_SHARDS = 4
+        event = _event("evt_sh_view", customer="cus_routed")
+        mock_construct.return_value = event
+
+        assert _post(client, event).status_code == 200
+        assert mock_apply_async.call_args.kwargs["queue"] == queue_for_customer("cus_routed")
+
+    @patch("orders.tasks.process_stripe_events.apply_async")
+    def test_drain_sends_explicit_batches_to_shards(self, mock_apply_async, settings):
+        settings.STRIPE_EVENT_SHARDS = 4
+        stale = timezone.now() - datetime.timedelta(minutes=10)
+        for i in range(6):
+            PaymentEvent.objects.create(
+                stripe_event_id=f"evt_sh_orphan_{i}",
+                event_type="customer.subscription.updated",
+                payload=_event(f"evt_sh_orphan_{i}", customer=f"cus_{i % 2}"),
+                received_at=stale,
+            )
+        batches = drain_payment_events.run(max_workers=4, batch_size=100)
+
+        assert batches == mock_apply_async.call_count
+        for call in mock_apply_async.call_args_list:
+            ids = call.kwargs["args"][0]
+            customers = set(
+                PaymentEvent.objects.filter(pk__in=ids).values_list(
+                    "payload__data__object__customer", flat=True
+                )
+            )
+            assert {queue_for_customer(c) for c in customers} == {call.kwargs["queue"]}
+        assert sum(len(c.kwargs["args"][0]) for c in mock_apply_async.call_args_list) == 6
+
+    @patch("orders.tasks.process_stripe_events.apply_async")
+    def test_drain_does_not_requeue_events_already_sent_to_a_shard(
+        self, mock_apply_async, settings
+    ):
+        settings.STRIPE_EVENT_SHARDS = 4
+        stale = timezone.now() - datetime.timedelta(minutes=10)
+        PaymentEvent.objects.create(
+            stripe_event_id="evt_sh_behind",
+            event_type="customer.subscription.updated",
+            payload=_event("evt_sh_behind"),
+            received_at=stale,
+        )
+        assert drain_payment_events.run() == 1
+        assert drain_payment_events.run() == 0
+
+        PaymentEvent.objects.update(requeued_at=timezone.now() - datetime.timedelta(hours=1))
+        assert drain_payment_events.run() == 1
+        assert mock_apply_async.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# 4. orders/stripe_cache.py — Stripe object cache
+# ---------------------------------------------------------------------------
+
+
+def _subscription(sub_id="sub_cache_1", status="active", customer="cus_pipe_1"):
+    return {
+        "id": sub_id,
+        "object": "subscription",
+        "customer": customer,
+        "status": status,
+        "items": {"data": [{"price": {"id": "price_cache"}}]},
+        "current_period_start": 1_700_000_000,
+        "current_period_end": 1_702_592_000,
+        "cancel_at_period_end": False,
+    }
+
+
+def _subscription_event(event_id, created, **kwargs):
+    return {
+        "id": event_id,
+        "type": "customer.subscription.updated",
+        "created": created,
+        "data": {"object": _subscription(**kwargs)},
+    }
+
+
+class TestStripeObjectCache:
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
+    def test_hit_skips_api_call(self, mock_retrieve):
+        assert remember_event(_subscription_event("evt_c1", created=100))
+        sub = retrieve_subscription("sub_cache_1")
+        assert sub["status"] == "active"
+        mock_retrieve.assert_not_called()
+
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
+    def test_miss_calls_api_and_caches_result(self, mock_retrieve):
+        mock_retrieve.return_value = _subscription("sub_cache_2")
+        retrieve_subscription("sub_cache_2")
+        retrieve_subscription("sub_cache_2")
+        mock_retrieve.assert_called_once_with("sub_cache_2")
+
+    def test_older_snapshot_does_not_overwrite_newer(self):
+        remember_event(_subscription_event("evt_new", created=200, status="canceled"))
+        assert not remember_event(_subscription_event("evt_old", created=100, status="active"))
+        assert get_cached("subscription", "sub_cache_1")["status"] == "canceled"
+
+    def test_only_cacheable_object_types_are_stored(self):
+        event = {"id": "evt_c3", "created": 1, "data": {"object": {"id": "cs_1", "object": "x"}}}
+        assert not remember_event(event)
+        assert get_cached("x", "cs_1") is None
+
+
+@pytest.mark.django_db
+class TestWebhookFeedsCache:
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
+    @patch("orders.views.process_stripe_event.apply_async")
+    @patch("orders.views.stripe.Webhook.construct_event")
+    def test_subscription_event_avoids_retrieve_at_checkout(
+        self, mock_construct, mock_apply_async, mock_retrieve, client
+    ):
+        event = _subscription_event("evt_feed", created=300, sub_id="sub_feed")
+        event["type"] = "customer.subscription.created"
+        mock_construct.return_value = event
+        assert _post(client, event).status_code == 200
+
+        assert retrieve_subscription("sub_feed")["id"] == "sub_feed"
+        mock_retrieve.assert_not_called()
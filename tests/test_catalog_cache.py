@@ -0,0 +1,182 @@
+"""
+Catalog cache tests — versioned ServicePlan index, its invalidation, and the
+anonymous page cache built on it.
+"""
+
+import re
+
+import pytest
+from django.urls import reverse
+
+from services import catalog
+from services.models import PlanFeature, ServicePlan
+from services.pagecache import NONCE_PLACEHOLDER
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def starter(db):
+    return ServicePlan.objects.create(
+        name="Starter",
+        slug="starter",
+        price_monthly="29.00",
+        price_annual="290.00",
+        tier_key="starter",
+        stripe_price_id_monthly="price_starter_m",
+        stripe_price_id_annual="price_starter_y",
+        sort_order=1,
+    )
+
+
+@pytest.fixture
+def retired(db):
+    return ServicePlan.objects.create(
+        name="Legacy",
+        slug="legacy",
+        price_monthly="9.00",
+        stripe_price_id_monthly="price_legacy_m",
+        is_active=False,
+        sort_order=9,
+    )
+
+
+# ---------------------------------------------------------------------------
+# 1. services/catalog.py — plan index
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestPlanIndex:
+    def test_lookups_by_slug_id_and_price(self, starter):
+        assert catalog.get_plan_by_slug("starter").pk == starter.pk
+        assert catalog.get_plan_by_id(starter.pk).slug == "starter"
+        assert catalog.get_plan_by_price_id("price_starter_m").pk == starter.pk
+        assert catalog.get_plan_by_price_id("price_starter_y").pk == starter.pk
+
+    def test_unknown_keys_return_none(self, starter):
+        assert catalog.get_plan_by_slug("") is None
+        assert catalog.get_plan_by_slug("nope") is None
+        assert catalog.get_plan_by_price_id("price_nope") is None
+
+    def test_warm_lookups_do_not_query(self, starter, django_assert_num_queries):
+        catalog.get_plan_by_slug("starter")
+        with django_assert_num_queries(0):
+            catalog.get_plan_by_slug("starter")
+            catalog.get_plan_by_price_id("price_starter_y")
+            catalog.get_plan_by_id(starter.pk)
+            catalog.active_plans()
+
+    def test_active_plans_excludes_inactive(self, starter, retired):
+        assert [p.slug for p in catalog.active_plans()] == ["starter"]
+        # Inactive plans stay resolvable for webhooks about old subscriptions.
+        assert catalog.get_plan_by_price_id("price_legacy_m").pk == retired.pk
+
+    def test_features_are_prefetched(self, starter, django_assert_num_queries):
+        PlanFeature.objects.create(plan=starter, text="1 vCPU")
+        plan = catalog.get_plan_by_slug("starter")
+        with django_assert_num_queries(0):
+            assert [f.text for f in plan.features.all()] == ["1 vCPU"]
+
+
+@pytest.mark.django_db
+class TestPlanIndexInvalidation:
+    def test_plan_save_bumps_version(self, starter):
+        before = catalog.catalog_version()
+        starter.name = "Starter Plus"
+        starter.save()
+        assert catalog.catalog_version() > before
+        assert catalog.get_plan_by_slug("starter").name == "Starter Plus"
+
+    def test_plan_delete_drops_it_from_index(self, starter):
+        assert catalog.get_plan_by_slug("starter") is not None
+        starter.delete()
+        assert catalog.get_plan_by_slug("starter") is None
+
+    def test_feature_change_refreshes_features(self, starter):
+        catalog.get_plan_by_slug("starter")
+        PlanFeature.objects.create(plan=starter, text="Backups")
+        plan = catalog.get_plan_by_slug("starter")
+        assert [f.text for f in plan.features.all()] == ["Backups"]
+
+    def test_version_bump_from_another_process_is_seen(self, starter):
+        catalog.get_plan_by_slug("starter")
+        ServicePlan.objects.filter(pk=starter.pk).update(tier_key="pro")
+        assert catalog.get_plan_by_slug("starter").tier_key == "starter"
+
+        # Simulate another process bumping the shared version: the local index stays.
+        catalog.cache.set(catalog.VERSION_CACHE_KEY, catalog.catalog_version() + 1)
+        assert catalog.get_plan_by_slug("starter").tier_key == "pro"
+
+
+# ---------------------------------------------------------------------------
+# 2. services/pagecache.py — anonymous full-page cache
+# ---------------------------------------------------------------------------
+
+PRICING_URL = reverse("services:pricing")
+
+
+@pytest.mark.django_db
+class TestPageCache:
+    def test_warm_hit_does_not_query(self, client, starter, django_assert_num_queries):
+        client.get(PRICING_URL)
+        with django_assert_num_queries(0):
+            resp = client.get(PRICING_URL)
+        assert resp.status_code == 200
+        assert b"Starter" in resp.content
+
+    @pytest.mark.parametrize(
+        "url_name,kwargs",
+        [
+            ("home:index", {}),
+            ("services:pricing", {}),
+            ("services:plan_detail", {"slug": "starter"}),
+        ],
+    )
+    def test_catalog_pages_send_validators(self, client, starter, url_name, kwargs):
+        resp = client.get(reverse(url_name, kwargs=kwargs))
+        assert resp.status_code == 200
+        assert resp["ETag"]
+        assert resp["Last-Modified"]
+        assert "Cookie" in resp["Vary"]
+
+    def test_if_none_match_returns_304(self, client, starter):
+        etag = client.get(PRICING_URL)["ETag"]
+        resp = client.get(PRICING_URL, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+        assert resp.content == b""
+
+    def test_plan_change_invalidates_cached_page(self, client, starter):
+        first = client.get(PRICING_URL)
+        starter.name = "Starter Renamed"
+        starter.save()
+        second = client.get(PRICING_URL)
+        assert b"Starter Renamed" in second.content
+        assert second["ETag"] != first["ETag"]
+        assert client.get(PRICING_URL, HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 200
+
+    def test_each_hit_gets_its_own_csp_nonce(self, client, starter):
+        first = client.get(PRICING_URL)
+        second = client.get(PRICING_URL)
+        nonces = [re.search(rb'nonce="([^"]+)"', r.content).group(1) for r in (first, second)]
+        assert nonces[0] and nonces[1]
+        assert nonces[0] != nonces[1]
+        assert NONCE_PLACEHOLDER.encode() not in second.content
+
+    def test_authenticated_users_bypass_cache(self, client_logged_in, starter):
+        resp = client_logged_in.get(PRICING_URL)
+        assert resp.status_code == 200
+        assert not resp.has_header("ETag")
+        assert b"Start Free Trial" not in resp.content
+
+    def test_anonymous_page_is_not_served_to_logged_in_user(
+        self, client, client_logged_in, starter
+    ):
+        client.get(PRICING_URL)
+        assert b"Start Free Trial" not in client_logged_in.get(PRICING_URL).content
+
+    def test_inactive_plan_detail_is_404(self, client, retired):
+        url = reverse("services:plan_detail", kwargs={"slug": "legacy"})
+        assert client.get(url).status_code == 404
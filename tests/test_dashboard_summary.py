@@ -0,0 +1,205 @@
+"""
+Dashboard summary tests — the UserDashboardSummary read model, its incremental
+maintenance from ticket/VPS/subscription writes, and the rebuild command.
+"""
+
+import datetime
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import (
+    Customer,
+    Order,
+    ProvisioningJob,
+    Subscription,
+    SubscriptionStatus,
+    VPSInstance,
+    VPSInstanceStatus,
+)
+from orders.webhooks import handle_event
+from services.models import ServicePlan
+from tickets.models import Ticket, TicketStatus
+from users.models import UserDashboardSummary
+from users.summary import cache_key, get_summary, rebuild, refresh
+
+DASHBOARD_URL = reverse("users:dashboard")
+
+
+@pytest.fixture
+def customer(db, user):
+    return Customer.objects.create(user=user, stripe_customer_id="cus_summary")
+
+
+def _vps(customer, n, status=VPSInstanceStatus.RUNNING):
+    plan, _ = ServicePlan.objects.get_or_create(
+        slug="starter", defaults={"name": "Starter", "price_monthly": "29.00"}
+    )
+    order = Order.objects.create(customer=customer, service_plan=plan)
+    job = ProvisioningJob.objects.create(order=order)
+    return VPSInstance.objects.create(
+        provisioning_job=job, customer=customer, hostname=f"vps-{n}", status=status
+    )
+
+
+def _summary(user):
+    return UserDashboardSummary.objects.get(user=user)
+
+
+# ---------------------------------------------------------------------------
+# 1. Incremental maintenance from the save paths
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestSummaryMaintenance:
+    def test_ticket_writes_update_counts(self, user):
+        ticket = Ticket.objects.create(user=user, subject="Help")
+        Ticket.objects.create(user=user, subject="More help")
+        assert (_summary(user).total_tickets, _summary(user).open_tickets) == (2, 2)
+
+        ticket.status = TicketStatus.CLOSED
+        ticket.save(update_fields=["status"])
+        assert (_summary(user).total_tickets, _summary(user).open_tickets) == (2, 1)
+
+        ticket.delete()
+        assert (_summary(user).total_tickets, _summary(user).open_tickets) == (1, 1)
+
+    def test_vps_writes_update_counts_and_services(self, user, customer):
+        vps = _vps(customer, 1)
+        _vps(customer, 2, status=VPSInstanceStatus.TERMINATED)
+        summary = _summary(user)
+        assert summary.vps_counts == {"running": 1, "terminated": 1}
+        assert summary.services == [
+            {"pk": vps.pk, "hostname": "vps-1", "status": "running", "status_display": "Running"}
+        ]
+
+        vps.status = VPSInstanceStatus.STOPPED
+        vps.save(update_fields=["status"])
+        assert _summary(user).vps_counts == {"stopped": 1, "terminated": 1}
+        assert _summary(user).services[0]["status_display"] == "Stopped"
+
+    def test_subscription_webhook_updates_snapshot(self, user, customer):
+        period_end = int((timezone.now() + datetime.timedelta(days=30)).timestamp())
+        event = {
+            "type": "customer.subscription.updated",
+            "data": {
+                "object": {
+                    "id": "sub_summary",
+                    "customer": "cus_summary",
+                    "status": "active",
+                    "current_period_end": period_end,
+                    "cancel_at_period_end": True,
+                }
+            },
+        }
+        handle_event(event)
+        snapshot = _summary(user).subscription
+        assert snapshot["status"] == "active"
+        assert snapshot["cancel_at_period_end"] is True
+
+        event["data"]["object"]["status"] = "canceled"
+        handle_event(event)
+        assert _summary(user).subscription is None
+
+    def test_refresh_locks_the_row_before_reading_sections(self, user):
+        rebuild(user.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            refresh(user.pk, "tickets")
+        tables = [
+            "summary" if "users_userdashboardsummary" in q["sql"].split("WHERE")[0] else "other"
+            for q in ctx.captured_queries
+            if q["sql"].startswith(("SELECT", "UPDATE"))
+        ]
+        # lock, ticket aggregate, write
+        assert tables == ["summary", "other", "summary"]
+        if connection.features.has_select_for_update:
+            assert "FOR UPDATE" in ctx.captured_queries[0]["sql"]
+
+    def test_writes_invalidate_the_cached_summary(self, user):
+        get_summary(user.pk)
+        assert cache.get(cache_key(user.pk)) is not None
+        Ticket.objects.create(user=user, subject="Help")
+        assert cache.get(cache_key(user.pk)) is None
+        assert get_summary(user.pk)["total_tickets"] == 1
+
+    def test_deleting_the_user_removes_the_summary(self, user, customer):
+        Ticket.objects.create(user=user, subject="Help")
+        _vps(customer, 1)
+        user.delete()
+        assert not UserDashboardSummary.objects.exists()
+
+
+# ---------------------------------------------------------------------------
+# 2. Dashboard reads
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestDashboardReads:
+    def test_dashboard_renders_from_summary(self, client_logged_in, user, customer):
+        Ticket.objects.create(user=user, subject="Open one")
+        Ticket.objects.create(user=user, subject="Done", status=TicketStatus.CLOSED)
+        _vps(customer, 7)
+        Subscription.objects.create(
+            customer=customer, stripe_subscription_id="sub_dash", status=SubscriptionStatus.ACTIVE
+        )
+        resp = client_logged_in.get(DASHBOARD_URL)
+        assert resp.status_code == 200
+        assert resp.context["total_tickets"] == 2
+        assert resp.context["open_tickets"] == 1
+        assert resp.context["active_services"] == 1
+        assert resp.context["subscription"]["status"] == "active"
+        assert b"vps-7" in resp.content
+
+    def test_cache_miss_is_one_row_lookup_and_hit_is_none(self, client_logged_in, user):
+        Ticket.objects.create(user=user, subject="Help")
+        cache.delete(cache_key(user.pk))
+
+        def summary_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                assert client_logged_in.get(DASHBOARD_URL).status_code == 200
+            table = UserDashboardSummary._meta.db_table
+            return [q["sql"] for q in ctx.captured_queries if table in q["sql"]]
+
+        assert len(summary_queries()) == 1
+        assert summary_queries() == []
+
+    def test_missing_row_is_built_on_first_read(self, user):
+        Ticket.objects.bulk_create([Ticket(user=user, subject="Imported")])
+        assert get_summary(user.pk)["total_tickets"] == 1
+        assert _summary(user).total_tickets == 1
+
+
+# ---------------------------------------------------------------------------
+# 3. rebuild_dashboard_summaries
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestRebuildCommand:
+    def test_repairs_drift_from_bulk_writes(self, user):
+        Ticket.objects.create(user=user, subject="Help")
+        Ticket.objects.bulk_create(Ticket(user=user, subject=f"Bulk {n}") for n in range(3))
+        assert _summary(user).total_tickets == 1
+
+        out = StringIO()
+        call_command("rebuild_dashboard_summaries", stdout=out)
+        assert _summary(user).total_tickets == 4
+        assert "1 rebuilt" in out.getvalue()
+
+    def test_unchanged_rows_are_left_alone(self, user):
+        rebuild(user.pk)
+        assert rebuild(user.pk) is False
+
+    def test_single_user_by_email(self, user):
+        out = StringIO()
+        call_command("rebuild_dashboard_summaries", "--user", user.email, stdout=out)
+        assert "1 summaries checked" in out.getvalue()
+        assert UserDashboardSummary.objects.filter(user=user).exists()
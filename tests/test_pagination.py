@@ -0,0 +1,215 @@
+"""
+Pagination tests — opt-in keyset cursors on (created_at, id) for the growing
+API collections and HTML list views, alongside the default page numbers.
+"""
+
+import datetime
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.pagination import Cursor, InvalidCursor, keyset_page
+from orders.models import Customer, Order, ProvisioningJob, VPSInstance
+from services.models import ServicePlan
+from tickets.models import Ticket
+
+
+def _tickets(user, count, created_at=None):
+    tickets = Ticket.objects.bulk_create(
+        Ticket(user=user, subject=f"Ticket {n}") for n in range(count)
+    )
+    if created_at is not None:
+        Ticket.objects.filter(pk__in=[t.pk for t in tickets]).update(created_at=created_at)
+    return tickets
+
+
+def _walk(queryset, page_size):
+    """Follow next cursors from the first page; return the pages as pk lists."""
+    pages, cursor = [], None
+    while True:
+        page = keyset_page(queryset, cursor, page_size)
+        pages.append([t.pk for t in page])
+        if not page.has_next():
+            return pages
+        cursor = page.next_cursor
+
+
+@pytest.fixture
+def customer(db, user):
+    return Customer.objects.create(user=user, stripe_customer_id="cus_pages")
+
+
+@pytest.fixture
+def orders(customer):
+    plan = ServicePlan.objects.create(name="Starter", slug="starter", price_monthly="29.00")
+    return Order.objects.bulk_create(
+        Order(customer=customer, service_plan=plan, amount_total="29.00") for _ in range(35)
+    )
+
+
+@pytest.fixture
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+# ---------------------------------------------------------------------------
+# 1. config/pagination.py — keyset pages
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestKeysetPage:
+    def test_walks_every_row_once_newest_first(self, user):
+        tickets = _tickets(user, 25)
+        pages = _walk(Ticket.objects.all(), 10)
+        assert [len(p) for p in pages] == [10, 10, 5]
+        assert sum(pages, []) == [t.pk for t in reversed(tickets)]
+
+    def test_ties_on_created_at_are_broken_by_id(self, user):
+        tickets = _tickets(user, 25, created_at=timezone.now())
+        pages = _walk(Ticket.objects.all(), 10)
+        assert sum(pages, []) == sorted((t.pk for t in tickets), reverse=True)
+
+    def test_previous_cursor_returns_the_page_before(self, user):
+        _tickets(user, 25, created_at=timezone.now())
+        first = keyset_page(Ticket.objects.all(), None, 10)
+        second = keyset_page(Ticket.objects.all(), first.next_cursor, 10)
+        back = keyset_page(Ticket.objects.all(), second.previous_cursor, 10)
+        assert [t.pk for t in back] == [t.pk for t in first]
+        assert not back.has_previous()
+        assert back.has_next()
+
+    def test_new_rows_do_not_shift_later_pages(self, user):
+        _tickets(user, 20)
+        first = keyset_page(Ticket.objects.all(), None, 10)
+        expected = [t.pk for t in keyset_page(Ticket.objects.all(), first.next_cursor, 10)]
+        _tickets(user, 5)
+        assert [t.pk for t in keyset_page(Ticket.objects.all(), first.next_cursor, 10)] == expected
+
+    def test_first_page_of_a_short_list_has_no_cursors(self, user):
+        _tickets(user, 3)
+        page = keyset_page(Ticket.objects.all(), None, 10)
+        assert len(page) == 3
+        assert not page.has_other_pages()
+
+    def test_cursor_round_trips(self):
+        cursor = Cursor(datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=datetime.UTC), 42, True)
+        assert Cursor.decode(cursor.encode()) == cursor
+
+    @pytest.mark.parametrize("token", ["garbage", "", "eHx5fHo", "YXwyMDI2LTAxLTAxfGFiYw"])
+    def test_malformed_cursor_is_rejected(self, token):
+        with pytest.raises(InvalidCursor):
+            Cursor.decode(token)
+
+    def test_deep_page_issues_no_count_or_offset(self, user):
+        _tickets(user, 50)
+        first = keyset_page(Ticket.objects.all(), None, 10)
+        with CaptureQueriesContext(connection) as ctx:
+            keyset_page(Ticket.objects.all(), first.next_cursor, 10)
+        assert len(ctx) == 1
+        sql = ctx.captured_queries[0]["sql"].upper()
+        assert "COUNT(" not in sql
+        assert "OFFSET" not in sql
+
+
+# ---------------------------------------------------------------------------
+# 2. API — ?pagination=cursor on tickets, orders and VPS
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestApiCursorPagination:
+    def test_page_numbers_remain_the_default(self, api_client, orders):
+        body = api_client.get("/api/v1/orders/").json()
+        assert body["count"] == 35
+        assert "page=2" in body["next"]
+
+    def test_cursor_mode_follows_next_links(self, api_client, orders):
+        body = api_client.get("/api/v1/orders/?pagination=cursor").json()
+        assert "count" not in body
+        assert body["previous"] is None
+        seen = [o["id"] for o in body["results"]]
+        while body["next"]:
+            body = api_client.get(body["next"]).json()
+            seen += [o["id"] for o in body["results"]]
+        assert seen == [o.pk for o in reversed(orders)]
+
+    def test_previous_link_returns_to_first_page(self, api_client, orders):
+        first = api_client.get("/api/v1/orders/?pagination=cursor").json()
+        second = api_client.get(first["next"]).json()
+        back = api_client.get(second["previous"]).json()
+        assert back["results"] == first["results"]
+
+    def test_ticket_and_vps_lists_accept_cursors(self, api_client, user, customer, orders):
+        _tickets(user, 25)
+        jobs = ProvisioningJob.objects.bulk_create(
+            ProvisioningJob(order=order) for order in orders[:25]
+        )
+        VPSInstance.objects.bulk_create(
+            VPSInstance(provisioning_job=job, customer=customer, hostname=f"vps-{n}")
+            for n, job in enumerate(jobs)
+        )
+        for url in ("/api/v1/tickets/", "/api/v1/vps/"):
+            body = api_client.get(f"{url}?pagination=cursor").json()
+            assert len(body["results"]) == 20
+            assert len(api_client.get(body["next"]).json()["results"]) == 5
+
+    def test_invalid_cursor_returns_404(self, api_client, orders):
+        assert api_client.get("/api/v1/orders/?cursor=garbage").status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# 3. HTML list views
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestHtmlCursorPagination:
+    def test_order_history_pages_by_cursor(self, client_logged_in, orders):
+        resp = client_logged_in.get(reverse("orders:order_history") + "?pagination=cursor")
+        assert resp.status_code == 200
+        page = resp.context["orders"]
+        assert len(page) == 15
+        assert page.has_next()
+        assert f"cursor={page.next_cursor}".encode() in resp.content
+
+        nxt = client_logged_in.get(
+            reverse("orders:order_history") + f"?pagination=cursor&cursor={page.next_cursor}"
+        )
+        assert [o.pk for o in nxt.context["orders"]] == [o.pk for o in reversed(orders)][15:30]
+
+    def test_vps_list_keeps_status_filter_in_cursor_links(self, client_logged_in, customer, orders):
+        jobs = ProvisioningJob.objects.bulk_create(
+            ProvisioningJob(order=order) for order in orders[:12]
+        )
+        VPSInstance.objects.bulk_create(
+            VPSInstance(
+                provisioning_job=job, customer=customer, hostname=f"vps-{n}", status="running"
+            )
+            for n, job in enumerate(jobs)
+        )
+        resp = client_logged_in.get(
+            reverse("orders:vps_list") + "?status=running&pagination=cursor"
+        )
+        assert len(resp.context["instances"]) == 10
+        assert b"status=running" in resp.content
+        assert b"cursor=" in resp.content
+
+    def test_staff_ticket_list_pages_by_cursor(self, client, superuser, user):
+        _tickets(user, 30)
+        client.force_login(superuser)
+        resp = client.get(reverse("tickets:staff_list") + "?pagination=cursor")
+        page = resp.context["tickets"]
+        assert page.is_cursor
+        assert len(page) == 20
+        assert page.has_next()
+
+    def test_invalid_cursor_is_404(self, client_logged_in, orders):
+        resp = client_logged_in.get(reverse("orders:order_history") + "?cursor=garbage")
+        assert resp.status_code == 404
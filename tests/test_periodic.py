@@ -0,0 +1,681 @@
+"""
+Periodic task tests — subscription expiry notices and housekeeping jobs.
+"""
+
+import datetime
+import gzip
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from notifications.models import NotificationKind, NotificationLog
+from notifications.tasks import send_notification_batch_task
+from orders import partitions
+from orders.ingest import event_created_at
+from orders.models import (
+    Customer,
+    EventStatus,
+    Order,
+    OrderStatus,
+    PaymentEvent,
+    ProvisioningJob,
+    ProvisioningStatus,
+    Subscription,
+    SubscriptionStatus,
+)
+from orders.periodic import (
+    POLL_LOCK_KEY,
+    check_expiring_subscriptions,
+    cleanup_old_payment_events,
+    cleanup_stale_provisioning_jobs,
+    maintain_partitions,
+    poll_provisioning_operations,
+)
+from orders.provisioning import (
+    DemoProvider,
+    OperationState,
+    OperationStatus,
+    ProvisionOperation,
+)
+from orders.pruning import cursor_key, prune_payment_events
+from orders.tasks import complete_provisioning, provision_vps_task
+from services.models import ServicePlan
+
+User = get_user_model()
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+def _expiring_subscription(n, days=2, cancel=True, status=SubscriptionStatus.ACTIVE):
+    user = User.objects.create_user(email=f"expiring{n}@ez-solutions.com", password="x")
+    customer = Customer.objects.create(user=user, stripe_customer_id=f"cus_exp_{n}")
+    return Subscription.objects.create(
+        customer=customer,
+        stripe_subscription_id=f"sub_exp_{n}",
+        status=status,
+        current_period_end=timezone.now() + datetime.timedelta(days=days),
+        cancel_at_period_end=cancel,
+    )
+
+
+# ---------------------------------------------------------------------------
+# 1. check_expiring_subscriptions
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestCheckExpiringSubscriptions:
+    @patch("notifications.tasks.send_notification_batch_task.apply_async")
+    def test_queues_one_batch_for_all_expiring(self, mock_apply_async):
+        for n in range(3):
+            _expiring_subscription(n)
+        _expiring_subscription(10, days=10)  # outside the window
+        _expiring_subscription(11, cancel=False)  # renews
+        _expiring_subscription(12, status=SubscriptionStatus.CANCELED)
+
+        assert check_expiring_subscriptions.run() == 3
+        mock_apply_async.assert_called_once()
+        items = mock_apply_async.call_args.kwargs["args"][0]
+        assert {i["user_id"] for i in items} == set(
+            Subscription.objects.filter(
+                stripe_subscription_id__in=["sub_exp_0", "sub_exp_1", "sub_exp_2"]
+            ).values_list("customer__user_id", flat=True)
+        )
+        assert all(i["kind"] == NotificationKind.SUBSCRIPTION_EXPIRING for i in items)
+
+    @patch("notifications.tasks.send_notification_batch_task.apply_async")
+    def test_recently_notified_users_are_excluded(self, mock_apply_async):
+        notified = _expiring_subscription(0)
+        pending = _expiring_subscription(1)
+        NotificationLog.objects.create(
+            user=notified.customer.user,
+            channel="email",
+            kind=NotificationKind.SUBSCRIPTION_EXPIRING,
+            subject="Your subscription is expiring soon",
+            recipient=notified.customer.user.email,
+            success=True,
+        )
+        # A different kind of notice does not suppress the expiry notice.
+        NotificationLog.objects.create(
+            user=notified.customer.user,
+            channel="email",
+            subject="Ticket reply",
+            recipient=notified.customer.user.email,
+            success=True,
+        )
+
+        assert check_expiring_subscriptions.run() == 1
+        items = mock_apply_async.call_args.kwargs["args"][0]
+        assert [i["user_id"] for i in items] == [pending.customer.user_id]
+
+    @patch("notifications.tasks.send_notification_batch_task.apply_async")
+    def test_splits_large_runs_into_batches(self, mock_apply_async):
+        for n in range(5):
+            _expiring_subscription(n)
+        assert check_expiring_subscriptions.run(batch_size=2) == 5
+        assert [len(c.kwargs["args"][0]) for c in mock_apply_async.call_args_list] == [2, 2, 1]
+
+    @patch("notifications.tasks.send_notification_batch_task.apply_async")
+    def test_query_count_does_not_grow_with_subscribers(
+        self, mock_apply_async, django_assert_max_num_queries
+    ):
+        for n in range(20):
+            _expiring_subscription(n)
+        with django_assert_max_num_queries(1):
+            check_expiring_subscriptions.run()
+
+    def test_sent_notices_are_logged_with_kind_and_suppress_next_run(self):
+        sub = _expiring_subscription(0)
+        check_expiring_subscriptions.run()  # no broker in tests → runs synchronously
+
+        assert NotificationLog.objects.filter(
+            user=sub.customer.user, kind=NotificationKind.SUBSCRIPTION_EXPIRING
+        ).exists()
+        with patch("notifications.tasks.send_notification_batch_task.apply_async") as mock_apply:
+            assert check_expiring_subscriptions.run() == 0
+        mock_apply.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestSendNotificationBatch:
+    @patch("notifications.dispatch.notify_user")
+    def test_one_failure_does_not_stop_the_batch(self, mock_notify, user):
+        other = User.objects.create_user(email="other@ez-solutions.com", password="x")
+        mock_notify.side_effect = [RuntimeError("smtp down"), {"email": True}]
+        items = [
+            {"user_id": user.pk, "subject": "s", "body": "b"},
+            {"user_id": other.pk, "subject": "s", "body": "b"},
+            {"user_id": 999_999, "subject": "s", "body": "b"},
+        ]
+        assert send_notification_batch_task.run(items) == 1
+        assert mock_notify.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# 2. cleanup_stale_provisioning_jobs
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def order(db, user):
+    customer = Customer.objects.create(user=user, stripe_customer_id="cus_stale")
+    plan = ServicePlan.objects.create(name="Starter", slug="starter", price_monthly="29.00")
+    return Order.objects.create(customer=customer, service_plan=plan, status=OrderStatus.PAID)
+
+
+def _job(order, status=ProvisioningStatus.PROVISIONING, hours_ago=2):
+    return ProvisioningJob.objects.create(
+        order=order,
+        status=status,
+        started_at=timezone.now() - datetime.timedelta(hours=hours_ago),
+    )
+
+
+@pytest.mark.django_db
+class TestCleanupStaleProvisioningJobs:
+    @patch("notifications.tasks.send_admin_notification_task.delay")
+    def test_fails_stale_jobs_and_sends_one_digest(self, mock_delay, order):
+        stale = [_job(order) for _ in range(3)]
+        fresh = _job(order, hours_ago=0)
+        done = _job(order, status=ProvisioningStatus.READY)
+
+        assert cleanup_stale_provisioning_jobs.run() == 3
+
+        for job in stale:
+            job.refresh_from_db()
+            assert job.status == ProvisioningStatus.FAILED
+            assert job.error_message == "Timed out after 1 hour"
+        fresh.refresh_from_db()
+        done.refresh_from_db()
+        assert fresh.status == ProvisioningStatus.PROVISIONING
+        assert done.status == ProvisioningStatus.READY
+
+        mock_delay.assert_called_once()
+        digest = mock_delay.call_args.kwargs
+        assert digest["subject"] == "3 provisioning job(s) timed out"
+        for job in stale:
+            assert f"ProvisioningJob #{job.pk} (order #{order.pk})" in digest["body"]
+
+    @patch("notifications.tasks.send_admin_notification_task.delay")
+    def test_nothing_stale_sends_nothing(self, mock_delay, order):
+        _job(order, hours_ago=0)
+        assert cleanup_stale_provisioning_jobs.run() == 0
+        mock_delay.assert_not_called()
+
+    @patch("notifications.tasks.send_admin_notification_task.delay")
+    def test_single_query_regardless_of_job_count(
+        self, mock_delay, order, django_assert_num_queries
+    ):
+        for _ in range(25):
+            _job(order)
+        with django_assert_num_queries(1):
+            assert cleanup_stale_provisioning_jobs.run() == 25
+
+    @patch("notifications.tasks.send_admin_notification_task.delay")
+    def test_digest_is_truncated_for_large_outages(self, mock_delay, order):
+        for _ in range(55):
+            _job(order)
+        cleanup_stale_provisioning_jobs.run()
+        body = mock_delay.call_args.kwargs["body"]
+        assert body.count("ProvisioningJob #") == 50
+        assert "… and 5 more" in body
+
+    @patch("notifications.tasks.send_admin_notification_task.delay")
+    def test_fallback_without_update_returning(self, mock_delay, order):
+        stale = _job(order)
+        # SQLite before 3.35 has no UPDATE … RETURNING.
+        with patch("sqlite3.sqlite_version_info", (3, 34, 1)):
+            assert cleanup_stale_provisioning_jobs.run() == 1
+        stale.refresh_from_db()
+        assert stale.status == ProvisioningStatus.FAILED
+        mock_delay.assert_called_once()
+
+
+class _SubmittingProvider(DemoProvider):
+    """Returns operations from provision(); poll() reports ``outcomes`` (default pending)."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.outcomes = {}
+        self.threads = set()
+
+    def provision(self, job):
+        return ProvisionOperation(id=f"op-{job.pk}", data={"node": "pve1"})
+
+    def poll(self, operation):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        outcome = self.outcomes.get(operation.id, OperationStatus(OperationState.PENDING))
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _succeeded(job):
+    result = {"external_id": f"ext-{job.pk}", "ip_address": "10.1.0.5", "vmid": 1000 + job.pk}
+    return OperationStatus(OperationState.SUCCEEDED, result=result)
+
+
+@pytest.fixture
+def submitting_provider():
+    provider = _SubmittingProvider()
+    with patch("orders.provisioning.get_provider", return_value=provider):
+        yield provider
+
+
+def _submitted(order, count=1):
+    jobs = [ProvisioningJob.objects.create(order=order, provider="demo") for _ in range(count)]
+    for job in jobs:
+        provision_vps_task.run(job.pk)
+    return jobs
+
+
+@pytest.mark.django_db
+@patch("orders.tasks._queue_vps_failed_notification")
+@patch("orders.tasks._queue_vps_ready_notification")
+class TestPollProvisioningOperations:
+    def test_submit_stores_the_operation_and_returns(
+        self, mock_ready, mock_failed, order, submitting_provider
+    ):
+        (job,) = _submitted(order)
+        job.refresh_from_db()
+        assert job.status == ProvisioningStatus.PROVISIONING
+        assert job.payload["operation"] == {"id": f"op-{job.pk}", "data": {"node": "pve1"}}
+        assert not hasattr(job, "vps_instance")
+        mock_ready.assert_not_called()
+
+    def test_resubmitting_a_submitted_job_is_a_no_op(
+        self, mock_ready, mock_failed, order, submitting_provider
+    ):
+        (job,) = _submitted(order)
+        with patch.object(submitting_provider, "provision") as mock_provision:
+            provision_vps_task.run(job.pk)
+        mock_provision.assert_not_called()
+
+    def test_finished_operations_complete_their_jobs(
+        self, mock_ready, mock_failed, order, submitting_provider
+    ):
+        done, pending = _submitted(order, 2)
+        submitting_provider.outcomes[f"op-{done.pk}"] = _succeeded(done)
+
+        assert poll_provisioning_operations.run() == 1
+
+        done.refresh_from_db()
+        pending.refresh_from_db()
+        assert done.status == ProvisioningStatus.READY
+        assert done.external_id == f"ext-{done.pk}"
+        assert done.vps_instance.proxmox_vmid == 1000 + done.pk
+        assert pending.status == ProvisioningStatus.PROVISIONING
+        mock_ready.assert_called_once()
+
+    def test_failed_operation_fails_the_job(
+        self, mock_ready, mock_failed, order, submitting_provider
+    ):
+        (job,) = _submitted(order)
+        submitting_provider.outcomes[f"op-{job.pk}"] = OperationStatus(
+            OperationState.FAILED, error="clone failed: storage full"
+        )
+        assert poll_provisioning_operations.run() == 1
+        job.refresh_from_db()
+        assert job.status == ProvisioningStatus.FAILED
+        assert job.error_message == "clone failed: storage full"
+        mock_failed.assert_called_once_with(job.pk, "clone failed: storage full")
+
+    def test_poll_error_leaves_the_job_for_the_next_run(
+        self, mock_ready, mock_failed, order, submitting_provider
+    ):
+        broken, done = _submitted(order, 2)
+        submitting_provider.outcomes[f"op-{broken.pk}"] = ConnectionError("node unreachable")
+        submitting_provider.outcomes[f"op-{done.pk}"] = _succeeded(done)
+
+        assert poll_provisioning_operations.run() == 1
+        broken.refresh_from_db()
+        assert broken.status == ProvisioningStatus.PROVISIONING
+
+    def test_polls_run_concurrently(
+        self, mock_ready, mock_failed, settings, order, submitting_provider
+    ):
+        settings.PROVISIONING_POLL_CONCURRENCY = 8
+        submitting_provider.delay = 0.05
+        jobs = _submitted(order, 16)
+        for job in jobs:
+            submitting_provider.outcomes[f"op-{job.pk}"] = _succeeded(job)
+
+        started = time.monotonic()
+        assert poll_provisioning_operations.run() == 16
+        assert time.monotonic() - started < 16 * 0.05
+        assert len(submitting_provider.threads) > 1
+
+    def test_batch_size_caps_one_run(self, mock_ready, mock_failed, order, submitting_provider):
+        jobs = _submitted(order, 3)
+        for job in jobs:
+            submitting_provider.outcomes[f"op-{job.pk}"] = _succeeded(job)
+        assert poll_provisioning_operations.run(batch_size=2) == 2
+        assert poll_provisioning_operations.run(batch_size=2) == 1
+
+    def test_overlapping_run_is_skipped(self, mock_ready, mock_failed, order, submitting_provider):
+        (job,) = _submitted(order)
+        submitting_provider.outcomes[f"op-{job.pk}"] = _succeeded(job)
+        cache.add(POLL_LOCK_KEY, 1)
+        with patch.object(submitting_provider, "poll") as mock_poll:
+            assert poll_provisioning_operations.run() == 0
+        mock_poll.assert_not_called()
+
+        cache.delete(POLL_LOCK_KEY)
+        assert poll_provisioning_operations.run() == 1
+        assert cache.get(POLL_LOCK_KEY) is None
+
+    def test_a_job_completes_once(self, mock_ready, mock_failed, order, submitting_provider):
+        (job,) = _submitted(order)
+        result = _succeeded(job).result
+        assert complete_provisioning(job, result) is True
+        assert complete_provisioning(job, result) is False
+        assert mock_ready.call_count == 1
+
+
+# ---------------------------------------------------------------------------
+# 3. cleanup_old_payment_events — orders/pruning.py
+# ---------------------------------------------------------------------------
+
+
+def _event(n, status=EventStatus.PROCESSED, days_ago=100):
+    return PaymentEvent.objects.create(
+        stripe_event_id=f"evt_prune_{n}",
+        event_type="invoice.paid",
+        status=status,
+        processed_at=timezone.now() - datetime.timedelta(days=days_ago),
+        payload={"id": f"evt_prune_{n}", "data": {"object": {"amount": n}}},
+    )
+
+
+@pytest.mark.django_db
+class TestCleanupOldPaymentEvents:
+    @pytest.fixture(autouse=True)
+    def _small_batches(self, settings):
+        settings.PAYMENT_EVENT_PRUNE_BATCH_SIZE = 2
+        settings.PAYMENT_EVENT_PRUNE_SLEEP = 0
+
+    def test_deletes_only_old_finished_events_in_batches(self):
+        old = [_event(n) for n in range(5)]
+        recent = _event(10, days_ago=5)
+        failed = _event(11, status=EventStatus.FAILED)
+
+        with CaptureQueriesContext(connection) as ctx:
+            assert cleanup_old_payment_events.run() == 5
+        deletes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("DELETE")]
+        assert len(deletes) == 3  # batches of 2, 2, 1
+        # Keyset pagination: batches are selected by id, never by OFFSET.
+        assert not any("OFFSET" in q["sql"] for q in ctx.captured_queries)
+
+        remaining = set(PaymentEvent.objects.values_list("pk", flat=True))
+        assert remaining == {recent.pk, failed.pk}
+        assert not remaining & {e.pk for e in old}
+
+    def test_resumes_from_cursor_after_time_budget(self):
+        events = [_event(n) for n in range(5)]
+
+        with patch("orders.periodic.cleanup_old_payment_events.apply_async") as mock_requeue:
+            assert cleanup_old_payment_events.run(time_budget=0) == 2
+        resume_from = mock_requeue.call_args.kwargs["kwargs"]["cutoff"]
+        cutoff = datetime.datetime.fromisoformat(resume_from)
+        key = cursor_key(
+            PaymentEvent.objects.filter(
+                status__in=[EventStatus.PROCESSED, EventStatus.SKIPPED], processed_at__lt=cutoff
+            )
+        )
+        assert cache.get(key) == events[1].pk
+
+        assert cleanup_old_payment_events.run(cutoff=resume_from) == 3
+        assert not PaymentEvent.objects.exists()
+        assert cache.get(key) is None
+
+    def test_cursor_is_not_shared_between_cutoffs(self):
+        events = [_event(n, days_ago=100 + n) for n in range(4)]
+        newer = PaymentEvent.objects.filter(pk__in=[e.pk for e in events])
+        older = newer.filter(processed_at__lt=timezone.now() - datetime.timedelta(days=102))
+        assert cursor_key(newer) != cursor_key(older)
+
+        # A cursor left far ahead by an interrupted run with another cutoff...
+        cache.set(cursor_key(newer), events[-1].pk)
+        # ...does not make this filter skip its rows.
+        assert prune_payment_events(older).deleted == 2
+
+    def test_archives_payloads_before_deleting(self, tmp_path):
+        events = [_event(n) for n in range(3)]
+        with override_settings(PAYMENT_EVENT_ARCHIVE_DIR=str(tmp_path)):
+            assert cleanup_old_payment_events.run() == 3
+
+        files = sorted(tmp_path.glob("payment_events-*.jsonl.gz"))
+        assert len(files) == 2
+        assert not list(tmp_path.glob("*.tmp"))
+        rows = [json.loads(line) for f in files for line in gzip.open(f).read().splitlines()]
+        assert [r["stripe_event_id"] for r in rows] == [e.stripe_event_id for e in events]
+        assert rows[1]["payload"]["data"]["object"]["amount"] == 1
+
+    def test_failed_archive_keeps_rows(self, tmp_path):
+        _event(0)
+        with (
+            override_settings(PAYMENT_EVENT_ARCHIVE_DIR=str(tmp_path)),
+            patch("orders.pruning.os.fsync", side_effect=OSError("disk full")),
+            pytest.raises(OSError),
+        ):
+            cleanup_old_payment_events.run()
+        assert PaymentEvent.objects.count() == 1
+        assert not list(tmp_path.iterdir())
+
+
+# ---------------------------------------------------------------------------
+# 4. maintain_partitions — orders/partitions.py
+# ---------------------------------------------------------------------------
+
+NOW = datetime.datetime(2026, 10, 16, 12, 0, tzinfo=datetime.UTC)
+PAYMENT_EVENTS = partitions.PARTITIONED_TABLES[0]
+
+
+class TestPartitionCalendar:
+    def test_month_arithmetic_crosses_years(self):
+        assert partitions.add_months(datetime.date(2026, 11, 1), 3) == datetime.date(2027, 2, 1)
+        assert partitions.add_months(datetime.date(2026, 1, 1), -1) == datetime.date(2025, 12, 1)
+        assert partitions.months_between(
+            datetime.date(2026, 11, 20), datetime.date(2027, 1, 1)
+        ) == [
+            datetime.date(2026, 11, 1),
+            datetime.date(2026, 12, 1),
+            datetime.date(2027, 1, 1),
+        ]
+
+    def test_partition_names_round_trip(self):
+        name = partitions.partition_name("orders_paymentevent", datetime.date(2026, 3, 1))
+        assert name == "orders_paymentevent_p202603"
+        assert partitions.parse_partition_month("orders_paymentevent", name) == datetime.date(
+            2026, 3, 1
+        )
+        assert (
+            partitions.parse_partition_month("orders_paymentevent", "orders_paymentevent_default")
+            is None
+        )
+
+    def test_month_expires_once_all_of_it_is_past_retention(self):
+        months = [datetime.date(2026, m, 1) for m in (6, 7, 8)]
+        # cutoff = 2026-07-18: June has fully aged out, July has not.
+        assert partitions.expired_months(months, NOW, retention_days=90) == [
+            datetime.date(2026, 6, 1)
+        ]
+
+
+@pytest.mark.django_db
+class TestPartitionMaintenance:
+    def test_creates_current_and_upcoming_months(self):
+        existing = {datetime.date(2026, 10, 1): "orders_paymentevent_p202610"}
+        with patch("orders.partitions.existing_partitions", return_value=existing):
+            created = partitions.ensure_partitions(
+                PAYMENT_EVENTS, NOW, months_ahead=2, dry_run=True
+            )
+        assert created == ["orders_paymentevent_p202611", "orders_paymentevent_p202612"]
+
+    def test_keeps_expired_partition_with_unfinished_events(self, settings):
+        settings.PAYMENT_EVENT_RETENTION_DAYS = 90
+        existing = {
+            datetime.date(2026, 1, 1): "orders_paymentevent_p202601",
+            datetime.date(2026, 2, 1): "orders_paymentevent_p202602",
+            datetime.date(2026, 10, 1): "orders_paymentevent_p202610",
+        }
+        PaymentEvent.objects.create(
+            stripe_event_id="evt_stuck",
+            event_type="invoice.paid",
+            status=EventStatus.FAILED,
+            stripe_created_at=datetime.datetime(2026, 2, 10, tzinfo=datetime.UTC),
+        )
+        with patch("orders.partitions.existing_partitions", return_value=existing):
+            dropped = partitions.drop_expired_partitions(PAYMENT_EVENTS, NOW, dry_run=True)
+        assert dropped == ["orders_paymentevent_p202601"]
+
+    @pytest.mark.skipif(connection.vendor == "postgresql", reason="checks the SQLite fallback")
+    def test_noop_on_sqlite(self):
+        assert partitions.maintain_partitions(now=NOW) == {}
+        assert maintain_partitions.run() == 0
+
+    @pytest.mark.skipif(connection.vendor == "postgresql", reason="checks the SQLite fallback")
+    def test_command_requires_postgresql(self):
+        with pytest.raises(CommandError, match="PostgreSQL"):
+            call_command("manage_partitions", "--dry-run")
+
+    def test_conversion_refuses_pending_migrations(self):
+        with patch("orders.partitions.pending_migrations", return_value=["orders.0099_next"]):
+            with pytest.raises(RuntimeError, match="orders.0099_next"):
+                partitions.convert_to_partitioned(PAYMENT_EVENTS, NOW, months_ahead=1)
+
+    def test_row_pruning_defers_to_partition_retention(self):
+        _event(0)
+        with patch("orders.partitions.is_partitioned", return_value=True):
+            assert cleanup_old_payment_events.run() == 0
+        assert PaymentEvent.objects.count() == 1
+
+
+class TestEventCreatedAt:
+    def test_uses_stripe_created_time(self):
+        created = event_created_at({"id": "evt_1", "created": 1_780_000_000})
+        assert created == datetime.datetime.fromtimestamp(1_780_000_000, tz=datetime.UTC)
+
+    @pytest.mark.parametrize("created", [None, "soon", ...])
+    def test_missing_created_time_is_rejected(self, created):
+        event = {"id": "evt_1"} if created is ... else {"id": "evt_1", "created": created}
+        with pytest.raises(ValueError, match="evt_1"):
+            event_created_at(event)
+
+
+def _index_and_fk_names(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = %s::regclass AND NOT i.indisunique",
+            [table],
+        )
+        names = {row[0] for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        return names | {row[0] for row in cursor.fetchall()}
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="partitioning is PostgreSQL-only")
+@pytest.mark.django_db
+class TestPartitionConversionPostgres:
+    def test_payment_events_keep_rows_indexes_and_dedup(self):
+        created = datetime.datetime(2026, 8, 3, tzinfo=datetime.UTC)
+        old = PaymentEvent.objects.create(
+            stripe_event_id="evt_part_1", event_type="invoice.paid", stripe_created_at=created
+        )
+        table = PAYMENT_EVENTS.table
+        names = _index_and_fk_names(table)
+
+        assert partitions.convert_to_partitioned(PAYMENT_EVENTS, NOW, months_ahead=1) == 1
+
+        assert partitions.is_partitioned(table)
+        assert sorted(partitions.existing_partitions(table)) == [
+            datetime.date(2026, m, 1) for m in (8, 9, 10, 11)
+        ]
+        assert _index_and_fk_names(table) == names
+        assert PaymentEvent.objects.get(stripe_event_id="evt_part_1").pk == old.pk
+        assert PaymentEvent.objects.create(stripe_event_id="evt_part_2").pk > old.pk
+
+        # A redelivery carries the same created time, so it still collides.
+        PaymentEvent.objects.bulk_create(
+            [PaymentEvent(stripe_event_id="evt_part_1", stripe_created_at=created)],
+            ignore_conflicts=True,
+        )
+        with pytest.raises(IntegrityError), transaction.atomic():
+            PaymentEvent.objects.create(stripe_event_id="evt_part_1", stripe_created_at=created)
+        assert PaymentEvent.objects.count() == 2
+
+    def test_notification_log_keeps_foreign_key(self, user):
+        NotificationLog.objects.create(
+            user=user, channel="email", subject="Hi", recipient=user.email, success=True
+        )
+        spec = partitions.PARTITIONED_TABLES[1]
+        names = _index_and_fk_names(spec.table)
+        assert any("_fk_" in name for name in names)
+
+        assert partitions.convert_to_partitioned(spec, NOW, months_ahead=1) == 1
+        assert _index_and_fk_names(spec.table) == names
+        assert partitions.maintain_partitions(now=NOW, months_ahead=1, dry_run=True)[
+            spec.table
+        ] == {
+            "created": [],
+            "dropped": [],
+            "pruned": 0,
+        }
+
+    def test_creating_a_partition_moves_its_rows_out_of_the_default(self):
+        partitions.convert_to_partitioned(PAYMENT_EVENTS, NOW, months_ahead=1)
+        december = datetime.datetime(2026, 12, 5, tzinfo=datetime.UTC)
+        early = PaymentEvent.objects.create(stripe_event_id="evt_dec", stripe_created_at=december)
+
+        created = partitions.ensure_partitions(PAYMENT_EVENTS, december, months_ahead=0)
+
+        assert created == [partitions.partition_name(PAYMENT_EVENTS.table, december.date())]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM orders_paymentevent WHERE id = %s",
+                [early.pk],
+            )
+            assert cursor.fetchone()[0] == created[0]
+            cursor.execute("SELECT count(*) FROM orders_paymentevent_default")
+            assert cursor.fetchone()[0] == 0
+        assert PaymentEvent.objects.get(stripe_event_id="evt_dec").pk == early.pk
+
+    def test_expired_rows_are_pruned_from_the_default_partition(self, settings):
+        settings.PAYMENT_EVENT_RETENTION_DAYS = 90
+        partitions.convert_to_partitioned(PAYMENT_EVENTS, NOW, months_ahead=1)
+        backfilled = datetime.datetime(2025, 1, 10, tzinfo=datetime.UTC)
+        for event_id, status in (("evt_old_done", "processed"), ("evt_old_failed", "failed")):
+            PaymentEvent.objects.create(
+                stripe_event_id=event_id, stripe_created_at=backfilled, status=status
+            )
+        PaymentEvent.objects.create(
+            stripe_event_id="evt_future",
+            stripe_created_at=datetime.datetime(2027, 6, 1, tzinfo=datetime.UTC),
+            status="processed",
+        )
+
+        assert partitions.prune_default_partition(PAYMENT_EVENTS, NOW, dry_run=True) == 1
+        assert PaymentEvent.objects.count() == 3
+        assert partitions.prune_default_partition(PAYMENT_EVENTS, NOW) == 1
+        assert set(PaymentEvent.objects.values_list("stripe_event_id", flat=True)) == {
+            "evt_old_failed",
+            "evt_future",
+        }
@@ -1,10 +1,18 @@
 """Phase 0 — smoke tests: project boots, User model works, core pages respond."""
 
+import re
+from pathlib import Path
+from unittest.mock import patch
+
 import pytest
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
 from django.urls import reverse
 
+from config.cache import build_caches
+from config.db import database_options
+
 User = get_user_model()
 
 
@@ -101,3 +109,72 @@ class TestPublicPages:
         url = reverse("account_signup")
         response = client.get(url)
         assert response.status_code == 200
+
+
+# ---------------------------------------------------------------------------
+# Cache configuration
+# ---------------------------------------------------------------------------
+class TestCacheProfiles:
+    def test_redis_profile_defines_every_alias(self):
+        caches = build_caches("redis", "redis://cache:6379/1")
+        assert set(caches) == {"default", "throttle", "sessions", "fragments"}
+        assert all(c["LOCATION"] == "redis://cache:6379/1" for c in caches.values())
+        assert len({c["KEY_PREFIX"] for c in caches.values()}) == 4
+
+    def test_locmem_profile_keeps_aliases_separate(self):
+        caches = build_caches("locmem")
+        assert set(caches) == {"default", "throttle", "sessions", "fragments"}
+        assert len({c["LOCATION"] for c in caches.values()}) == 4
+
+    def test_unknown_backend_is_rejected(self):
+        with pytest.raises(ValueError):
+            build_caches("memcached")
+
+    @pytest.mark.django_db
+    def test_api_throttle_counts_in_throttle_alias(self, client):
+        from django.core.cache import cache, caches
+
+        client.get("/api/v1/plans/")
+        assert any(key for key in caches["throttle"]._cache if "throttle_anon" in key)
+        assert not any(key for key in cache._cache if "throttle_anon" in key)
+
+
+class TestDatabaseOptions:
+    PG = "django.db.backends.postgresql"
+
+    @pytest.fixture(autouse=True)
+    def _pool_driver_installed(self):
+        with patch("config.db.find_spec", return_value=object()):
+            yield
+
+    def test_persistent_mode_has_no_pool(self):
+        assert database_options(self.PG, False, "web") == {}
+
+    def test_pool_is_ignored_for_sqlite(self):
+        assert database_options("django.db.backends.sqlite3", True, "web") == {}
+
+    def test_pool_sized_per_process_type(self):
+        web = database_options(self.PG, True, "web")["pool"]
+        periodic = database_options(self.PG, True, "periodic")["pool"]
+        assert (web["min_size"], web["max_size"]) == (2, 4)
+        assert (periodic["min_size"], periodic["max_size"]) == (1, 1)
+
+    def test_power_pool_covers_its_worker_threads(self):
+        makefile = (Path(settings.BASE_DIR) / "Makefile").read_text()
+        target = makefile.split("worker-power:", 1)[1].split("\n\n", 1)[0]
+        threads = int(re.search(r"--concurrency=(\d+)", target)[1])
+        assert "PROCESS_TYPE=power" in target
+        assert database_options(self.PG, True, "power")["pool"]["max_size"] >= threads
+
+    def test_explicit_sizes_override_defaults(self):
+        pool = database_options(self.PG, True, "worker", min_size=3, max_size=8)["pool"]
+        assert (pool["min_size"], pool["max_size"]) == (3, 8)
+
+    def test_unknown_process_type_is_rejected(self):
+        with pytest.raises(ValueError):
+            database_options(self.PG, True, "gateway")
+
+    def test_pool_without_psycopg3_fails_clearly(self):
+        with patch("config.db.find_spec", return_value=None):
+            with pytest.raises(ValueError, match="psycopg"):
+                database_options(self.PG, True, "web")
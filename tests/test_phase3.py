@@ -16,6 +16,7 @@ from orders.tasks import (
     send_checkout_success_email_task,
     send_subscription_canceled_email_task,
 )
+from orders.webhooks import handle_event
 from services.models import ServicePlan
 from users.models import SubscriptionTier
 
@@ -261,10 +262,23 @@ class TestStripeWebhook:
         )
         assert resp.status_code == 400
 
+    @patch("orders.views.stripe.Webhook.construct_event")
+    def test_webhook_rejects_event_without_created_time(self, mock_construct, client, db):
+        """The created time keys the partitioned table; now() would differ per delivery."""
+        mock_construct.return_value = {"id": "evt_no_time", "type": "test", "data": {}}
+        resp = _build_webhook_request(client, {"id": "evt_no_time"})
+        assert resp.status_code == 400
+        assert not PaymentEvent.objects.filter(stripe_event_id="evt_no_time").exists()
+
     @patch("orders.views.stripe.Webhook.construct_event")
     def test_webhook_idempotency(self, mock_construct, client, db):
         """Second delivery of same event_id must return 200 and not duplicate rows."""
-        event = {"id": "evt_dup_001", "type": "payment_intent.succeeded", "data": {"object": {}}}
+        event = {
+            "id": "evt_dup_001",
+            "type": "payment_intent.succeeded",
+            "created": 1_700_000_000,
+            "data": {"object": {}},
+        }
         mock_construct.return_value = event
 
         # Pre-seed the event as already processed
@@ -281,7 +295,12 @@ class TestStripeWebhook:
     @patch("orders.views.stripe.Webhook.construct_event")
     def test_webhook_records_unhandled_event(self, mock_construct, client, db):
         """Unrecognised event types should still be logged and return 200."""
-        event = {"id": "evt_unknown_001", "type": "some.unknown.event", "data": {"object": {}}}
+        event = {
+            "id": "evt_unknown_001",
+            "type": "some.unknown.event",
+            "created": 1_700_000_000,
+            "data": {"object": {}},
+        }
         mock_construct.return_value = event
 
         resp = _build_webhook_request(client, event)
@@ -296,6 +315,7 @@ class TestStripeWebhook:
         event = {
             "id": "evt_checkout_001",
             "type": "checkout.session.completed",
+            "created": 1_700_000_000,
             "data": {"object": {"customer": "cus_x", "subscription": "sub_x", "metadata": {}}},
         }
         mock_construct.return_value = event
@@ -317,6 +337,7 @@ class TestStripeWebhook:
         event = {
             "id": "evt_cancel_001",
             "type": "customer.subscription.deleted",
+            "created": 1_700_000_000,
             "data": {
                 "object": {
                     "id": "sub_del_001",
@@ -341,6 +362,43 @@ class TestStripeWebhook:
         user.refresh_from_db()
         assert user.subscription_tier == SubscriptionTier.FREE
 
+    @staticmethod
+    def _subscription_event(event_id, created, status):
+        return {
+            "id": event_id,
+            "type": "customer.subscription.updated",
+            "created": created,
+            "data": {
+                "object": {
+                    "id": "sub_order_001",
+                    "customer": "cus_test_123",
+                    "status": status,
+                    "items": {"data": [{"price": {"id": "price_test_starter"}}]},
+                }
+            },
+        }
+
+    @patch("orders.webhooks._queue_subscription_canceled_email")
+    def test_late_subscription_event_does_not_overwrite_newer_state(
+        self, mock_email, user, customer, plan
+    ):
+        handle_event(self._subscription_event("evt_new", 1_700_000_100, "active"))
+        handle_event(self._subscription_event("evt_old", 1_700_000_000, "canceled"))
+
+        sub = Subscription.objects.get(stripe_subscription_id="sub_order_001")
+        assert sub.status == SubscriptionStatus.ACTIVE
+        assert sub.last_event_at.timestamp() == 1_700_000_100
+        user.refresh_from_db()
+        assert user.subscription_tier == SubscriptionTier.STARTER
+        mock_email.assert_not_called()
+
+    def test_newer_subscription_event_is_applied(self, customer):
+        handle_event(self._subscription_event("evt_first", 1_700_000_000, "active"))
+        handle_event(self._subscription_event("evt_second", 1_700_000_100, "past_due"))
+        sub = Subscription.objects.get(stripe_subscription_id="sub_order_001")
+        assert sub.status == SubscriptionStatus.PAST_DUE
+        assert sub.last_event_at.timestamp() == 1_700_000_100
+
 
 @pytest.mark.django_db
 class TestTransactionalEmailTasks:
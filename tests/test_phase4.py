@@ -68,6 +68,25 @@ class TestTicketModel:
         TicketMessage.objects.create(ticket=ticket, sender=ticket.user, body="Another msg")
         assert ticket.message_count == 2
 
+    def test_message_summary_annotations(self, ticket, user):
+        TicketMessage.objects.create(
+            ticket=ticket, sender=user, body="We're on it.", is_staff_reply=True
+        )
+        empty = Ticket.objects.create(user=user, subject="No thread yet")
+        rows = {t.pk: t for t in Ticket.objects.with_message_summary()}
+
+        assert rows[ticket.pk].message_count == 2
+        assert rows[ticket.pk].last_message_is_staff is True
+        assert rows[ticket.pk].last_message_at == ticket.messages.last().created_at
+        assert rows[empty.pk].message_count == 0
+        assert rows[empty.pk].last_message_at is None
+        assert rows[empty.pk].last_message_is_staff is None
+
+    def test_message_count_uses_prefetched_thread(self, ticket, django_assert_num_queries):
+        ticket = Ticket.objects.prefetch_related("messages").get(pk=ticket.pk)
+        with django_assert_num_queries(0):
+            assert ticket.message_count == 1
+
     def test_get_absolute_url(self, ticket):
         url = ticket.get_absolute_url()
         assert str(ticket.pk) in url
@@ -127,6 +146,18 @@ class TestTicketListView:
         resp = client.get(LIST_URL)
         assert b"Other user" not in resp.content
 
+    def test_list_query_count_is_independent_of_thread_size(
+        self, client, user, ticket, django_assert_max_num_queries
+    ):
+        TicketMessage.objects.bulk_create(
+            TicketMessage(ticket=ticket, sender=user, body=f"Update {n}") for n in range(20)
+        )
+        Ticket.objects.bulk_create(Ticket(user=user, subject=f"Ticket {n}") for n in range(14))
+        client.force_login(user)
+        with django_assert_max_num_queries(5):
+            resp = client.get(LIST_URL)
+        assert b'<td class="px-6 py-4 text-gray-500">21</td>' in resp.content
+
     def test_list_empty_state_renders(self, client_logged_in):
         resp = client_logged_in.get(LIST_URL)
         assert resp.status_code == 200
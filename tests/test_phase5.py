@@ -280,7 +280,7 @@ def _make_stripe_sub_dict(sub_id="sub_new_001", status="active", price_id="price
 
 @pytest.mark.django_db
 class TestHandleCheckoutCompleted:
-    @patch("orders.webhooks.stripe.Subscription.retrieve")
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
     @patch("orders.webhooks._queue_checkout_success_email")
     @patch("orders.webhooks._queue_provisioning")
     def test_creates_order_with_correct_fields(
@@ -306,7 +306,7 @@ class TestHandleCheckoutCompleted:
         assert order.currency == "usd"
         assert order.stripe_payment_intent_id == "pi_test_001"
 
-    @patch("orders.webhooks.stripe.Subscription.retrieve")
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
     @patch("orders.webhooks._queue_checkout_success_email")
     @patch("orders.webhooks._queue_provisioning")
     def test_queues_provisioning_for_paid_plan_with_tier(
@@ -325,7 +325,7 @@ class TestHandleCheckoutCompleted:
         _handle_checkout_completed(session)
         mock_prov.assert_called_once()
 
-    @patch("orders.webhooks.stripe.Subscription.retrieve")
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
     @patch("orders.webhooks._queue_checkout_success_email")
     @patch("orders.webhooks._queue_provisioning")
     def test_no_provisioning_for_plan_without_tier_key(
@@ -344,7 +344,7 @@ class TestHandleCheckoutCompleted:
         _handle_checkout_completed(session)
         mock_prov.assert_not_called()
 
-    @patch("orders.webhooks.stripe.Subscription.retrieve")
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
     @patch("orders.webhooks._queue_checkout_success_email")
     @patch("orders.webhooks._queue_provisioning")
     def test_skips_unknown_customer(self, mock_prov, mock_email, mock_stripe_retrieve, db):
@@ -357,7 +357,7 @@ class TestHandleCheckoutCompleted:
         assert Order.objects.count() == 0
         mock_prov.assert_not_called()
 
-    @patch("orders.webhooks.stripe.Subscription.retrieve")
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
     @patch("orders.webhooks._queue_checkout_success_email")
     @patch("orders.webhooks._queue_provisioning")
     def test_skips_when_no_customer_or_subscription(
@@ -367,7 +367,7 @@ class TestHandleCheckoutCompleted:
         mock_stripe_retrieve.assert_not_called()
         assert Order.objects.count() == 0
 
-    @patch("orders.webhooks.stripe.Subscription.retrieve")
+    @patch("orders.stripe_cache.stripe.Subscription.retrieve")
     @patch("orders.webhooks._queue_checkout_success_email")
     @patch("orders.webhooks._queue_provisioning")
     def test_updates_user_tier_on_checkout(
@@ -471,7 +471,7 @@ class TestHandleEventDispatch:
                 "data": {"object": {"id": "cs_xyz"}},
             }
         )
-        mock_handler.assert_called_once_with({"id": "cs_xyz"})
+        mock_handler.assert_called_once_with({"id": "cs_xyz"}, None)
 
     @patch("orders.webhooks._handle_subscription_change")
     def test_routes_subscription_updated(self, mock_handler):
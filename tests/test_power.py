@@ -0,0 +1,541 @@
+"""
+VPS power action tests — queued operations, transitional instance states,
+the worker tasks, polling / long-polling, stale operation expiry and bulk
+actions.
+"""
+
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import (
+    Customer,
+    Order,
+    OrderStatus,
+    ProvisioningJob,
+    ProvisioningStatus,
+    VPSInstance,
+    VPSInstanceStatus,
+    VPSOperation,
+    VPSOperationStatus,
+)
+from orders.periodic import expire_stale_power_operations
+from orders.power import (
+    DONE_KEY,
+    RETRY_AFTER,
+    PowerActionConflict,
+    bulk_chunk_size,
+    request_bulk_power_action,
+    request_power_action,
+)
+from orders.provisioning import DemoProvider
+from orders.tasks import vps_bulk_power_action_task, vps_power_action_task
+from services.models import ServicePlan
+from users.models import UserDashboardSummary
+
+
+@pytest.fixture
+def customer(db, user):
+    return Customer.objects.create(user=user, stripe_customer_id="cus_power")
+
+
+@pytest.fixture
+def instance(customer):
+    plan = ServicePlan.objects.create(
+        name="Starter", slug="starter", price_monthly="9.00", tier_key="starter"
+    )
+    order = Order.objects.create(customer=customer, service_plan=plan, status=OrderStatus.PAID)
+    job = ProvisioningJob.objects.create(
+        order=order, provider="demo", status=ProvisioningStatus.READY
+    )
+    return VPSInstance.objects.create(
+        provisioning_job=job,
+        customer=customer,
+        hostname="vps-power.ez-solutions.dev",
+        proxmox_vmid=31337,
+        status=VPSInstanceStatus.RUNNING,
+    )
+
+
+@pytest.fixture
+def api(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def mock_enqueue():
+    with patch("orders.tasks.vps_power_action_task.apply_async") as apply_async:
+        yield apply_async
+
+
+@pytest.fixture(autouse=True)
+def mock_bulk_enqueue():
+    with patch("orders.tasks.vps_bulk_power_action_task.apply_async") as apply_async:
+        yield apply_async
+
+
+def _action_url(instance):
+    return f"/api/v1/vps/{instance.pk}/action/"
+
+
+def _status(instance):
+    instance.refresh_from_db(fields=["status"])
+    return instance.status
+
+
+# ---------------------------------------------------------------------------
+# 1. Requesting an action — API and web view
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestRequestPowerAction:
+    def test_api_returns_202_with_the_operation(
+        self, api, instance, mock_enqueue, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = api.post(_action_url(instance), {"action": "restart"}, format="json")
+        assert resp.status_code == 202
+        body = resp.json()
+        assert body["status"] == VPSOperationStatus.PENDING
+        assert body["instance_status"] == VPSInstanceStatus.RESTARTING
+        assert resp["Location"] == f"/api/v1/vps/operations/{body['id']}/"
+        assert resp["Retry-After"] == str(RETRY_AFTER)
+        assert _status(instance) == VPSInstanceStatus.RESTARTING
+        mock_enqueue.assert_called_once_with(args=[body["id"]], ignore_result=True)
+
+    def test_no_provider_call_in_the_request(self, api, instance):
+        with patch.object(DemoProvider, "stop") as stop:
+            assert api.post(_action_url(instance), {"action": "stop"}).status_code == 202
+        stop.assert_not_called()
+
+    def test_action_invalid_for_status(self, api, instance):
+        resp = api.post(_action_url(instance), {"action": "start"}, format="json")
+        assert resp.status_code == 400
+        assert "Cannot start a running instance" in resp.json()["detail"]
+        assert not VPSOperation.objects.exists()
+
+    def test_action_in_flight_conflicts(self, api, instance):
+        assert api.post(_action_url(instance), {"action": "stop"}).status_code == 202
+        resp = api.post(_action_url(instance), {"action": "restart"}, format="json")
+        assert resp.status_code == 409
+        assert VPSOperation.objects.count() == 1
+
+    def test_second_unfinished_operation_is_rejected_by_the_database(self, instance):
+        request_power_action(instance, "stop")
+        VPSInstance.objects.filter(pk=instance.pk).update(status=VPSInstanceStatus.RUNNING)
+        instance.status = VPSInstanceStatus.RUNNING
+        with pytest.raises(PowerActionConflict):
+            request_power_action(instance, "restart")
+        assert _status(instance) == VPSInstanceStatus.RUNNING
+
+    def test_other_users_instance_is_not_found(self, instance, admin_user):
+        client = APIClient()
+        client.force_authenticate(user=admin_user)
+        assert client.post(_action_url(instance), {"action": "stop"}).status_code == 404
+
+    def test_enqueue_failure_fails_the_operation(
+        self, api, instance, mock_enqueue, django_capture_on_commit_callbacks
+    ):
+        mock_enqueue.side_effect = OSError("broker down")
+        with django_capture_on_commit_callbacks(execute=True):
+            op_id = api.post(_action_url(instance), {"action": "stop"}).json()["id"]
+        operation = VPSOperation.objects.get(pk=op_id)
+        assert operation.status == VPSOperationStatus.FAILED
+        assert "could not be queued" in operation.error_message
+        assert _status(instance) == VPSInstanceStatus.RUNNING
+
+    def test_web_view_queues_and_redirects(self, client_logged_in, instance):
+        resp = client_logged_in.post(
+            reverse("orders:vps_action", args=[instance.pk]), {"action": "restart"}
+        )
+        assert resp.status_code == 302
+        assert _status(instance) == VPSInstanceStatus.RESTARTING
+        assert VPSOperation.objects.get().action == "restart"
+        assert "restarting" in str(list(get_messages(resp.wsgi_request))[0])
+
+        detail = client_logged_in.get(reverse("orders:vps_detail", args=[instance.pk]))
+        assert b"Restarting" in detail.content
+        assert b'http-equiv="refresh"' in detail.content
+
+    def test_dashboard_summary_counts_transitional_instances(self, user, instance):
+        request_power_action(instance, "stop")
+        summary = UserDashboardSummary.objects.get(user=user)
+        assert summary.vps_counts == {"stopping": 1}
+        assert summary.services[0]["status"] == "stopping"
+
+
+# ---------------------------------------------------------------------------
+# 2. Running an action — vps_power_action_task
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestRunPowerAction:
+    def test_success_settles_the_instance(self, instance):
+        operation = request_power_action(instance, "stop")
+        assert vps_power_action_task.run(operation.pk) == VPSOperationStatus.SUCCEEDED
+        operation.refresh_from_db()
+        assert operation.status == VPSOperationStatus.SUCCEEDED
+        assert operation.started_at and operation.completed_at
+        assert _status(instance) == VPSInstanceStatus.STOPPED
+        assert cache.get(DONE_KEY.format(pk=operation.pk)) == VPSOperationStatus.SUCCEEDED
+
+    def test_provider_refusal_restores_the_previous_status(self, instance):
+        operation = request_power_action(instance, "restart")
+        with patch.object(DemoProvider, "restart", return_value=False):
+            assert vps_power_action_task.run(operation.pk) == VPSOperationStatus.FAILED
+        operation.refresh_from_db()
+        assert "rejected the restart" in operation.error_message
+        assert _status(instance) == VPSInstanceStatus.RUNNING
+
+    def test_provider_error_is_recorded(self, instance):
+        operation = request_power_action(instance, "stop")
+        with patch.object(DemoProvider, "stop", side_effect=RuntimeError("hypervisor offline")):
+            vps_power_action_task.run(operation.pk)
+        operation.refresh_from_db()
+        assert operation.status == VPSOperationStatus.FAILED
+        assert operation.error_message == "hypervisor offline"
+
+    def test_redelivery_does_not_repeat_the_action(self, instance):
+        operation = request_power_action(instance, "stop")
+        with patch.object(DemoProvider, "stop", return_value=True) as stop:
+            vps_power_action_task.run(operation.pk)
+            assert vps_power_action_task.run(operation.pk) is None
+        stop.assert_called_once()
+
+    def test_stale_operations_expire(self, instance):
+        operation = request_power_action(instance, "stop")
+        VPSOperation.objects.filter(pk=operation.pk).update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+        assert expire_stale_power_operations.run() == 1
+        operation.refresh_from_db()
+        assert operation.status == VPSOperationStatus.FAILED
+        assert _status(instance) == VPSInstanceStatus.RUNNING
+        assert vps_power_action_task.run(operation.pk) is None
+
+    def _running_for_an_hour(self, operation):
+        VPSOperation.objects.filter(pk=operation.pk).update(
+            status=VPSOperationStatus.RUNNING, created_at=timezone.now() - timedelta(hours=1)
+        )
+
+    def test_expired_action_the_vm_completed_succeeds(self, instance):
+        operation = request_power_action(instance, "restart")
+        self._running_for_an_hour(operation)
+        assert expire_stale_power_operations.run() == 1
+        operation.refresh_from_db()
+        assert operation.status == VPSOperationStatus.SUCCEEDED
+        assert _status(instance) == VPSInstanceStatus.RUNNING
+
+    def test_expired_action_the_vm_did_not_complete_fails(self, instance):
+        operation = request_power_action(instance, "stop")
+        self._running_for_an_hour(operation)
+        with patch.object(DemoProvider, "status", return_value="running") as status:
+            assert expire_stale_power_operations.run() == 1
+        status.assert_called_once()
+        operation.refresh_from_db()
+        assert operation.status == VPSOperationStatus.FAILED
+        assert _status(instance) == VPSInstanceStatus.RUNNING
+
+    def test_expiry_fails_the_action_when_the_provider_errors(self, instance):
+        operation = request_power_action(instance, "restart")
+        self._running_for_an_hour(operation)
+        with patch.object(DemoProvider, "status", side_effect=RuntimeError("API down")):
+            assert expire_stale_power_operations.run() == 1
+        operation.refresh_from_db()
+        assert operation.status == VPSOperationStatus.FAILED
+
+
+# ---------------------------------------------------------------------------
+# 3. Polling — GET /api/v1/vps/operations/{pk}/
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestOperationPolling:
+    def test_poll_reports_the_outcome(self, api, instance):
+        op_id = api.post(_action_url(instance), {"action": "stop"}).json()["id"]
+        vps_power_action_task.run(op_id)
+        resp = api.get(f"/api/v1/vps/operations/{op_id}/")
+        body = resp.json()
+        assert body["status"] == VPSOperationStatus.SUCCEEDED
+        assert "Retry-After" not in resp
+        assert body["instance_status"] == VPSInstanceStatus.STOPPED
+        assert body["error"] == ""
+
+    def test_other_users_operation_is_not_found(self, instance, admin_user):
+        operation = request_power_action(instance, "stop")
+        client = APIClient()
+        client.force_authenticate(user=admin_user)
+        assert client.get(f"/api/v1/vps/operations/{operation.pk}/").status_code == 404
+
+    def test_long_poll_wakes_when_the_operation_finishes(self, api, instance):
+        operation = request_power_action(instance, "stop")
+        # A worker's writes would be invisible inside this test's transaction,
+        # so finish the operation here and set only its cache flag "later",
+        # from another thread, once the request is already waiting.
+        key = DONE_KEY.format(pk=operation.pk)
+
+        def finish():
+            VPSOperation.objects.filter(pk=operation.pk).update(status=VPSOperationStatus.SUCCEEDED)
+
+        with patch("orders.power.time.sleep", side_effect=lambda _: finish()) as sleep:
+            threading.Timer(0.3, cache.set, args=(key, VPSOperationStatus.SUCCEEDED)).start()
+            started = time.monotonic()
+            body = api.get(f"/api/v1/vps/operations/{operation.pk}/?wait=10").json()
+        assert sleep.called
+        assert time.monotonic() - started < 5
+        assert body["status"] == VPSOperationStatus.SUCCEEDED
+
+    def test_long_poll_is_capped(self, api, instance, settings):
+        settings.POWER_ACTION_MAX_WAIT = 0.3
+        operation = request_power_action(instance, "stop")
+        started = time.monotonic()
+        response = api.get(f"/api/v1/vps/operations/{operation.pk}/?wait=60")
+        assert time.monotonic() - started < 2
+        assert response.json()["status"] == VPSOperationStatus.PENDING
+        assert response["Retry-After"] == str(RETRY_AFTER)
+
+    def test_invalid_wait(self, api, instance):
+        operation = request_power_action(instance, "stop")
+        assert api.get(f"/api/v1/vps/operations/{operation.pk}/?wait=soon").status_code == 400
+
+
+# ---------------------------------------------------------------------------
+# 4. Bulk actions — POST /api/v1/vps/bulk-action/
+# ---------------------------------------------------------------------------
+
+BULK_URL = "/api/v1/vps/bulk-action/"
+
+
+def _fleet(customer, count, status=VPSInstanceStatus.RUNNING):
+    plan = ServicePlan.objects.get_or_create(
+        slug="starter", defaults={"name": "Starter", "price_monthly": "9.00"}
+    )[0]
+    start = VPSInstance.objects.count()
+    orders = Order.objects.bulk_create(
+        Order(customer=customer, service_plan=plan, status=OrderStatus.PAID) for _ in range(count)
+    )
+    jobs = ProvisioningJob.objects.bulk_create(
+        ProvisioningJob(order=order, provider="demo", status=ProvisioningStatus.READY)
+        for order in orders
+    )
+    return VPSInstance.objects.bulk_create(
+        VPSInstance(
+            provisioning_job=job,
+            customer=customer,
+            hostname=f"vps-bulk-{start + n}.ez-solutions.dev",
+            status=status,
+        )
+        for n, job in enumerate(jobs)
+    )
+
+
+class _SlowProvider(DemoProvider):
+    """DemoProvider whose power actions take *delay* and record their overlap."""
+
+    max_concurrency = 8
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = self.peak = 0
+
+    def restart(self, instance):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return instance.hostname != "vps-bulk-0.ez-solutions.dev"
+
+
+@pytest.mark.django_db
+class TestBulkPowerAction:
+    def test_per_instance_results_in_request_order(
+        self,
+        api,
+        customer,
+        admin_user,
+        mock_enqueue,
+        mock_bulk_enqueue,
+        django_capture_on_commit_callbacks,
+    ):
+        running = _fleet(customer, 3)
+        (stopped,) = _fleet(customer, 1, status=VPSInstanceStatus.STOPPED)
+        foreign = _fleet(Customer.objects.create(user=admin_user, stripe_customer_id="cus_x"), 1)
+        ids = [running[2].pk, stopped.pk, foreign[0].pk, running[0].pk, running[1].pk]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = api.post(BULK_URL, {"action": "restart", "ids": ids}, format="json")
+        assert resp.status_code == 202
+        body = resp.json()
+        assert (body["queued"], body["rejected"]) == (3, 2)
+        assert [r["id"] for r in body["results"]] == ids
+        by_id = {r["id"]: r for r in body["results"]}
+        assert "Cannot restart a stopped instance" in by_id[stopped.pk]["error"]
+        assert by_id[foreign[0].pk] == {
+            "id": foreign[0].pk,
+            "queued": False,
+            "operation": None,
+            "error": "Not found.",
+        }
+
+        op_ids = sorted(r["operation"] for r in body["results"] if r["queued"])
+        assert op_ids == sorted(
+            VPSOperation.objects.filter(instance__in=running).values_list("pk", flat=True)
+        )
+        assert _status(running[0]) == VPSInstanceStatus.RESTARTING
+        assert _status(foreign[0]) == VPSInstanceStatus.RUNNING
+        (call,) = mock_bulk_enqueue.call_args_list
+        assert sorted(call.kwargs["args"][0]) == op_ids
+        mock_enqueue.assert_not_called()
+
+    def test_a_single_instance_takes_the_single_action_task(
+        self, api, customer, mock_enqueue, mock_bulk_enqueue, django_capture_on_commit_callbacks
+    ):
+        _fleet(customer, 1, status=VPSInstanceStatus.STOPPED)
+        with django_capture_on_commit_callbacks(execute=True):
+            api.post(BULK_URL, {"action": "start", "status": "stopped"}, format="json")
+        mock_enqueue.assert_called_once()
+        mock_bulk_enqueue.assert_not_called()
+
+    def test_large_requests_are_split_to_fit_the_task_time_limit(
+        self, user, customer, settings, mock_bulk_enqueue, django_capture_on_commit_callbacks
+    ):
+        settings.PROXMOX_MAX_CONNECTIONS = 2
+        settings.PROXMOX_TASK_TIMEOUT, settings.PROXMOX_TIMEOUT = 100, 10
+        assert bulk_chunk_size() == 4  # two 110 s rounds of two calls in 240 s
+        fleet = _fleet(customer, 9)
+        with django_capture_on_commit_callbacks(execute=True):
+            request_bulk_power_action(user, "stop", ids=[i.pk for i in fleet], limit=500)
+        sizes = [len(call.kwargs["args"][0]) for call in mock_bulk_enqueue.call_args_list]
+        assert sizes == [4, 4, 1]
+
+    def test_a_failed_chunk_fails_only_the_unqueued_operations(
+        self, user, customer, settings, mock_bulk_enqueue, django_capture_on_commit_callbacks
+    ):
+        settings.PROXMOX_MAX_CONNECTIONS = 2
+        settings.PROXMOX_TASK_TIMEOUT, settings.PROXMOX_TIMEOUT = 200, 10
+        mock_bulk_enqueue.side_effect = [None, RuntimeError("broker down")]
+        fleet = _fleet(customer, 3)
+        with django_capture_on_commit_callbacks(execute=True):
+            request_bulk_power_action(user, "stop", ids=[i.pk for i in fleet], limit=500)
+        statuses = list(VPSOperation.objects.order_by("pk").values_list("status", flat=True))
+        assert statuses == [
+            VPSOperationStatus.PENDING,
+            VPSOperationStatus.PENDING,
+            VPSOperationStatus.FAILED,
+        ]
+
+    def test_status_filter(self, api, customer):
+        _fleet(customer, 4)
+        _fleet(customer, 2, status=VPSInstanceStatus.STOPPED)
+        body = api.post(BULK_URL, {"action": "stop", "status": "running"}).json()
+        assert body["queued"] == 4
+        assert VPSInstance.objects.filter(status=VPSInstanceStatus.STOPPING).count() == 4
+        assert VPSInstance.objects.filter(status=VPSInstanceStatus.STOPPED).count() == 2
+
+    def test_query_count_does_not_grow_with_the_fleet(self, user, customer):
+        def bulk_queries(count):
+            VPSOperation.objects.all().delete()
+            VPSInstance.objects.update(status=VPSInstanceStatus.STOPPED)
+            ids = [i.pk for i in _fleet(customer, count)]
+            with CaptureQueriesContext(connection) as ctx:
+                results = request_bulk_power_action(user, "restart", ids=ids, limit=500)
+            assert all(result.operation for result in results)
+            return len(ctx)
+
+        bulk_queries(1)  # warm the dashboard summary row
+        assert bulk_queries(40) == bulk_queries(5)
+
+    @pytest.mark.parametrize(
+        "payload",
+        [
+            {"action": "restart"},
+            {"action": "restart", "ids": [1], "status": "running"},
+            {"action": "restart", "ids": []},
+            {"action": "reboot", "ids": [1]},
+        ],
+    )
+    def test_invalid_payloads(self, api, payload):
+        assert api.post(BULK_URL, payload, format="json").status_code == 400
+
+    def test_limits(self, api, customer, settings):
+        settings.POWER_BULK_ACTION_LIMIT = 3
+        _fleet(customer, 4)
+        resp = api.post(BULK_URL, {"action": "stop", "ids": [1, 2, 3, 4]}, format="json")
+        assert resp.status_code == 400
+        resp = api.post(BULK_URL, {"action": "stop", "status": "running"}, format="json")
+        assert resp.status_code == 400
+        assert "More than 3 instances" in resp.json()["detail"]
+        assert not VPSOperation.objects.exists()
+
+    def test_nothing_queued_is_200(self, api, customer):
+        stopped = _fleet(customer, 2, status=VPSInstanceStatus.STOPPED)
+        ids = [i.pk for i in stopped]
+        resp = api.post(BULK_URL, {"action": "stop", "ids": ids}, format="json")
+        assert resp.status_code == 200
+        assert resp.json()["queued"] == 0
+
+    def test_operations_can_be_polled_together(self, api, customer, admin_user):
+        ids = [i.pk for i in _fleet(customer, 3)]
+        results = api.post(BULK_URL, {"action": "stop", "ids": ids}, format="json").json()
+        ops = [r["operation"] for r in results["results"]]
+        (other,) = _fleet(Customer.objects.create(user=admin_user, stripe_customer_id="cus_y"), 1)
+        foreign = request_power_action(other, "stop")
+
+        ids = ",".join(str(pk) for pk in [*ops, foreign.pk])
+        body = api.get(f"/api/v1/vps/operations/?ids={ids}").json()
+        assert [op["id"] for op in body] == sorted(ops)
+        assert {op["status"] for op in body} == {VPSOperationStatus.PENDING}
+        assert api.get("/api/v1/vps/operations/?ids=x").status_code == 400
+        assert api.get("/api/v1/vps/operations/").status_code == 400
+
+
+@pytest.mark.django_db
+class TestRunPowerActions:
+    def test_batch_runs_concurrently_within_the_provider_limit(self, user, customer):
+        fleet = _fleet(customer, 24)
+        results = request_bulk_power_action(user, "restart", ids=[i.pk for i in fleet], limit=500)
+        provider = _SlowProvider()
+
+        with patch("orders.power.get_provider", return_value=provider):
+            started = time.monotonic()
+            claimed = vps_bulk_power_action_task.run([r.operation.pk for r in results])
+            elapsed = time.monotonic() - started
+
+        assert claimed == 24
+        assert 1 < provider.peak <= provider.max_concurrency
+        assert elapsed < 24 * provider.delay / 2
+        statuses = dict(VPSOperation.objects.values_list("instance_id", "status"))
+        assert statuses[fleet[0].pk] == VPSOperationStatus.FAILED
+        assert list(statuses.values()).count(VPSOperationStatus.SUCCEEDED) == 23
+        assert set(VPSInstance.objects.values_list("status", flat=True)) == {
+            VPSInstanceStatus.RUNNING
+        }
+        assert cache.get(DONE_KEY.format(pk=results[1].operation.pk)) == "succeeded"
+
+    def test_batch_is_claimed_once(self, user, customer):
+        fleet = _fleet(customer, 3)
+        results = request_bulk_power_action(user, "stop", ids=[i.pk for i in fleet], limit=500)
+        op_ids = [r.operation.pk for r in results]
+        assert vps_bulk_power_action_task.run(op_ids) == 3
+        assert vps_bulk_power_action_task.run(op_ids) == 0
+        assert set(VPSInstance.objects.values_list("status", flat=True)) == {
+            VPSInstanceStatus.STOPPED
+        }
@@ -0,0 +1,251 @@
+"""
+Provisioning tests — batch submission of queued ProvisioningJobs with
+per-provider concurrency limits.
+"""
+
+import datetime
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.batch import SCHEDULED_KEY, provision_batch, schedule_batch
+from orders.models import (
+    Customer,
+    Order,
+    OrderStatus,
+    ProvisioningJob,
+    ProvisioningStatus,
+    VPSInstance,
+    VPSInstanceStatus,
+)
+from orders.periodic import provision_stranded_jobs
+from orders.provisioning import PLAN_SPECS, DemoProvider, ProvisionOperation
+from orders.tasks import provision_batch_task
+from orders.webhooks import _queue_provisioning
+from services.models import ServicePlan
+from users.models import UserDashboardSummary
+
+
+@pytest.fixture
+def plan(db):
+    return ServicePlan.objects.create(
+        name="Professional", slug="professional", price_monthly="59.00", tier_key="professional"
+    )
+
+
+@pytest.fixture
+def customer(db, user):
+    return Customer.objects.create(user=user, stripe_customer_id="cus_batch")
+
+
+@pytest.fixture(autouse=True)
+def _no_notifications():
+    with (
+        patch("orders.tasks._queue_vps_ready_notification") as ready,
+        patch("orders.tasks._queue_vps_failed_notification"),
+    ):
+        yield ready
+
+
+def _queued(customer, plan, count, provider="demo"):
+    orders = Order.objects.bulk_create(
+        Order(customer=customer, service_plan=plan, status=OrderStatus.PAID) for _ in range(count)
+    )
+    return ProvisioningJob.objects.bulk_create(
+        ProvisioningJob(order=order, provider=provider, payload={"tier_key": plan.tier_key})
+        for order in orders
+    )
+
+
+class _CountingProvider(DemoProvider):
+    """DemoProvider that records how many provision() calls overlap."""
+
+    max_concurrency = 4
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = self.peak = 0
+
+    def provision(self, job):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return {"external_id": f"ext-{job.pk}", "ip_address": "10.2.0.1", "vmid": 5000 + job.pk}
+
+
+# ---------------------------------------------------------------------------
+# 1. provision_batch — orders/batch.py
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestProvisionBatch:
+    def test_provisions_every_queued_job(self, customer, plan):
+        jobs = _queued(customer, plan, 12)
+        with patch("orders.batch.get_provider", return_value=_CountingProvider(delay=0)):
+            result = provision_batch()
+        assert (result.claimed, result.ready, result.failed) == (12, 12, 0)
+
+        assert set(ProvisioningJob.objects.values_list("status", flat=True).distinct()) == {
+            ProvisioningStatus.READY
+        }
+        instances = VPSInstance.objects.filter(provisioning_job__in=jobs)
+        assert instances.count() == 12
+        instance = instances.first()
+        assert instance.status == VPSInstanceStatus.RUNNING
+        assert instance.ram_mb == PLAN_SPECS["professional"]["ram_mb"]
+        assert instance.hostname.endswith("-professional.ez-solutions.dev")
+
+    def test_query_count_does_not_grow_with_the_batch(self, customer, plan):
+        provider = _CountingProvider(delay=0)
+
+        def batch_queries(count):
+            _queued(customer, plan, count)
+            with CaptureQueriesContext(connection) as ctx:
+                assert provision_batch().ready == count
+            return len(ctx)
+
+        with patch("orders.batch.get_provider", return_value=provider):
+            batch_queries(1)  # warm the plan catalog and the dashboard summary row
+            assert batch_queries(40) == batch_queries(5)
+
+    def test_provider_concurrency_is_bounded(self, customer, plan):
+        provider = _CountingProvider()
+        _queued(customer, plan, 12)
+        with patch("orders.batch.get_provider", return_value=provider):
+            started = time.monotonic()
+            assert provision_batch().ready == 12
+        assert 1 < provider.peak <= provider.max_concurrency
+        assert time.monotonic() - started < 12 * provider.delay
+
+    def test_mixed_outcomes(self, customer, plan):
+        ok, pending, broken = _queued(customer, plan, 3)
+
+        def provision(job):
+            if job.pk == pending.pk:
+                return ProvisionOperation(id="UPID:pve1:42")
+            if job.pk == broken.pk:
+                raise RuntimeError("Cloud API down")
+            return {"external_id": "ext", "ip_address": "10.2.0.2", "vmid": 777}
+
+        with patch.object(DemoProvider, "provision", side_effect=provision):
+            result = provision_batch()
+        assert (result.ready, result.submitted, result.failed) == (1, 1, 1)
+
+        for job in (ok, pending, broken):
+            job.refresh_from_db()
+        assert ok.status == ProvisioningStatus.READY
+        assert pending.status == ProvisioningStatus.PROVISIONING
+        assert pending.payload["operation"]["id"] == "UPID:pve1:42"
+        assert broken.status == ProvisioningStatus.FAILED
+        assert "Cloud API down" in broken.error_message
+
+    def test_unknown_provider_fails_its_jobs(self, customer, plan):
+        (job,) = _queued(customer, plan, 1, provider="nonexistent")
+        assert provision_batch().failed == 1
+        job.refresh_from_db()
+        assert job.status == ProvisioningStatus.FAILED
+
+    def test_only_queued_jobs_are_claimed(self, customer, plan):
+        queued, running = _queued(customer, plan, 2)
+        ProvisioningJob.objects.filter(pk=running.pk).update(status=ProvisioningStatus.PROVISIONING)
+        assert provision_batch().claimed == 1
+        assert provision_batch().claimed == 0
+        assert not VPSInstance.objects.filter(provisioning_job=running).exists()
+
+    @patch("orders.tasks.provision_batch_task.apply_async")
+    def test_limit_and_job_ids(self, mock_apply, customer, plan):
+        jobs = _queued(customer, plan, 4)
+        assert provision_batch(limit=3).claimed == 3
+        # A full batch schedules the next one for whatever is still queued.
+        mock_apply.assert_called_once()
+        assert provision_batch(job_ids=[jobs[0].pk]).claimed == 0
+        assert provision_batch(job_ids=[jobs[3].pk]).claimed == 1
+
+    def test_constraint_violation_fails_only_the_offending_job(self, customer, plan):
+        first, second = _queued(customer, plan, 2)
+        with patch.object(
+            DemoProvider,
+            "provision",
+            return_value={"external_id": "ext", "ip_address": "10.2.0.3", "vmid": 4242},
+        ):
+            result = provision_batch()
+        assert (result.ready, result.failed) == (1, 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert {first.status, second.status} == {
+            ProvisioningStatus.READY,
+            ProvisioningStatus.FAILED,
+        }
+        assert VPSInstance.objects.count() == 1
+
+    def test_dashboard_summary_sees_the_new_instances(self, user, customer, plan):
+        _queued(customer, plan, 3)
+        with patch("orders.batch.get_provider", return_value=_CountingProvider(delay=0)):
+            provision_batch()
+        summary = UserDashboardSummary.objects.get(user=user)
+        assert summary.vps_counts == {"running": 3}
+        assert len(summary.services) == 3
+
+
+# ---------------------------------------------------------------------------
+# 2. Scheduling from checkout
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestScheduleBatch:
+    @patch("orders.tasks.provision_batch_task.apply_async")
+    def test_a_burst_of_checkouts_schedules_one_batch(self, mock_apply, customer, plan):
+        for _ in range(5):
+            _queue_provisioning(Order.objects.create(customer=customer, service_plan=plan))
+        mock_apply.assert_called_once()
+        assert ProvisioningJob.objects.filter(status=ProvisioningStatus.QUEUED).count() == 5
+
+    @patch("orders.tasks.provision_batch_task.apply_async")
+    def test_the_task_reopens_scheduling_and_claims_the_burst(self, mock_apply, customer, plan):
+        _queued(customer, plan, 3)
+        schedule_batch()
+        assert provision_batch_task.run() == 3
+        assert cache.get(SCHEDULED_KEY) is None
+        schedule_batch()
+        assert mock_apply.call_count == 2
+
+    @patch("orders.tasks.provision_batch_task.apply_async")
+    def test_partial_batch_does_not_reschedule(self, mock_apply, customer, plan):
+        _queued(customer, plan, 2)
+        assert provision_batch(limit=3).claimed == 2
+        mock_apply.assert_not_called()
+
+    @patch("orders.tasks.provision_batch_task.apply_async")
+    def test_stranded_jobs_are_swept(self, mock_apply, customer, plan):
+        stranded, fresh = _queued(customer, plan, 2)
+        ProvisioningJob.objects.filter(pk=stranded.pk).update(
+            created_at=timezone.now() - datetime.timedelta(minutes=10)
+        )
+        # A batch task was scheduled and lost; its key still blocks scheduling.
+        cache.add(SCHEDULED_KEY, 1)
+
+        assert provision_stranded_jobs.run() == 1
+        stranded.refresh_from_db()
+        fresh.refresh_from_db()
+        assert stranded.status == ProvisioningStatus.READY
+        assert fresh.status == ProvisioningStatus.QUEUED
+
+    @patch("orders.tasks.provision_batch_task.apply_async", side_effect=OSError("broker down"))
+    def test_enqueue_failure_provisions_inline(self, mock_apply, customer, plan):
+        order = Order.objects.create(customer=customer, service_plan=plan)
+        _queue_provisioning(order)
+        job = order.provisioning_jobs.get()
+        assert job.status == ProvisioningStatus.READY
+        assert cache.get(SCHEDULED_KEY) is None
@@ -0,0 +1,512 @@
+"""
+Proxmox provider tests — the pooled API client and ProxmoxProvider, run
+against a local fake hypervisor speaking the Proxmox VE REST API.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from orders.models import (
+    Customer,
+    Order,
+    OrderStatus,
+    ProvisioningJob,
+    ProvisioningStatus,
+    VPSInstance,
+)
+from orders.periodic import poll_provisioning_operations
+from orders.provisioning import (
+    PLAN_SPECS,
+    OperationState,
+    ProvisionOperation,
+    ProxmoxProvider,
+    get_provider,
+)
+from orders.proxmox import ProxmoxClient, ProxmoxError, get_client, reset_client
+from orders.tasks import provision_vps_task
+from services.models import ServicePlan
+
+# ---------------------------------------------------------------------------
+# Fake hypervisor
+# ---------------------------------------------------------------------------
+
+
+class FakeProxmox:
+    """In-memory cluster state behind the fake API.
+
+    Clone tasks report "running" for ``clone_polls`` status checks before
+    finishing, other tasks for ``task_polls``, and every task ends with
+    ``task_exitstatus``; ``agent_up`` is whether the guest agent answers;
+    ``failures`` is a list of HTTP statuses returned (and consumed)
+    ahead of the real response; ``delay`` sleeps before every response.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.vms = {"9000": {"status": "stopped", "template": True}}
+        self.tasks = {}
+        self.tickets = set()
+        self.logins = 0
+        self.connections = 0
+        self.requests = []
+        self.failures = []
+        self.clone_polls = 1
+        self.task_polls = 0
+        self.task_exitstatus = "OK"
+        self.agent_up = True
+        self.delay = 0.0
+
+    def login(self):
+        self.logins += 1
+        ticket = f"PVE:root@pam:{self.logins}"
+        self.tickets.add(ticket)
+        return {"ticket": ticket, "CSRFPreventionToken": f"csrf-{self.logins}"}
+
+    def task(self, node, kind, vmid, polls=None):
+        upid = f"UPID:{node}:{len(self.tasks):08X}:0:0:{kind}:{vmid}:root@pam:"
+        self.tasks[upid] = {"polls": 0, "running": polls, "exitstatus": self.task_exitstatus}
+        return upid
+
+    def handle(self, method, path, headers, form):
+        if path == "/api2/json/access/ticket" and method == "POST":
+            return 200, self.login()
+
+        cookie = headers.get("Cookie", "")
+        token = headers.get("Authorization", "")
+        ticket = cookie.removeprefix("PVEAuthCookie=")
+        if not (ticket in self.tickets or token.startswith("PVEAPIToken=")):
+            return 401, None
+        if ticket and method != "GET" and not headers.get("CSRFPreventionToken"):
+            return 401, None
+
+        if path == "/api2/json/cluster/resources":
+            return 200, [
+                {"vmid": int(vmid), "node": "pve", "type": "qemu", "status": vm["status"]}
+                | ({"template": 1} if vm.get("template") else {})
+                for vmid, vm in self.vms.items()
+            ]
+        if m := re.fullmatch(r"/api2/json/nodes/(\w+)/qemu/(\d+)/clone", path):
+            node, newid = m[1], form["newid"]
+            if newid in self.vms:
+                return 500, None
+            self.vms[newid] = {"status": "stopped", "name": form["name"], "config": {}}
+            return 200, self.task(node, "qmclone", newid)
+        if m := re.fullmatch(r"/api2/json/nodes/\w+/tasks/(.+)/status", path):
+            task = self.tasks[m[1]]
+            task["polls"] += 1
+            running = self.clone_polls if task["running"] is None else task["running"]
+            if task["polls"] <= running:
+                return 200, {"status": "running"}
+            return 200, {"status": "stopped", "exitstatus": task["exitstatus"]}
+        if m := re.fullmatch(r"/api2/json/nodes/(\w+)/qemu/(\d+)(/.*)?", path):
+            node, vmid = m[1], m[2]
+            vm = self.vms.get(vmid)
+            if vm is None:
+                return 500, None
+            action = m[3] or ""
+            if action == "/status/current":
+                return 200, {
+                    "status": vm["status"],
+                    "vmid": int(vmid),
+                    "uptime": vm.get("uptime", 0),
+                }
+            if action == "/config" and method == "PUT":
+                vm["config"].update(form)
+                return 200, None
+            if action == "/resize" and method == "PUT":
+                vm["config"]["size"] = form["size"]
+                return 200, None
+            if action in ("/status/start", "/status/reboot") and method == "POST":
+                vm["status"] = "running"
+                return 200, self.task(node, f"qm{action[8:]}", vmid, self.task_polls)
+            if action in ("/status/shutdown", "/status/stop") and method == "POST":
+                vm["status"] = "stopped"
+                return 200, self.task(node, f"qm{action[8:]}", vmid, self.task_polls)
+            if action == "/agent/network-get-interfaces":
+                if not self.agent_up:
+                    return 500, None  # QEMU guest agent is not running
+                return 200, {
+                    "result": [
+                        {
+                            "name": name,
+                            "ip-addresses": [{"ip-address-type": "ipv4", "ip-address": ip}],
+                        }
+                        for name, ip in (("lo", "127.0.0.1"), ("eth0", "203.0.113.7"))
+                    ]
+                }
+            if action == "" and method == "DELETE":
+                del self.vms[vmid]
+                return 200, self.task(node, "qmdestroy", vmid, self.task_polls)
+        return 501, None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        form = {k: v[0] for k, v in parse_qs(body).items()}
+        time.sleep(fake.delay)
+        with fake.lock:
+            fake.requests.append((self.command, url.path))
+            if fake.failures:
+                status, data = fake.failures.pop(0), None
+            else:
+                status, data = fake.handle(self.command, url.path, self.headers, form)
+        payload = json.dumps({"data": data}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients that time out hang up mid-response
+
+
+@pytest.fixture
+def fake_proxmox(settings):
+    fake = FakeProxmox()
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.fake = fake
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    settings.PROXMOX_URL = f"http://127.0.0.1:{server.server_port}"
+    settings.PROXMOX_USERNAME = "root@pam"
+    settings.PROXMOX_PASSWORD = "secret"  # noqa: S105
+    settings.PROXMOX_TOKEN_ID = ""
+    settings.PROXMOX_RETRY_BACKOFF = 0
+    settings.PROXMOX_TEMPLATES = {"ubuntu-22.04": "9000"}
+    reset_client()
+    yield fake
+    reset_client()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def job(db, user):
+    customer = Customer.objects.create(user=user, stripe_customer_id="cus_pve")
+    plan = ServicePlan.objects.create(
+        name="Professional", slug="professional", price_monthly="59.00", tier_key="professional"
+    )
+    order = Order.objects.create(customer=customer, service_plan=plan, status=OrderStatus.PAID)
+    return ProvisioningJob.objects.create(
+        order=order, provider="proxmox", payload={"tier_key": "professional"}
+    )
+
+
+# ---------------------------------------------------------------------------
+# 1. ProxmoxClient — pooling, auth, retries, timeouts
+# ---------------------------------------------------------------------------
+
+
+class TestProxmoxClient:
+    def test_requests_share_one_connection(self, fake_proxmox):
+        client = get_client()
+        for _ in range(20):
+            client.get("/nodes/pve/qemu/9000/status/current")
+        assert fake_proxmox.connections == 1
+        assert get_client() is client
+
+    def test_auth_ticket_is_reused(self, fake_proxmox):
+        client = get_client()
+        client.get("/nodes/pve/qemu/9000/status/current")
+        client.post("/nodes/pve/qemu/9000/status/start")
+        assert fake_proxmox.logins == 1
+
+    def test_expired_ticket_is_renewed_once(self, fake_proxmox):
+        client = get_client()
+        client.get("/nodes/pve/qemu/9000/status/current")
+        fake_proxmox.tickets.clear()
+        assert client.get("/nodes/pve/qemu/9000/status/current")["status"] == "stopped"
+        assert fake_proxmox.logins == 2
+
+    def test_api_token_skips_the_ticket(self, fake_proxmox, settings):
+        settings.PROXMOX_TOKEN_ID = "ez@pve!provisioner"
+        settings.PROXMOX_TOKEN_SECRET = "0000-token"  # noqa: S105
+        reset_client()
+        get_client().post("/nodes/pve/qemu/9000/status/start")
+        assert fake_proxmox.logins == 0
+
+    def test_reads_are_retried_on_5xx(self, fake_proxmox):
+        client = get_client()
+        client.get("/nodes/pve/qemu/9000/status/current")
+        fake_proxmox.failures = [503, 502]
+        assert client.get("/nodes/pve/qemu/9000/status/current")["status"] == "stopped"
+
+    @pytest.mark.parametrize(
+        "method, path",
+        [
+            ("POST", "/nodes/pve/qemu/9000/status/start"),
+            ("PUT", "/nodes/pve/qemu/9000/config"),
+            ("DELETE", "/nodes/pve/qemu/9000"),
+        ],
+    )
+    def test_writes_are_not_retried_once_sent(self, fake_proxmox, method, path):
+        client = get_client()
+        client.get("/nodes/pve/qemu/9000/status/current")
+        fake_proxmox.failures = [503]
+        with pytest.raises(ProxmoxError) as exc_info:
+            client.request(method, path)
+        assert exc_info.value.status_code == 503
+        assert fake_proxmox.requests.count((method, f"/api2/json{path}")) == 1
+
+    def test_retries_are_bounded(self, fake_proxmox):
+        client = get_client()
+        client.get("/nodes/pve/qemu/9000/status/current")
+        fake_proxmox.failures = [503] * 10
+        with pytest.raises(ProxmoxError):
+            client.get("/nodes/pve/qemu/9000/status/current")
+        assert len(fake_proxmox.failures) == 10 - 4  # first try + PROXMOX_MAX_RETRIES
+
+    def test_connection_errors_are_retried_with_jittered_backoff(self):
+        client = ProxmoxClient(
+            "http://127.0.0.1:9", token_id="t", max_retries=2, retry_backoff=0.01
+        )
+        with patch("orders.proxmox.time.sleep") as mock_sleep, pytest.raises(ProxmoxError):
+            client.get("/version")
+        delays = [c.args[0] for c in mock_sleep.call_args_list]
+        assert len(delays) == 2
+        assert 0 <= delays[0] <= 0.02 and 0 <= delays[1] <= 0.04
+
+    def test_per_call_timeout(self, fake_proxmox):
+        client = get_client()
+        client.get("/nodes/pve/qemu/9000/status/current")
+        fake_proxmox.delay = 0.5
+        started = time.monotonic()
+        with pytest.raises(ProxmoxError):
+            client.post("/nodes/pve/qemu/9000/status/start", timeout=0.1)
+        assert time.monotonic() - started < 0.5
+
+    def test_unconfigured_url_raises(self, settings):
+        settings.PROXMOX_URL = ""
+        reset_client()
+        with pytest.raises(ProxmoxError):
+            get_client()
+
+
+# ---------------------------------------------------------------------------
+# 2. ProxmoxProvider
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestProxmoxProvider:
+    def test_registered(self):
+        assert isinstance(get_provider("proxmox"), ProxmoxProvider)
+
+    def test_provision_clones_then_sizes_boots_and_succeeds(self, fake_proxmox, settings, job):
+        provider = ProxmoxProvider()
+        operation = provider.provision(job)
+        vmid = settings.PROXMOX_VMID_BASE + job.pk
+        assert operation.data["vmid"] == vmid
+
+        states = [provider.poll(operation) for _ in range(3)]
+        assert [s.state for s in states] == [
+            OperationState.PENDING,  # clone running
+            OperationState.PENDING,  # cloned — configured and started
+            OperationState.SUCCEEDED,
+        ]
+        assert states[-1].result == {
+            "external_id": f"pve/{vmid}",
+            "vmid": vmid,
+            "ip_address": "203.0.113.7",
+        }
+        vm = fake_proxmox.vms[str(vmid)]
+        specs = PLAN_SPECS["professional"]
+        assert vm["config"] == {
+            "cores": str(specs["cpu_cores"]),
+            "memory": str(specs["ram_mb"]),
+            "size": f"{specs['disk_gb']}G",
+        }
+
+    def test_failed_clone_fails_the_operation(self, fake_proxmox, job):
+        provider = ProxmoxProvider()
+        operation = provider.provision(job)
+        fake_proxmox.tasks[operation.id]["exitstatus"] = "storage 'local-lvm' is full"
+        fake_proxmox.clone_polls = 0
+        status = provider.poll(operation)
+        assert status.state == OperationState.FAILED
+        assert "storage 'local-lvm' is full" in status.error
+
+    def test_boot_writes_are_sent_once(self, fake_proxmox, job):
+        fake_proxmox.clone_polls = 0
+        provider = ProxmoxProvider()
+        operation = provider.provision(job)
+        assert provider.poll(operation).state == OperationState.PENDING
+        assert operation.data["configured"] is True
+
+        # The VM is slow to report "running": later polls only watch the start task.
+        fake_proxmox.vms[str(operation.data["vmid"])]["status"] = "stopped"
+        assert [provider.poll(operation).state for _ in range(2)] == [OperationState.PENDING] * 2
+        vm = f"/api2/json/nodes/pve/qemu/{operation.data['vmid']}"
+        for request in (
+            ("PUT", f"{vm}/config"),
+            ("PUT", f"{vm}/resize"),
+            ("POST", f"{vm}/status/start"),
+        ):
+            assert fake_proxmox.requests.count(request) == 1
+
+    def test_failed_start_fails_the_operation(self, fake_proxmox, job):
+        fake_proxmox.clone_polls = 0
+        provider = ProxmoxProvider()
+        operation = provider.provision(job)
+        fake_proxmox.task_exitstatus = "start failed: QEMU exited with code 1"
+        provider.poll(operation)
+        fake_proxmox.vms[str(operation.data["vmid"])]["status"] = "stopped"
+        status = provider.poll(operation)
+        assert status.state == OperationState.FAILED
+        assert "QEMU exited with code 1" in status.error
+
+    def test_unknown_template_raises(self, fake_proxmox, settings, job):
+        settings.PROXMOX_TEMPLATES = {}
+        with pytest.raises(ValueError):
+            ProxmoxProvider().provision(job)
+
+    @patch("orders.tasks._queue_vps_ready_notification")
+    def test_end_to_end_through_the_poller(self, mock_notify, fake_proxmox, settings, job):
+        provision_vps_task.run(job.pk)
+        for _ in range(3):
+            poll_provisioning_operations.run()
+        job.refresh_from_db()
+        assert job.status == ProvisioningStatus.READY
+        instance = VPSInstance.objects.get(provisioning_job=job)
+        assert instance.proxmox_vmid == settings.PROXMOX_VMID_BASE + job.pk
+        assert instance.ip_address == "203.0.113.7"
+        assert fake_proxmox.connections == 1
+
+    @patch("orders.tasks._queue_vps_ready_notification")
+    def test_poller_saves_the_boot_steps_with_the_job(self, mock_notify, fake_proxmox, job):
+        fake_proxmox.clone_polls = 0
+        provision_vps_task.run(job.pk)
+        poll_provisioning_operations.run()
+        job.refresh_from_db()
+        data = job.payload["operation"]["data"]
+        assert data["configured"] is True
+        assert data["start_task"].startswith("UPID:pve:")
+
+        fake_proxmox.vms[str(data["vmid"])]["status"] = "stopped"
+        poll_provisioning_operations.run()
+        start = ("POST", f"/api2/json/nodes/pve/qemu/{data['vmid']}/status/start")
+        assert fake_proxmox.requests.count(start) == 1
+        job.refresh_from_db()
+        assert job.status == ProvisioningStatus.PROVISIONING
+
+    def test_success_waits_for_the_guest_agent_ip(self, fake_proxmox, settings, job):
+        fake_proxmox.agent_up = False
+        provider = ProxmoxProvider()
+        operation = provider.provision(job)
+        states = [provider.poll(operation).state for _ in range(3)]
+        assert states == [OperationState.PENDING] * 3  # cloned, started, agent not up
+
+        fake_proxmox.agent_up = True
+        status = provider.poll(operation)
+        assert status.state == OperationState.SUCCEEDED
+        assert status.result["ip_address"] == "203.0.113.7"
+
+    def test_success_without_agent_after_the_timeout(self, fake_proxmox, settings, job):
+        fake_proxmox.agent_up = False
+        provider = ProxmoxProvider()
+        operation = provider.provision(job)
+        provider.poll(operation)
+        provider.poll(operation)
+        vm = fake_proxmox.vms[str(operation.data["vmid"])]
+        vm["uptime"] = settings.PROXMOX_GUEST_AGENT_TIMEOUT
+        status = provider.poll(operation)
+        assert status.state == OperationState.SUCCEEDED
+        assert status.result["ip_address"] is None
+
+    def test_power_actions(self, fake_proxmox):
+        fake_proxmox.vms["10042"] = {"status": "stopped", "config": {}}
+        instance = MagicMock(proxmox_vmid=10042)
+        instance.provisioning_job.external_id = "pve/10042"
+        provider = ProxmoxProvider()
+
+        assert provider.start(instance) is True
+        assert provider.status(instance) == "running"
+        assert provider.stop(instance) is True
+        assert provider.status(instance) == "stopped"
+        assert provider.restart(instance) is True
+        assert provider.terminate(instance) is True
+        assert "10042" not in fake_proxmox.vms
+
+    @patch("orders.provisioning.TASK_POLL_INTERVAL", 0)
+    def test_power_actions_wait_for_their_task(self, fake_proxmox):
+        fake_proxmox.vms["10042"] = {"status": "stopped", "config": {}}
+        fake_proxmox.task_polls = 2
+        instance = MagicMock(proxmox_vmid=10042)
+        instance.provisioning_job.external_id = "pve/10042"
+
+        assert ProxmoxProvider().start(instance) is True
+        (task,) = fake_proxmox.tasks.values()
+        assert task["polls"] == 3
+
+    def test_failed_power_task_raises(self, fake_proxmox):
+        fake_proxmox.vms["10042"] = {"status": "running", "config": {}}
+        fake_proxmox.task_exitstatus = "can't lock file '/var/lock/qemu-server/lock-10042.conf'"
+        instance = MagicMock(proxmox_vmid=10042)
+        instance.provisioning_job.external_id = "pve/10042"
+        with pytest.raises(ProxmoxError, match="can't lock file"):
+            ProxmoxProvider().stop(instance)
+
+    @patch("orders.provisioning.TASK_POLL_INTERVAL", 0)
+    def test_power_task_wait_is_bounded(self, fake_proxmox, settings):
+        settings.PROXMOX_TASK_TIMEOUT = 0
+        fake_proxmox.vms["10042"] = {"status": "running", "config": {}}
+        fake_proxmox.task_polls = 100
+        instance = MagicMock(proxmox_vmid=10042)
+        instance.provisioning_job.external_id = "pve/10042"
+        with pytest.raises(ProxmoxError, match="still running"):
+            ProxmoxProvider().restart(instance)
+
+    def test_fleet_status_is_one_listing_call(self, fake_proxmox):
+        fake_proxmox.vms.update(
+            {
+                "10001": {"status": "running", "config": {}},
+                "10002": {"status": "paused", "config": {}},
+                "10003": {"status": "prelaunch", "config": {}},
+            }
+        )
+        fleet = ProxmoxProvider().fleet_status()
+        assert fleet == {10001: "running", 10002: "suspended", 10003: "error"}
+        assert [r for r in fake_proxmox.requests if "cluster" in r[1]] == [
+            ("GET", "/api2/json/cluster/resources")
+        ]
+
+    def test_poll_is_safe_across_threads(self, fake_proxmox, job):
+        provider = ProxmoxProvider()
+        operation = ProvisionOperation.from_payload(provider.provision(job).to_payload())
+        fake_proxmox.clone_polls = 100
+        threads = [threading.Thread(target=provider.poll, args=(operation,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert fake_proxmox.logins == 1
+        assert fake_proxmox.connections <= 8
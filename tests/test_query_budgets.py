@@ -0,0 +1,459 @@
+"""
+Query and latency budget tests — every route in api/, orders/, tickets/ and the
+dashboard, against an account seeded with realistic volumes.
+
+Each budget caps the number of SQL queries one request may issue and the p95
+wall-clock latency over repeated requests.  Query counts are exact regressions
+(an N+1 shows up as soon as a page holds more than one row); latency budgets are
+deliberately loose and scale with QUERY_BUDGET_LATENCY_FACTOR for slow runners.
+
+Knobs (environment):
+  QUERY_BUDGET_SCALE           — multiply the seeded volumes (default 1)
+  QUERY_BUDGET_RUNS            — requests timed per route (default 20)
+  QUERY_BUDGET_LATENCY_FACTOR  — multiply every p95 budget (default 1.0)
+
+Runs on SQLite or PostgreSQL — whatever DATABASES points at.  Select just these
+with ``pytest -m budget``.
+"""
+
+import datetime
+import os
+import statistics
+import time
+from dataclasses import dataclass, field
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import urls as api_urls
+from orders import urls as orders_urls
+from orders.models import (
+    Customer,
+    Order,
+    OrderStatus,
+    ProvisioningJob,
+    ProvisioningStatus,
+    Subscription,
+    SubscriptionStatus,
+    VPSInstance,
+    VPSInstanceStatus,
+    VPSOperation,
+    VPSOperationStatus,
+    VPSPowerAction,
+)
+from services.models import ServicePlan
+from tickets import urls as tickets_urls
+from tickets.models import Ticket, TicketMessage, TicketStatus
+
+User = get_user_model()
+
+pytestmark = pytest.mark.budget
+
+SCALE = int(os.environ.get("QUERY_BUDGET_SCALE", "1"))
+RUNS = int(os.environ.get("QUERY_BUDGET_RUNS", "20"))
+LATENCY_FACTOR = float(os.environ.get("QUERY_BUDGET_LATENCY_FACTOR", "1.0"))
+
+VOLUMES = {
+    "tickets": 1000 * SCALE,
+    "messages_per_ticket": 4,
+    "vps": 300 * SCALE,
+    "orders": 1000 * SCALE,
+}
+
+# Password hashing cost is a PASSWORD_HASHERS setting, not something these
+# budgets should measure, so the seeded accounts use a fast hasher.
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+PASSWORD = "BudgetPass123!"
+
+
+# ---------------------------------------------------------------------------
+# Seed data — created once per module, outside the per-test transactions
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Seed:
+    user: object
+    staff: object
+    ticket: object
+    closed_ticket: object
+    running_vps: object
+    plan: object
+    vps_operation: object
+    extra: dict = field(default_factory=dict)
+
+
+def _seed() -> Seed:
+    now = timezone.now()
+    user = User.objects.create_user(email="budget@budget.test", password=PASSWORD)
+    staff = User.objects.create_user(email="staff@budget.test", password=PASSWORD, is_staff=True)
+    plan = ServicePlan.objects.create(
+        name="Budget",
+        slug="budget",
+        price_monthly="29.00",
+        tier_key="starter",
+        stripe_price_id_monthly="price_budget_m",
+    )
+    customer = Customer.objects.create(user=user, stripe_customer_id="cus_budget")
+    subscription = Subscription.objects.create(
+        customer=customer,
+        stripe_subscription_id="sub_budget",
+        status=SubscriptionStatus.ACTIVE,
+        current_period_end=now + datetime.timedelta(days=20),
+    )
+
+    orders = Order.objects.bulk_create(
+        Order(
+            customer=customer,
+            service_plan=plan,
+            subscription=subscription,
+            status=OrderStatus.PAID,
+            amount_total="29.00",
+        )
+        for _ in range(VOLUMES["orders"])
+    )
+    jobs = ProvisioningJob.objects.bulk_create(
+        ProvisioningJob(order=orders[n % len(orders)], status=ProvisioningStatus.READY)
+        for n in range(VOLUMES["vps"])
+    )
+    statuses = [VPSInstanceStatus.RUNNING, VPSInstanceStatus.STOPPED]
+    VPSInstance.objects.bulk_create(
+        VPSInstance(
+            provisioning_job=job,
+            customer=customer,
+            subscription=subscription,
+            hostname=f"vps-{n}.budget.test",
+            status=statuses[n % 2],
+        )
+        for n, job in enumerate(jobs)
+    )
+
+    ticket_statuses = TicketStatus.values
+    tickets = Ticket.objects.bulk_create(
+        Ticket(user=user, subject=f"Ticket {n}", status=ticket_statuses[n % len(ticket_statuses)])
+        for n in range(VOLUMES["tickets"])
+    )
+    TicketMessage.objects.bulk_create(
+        TicketMessage(ticket=t, sender=staff if m % 2 else user, body=f"Message {m}")
+        for t in tickets
+        for m in range(VOLUMES["messages_per_ticket"])
+    )
+
+    return Seed(
+        user=user,
+        staff=staff,
+        ticket=Ticket.objects.filter(user=user, status=TicketStatus.OPEN).latest("pk"),
+        closed_ticket=Ticket.objects.filter(user=user, status=TicketStatus.CLOSED).latest("pk"),
+        running_vps=VPSInstance.objects.filter(
+            customer=customer, status=VPSInstanceStatus.RUNNING
+        ).latest("pk"),
+        plan=plan,
+        vps_operation=VPSOperation.objects.create(
+            instance=VPSInstance.objects.filter(customer=customer).earliest("pk"),
+            requested_by=user,
+            action=VPSPowerAction.RESTART,
+            status=VPSOperationStatus.SUCCEEDED,
+            previous_status=VPSInstanceStatus.RUNNING,
+        ),
+    )
+
+
+def _unseed() -> None:
+    User.objects.filter(email__endswith="@budget.test").delete()
+    ServicePlan.objects.filter(slug="budget").delete()
+
+
+@pytest.fixture(scope="module")
+def seed(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock(), override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+        _unseed()
+        data = _seed()
+    yield data
+    with django_db_blocker.unblock():
+        _unseed()
+
+
+# ---------------------------------------------------------------------------
+# Budgets
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Budget:
+    route: str  # URL name, e.g. "api:me"
+    queries: int  # max SQL queries for one warm request
+    p95_ms: float  # max p95 latency over RUNS requests
+    method: str = "get"
+    as_user: str = "user"  # user | staff | anon
+    kwargs: tuple = ()  # (url kwarg, Seed attribute) pairs
+    data: dict | None = None
+    query: str = ""
+    api: bool = False
+    status: tuple = (200,)
+
+    @property
+    def id(self) -> str:
+        suffix = f"?{self.query}" if self.query else ""
+        return f"{self.method.upper()} {self.route}{suffix}"
+
+
+def _api(route, queries, p95_ms, **kwargs):
+    return Budget(route, queries, p95_ms, api=True, **kwargs)
+
+
+BUDGETS = [
+    # ── api/urls.py ──────────────────────────────────────────────────────
+    _api("api:health", 0, 25, as_user="anon"),
+    _api("api:health-db", 2, 30, as_user="staff"),
+    _api("api:health-fleet", 2, 30, as_user="staff", status=(200, 204)),
+    _api("api:schema", 0, 300, as_user="anon"),
+    _api("api:docs", 0, 50, as_user="anon"),
+    _api(
+        "api:token-obtain-pair",
+        5,
+        80,
+        method="post",
+        as_user="anon",
+        data={"email": "budget@budget.test", "password": PASSWORD},
+    ),
+    _api("api:token-refresh", 13, 40, method="post", as_user="anon", data={"refresh": None}),
+    _api("api:me", 4, 40),
+    _api("api:me", 5, 40, method="patch", data={"first_name": "Budget"}),
+    _api("api:plan-list", 0, 25, as_user="anon"),
+    _api("api:ticket-list", 4, 80),
+    _api(
+        "api:ticket-list",
+        12,
+        60,
+        method="post",
+        data={"subject": "Help", "body": "Please"},
+        status=(201,),
+    ),
+    _api("api:ticket-detail", 4, 40, kwargs=(("pk", "ticket"),)),
+    _api(
+        "api:ticket-reply",
+        4,
+        40,
+        method="post",
+        kwargs=(("pk", "ticket"),),
+        data={"body": "Hi"},
+        status=(201,),
+    ),
+    _api("api:v1-orders-list", 4, 60),
+    _api("api:v1-vps-list", 4, 60),
+    _api("api:v1-vps-detail", 3, 40, kwargs=(("pk", "running_vps"),)),
+    _api(
+        "api:v1-vps-action",
+        11,
+        80,
+        method="post",
+        kwargs=(("pk", "running_vps"),),
+        data={"action": "restart"},
+        status=(202,),
+    ),
+    _api(
+        "api:v1-vps-bulk-action",
+        12,
+        150,
+        method="post",
+        data={"action": "restart", "status": "running"},
+        status=(202,),
+    ),
+    _api("api:v1-vps-operation", 3, 40, kwargs=(("pk", "vps_operation"),)),
+    _api("api:v1-vps-operation-list", 3, 40),
+    # ── orders/urls.py ───────────────────────────────────────────────────
+    Budget("orders:billing", 4, 40),
+    Budget("orders:order_history", 5, 100),
+    Budget("orders:billing_portal", 3, 80, method="post", status=(302,)),
+    Budget("orders:checkout", 3, 40, method="post", kwargs=(("plan_slug", "plan"),), status=(302,)),
+    Budget("orders:vps_list", 5, 150),
+    Budget("orders:vps_list", 5, 100, query="status=running"),
+    Budget("orders:vps_detail", 3, 40, kwargs=(("pk", "running_vps"),)),
+    Budget(
+        "orders:vps_action",
+        11,
+        50,
+        method="post",
+        kwargs=(("pk", "running_vps"),),
+        data={"action": "restart"},
+        status=(302,),
+    ),
+    Budget("orders:stripe_webhook", 1, 20, method="post", as_user="anon"),
+    # ── tickets/urls.py ──────────────────────────────────────────────────
+    Budget("tickets:list", 4, 100),
+    Budget("tickets:list", 4, 100, query="status=open"),
+    Budget("tickets:create", 2, 50),
+    Budget(
+        "tickets:create",
+        9,
+        60,
+        method="post",
+        data={"subject": "Help", "body": "Please", "priority": "normal"},
+        status=(302,),
+    ),
+    Budget("tickets:detail", 4, 40, kwargs=(("pk", "ticket"),)),
+    Budget(
+        "tickets:detail",
+        4,
+        60,
+        method="post",
+        kwargs=(("pk", "ticket"),),
+        data={"body": "Any news?"},
+        status=(302,),
+    ),
+    Budget("tickets:staff_list", 4, 160, as_user="staff"),
+    Budget("tickets:staff_detail", 4, 40, as_user="staff", kwargs=(("pk", "ticket"),)),
+    # ── users/urls.py — dashboard ────────────────────────────────────────
+    Budget("users:dashboard", 2, 40),
+]
+
+# Routes deliberately without a budget, with the reason.
+UNBUDGETED: dict[str, str] = {}
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+
+
+def _client(seed: Seed, as_user: str) -> Client:
+    client = Client()
+    if as_user != "anon":
+        client.force_login(getattr(seed, as_user))
+    return client
+
+
+def _url(budget: Budget, seed: Seed) -> str:
+    kwargs = {}
+    for name, attr in budget.kwargs:
+        obj = getattr(seed, attr)
+        kwargs[name] = obj.slug if name.endswith("slug") else obj.pk
+    url = reverse(budget.route, kwargs=kwargs)
+    if budget.route == "api:v1-vps-operation-list":
+        return f"{url}?ids={seed.vps_operation.pk}"
+    return f"{url}?{budget.query}" if budget.query else url
+
+
+def _data(budget: Budget, seed: Seed):
+    if budget.route == "api:token-refresh":
+        # Refresh tokens rotate and are blacklisted after use — mint one per request.
+        return {"refresh": str(RefreshToken.for_user(seed.user))}
+    if budget.route in ("api:v1-vps-action", "api:v1-vps-bulk-action", "orders:vps_action"):
+        # Each action leaves instances restarting — reset them so every
+        # request measures fresh actions rather than conflicts.
+        VPSOperation.objects.filter(instance__customer__user=seed.user).exclude(
+            pk=seed.vps_operation.pk
+        ).delete()
+        VPSInstance.objects.filter(
+            customer__user=seed.user, status=VPSInstanceStatus.RESTARTING
+        ).update(status=VPSInstanceStatus.RUNNING)
+    return budget.data
+
+
+def _request(client: Client, budget: Budget, url: str, data):
+    call = getattr(client, budget.method)
+    if budget.api and budget.method in ("post", "patch"):
+        return call(url, data, content_type="application/json")
+    if budget.route == "orders:stripe_webhook":
+        return call(url, b"{}", content_type="application/json", HTTP_STRIPE_SIGNATURE="t=1,v1=x")
+    return call(url, data) if data is not None else call(url)
+
+
+def p95(samples: list[float]) -> float:
+    return statistics.quantiles(samples, n=20, method="inclusive")[18]
+
+
+@pytest.fixture
+def outside_world():
+    """Stub Stripe, the Celery broker and throttles — only our own work is measured."""
+    stripe_session = MagicMock(url="https://checkout.stripe.test/session")
+    event = {
+        "id": "evt_budget",
+        "type": "customer.created",
+        "created": int(time.time()),
+        "data": {"object": {"id": "cus_budget", "object": "customer"}},
+    }
+    with (
+        override_settings(PASSWORD_HASHERS=FAST_HASHERS),
+        patch("rest_framework.throttling.SimpleRateThrottle.allow_request", return_value=True),
+        patch("orders.views.stripe.checkout.Session.create", return_value=stripe_session),
+        patch("orders.views.stripe.billing_portal.Session.create", return_value=stripe_session),
+        patch("orders.views.stripe.Webhook.construct_event", return_value=event),
+        patch("orders.tasks.process_stripe_event.apply_async"),
+        patch("orders.tasks.vps_power_action_task.apply_async"),
+        patch("orders.tasks.send_ticket_notification_task.apply_async"),
+        patch("notifications.tasks.send_notification_task.apply_async"),
+        patch("notifications.tasks.send_admin_notification_task.apply_async"),
+    ):
+        yield
+
+
+# ---------------------------------------------------------------------------
+# 1. Every route has a budget
+# ---------------------------------------------------------------------------
+
+
+class TestBudgetCoverage:
+    @pytest.mark.parametrize(
+        "namespace,module",
+        [("api", api_urls), ("orders", orders_urls), ("tickets", tickets_urls)],
+    )
+    def test_every_route_is_budgeted(self, namespace, module):
+        routes = {f"{namespace}:{p.name}" for p in module.urlpatterns}
+        budgeted = {b.route for b in BUDGETS} | set(UNBUDGETED)
+        assert routes - budgeted == set()
+
+    def test_dashboard_is_budgeted(self):
+        assert "users:dashboard" in {b.route for b in BUDGETS}
+
+
+# ---------------------------------------------------------------------------
+# 2. Query counts and p95 latency
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("outside_world")
+class TestRouteBudgets:
+    @pytest.mark.parametrize("budget", BUDGETS, ids=lambda b: b.id)
+    def test_query_budget(self, seed, budget):
+        client = _client(seed, budget.as_user)
+        url = _url(budget, seed)
+        _request(client, budget, url, _data(budget, seed))  # warm caches, sessions, plan index
+
+        data = _data(budget, seed)
+        with CaptureQueriesContext(connection) as ctx:
+            response = _request(client, budget, url, data)
+
+        assert response.status_code in budget.status, response.content[:500]
+        queries = "\n".join(q["sql"] for q in ctx.captured_queries)
+        message = f"{budget.id}: {len(ctx)} queries, budget {budget.queries}\n{queries}"
+        assert len(ctx) <= budget.queries, message
+
+    @pytest.mark.parametrize("budget", BUDGETS, ids=lambda b: b.id)
+    def test_latency_budget(self, seed, budget):
+        client = _client(seed, budget.as_user)
+        url = _url(budget, seed)
+        _request(client, budget, url, _data(budget, seed))
+
+        samples = []
+        for _ in range(max(RUNS, 2)):
+            data = _data(budget, seed)
+            start = time.perf_counter()
+            response = _request(client, budget, url, data)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code in budget.status
+
+        limit = budget.p95_ms * LATENCY_FACTOR
+        measured = p95(samples)
+        message = (
+            f"{budget.id}: p95 {measured:.1f} ms over {len(samples)} runs, budget {limit:.0f} ms"
+        )
+        assert measured <= limit, message
@@ -0,0 +1,270 @@
+"""
+Query plan tests — the hot views and periodic tasks are served by indexes.
+
+Each test captures the SQL a view or task actually runs and EXPLAINs it.  On
+SQLite a plan step of ``SCAN <table>`` is a full table scan; on PostgreSQL
+sequential scans are disabled for the EXPLAIN, so a remaining ``Seq Scan on
+<table>`` means no usable index exists.  Tests that name an index check that
+the planner picks the composite index added for that query shape.
+"""
+
+import datetime
+import re
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from notifications.models import NotificationLog
+from orders.models import (
+    Customer,
+    EventStatus,
+    Order,
+    PaymentEvent,
+    ProvisioningJob,
+    ProvisioningStatus,
+    Subscription,
+    SubscriptionStatus,
+    VPSInstance,
+    VPSInstanceStatus,
+)
+from orders.periodic import (
+    check_expiring_subscriptions,
+    cleanup_old_payment_events,
+    cleanup_stale_provisioning_jobs,
+    drain_payment_events,
+    provision_stranded_jobs,
+)
+from services.models import ServicePlan
+from tickets.models import Ticket, TicketStatus
+from users.summary import rebuild
+
+# Tables whose hot queries must never fall back to a full scan.
+HOT_TABLES = {
+    Subscription._meta.db_table,
+    Order._meta.db_table,
+    PaymentEvent._meta.db_table,
+    ProvisioningJob._meta.db_table,
+    VPSInstance._meta.db_table,
+    Ticket._meta.db_table,
+    NotificationLog._meta.db_table,
+}
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+
+
+def explain(sql: str, params=()) -> str:
+    """Return the query plan for *sql* as text, one step per line."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}", params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return "\n".join(row[-1] for row in cursor.fetchall())
+
+
+def full_scans(plan: str) -> set[str]:
+    """Tables read by a full scan in *plan*."""
+    if connection.vendor == "postgresql":
+        return set(re.findall(r"Seq Scan on (\w+)", plan))
+    # "SCAN t USING INDEX i" walks a whole index — still a full scan.
+    return set(re.findall(r"^\s*SCAN (\w+)", plan, flags=re.MULTILINE))
+
+
+def hot_queries(ctx) -> list[str]:
+    """Captured SELECT/UPDATE/DELETE statements that touch a hot table."""
+    statements = []
+    for query in ctx.captured_queries:
+        sql = query["sql"]
+        if not re.match(r"\s*(SELECT|UPDATE|DELETE)", sql, flags=re.IGNORECASE):
+            continue
+        if any(f'"{table}"' in sql or f" {table} " in sql for table in HOT_TABLES):
+            statements.append(sql)
+    return statements
+
+
+def assert_indexed(ctx):
+    """Every hot-table statement in *ctx* is planned without a full scan."""
+    statements = hot_queries(ctx)
+    assert statements, "no queries against the hot tables were captured"
+    for sql in statements:
+        plan = explain(sql)
+        scanned = full_scans(plan) & HOT_TABLES
+        assert not scanned, f"full scan of {scanned}:\n{sql}\n{plan}"
+
+
+def assert_uses_index(queryset, index_name: str):
+    sql, params = queryset.query.sql_with_params()
+    plan = explain(sql, params)
+    assert index_name in plan, plan
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def account(db, user):
+    """A customer with a little of everything, so plans are not trivially empty."""
+    now = timezone.now()
+    customer = Customer.objects.create(user=user, stripe_customer_id="cus_plans")
+    subscription = Subscription.objects.create(
+        customer=customer,
+        stripe_subscription_id="sub_plans",
+        status=SubscriptionStatus.ACTIVE,
+        current_period_end=now + datetime.timedelta(days=2),
+        cancel_at_period_end=True,
+    )
+    plan = ServicePlan.objects.create(name="Starter", slug="starter", price_monthly="29.00")
+    order = Order.objects.create(customer=customer, service_plan=plan, subscription=subscription)
+    for n, status in enumerate(VPSInstanceStatus.values):
+        job = ProvisioningJob.objects.create(
+            order=order,
+            status=ProvisioningStatus.PROVISIONING,
+            started_at=now - datetime.timedelta(hours=n),
+        )
+        VPSInstance.objects.create(
+            provisioning_job=job, customer=customer, hostname=f"vps-{n}", status=status
+        )
+    for n, status in enumerate(TicketStatus.values):
+        Ticket.objects.create(user=user, subject=f"Ticket {n}", status=status)
+    for n in range(3):
+        NotificationLog.objects.create(
+            user=user, channel="email", subject=f"Notice {n}", recipient=user.email
+        )
+        PaymentEvent.objects.create(
+            stripe_event_id=f"evt_plans_{n}",
+            event_type="invoice.paid",
+            status=EventStatus.PROCESSED,
+            processed_at=now - datetime.timedelta(days=100),
+        )
+    return customer
+
+
+# ---------------------------------------------------------------------------
+# 1. Composite indexes chosen for their query shapes
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestCompositeIndexes:
+    def test_active_subscription_lookup(self, account):
+        active = account.subscriptions.filter(
+            status__in=[SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING]
+        )
+        assert_uses_index(active, "sub_customer_status_idx")
+
+    def test_vps_by_customer_and_status(self, account):
+        running = VPSInstance.objects.filter(
+            customer=account, status=VPSInstanceStatus.RUNNING
+        ).order_by("-created_at")
+        assert_uses_index(running, "vps_cust_status_created_idx")
+
+    def test_stale_provisioning_jobs(self, account):
+        stale = ProvisioningJob.objects.filter(
+            status=ProvisioningStatus.PROVISIONING,
+            started_at__lt=timezone.now() - datetime.timedelta(hours=1),
+        )
+        assert_uses_index(stale, "provjob_status_started_idx")
+
+    def test_tickets_by_user_and_status(self, account, user):
+        open_tickets = Ticket.objects.filter(user=user, status=TicketStatus.OPEN).order_by(
+            "-updated_at"
+        )
+        assert_uses_index(open_tickets, "ticket_user_status_updated_idx")
+
+    def test_ticket_keyset_page(self, account, user):
+        now = timezone.now()
+        page = (
+            Ticket.objects.filter(user=user, created_at__lte=now)
+            .exclude(created_at=now, pk__gte=10)
+            .order_by("-created_at", "-pk")[:21]
+        )
+        assert_uses_index(page, "ticket_user_created_idx")
+
+    def test_vps_keyset_page(self, account):
+        now = timezone.now()
+        page = (
+            VPSInstance.objects.filter(customer=account, created_at__lte=now)
+            .exclude(created_at=now, pk__gte=10)
+            .order_by("-created_at", "-pk")[:11]
+        )
+        assert_uses_index(page, "vps_customer_created_idx")
+
+    def test_notification_history(self, account, user):
+        assert_uses_index(
+            user.notification_logs.order_by("-created_at")[:20], "notif_user_created_idx"
+        )
+
+    def test_expired_payment_events(self, account):
+        expired = PaymentEvent.objects.filter(
+            status__in=[EventStatus.PROCESSED, EventStatus.SKIPPED],
+            processed_at__lt=timezone.now() - datetime.timedelta(days=90),
+        )
+        assert_uses_index(expired, "payevent_status_processed_idx")
+
+    def test_received_backlog(self, account):
+        backlog = PaymentEvent.objects.filter(
+            status=EventStatus.RECEIVED,
+            received_at__lte=timezone.now() - datetime.timedelta(minutes=2),
+        ).order_by("received_at")
+        assert_uses_index(backlog, "payevent_status_received_idx")
+
+
+# ---------------------------------------------------------------------------
+# 2. Hot views and tasks — no full scans of the hot tables
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestHotPathPlans:
+    @pytest.mark.parametrize(
+        "url",
+        [
+            reverse("orders:vps_list"),
+            reverse("orders:vps_list") + "?status=running",
+            reverse("tickets:list"),
+            reverse("tickets:list") + "?status=open",
+            reverse("orders:order_history"),
+        ],
+    )
+    def test_customer_views(self, client_logged_in, account, url):
+        with CaptureQueriesContext(connection) as ctx:
+            assert client_logged_in.get(url).status_code == 200
+        assert_indexed(ctx)
+
+    def test_dashboard_summary_rebuild(self, account, user):
+        # The dashboard itself reads one summary row; its sections are the hot queries.
+        with CaptureQueriesContext(connection) as ctx:
+            rebuild(user.pk)
+        assert_indexed(ctx)
+
+    @pytest.mark.parametrize(
+        "task",
+        [
+            cleanup_stale_provisioning_jobs,
+            cleanup_old_payment_events,
+            drain_payment_events,
+            check_expiring_subscriptions,
+            provision_stranded_jobs,
+        ],
+        ids=lambda t: t.name.rsplit(".", 1)[-1],
+    )
+    def test_periodic_tasks(self, account, settings, task):
+        settings.PAYMENT_EVENT_PRUNE_SLEEP = 0
+        with (
+            patch("notifications.tasks.send_admin_notification_task.delay"),
+            patch("notifications.tasks.send_notification_batch_task.apply_async"),
+            patch("orders.tasks.process_stripe_events.apply_async"),
+            CaptureQueriesContext(connection) as ctx,
+        ):
+            task.run()
+        assert_indexed(ctx)
@@ -0,0 +1,219 @@
+"""
+Fleet reconcile tests — bulk status sync of VPSInstances from each
+provider's fleet listing, anomaly metrics and the periodic task.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.models import (
+    Customer,
+    Order,
+    OrderStatus,
+    ProvisioningJob,
+    ProvisioningStatus,
+    VPSInstance,
+    VPSInstanceStatus,
+)
+from orders.periodic import reconcile_fleet_status
+from orders.provisioning import DemoProvider
+from orders.reconcile import METRICS_KEY, reconcile_fleet
+from services.models import ServicePlan
+from users.models import UserDashboardSummary
+
+
+@pytest.fixture
+def customer(db, user):
+    return Customer.objects.create(user=user, stripe_customer_id="cus_fleet")
+
+
+@pytest.fixture
+def plan(db):
+    return ServicePlan.objects.create(
+        name="Starter", slug="starter", price_monthly="9.00", tier_key="starter"
+    )
+
+
+def _instances(customer, plan, count, status=VPSInstanceStatus.RUNNING, provider="fleet"):
+    start = VPSInstance.objects.count()
+    orders = Order.objects.bulk_create(
+        Order(customer=customer, service_plan=plan, status=OrderStatus.PAID) for _ in range(count)
+    )
+    jobs = ProvisioningJob.objects.bulk_create(
+        ProvisioningJob(order=order, provider=provider, status=ProvisioningStatus.READY)
+        for order in orders
+    )
+    return VPSInstance.objects.bulk_create(
+        VPSInstance(
+            provisioning_job=job,
+            customer=customer,
+            hostname=f"vps-{start + i}.ez-solutions.dev",
+            proxmox_vmid=20000 + start + i,
+            status=status,
+        )
+        for i, job in enumerate(jobs)
+    )
+
+
+class _FleetProvider(DemoProvider):
+    """Provider whose fleet listing is a plain dict set by the test."""
+
+    def __init__(self, fleet):
+        self.fleet = fleet
+        self.listings = 0
+
+    def fleet_status(self):
+        self.listings += 1
+        return dict(self.fleet)
+
+
+def _fleet(instances, status="running"):
+    return {instance.proxmox_vmid: status for instance in instances}
+
+
+# ---------------------------------------------------------------------------
+# 1. reconcile_fleet — orders/reconcile.py
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestReconcileFleet:
+    def test_drifted_instances_are_updated(self, customer, plan):
+        running = _instances(customer, plan, 4)
+        stopped = _instances(customer, plan, 2, status=VPSInstanceStatus.STOPPED)
+        fleet = _fleet(running) | _fleet(stopped, "stopped")
+        fleet[running[0].proxmox_vmid] = "stopped"
+        fleet[stopped[0].proxmox_vmid] = "running"
+        fleet[running[1].proxmox_vmid] = "suspended"
+
+        provider = _FleetProvider(fleet)
+        with patch("orders.reconcile.get_provider", return_value=provider):
+            result = reconcile_fleet()
+
+        assert provider.listings == 1
+        assert (result.checked, result.changed) == (6, 3)
+        assert result.transitions == {
+            "running->stopped": 1,
+            "stopped->running": 1,
+            "running->suspended": 1,
+        }
+        statuses = dict(VPSInstance.objects.values_list("pk", "status"))
+        assert statuses[running[0].pk] == VPSInstanceStatus.STOPPED
+        assert statuses[running[1].pk] == VPSInstanceStatus.SUSPENDED
+        assert statuses[stopped[0].pk] == VPSInstanceStatus.RUNNING
+        assert statuses[running[2].pk] == VPSInstanceStatus.RUNNING
+
+    def test_query_count_does_not_grow_with_the_fleet(self, customer, plan):
+        def reconcile_queries(count):
+            VPSInstance.objects.all().delete()
+            instances = _instances(customer, plan, count)
+            provider = _FleetProvider(_fleet(instances, "stopped"))
+            with (
+                patch("orders.reconcile.get_provider", return_value=provider),
+                CaptureQueriesContext(connection) as ctx,
+            ):
+                assert reconcile_fleet(chunk_size=1000).changed == count
+            return len(ctx)
+
+        reconcile_queries(1)  # warm the dashboard summary row
+        assert reconcile_queries(60) == reconcile_queries(5)
+
+    def test_instances_are_read_in_chunks(self, customer, plan):
+        instances = _instances(customer, plan, 7)
+        fleet = _fleet(instances, "stopped")
+        with patch("orders.reconcile.get_provider", return_value=_FleetProvider(fleet)):
+            result = reconcile_fleet(chunk_size=3)
+        assert (result.checked, result.changed) == (7, 7)
+        assert not VPSInstance.objects.filter(status=VPSInstanceStatus.RUNNING).exists()
+
+    def test_provisioning_and_terminated_instances_are_left_alone(self, customer, plan):
+        provisioning = _instances(customer, plan, 1, status=VPSInstanceStatus.PROVISIONING)
+        terminated = _instances(customer, plan, 1, status=VPSInstanceStatus.TERMINATED)
+        fleet = _fleet(provisioning + terminated, "stopped")
+        with patch("orders.reconcile.get_provider", return_value=_FleetProvider(fleet)):
+            result = reconcile_fleet()
+        assert (result.checked, result.changed, result.unmanaged) == (0, 0, 0)
+
+    def test_anomalies_are_counted_not_applied(self, customer, plan):
+        listed, absent = _instances(customer, plan, 2)
+        unmapped = _instances(customer, plan, 1)[0]
+        VPSInstance.objects.filter(pk=unmapped.pk).update(proxmox_vmid=None)
+        fleet = _fleet([listed]) | {99999: "running"}
+
+        with patch("orders.reconcile.get_provider", return_value=_FleetProvider(fleet)):
+            result = reconcile_fleet()
+        assert (result.missing, result.unmapped, result.unmanaged) == (1, 1, 1)
+        assert result.changed == 0
+        absent.refresh_from_db()
+        assert absent.status == VPSInstanceStatus.RUNNING
+
+    def test_providers_without_a_fleet_listing_are_skipped(self, customer, plan):
+        _instances(customer, plan, 2, status=VPSInstanceStatus.STOPPED, provider="demo")
+        result = reconcile_fleet()
+        assert result.skipped_providers == ["demo"]
+        assert result.checked == 0
+        assert not VPSInstance.objects.filter(status=VPSInstanceStatus.RUNNING).exists()
+
+    def test_listing_failure_skips_the_provider(self, customer, plan):
+        _instances(customer, plan, 1)
+        with patch.object(_FleetProvider, "fleet_status", side_effect=RuntimeError("API down")):
+            with patch("orders.reconcile.get_provider", return_value=_FleetProvider({})):
+                result = reconcile_fleet()
+        assert result.skipped_providers == ["fleet"]
+        assert result.missing == 0
+
+    def test_changes_settled_after_the_listing_are_kept(self, customer, plan):
+        stopped, drifted = _instances(customer, plan, 2, status=VPSInstanceStatus.STOPPED)
+
+        class _SlowListing(_FleetProvider):
+            def fleet_status(self):
+                listing = super().fleet_status()
+                # A start finishes while the listing is on its way back.
+                VPSInstance.objects.filter(pk=stopped.pk).update(
+                    status=VPSInstanceStatus.RUNNING, updated_at=timezone.now()
+                )
+                return listing
+
+        fleet = _fleet([stopped], "stopped") | _fleet([drifted], "running")
+        with patch("orders.reconcile.get_provider", return_value=_SlowListing(fleet)):
+            result = reconcile_fleet()
+        assert result.transitions == {"stopped->running": 1}
+        stopped.refresh_from_db()
+        drifted.refresh_from_db()
+        assert stopped.status == VPSInstanceStatus.RUNNING
+        assert drifted.status == VPSInstanceStatus.RUNNING
+
+    def test_dashboard_summary_sees_the_changes(self, user, customer, plan):
+        instances = _instances(customer, plan, 3)
+        fleet = _fleet(instances) | {instances[0].proxmox_vmid: "stopped"}
+        with patch("orders.reconcile.get_provider", return_value=_FleetProvider(fleet)):
+            reconcile_fleet()
+        summary = UserDashboardSummary.objects.get(user=user)
+        assert summary.vps_counts == {"running": 2, "stopped": 1}
+
+
+# ---------------------------------------------------------------------------
+# 2. Periodic task and metrics
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+class TestReconcileFleetStatusTask:
+    def test_returns_changes_and_records_metrics(self, customer, plan):
+        instances = _instances(customer, plan, 2)
+        fleet = {instances[0].proxmox_vmid: "stopped", 424242: "running"}
+        with patch("orders.reconcile.get_provider", return_value=_FleetProvider(fleet)):
+            assert reconcile_fleet_status.run() == 1
+
+        metrics = cache.get(METRICS_KEY)
+        assert metrics["checked"] == 2
+        assert metrics["changed"] == 1
+        assert metrics["missing"] == 1
+        assert metrics["unmanaged"] == 1
+        assert metrics["transitions"] == {"running->stopped": 1}
+        assert metrics["finished_at"]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.11 on 2026-10-16 19:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickets", "0002_ticketmessage_ticketmsg_ticket_created_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["user", "status", "updated_at"], name="ticket_user_status_updated_idx"
+            ),
+        ),
+    ]
@@ -4,6 +4,8 @@ import uuid
 
 from django.conf import settings
 from django.db import models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 
 
@@ -22,6 +24,23 @@ class TicketPriority(models.TextChoices):
     URGENT = "urgent", "Urgent"
 
 
+class TicketQuerySet(models.QuerySet):
+    def with_message_summary(self):
+        """Annotate ``message_count``, ``last_message_at`` and ``last_message_is_staff``.
+
+        Each is a correlated subquery on ``ticketmsg_ticket_created_idx``, so a
+        list page is a single query and no message rows are loaded.
+        """
+        thread = TicketMessage.objects.filter(ticket=OuterRef("pk"))
+        latest = thread.order_by("-created_at", "-pk")
+        counted = thread.order_by().values("ticket").annotate(n=models.Count("pk")).values("n")
+        return self.annotate(
+            message_count=Coalesce(Subquery(counted), 0),
+            last_message_at=Subquery(latest.values("created_at")[:1]),
+            last_message_is_staff=Subquery(latest.values("is_staff_reply")[:1]),
+        )
+
+
 class Ticket(models.Model):
     """A support request submitted by a user."""
 
@@ -47,10 +66,24 @@ class Ticket(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TicketQuerySet.as_manager()
+
+    # Set by TicketQuerySet.with_message_summary() through the message_count setter.
+    _message_count = None
+
     class Meta:
         verbose_name = "Support Ticket"
         verbose_name_plural = "Support Tickets"
         ordering = ["-created_at"]
+        indexes = [
+            # ticket_list / dashboard — a user's tickets by status, recently updated first
+            models.Index(
+                fields=["user", "status", "updated_at"], name="ticket_user_status_updated_idx"
+            ),
+            # Keyset pages on (created_at, id) — a user's tickets and the staff list
+            models.Index(fields=["user", "created_at"], name="ticket_user_created_idx"),
+            models.Index(fields=["created_at"], name="ticket_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"[{self.reference_short}] {self.subject}"
@@ -69,8 +102,16 @@ class Ticket(models.Model):
 
     @property
     def message_count(self) -> int:
+        if self._message_count is not None:
+            return self._message_count
+        if "messages" in getattr(self, "_prefetched_objects_cache", {}):
+            return len(self.messages.all())
         return self.messages.count()
 
+    @message_count.setter
+    def message_count(self, value: int) -> None:
+        self._message_count = value
+
 
 class TicketMessage(models.Model):
     """A reply in a ticket thread (from user or staff)."""
@@ -8,6 +8,8 @@ from django.db import transaction
 from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404, redirect, render
 
+from config.pagination import paginate
+
 from .forms import TicketCreateForm, TicketMessageForm
 from .models import Ticket, TicketMessage, TicketPriority, TicketStatus
 
@@ -15,7 +17,7 @@ from .models import Ticket, TicketMessage, TicketPriority, TicketStatus
 @login_required
 def ticket_list(request):
     """Show all tickets belonging to the logged-in user with filtering + pagination."""
-    tickets = request.user.tickets.prefetch_related("messages").all()
+    tickets = request.user.tickets.with_message_summary()
 
     # Status filter
     status_filter = request.GET.get("status", "")
@@ -140,8 +142,7 @@ def staff_ticket_list(request):
     if q:
         tickets = tickets.filter(Q(subject__icontains=q) | Q(user__email__icontains=q))
 
-    paginator = Paginator(tickets.order_by("-updated_at"), 20)
-    page = paginator.get_page(request.GET.get("page"))
+    page = paginate(request, tickets, 20, ordering=("-updated_at",))
 
     return render(
         request,
@@ -0,0 +1,42 @@
+"""
+Management command: rebuild_dashboard_summaries
+
+Usage:
+    python manage.py rebuild_dashboard_summaries                  # every user
+    python manage.py rebuild_dashboard_summaries --user a@b.com   # one user (email or ID)
+
+Recomputes UserDashboardSummary rows from the source tables, repairing drift
+left by bulk updates that bypass signals; see users/summary.py.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from users.summary import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard summary read model from tickets, VPS and subscriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild this user (email or ID)")
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Users loaded per query (default 500)"
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("pk")
+        if options["user"]:
+            ident = options["user"]
+            users = users.filter(**({"pk": ident} if ident.isdigit() else {"email": ident}))
+            if not users.exists():
+                raise CommandError(f"No user matches {ident!r}.")
+
+        total = drifted = 0
+        for user_id in users.values_list("pk", flat=True).iterator(
+            chunk_size=options["batch_size"]
+        ):
+            total += 1
+            drifted += rebuild(user_id)
+
+        self.stdout.write(self.style.SUCCESS(f"  ✓ {total} summaries checked, {drifted} rebuilt"))
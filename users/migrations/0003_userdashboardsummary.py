@@ -0,0 +1,57 @@
+# Generated by Django 5.2.11 on 2026-10-16 20:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserDashboardSummary",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="dashboard_summary",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("open_tickets", models.PositiveIntegerField(default=0)),
+                ("total_tickets", models.PositiveIntegerField(default=0)),
+                (
+                    "vps_counts",
+                    models.JSONField(blank=True, default=dict, help_text="VPS instances by status"),
+                ),
+                (
+                    "services",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text="Newest active VPS instances shown on the dashboard",
+                    ),
+                ),
+                (
+                    "subscription",
+                    models.JSONField(
+                        blank=True,
+                        help_text="Snapshot of the active subscription, if any",
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "dashboard summary",
+                "verbose_name_plural": "dashboard summaries",
+            },
+        ),
+    ]
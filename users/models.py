@@ -76,3 +76,31 @@ class User(AbstractBaseUser, PermissionsMixin):
     @property
     def is_paid(self):
         return self.subscription_tier != SubscriptionTier.FREE
+
+
+class UserDashboardSummary(models.Model):
+    """Read model for the dashboard — one row per user, maintained by users/summary.py."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="dashboard_summary",
+    )
+    open_tickets = models.PositiveIntegerField(default=0)
+    total_tickets = models.PositiveIntegerField(default=0)
+    vps_counts = models.JSONField(default=dict, blank=True, help_text="VPS instances by status")
+    services = models.JSONField(
+        default=list, blank=True, help_text="Newest active VPS instances shown on the dashboard"
+    )
+    subscription = models.JSONField(
+        null=True, blank=True, help_text="Snapshot of the active subscription, if any"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "dashboard summary"
+        verbose_name_plural = "dashboard summaries"
+
+    def __str__(self):
+        return f"Dashboard summary for user {self.user_id}"
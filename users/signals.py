@@ -10,9 +10,56 @@ log = logging.getLogger(__name__)
 def connect_signals():
     """Import allauth signals and connect handlers. Called from UsersConfig.ready()."""
     from allauth.account.signals import user_signed_up
+    from django.db.models.signals import post_delete, post_save
+
+    from orders.models import Subscription, VPSInstance
+    from tickets.models import Ticket
 
     user_signed_up.connect(on_user_signed_up)
 
+    # Dashboard summary maintenance (users/summary.py)
+    for model in (Ticket, VPSInstance, Subscription):
+        post_save.connect(on_summary_source_saved, sender=model)
+        post_delete.connect(on_summary_source_deleted, sender=model)
+
+
+SUMMARY_SECTIONS = {
+    "Ticket": "tickets",
+    "VPSInstance": "vps",
+    "Subscription": "subscription",
+}
+
+
+def _summary_user_id(instance) -> int | None:
+    if hasattr(instance, "user_id"):
+        return instance.user_id
+    if type(instance).customer.is_cached(instance):
+        return instance.customer.user_id
+    from orders.models import Customer
+
+    return (
+        Customer.objects.filter(pk=instance.customer_id).values_list("user_id", flat=True).first()
+    )
+
+
+def on_summary_source_saved(sender, instance, raw=False, **kwargs):
+    """Refresh the dashboard summary section fed by *sender*."""
+    if raw:
+        return
+    from .summary import refresh
+
+    user_id = _summary_user_id(instance)
+    if user_id is not None:
+        refresh(user_id, SUMMARY_SECTIONS[sender.__name__])
+
+
+def on_summary_source_deleted(sender, instance, **kwargs):
+    from .summary import refresh
+
+    user_id = _summary_user_id(instance)
+    if user_id is not None:
+        refresh(user_id, SUMMARY_SECTIONS[sender.__name__], create=False)
+
 
 def on_user_signed_up(sender, request, user, **kwargs):
     """Send a welcome email when a new user registers."""
@@ -0,0 +1,184 @@
+"""Dashboard read model — keeps ``UserDashboardSummary`` current.
+
+The dashboard is the most visited authenticated page.  Rendering it used to
+take two ticket COUNTs, an active-subscription lookup and a VPS query; the
+summary row holds all of it, and ``get_summary()`` serves it from the cache or
+a single primary-key lookup.
+
+Writes refresh only the section they touch, each recomputed from one indexed
+aggregate over that user's rows rather than patched with +1/-1 deltas, so a
+lost or doubled signal cannot leave a count permanently off.  The summary row
+is locked before a section is read, so two concurrent writers (say, two power
+workers finishing different instances) serialize instead of one committing a
+section computed before the other's change:
+
+  - Ticket save/delete        → ticket counts
+  - VPSInstance save/delete   → VPS counts by status + the services list
+  - Subscription save/delete  → active subscription snapshot (the Stripe
+    webhook handlers upsert subscriptions, so they land here too)
+
+The receivers live in users/signals.py.  ``QuerySet.update()`` and
+``bulk_create()`` bypass signals; code using them calls ``refresh()`` itself.
+``manage.py rebuild_dashboard_summaries`` recomputes every row to repair drift.
+"""
+
+from __future__ import annotations
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import UserDashboardSummary
+
+CACHE_KEY = "dashboard:summary:{user_id}"
+CACHE_TTL = 60 * 60
+SERVICE_LIMIT = 10
+
+OPEN_TICKET_STATUSES = ("open", "in_progress", "waiting")
+ACTIVE_VPS_STATUSES = ("running", "stopped", "provisioning", "starting", "stopping", "restarting")
+ACTIVE_SUBSCRIPTION_STATUSES = ("active", "trialing", "past_due")
+
+SUMMARY_FIELDS = (
+    "open_tickets",
+    "total_tickets",
+    "vps_counts",
+    "services",
+    "subscription",
+    "updated_at",
+)
+
+
+def cache_key(user_id: int) -> str:
+    return CACHE_KEY.format(user_id=user_id)
+
+
+# ---------------------------------------------------------------------------
+# Sections — each returns the summary fields it owns
+# ---------------------------------------------------------------------------
+
+
+def ticket_section(user_id: int) -> dict:
+    from tickets.models import Ticket
+
+    return Ticket.objects.filter(user_id=user_id).aggregate(
+        total_tickets=Count("pk"),
+        open_tickets=Count("pk", filter=Q(status__in=OPEN_TICKET_STATUSES)),
+    )
+
+
+def vps_section(user_id: int) -> dict:
+    from orders.models import VPSInstance, VPSInstanceStatus
+
+    instances = VPSInstance.objects.filter(customer__user_id=user_id)
+    counts = dict(instances.order_by().values_list("status").annotate(n=Count("pk")))
+    services = [
+        {**row, "status_display": VPSInstanceStatus(row["status"]).label}
+        for row in instances.filter(status__in=ACTIVE_VPS_STATUSES)
+        .order_by("-created_at")
+        .values("pk", "hostname", "status")[:SERVICE_LIMIT]
+    ]
+    return {"vps_counts": counts, "services": services}
+
+
+def subscription_section(user_id: int) -> dict:
+    from orders.models import Subscription
+
+    sub = (
+        Subscription.objects.filter(
+            customer__user_id=user_id, status__in=ACTIVE_SUBSCRIPTION_STATUSES
+        )
+        .order_by("-created_at")
+        .first()
+    )
+    if sub is None:
+        return {"subscription": None}
+    return {
+        "subscription": {
+            "id": sub.pk,
+            "status": sub.status,
+            "current_period_end": (
+                sub.current_period_end.isoformat() if sub.current_period_end else None
+            ),
+            "cancel_at_period_end": sub.cancel_at_period_end,
+        }
+    }
+
+
+SECTIONS = {
+    "tickets": ticket_section,
+    "vps": vps_section,
+    "subscription": subscription_section,
+}
+
+
+# ---------------------------------------------------------------------------
+# Maintenance
+# ---------------------------------------------------------------------------
+
+
+def _invalidate(user_id: int) -> None:
+    key = cache_key(user_id)
+    cache.delete(key)
+    # Again after commit, in case a reader cached the pre-commit row meanwhile.
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def refresh(user_id: int, *sections: str, create: bool = True) -> None:
+    """Recompute *sections* (default: all) of *user_id*'s summary.
+
+    A user without a summary row gets a full rebuild, unless *create* is
+    false — delete receivers pass that, so a cascading user delete never
+    re-creates the row it is removing.
+    """
+    with transaction.atomic(savepoint=False):
+        if not _lock(user_id):
+            if create:
+                rebuild(user_id)
+            return
+        values = {}
+        for name in sections or SECTIONS:
+            values.update(SECTIONS[name](user_id))
+        UserDashboardSummary.objects.filter(user_id=user_id).update(
+            **values, updated_at=timezone.now()
+        )
+    _invalidate(user_id)
+
+
+def rebuild(user_id: int) -> bool:
+    """Recompute every section of *user_id*'s summary; True if the row changed."""
+    with transaction.atomic(savepoint=False):
+        _lock(user_id)
+        values = {}
+        for section in SECTIONS.values():
+            values.update(section(user_id))
+        current = UserDashboardSummary.objects.filter(user_id=user_id).values(*values).first()
+        if current == values:
+            return False
+        UserDashboardSummary.objects.update_or_create(user_id=user_id, defaults=values)
+    _invalidate(user_id)
+    return True
+
+
+def _lock(user_id: int) -> bool:
+    """Lock *user_id*'s summary row until the transaction ends; False if it has none."""
+    return bool(
+        UserDashboardSummary.objects.select_for_update()
+        .filter(user_id=user_id)
+        .values_list("pk", flat=True)[:1]
+    )
+
+
+def get_summary(user_id: int) -> dict:
+    """The dashboard fields for *user_id* — cache, then row, then a rebuild."""
+    key = cache_key(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = (
+            UserDashboardSummary.objects.filter(user_id=user_id).values(*SUMMARY_FIELDS).first()
+        )
+        if summary is None:
+            rebuild(user_id)
+            summary = UserDashboardSummary.objects.values(*SUMMARY_FIELDS).get(user_id=user_id)
+        cache.set(key, summary, CACHE_TTL)
+    return summary
@@ -2,42 +2,27 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render
 
-from orders.models import VPSInstance
-from tickets.models import Ticket, TicketStatus
-
 from .forms import UserProfileForm
+from .summary import ACTIVE_VPS_STATUSES, get_summary
 
 
 @login_required
 def dashboard(request):
-    """Main authenticated dashboard — shows account overview."""
-    user = request.user
-
-    # Ticket stats
-    tickets_qs = Ticket.objects.filter(user=user)
-    total_tickets = tickets_qs.count()
-    open_tickets = tickets_qs.filter(
-        status__in=[TicketStatus.OPEN, TicketStatus.IN_PROGRESS, TicketStatus.WAITING]
-    ).count()
-
-    # Active subscription (may not exist yet for free users)
-    customer = getattr(user, "stripe_customer", None)
-    subscription = customer.get_active_subscription() if customer else None
-
-    # Active VPS instances
-    services = []
-    if customer:
-        services = VPSInstance.objects.filter(
-            customer=customer,
-            status__in=["running", "stopped", "provisioning"],
-        ).select_related("provisioning_job")[:10]
+    """Main authenticated dashboard — shows account overview.
 
+    Everything comes from the user's ``UserDashboardSummary`` (users/summary.py):
+    a cache hit, or a single row lookup.
+    """
+    summary = get_summary(request.user.pk)
+    vps_counts = summary["vps_counts"]
     ctx = {
-        "user": user,
-        "total_tickets": total_tickets,
-        "open_tickets": open_tickets,
-        "subscription": subscription,
-        "services": services,
+        "user": request.user,
+        "total_tickets": summary["total_tickets"],
+        "open_tickets": summary["open_tickets"],
+        "subscription": summary["subscription"],
+        "services": summary["services"],
+        "active_services": sum(vps_counts.get(status, 0) for status in ACTIVE_VPS_STATUSES),
+        "vps_total": sum(vps_counts.values()),
     }
     return render(request, "users/dashboard.html", ctx)
 